@@ -0,0 +1,39 @@
+"""notification_counters: per-user unread counters (services.notification_counters)
+
+Revision ID: a7d3e2f9c410
+Revises: f1a2c3d4e5b6
+Create Date: 2026-10-16 22:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d3e2f9c410"
+down_revision: Union[str, None] = "f1a2c3d4e5b6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # rows hazijazwi hapa: service hufanya seed kwa COUNT moja mara ya kwanza
+    op.create_table(
+        "notification_counters",
+        sa.Column(
+            "user_id", sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True,
+        ),
+        sa.Column("unread", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("version", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.CheckConstraint("unread >= 0", name="ck_notif_counter_unread_nonneg"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("notification_counters")
@@ -0,0 +1,53 @@
+"""broadcast_jobs: resumable broadcast progress (services.broadcast_runner)
+
+Revision ID: b7c1e0a4d911
+Revises: adc4bacd3cae
+Create Date: 2026-10-16 21:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7c1e0a4d911"
+down_revision: Union[str, None] = "adc4bacd3cae"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_VARIANT = sa.JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "broadcast_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("admin_id", sa.String(length=64), nullable=True),
+        sa.Column("idempotency_key", sa.String(length=120), nullable=True),
+        sa.Column("status", sa.String(length=8), nullable=False),
+        sa.Column("payload", JSON_VARIANT, nullable=False),
+        sa.Column("last_user_id", sa.String(length=64), nullable=True),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("processed", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("skipped", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("per_channel", JSON_VARIANT, nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("worker_id", sa.String(length=64), nullable=True),
+        sa.Column("lease_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    for col in ("id", "admin_id", "idempotency_key", "status", "lease_until", "created_at"):
+        op.create_index(f"ix_broadcast_jobs_{col}", "broadcast_jobs", [col])
+    op.create_index("ix_broadcast_jobs_status_lease", "broadcast_jobs", ["status", "lease_until"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("broadcast_jobs")
@@ -0,0 +1,52 @@
+"""webhook_events: durable webhook delivery queue (services.webhook_engine)
+
+Revision ID: c2d84f6a1b37
+Revises: b7c1e0a4d911
+Create Date: 2026-10-16 21:41:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c2d84f6a1b37"
+down_revision: Union[str, None] = "b7c1e0a4d911"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "webhook_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "endpoint_id", sa.Integer(),
+            sa.ForeignKey("webhook_endpoints.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("event_type", sa.String(length=100), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("correlation_id", sa.String(length=64), nullable=True),
+        sa.Column("status", sa.String(length=9), nullable=False),
+        sa.Column("attempt", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("max_retries", sa.Integer(), server_default=sa.text("3"), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("last_status_code", sa.Integer(), nullable=True),
+        sa.Column("last_error", sa.String(length=255), nullable=True),
+        sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.CheckConstraint("attempt >= 0 AND max_retries >= 0", name="ck_webhook_event_attempts_nonneg"),
+    )
+    for col in ("id", "endpoint_id", "user_id", "correlation_id", "created_at"):
+        op.create_index(f"ix_webhook_events_{col}", "webhook_events", [col])
+    op.create_index("ix_webhook_events_due", "webhook_events", ["status", "next_attempt_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("webhook_events")
@@ -0,0 +1,53 @@
+"""gift timeline rollups: per-minute replay gift buckets (services.gift_timeline)
+
+Revision ID: d3e95a7b2c48
+Revises: c2d84f6a1b37
+Create Date: 2026-10-16 21:42:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d3e95a7b2c48"
+down_revision: Union[str, None] = "c2d84f6a1b37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "gift_timeline_minutes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "stream_id", sa.Integer(),
+            sa.ForeignKey("live_streams.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("minute_epoch", sa.BigInteger(), nullable=False),
+        sa.Column("gift_name", sa.String(length=120), nullable=False),
+        sa.Column("gifts", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("quantity", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.UniqueConstraint("stream_id", "minute_epoch", "gift_name", name="uq_gtm_stream_minute_gift"),
+    )
+    op.create_index("ix_gtm_stream_minute", "gift_timeline_minutes", ["stream_id", "minute_epoch"])
+    op.create_table(
+        "gift_timeline_rollups",
+        sa.Column(
+            "stream_id", sa.Integer(),
+            sa.ForeignKey("live_streams.id", ondelete="CASCADE"), primary_key=True,
+        ),
+        sa.Column("last_event_id", sa.Integer(), nullable=True),
+        sa.Column("events", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("minutes", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("built_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("gift_timeline_rollups")
+    op.drop_table("gift_timeline_minutes")
@@ -0,0 +1,51 @@
+"""product search: pg_trgm + GIN tsvector/trigram indexes on products (Postgres)
+
+Revision ID: e4fa6b8c3d59
+Revises: d3e95a7b2c48
+Create Date: 2026-10-16 21:43:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4fa6b8c3d59"
+down_revision: Union[str, None] = "d3e95a7b2c48"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Lazima ilingane neno kwa neno na models.product.SEARCH_TSV_SQL (planner hulinganisha expression)
+SEARCH_TSV_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(sku, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY: products haifungwi kwa writes; haiwezi kuwa ndani ya transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_name_trgm "
+            "ON products USING gin (name gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_search_tsv "
+            f"ON products USING gin (({SEARCH_TSV_SQL}))"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_search_tsv")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_products_name_trgm")
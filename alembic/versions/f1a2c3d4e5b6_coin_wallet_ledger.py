@@ -0,0 +1,101 @@
+"""coin_wallets + coin_wallet_txns: ledger-first coin wallets (services.wallet_ledger)
+
+Revision ID: f1a2c3d4e5b6
+Revises: e4fa6b8c3d59
+Create Date: 2026-10-16 22:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1a2c3d4e5b6"
+down_revision: Union[str, None] = "e4fa6b8c3d59"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONEY = sa.Numeric(18, 2)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    insp = sa.inspect(op.get_bind())
+    legacy = insp.has_table("coin_wallets")
+    if legacy:
+        # DB za zamani (models/_coin_wallet_legacy.py) zina table hii tayari
+        cols = {c["name"] for c in insp.get_columns("coin_wallets")}
+        if "compacted_at" not in cols:
+            op.add_column("coin_wallets", sa.Column("compacted_at", sa.DateTime(timezone=True), nullable=True))
+    else:
+        op.create_table(
+            "coin_wallets",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("balance", MONEY, server_default=sa.text("0"), nullable=False),
+            sa.Column("currency", sa.String(length=8), server_default=sa.text("'TZS'"), nullable=False),
+            sa.Column("compacted_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.UniqueConstraint("user_id", name="uq_coin_wallets_user_id"),
+            sa.CheckConstraint("balance >= 0", name="ck_coin_wallets_balance_nonneg"),
+        )
+        op.create_index("ix_coin_wallets_user_id", "coin_wallets", ["user_id"])
+
+    op.create_table(
+        "coin_wallet_txns",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "wallet_id", sa.Integer(),
+            sa.ForeignKey("coin_wallets.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("type", sa.String(length=16), nullable=False),
+        sa.Column("amount", MONEY, nullable=False),
+        sa.Column("delta", MONEY, nullable=False),
+        sa.Column("balance_after", MONEY, nullable=True),
+        sa.Column("folded", sa.Boolean(), server_default=sa.text("false"), nullable=False),
+        sa.Column("currency", sa.String(length=8), nullable=True),
+        sa.Column("reference", sa.String(length=80), nullable=True),
+        sa.Column("idempotency_key", sa.String(length=128), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint("wallet_id", "idempotency_key", name="uq_cwt_wallet_idem"),
+    )
+    op.create_index("ix_cwt_wallet_id", "coin_wallet_txns", ["wallet_id", "id"])
+    op.create_index(
+        "ix_cwt_unfolded", "coin_wallet_txns", ["wallet_id"],
+        postgresql_where=sa.text("folded = false"), sqlite_where=sa.text("folded = 0"),
+    )
+
+    if legacy:
+        # ledger = chanzo cha ukweli: kila wallet iliyopo hupata row moja ya
+        # `opening` iliyokunjwa (delta = balance_after = balance), vinginevyo
+        # reconcile ingeona SUM(delta)=0 na fix ingefuta salio
+        wallets = sa.table(
+            "coin_wallets", sa.column("id"), sa.column("balance"), sa.column("currency"),
+        )
+        txns = sa.table(
+            "coin_wallet_txns",
+            sa.column("wallet_id"), sa.column("type"), sa.column("amount"), sa.column("delta"),
+            sa.column("balance_after"), sa.column("folded"), sa.column("currency"), sa.column("created_at"),
+        )
+        op.execute(
+            txns.insert().from_select(
+                ["wallet_id", "type", "amount", "delta", "balance_after", "folded", "currency", "created_at"],
+                sa.select(
+                    wallets.c.id, sa.literal("opening"), wallets.c.balance, wallets.c.balance,
+                    wallets.c.balance, sa.true(), wallets.c.currency, sa.func.now(),
+                ),
+            )
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("coin_wallet_txns")
+    cols = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("coin_wallets")}
+    if "locked_balance" in cols:
+        op.drop_column("coin_wallets", "compacted_at")  # table ya legacy: irudishe kama ilivyokuwa
+    else:
+        op.drop_table("coin_wallets")
@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select
 from pydantic import BaseModel
 
+from backend.utils.pagination import KeysetPage, exact_count, paginate
+
 ModelType = TypeVar("ModelType")
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -17,9 +19,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.get(self.model, id)
 
-    def list(
-        self, db: Session, *, offset: int = 0, limit: int = 50, filters: Optional[Dict[str, Any]] = None
-    ) -> Tuple[List[ModelType], int]:
+    def _filtered(self, filters: Optional[Dict[str, Any]] = None):
         stmt = select(self.model)
         if filters:
             for name, value in filters.items():
@@ -28,9 +28,44 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 col = getattr(self.model, name, None)
                 if col is not None:
                     stmt = stmt.where(col == value)
-        total = db.execute(stmt).unique().scalars().all()
-        items = total[offset : offset + limit]
-        return items, len(total)
+        return stmt
+
+    def list(
+        self, db: Session, *, offset: int = 0, limit: int = 50, filters: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[ModelType], int]:
+        # COUNT + LIMIT/OFFSET kwenye DB (si kuvuta table nzima kisha kukata kwa Python)
+        stmt = self._filtered(filters)
+        total = exact_count(db, stmt)
+        order = [c.asc() for c in self._key_cols("id")]
+        items = db.execute(stmt.order_by(*order).offset(offset).limit(limit)).unique().scalars().all()
+        return list(items), total
+
+    def list_keyset(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: str = "id",
+        desc: bool = True,
+        total: str = "none",
+    ) -> KeysetPage:
+        """Cursor pagination: ukurasa wowote una gharama sawa na wa kwanza."""
+        return paginate(
+            db,
+            self._filtered(filters),
+            self._key_cols(order_by),
+            limit=limit,
+            desc=desc,
+            cursor=cursor,
+            total=total,
+        )
+
+    def _key_cols(self, order_by: str) -> List[Any]:
+        pk = getattr(self.model, "id")
+        col = getattr(self.model, order_by, None)
+        return [pk] if col is None or order_by == "id" else [col, pk]
 
     # ----- CREATE -----
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
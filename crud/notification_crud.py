@@ -1,8 +1,9 @@
 from __future__ import annotations
-﻿from backend.schemas.user import UserOut
+from backend.schemas.user import UserOut
 from sqlalchemy.orm import Session
 from backend.models.notification import Notification
 from backend.schemas.notification import NotificationCreate
+from backend.services import notification_counters  # noqa: F401  (ORM hooks za unread counters)
 from datetime import datetime
 
 def create_notification(db: Session, notif: NotificationCreate):
@@ -23,8 +24,8 @@ def get_user_notifications(db: Session, user_id: int, skip: int = 0, limit: int
 
 def mark_notification_as_read(db: Session, notif_id: int):
     notif = db.query(Notification).filter(Notification.id == notif_id).first()
-    if notif:
-        notif.is_read = True
+    if notif and not notif.read:
+        notif.mark_read()
         db.commit()
         db.refresh(notif)
     return notif
@@ -1,14 +1,17 @@
 from __future__ import annotations
-﻿from backend.schemas.user import UserOut
+from typing import Any, Dict, Iterable, Tuple
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from backend.utils.email_sender import send_email_with_template
+from backend.utils import email_sender
 from backend.models.message import MessageLog
 from backend.models.ad_earning import AdEarning
-from backend.models.gift_transaction import GiftTransaction
-from backend.models.wallet import Wallet
 from backend.models.user import User
-def generate_campaign_report(db: Session, user: User):
+
+REPORT_TEMPLATE = "campaign_report"
+
+
+def build_campaign_report(db: Session, user: User) -> Tuple[str, Dict[str, Any]]:
+    """(email, data) ya ripoti ya saa 24 zilizopita kwa user mmoja."""
     today = datetime.utcnow()
     past = today - timedelta(days=1)
 
@@ -31,18 +34,30 @@ def generate_campaign_report(db: Session, user: User):
 
     replies = 0  # if reply system is tracked
 
-    send_email_with_template(
-        db=db,
-        to_email=user.email,
-        template_name="campaign_report",
-        data={
-            "user_name": user.full_name,
-            "report_date": today.strftime("%Y-%m-%d"),
-            "messages_sent": messages_sent,
-            "smartcoins_used": smartcoins_used,
-            "smartcoins_earned": total_earned,
-            "replies": replies
-        }
-    )
+    return user.email, {
+        "user_name": user.full_name,
+        "report_date": today.strftime("%Y-%m-%d"),
+        "messages_sent": messages_sent,
+        "smartcoins_used": smartcoins_used,
+        "smartcoins_earned": total_earned,
+        "replies": replies
+    }
+
+
+def generate_campaign_report(db: Session, user: User):
+    """Ripoti ya user mmoja: huenda kwenye email worker ikiwa inaendesha, vinginevyo hutumwa sasa."""
+    generate_campaign_reports(db, [user])
 
 
+def generate_campaign_reports(db: Session, users: Iterable[User]) -> Dict[str, Any]:
+    """
+    Ripoti za users wengi kwa job moja: worker (async) ikiwa inaendesha,
+    vinginevyo send_many kupitia pool ya SMTP. Foleni ikikataa job (imejaa /
+    loop haipatikani) ripoti hutumwa sasa badala ya kupotea.
+    """
+    recipients = [build_campaign_report(db, u) for u in users if getattr(u, "email", None)]
+    if not recipients:
+        return {"queued": 0}
+    if email_sender.worker.running and email_sender.enqueue_many(REPORT_TEMPLATE, recipients):
+        return {"queued": len(recipients)}
+    return email_sender.send_many(db, REPORT_TEMPLATE, recipients)
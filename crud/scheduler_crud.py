@@ -0,0 +1,209 @@
+# backend/crud/scheduler_crud.py
+# -*- coding: utf-8 -*-
+"""
+Queue ya `scheduled_messages` kwa dispatcher (backend.tasks.scheduler).
+
+- claim_due_messages: huchukua ujumbe unaostahili kwa `FOR UPDATE SKIP LOCKED`
+  na kuweka "lease" (status=sending, next_attempt_at=now+lease) kwa UPDATE moja.
+  Workers/instances wengi hushiriki foleni bila kugongana; worker akifa,
+  lease huisha na ujumbe unakuwa due tena.
+- mark_sent_bulk / record_failures_bulk: matokeo huandikwa kwa makundi
+  (UPDATE moja kwa waliofanikiwa; executemany kwa walioshindwa).
+- Retry hupangwa kama next_attempt_at ya baadaye (hakuna sleep ndani ya loop).
+
+Pia hutoa `get_due_unsent_messages` / `mark_message_sent` / `mark_message_failed`
+zinazotafutwa na crud.scheduler_bridge.
+"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.scheduled_message import ScheduledMessage, SchedStatus
+
+DUE_STATUSES = (SchedStatus.pending, SchedStatus.queued, SchedStatus.sending)
+
+RETRY_BASE_SECONDS = 30
+RETRY_CAP_SECONDS = 3600
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(retry_count: int, *, base: int = RETRY_BASE_SECONDS, cap: int = RETRY_CAP_SECONDS) -> float:
+    """Sawa na ScheduledMessage.backoff_retry: min(cap, base * 2^(retry-1)) + jitter ndogo."""
+    delay = min(cap, max(base, base * (2 ** max(0, retry_count - 1))))
+    return delay + random.uniform(0.0, delay * 0.1)
+
+
+def _due_clause(now: datetime):
+    due_at = func.coalesce(ScheduledMessage.next_attempt_at, ScheduledMessage.scheduled_time)
+    return (
+        ScheduledMessage.status.in_(DUE_STATUSES),
+        ScheduledMessage.sent.is_(False),
+        due_at <= now,
+    )
+
+
+def claim_due_messages(
+    db: Session,
+    now: Optional[datetime] = None,
+    *,
+    limit: int = 200,
+    lease_seconds: int = 120,
+    exclude_platforms: Iterable[str] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Chukua hadi `limit` ujumbe unaostahili na uweke lease. Hurudisha dicts
+    (id, platform, recipient, message, retry_count, max_retries, meta_json).
+    Commit hufanyika hapa ili locks zisishikiliwe wakati wa kutuma.
+    """
+    now = now or _utcnow()
+    due_at = func.coalesce(ScheduledMessage.next_attempt_at, ScheduledMessage.scheduled_time)
+    pick = select(ScheduledMessage.id).where(*_due_clause(now))
+    excluded = [p for p in exclude_platforms]
+    if excluded:
+        pick = pick.where(ScheduledMessage.platform.not_in(excluded))
+    pick = pick.order_by(due_at, ScheduledMessage.id).limit(limit).with_for_update(skip_locked=True)
+
+    stmt = (
+        update(ScheduledMessage)
+        .where(ScheduledMessage.id.in_(pick.scalar_subquery()))
+        .values(
+            status=SchedStatus.sending,
+            last_attempt_at=now,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(
+            ScheduledMessage.id,
+            ScheduledMessage.platform,
+            ScheduledMessage.recipient,
+            ScheduledMessage.content,
+            ScheduledMessage.retry_count,
+            ScheduledMessage.max_retries,
+            ScheduledMessage.meta_json,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        rows = db.execute(stmt).all()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return [
+        {
+            "id": r.id,
+            "platform": getattr(r.platform, "value", r.platform),
+            "recipient": r.recipient,
+            "message": r.content,
+            "retry_count": int(r.retry_count or 0),
+            "max_retries": int(r.max_retries or 0),
+            "meta_json": dict(r.meta_json or {}),
+        }
+        for r in rows
+    ]
+
+
+def mark_sent_bulk(db: Session, ids: Sequence[int], sent_at: Optional[datetime] = None) -> int:
+    """UPDATE moja kwa ujumbe wote uliofanikiwa."""
+    if not ids:
+        return 0
+    ts = sent_at or _utcnow()
+    res = db.execute(
+        update(ScheduledMessage)
+        .where(ScheduledMessage.id.in_(list(ids)), ScheduledMessage.status == SchedStatus.sending)
+        .values(status=SchedStatus.sent, sent=True, sent_at=ts, next_attempt_at=None, updated_at=ts)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+def record_failures_bulk(
+    db: Session,
+    failures: Sequence[Dict[str, Any]],
+    *,
+    now: Optional[datetime] = None,
+    base_seconds: int = RETRY_BASE_SECONDS,
+) -> Dict[str, int]:
+    """
+    failures: dicts za claim_due_messages + "error" (+ "permanent": bool).
+    Zenye attempts zilizobaki → queued na next_attempt_at ya baadaye;
+    zilizobaki → failed. Executemany moja (ORM bulk UPDATE by primary key).
+    """
+    if not failures:
+        return {"retry": 0, "failed": 0}
+    now = now or _utcnow()
+    params: List[Dict[str, Any]] = []
+    retry = failed = 0
+    for f in failures:
+        attempts = int(f.get("retry_count") or 0) + 1
+        meta = {**(f.get("meta_json") or {}), "last_error": str(f.get("error") or "")[:500]}
+        row: Dict[str, Any] = {"id": f["id"], "retry_count": attempts, "meta_json": meta, "updated_at": now}
+        if not f.get("permanent") and attempts < int(f.get("max_retries") or 0):
+            row.update(status=SchedStatus.queued, next_attempt_at=now + timedelta(seconds=retry_delay(attempts, base=base_seconds)))
+            retry += 1
+        else:
+            row.update(status=SchedStatus.failed, failed_at=now, next_attempt_at=None)
+            failed += 1
+        params.append(row)
+    db.execute(update(ScheduledMessage), params)
+    db.commit()
+    return {"retry": retry, "failed": failed}
+
+
+def release_leases(db: Session, ids: Sequence[int]) -> int:
+    """Rudisha ujumbe ambao haukutumwa (mf. shutdown) kuwa due mara moja."""
+    if not ids:
+        return 0
+    res = db.execute(
+        update(ScheduledMessage)
+        .where(ScheduledMessage.id.in_(list(ids)), ScheduledMessage.status == SchedStatus.sending)
+        .values(status=SchedStatus.queued, next_attempt_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+def queue_stats(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    now = now or _utcnow()
+    due = db.execute(select(func.count()).where(*_due_clause(now))).scalar() or 0
+    inflight = db.execute(
+        select(func.count()).where(
+            ScheduledMessage.status == SchedStatus.sending,
+            or_(ScheduledMessage.next_attempt_at.is_(None), ScheduledMessage.next_attempt_at > now),
+        )
+    ).scalar() or 0
+    return {"due": int(due), "leased": int(inflight)}
+
+
+# ---------- API inayotafutwa na crud.scheduler_bridge ----------
+def get_due_unsent_messages(db: Session, now: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+    return claim_due_messages(db, now, limit=limit)
+
+
+def mark_message_sent(db: Session, message_id: Any, sent_at: Optional[datetime] = None) -> None:
+    mark_sent_bulk(db, [message_id], sent_at)
+
+
+def mark_message_failed(db: Session, message_id: Any, error: str, attempt: Optional[int] = None) -> None:
+    row = db.execute(
+        select(ScheduledMessage.retry_count, ScheduledMessage.max_retries, ScheduledMessage.meta_json)
+        .where(ScheduledMessage.id == message_id)
+    ).first()
+    if row is None:
+        return
+    record_failures_bulk(db, [{
+        "id": message_id,
+        "retry_count": row.retry_count if attempt is None else attempt,
+        "max_retries": row.max_retries,
+        "meta_json": dict(row.meta_json or {}),
+        "error": error,
+    }])
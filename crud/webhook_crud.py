@@ -1,7 +1,8 @@
 from __future__ import annotations
-﻿from backend.schemas.user import UserOut
+from backend.schemas.user import UserOut
 from sqlalchemy.orm import Session
-from backend.models.webhook import WebhookEndpoint, WebhookDeliveryLog
+from backend.models.webhook import WebhookEndpoint
+from backend.models.webhook_delivery_log import WebhookDeliveryLog
 from backend.schemas.webhook import WebhookEndpointCreate
 from datetime import datetime
 
@@ -28,16 +29,21 @@ def log_delivery(
     response_code: int,
     success: bool,
     error_message: str | None = None,
-    attempts: int = 1
+    attempts: int = 1,
+    event_type: str = "generic",
 ):
+    """Log moja (njia ya zamani); engine huandika logs kwa makundi (webhook_queue_crud.apply_results)."""
+    endpoint = db.get(WebhookEndpoint, endpoint_id)
     log = WebhookDeliveryLog(
+        user_id=endpoint.user_id if endpoint else None,
         endpoint_id=endpoint_id,
+        target_url=endpoint.url if endpoint else "",
+        event_type=event_type,
         payload=payload,
         response_code=response_code,
         success=success,
-        error_message=error_message,
-        attempts=attempts,
-        delivered_at=datetime.utcnow()
+        error_message=(error_message or "")[:255] or None,
+        attempt=max(1, attempts),
     )
     db.add(log)
     db.commit()
@@ -45,5 +51,5 @@ def log_delivery(
     return log
 
 def get_webhook_logs(db: Session, endpoint_id: int):
-    return db.query(WebhookDeliveryLog).filter(WebhookDeliveryLog.endpoint_id == endpoint_id).order_by(WebhookDeliveryLog.delivered_at.desc()).all()
+    return db.query(WebhookDeliveryLog).filter(WebhookDeliveryLog.endpoint_id == endpoint_id).order_by(WebhookDeliveryLog.sent_at.desc()).all()
 
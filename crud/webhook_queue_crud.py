@@ -0,0 +1,260 @@
+# backend/crud/webhook_queue_crud.py
+# -*- coding: utf-8 -*-
+"""
+Foleni ya `webhook_events` kwa services.webhook_engine.
+
+- enqueue_event: row moja kwa kila endpoint hai iliyosajili tukio; request
+  path huandika tu (hakuna HTTP).
+- claim_due_events: `FOR UPDATE SKIP LOCKED` + lease (status=sending,
+  next_attempt_at=now+lease) kwa UPDATE moja; huambatanisha url/secret za
+  endpoints kwa query moja ya ziada.
+- apply_results: hali za events (executemany) + rows za WebhookDeliveryLog
+  (insert moja ya makundi) kwenye transaction moja.
+- Retry ni next_attempt_at ya baadaye (backoff ya scheduler_crud.retry_delay).
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.crud.scheduler_crud import retry_delay
+from backend.models.webhook import WebhookEndpoint
+from backend.models.webhook_delivery_log import WebhookDeliveryLog
+from backend.models.webhook_event import WebhookEvent, WebhookEventStatus
+
+DUE_STATUSES = (WebhookEventStatus.pending, WebhookEventStatus.sending)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _subscribed(ep: Any, event_type: str) -> bool:
+    events = ep.subscribed_events or []
+    return not events or event_type in events or "*" in events
+
+
+def enqueue_event(
+    db: Session,
+    *,
+    user_id: Any,
+    event_type: str,
+    payload: Any,
+    endpoint_ids: Optional[Iterable[int]] = None,
+    correlation_id: Optional[str] = None,
+    max_retries: Optional[int] = None,
+    commit: bool = True,
+    subscribed_only: bool = True,
+) -> int:
+    """
+    Weka tukio kwenye foleni kwa endpoints hai za user (au `endpoint_ids`).
+    `subscribed_only=False` hupuuza `subscribed_events` (utumaji wa moja kwa
+    moja kwa endpoint maalum, kama send_webhook ya zamani).
+    Hurudisha idadi ya deliveries zilizopangwa.
+    """
+    q = select(
+        WebhookEndpoint.id, WebhookEndpoint.user_id, WebhookEndpoint.max_retries, WebhookEndpoint.subscribed_events
+    ).where(WebhookEndpoint.is_active.is_(True))
+    if endpoint_ids is not None:
+        q = q.where(WebhookEndpoint.id.in_(list(endpoint_ids)))
+    else:
+        q = q.where(WebhookEndpoint.user_id == user_id)
+    body = payload if isinstance(payload, str) else json.dumps(payload, default=str, separators=(",", ":"))
+    rows = [
+        {
+            "endpoint_id": ep.id,
+            "user_id": ep.user_id,
+            "event_type": event_type,
+            "payload": body,
+            "correlation_id": correlation_id,
+            "status": WebhookEventStatus.pending,
+            "attempt": 0,
+            "max_retries": int(max_retries if max_retries is not None
+                               else ep.max_retries if ep.max_retries is not None else 3),
+            "next_attempt_at": _utcnow(),
+        }
+        for ep in db.execute(q).all()
+        if not subscribed_only or _subscribed(ep, event_type)
+    ]
+    if rows:
+        db.execute(insert(WebhookEvent), rows)
+        if commit:
+            db.commit()
+    return len(rows)
+
+
+def claim_due_events(
+    db: Session,
+    now: Optional[datetime] = None,
+    *,
+    limit: int = 200,
+    lease_seconds: int = 60,
+    exclude_endpoints: Iterable[int] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Chukua hadi `limit` events zilizofika muda na uweke lease. Kila dict ina
+    pia `url`, `secret`, `active` za endpoint. Commit hufanyika hapa.
+    """
+    now = now or _utcnow()
+    pick = select(WebhookEvent.id).where(
+        WebhookEvent.status.in_(DUE_STATUSES), WebhookEvent.next_attempt_at <= now
+    )
+    excluded = list(exclude_endpoints)
+    if excluded:
+        pick = pick.where(WebhookEvent.endpoint_id.not_in(excluded))
+    pick = pick.order_by(WebhookEvent.next_attempt_at, WebhookEvent.id).limit(limit).with_for_update(skip_locked=True)
+
+    stmt = (
+        update(WebhookEvent)
+        .where(WebhookEvent.id.in_(pick.scalar_subquery()))
+        .values(status=WebhookEventStatus.sending, next_attempt_at=now + timedelta(seconds=lease_seconds))
+        .returning(
+            WebhookEvent.id,
+            WebhookEvent.endpoint_id,
+            WebhookEvent.user_id,
+            WebhookEvent.event_type,
+            WebhookEvent.payload,
+            WebhookEvent.correlation_id,
+            WebhookEvent.attempt,
+            WebhookEvent.max_retries,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        rows = db.execute(stmt).all()
+        eps = {}
+        if rows:
+            eps = {
+                e.id: e
+                for e in db.execute(
+                    select(WebhookEndpoint.id, WebhookEndpoint.user_id, WebhookEndpoint.url,
+                           WebhookEndpoint.secret, WebhookEndpoint.is_active)
+                    .where(WebhookEndpoint.id.in_({r.endpoint_id for r in rows}))
+                ).all()
+            }
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    out: List[Dict[str, Any]] = []
+    for r in rows:
+        ep = eps.get(r.endpoint_id)
+        out.append({
+            "id": r.id,
+            "endpoint_id": r.endpoint_id,
+            "user_id": r.user_id if r.user_id is not None else getattr(ep, "user_id", None),
+            "event_type": r.event_type,
+            "payload": r.payload,
+            "correlation_id": r.correlation_id,
+            "attempt": int(r.attempt or 0),
+            "max_retries": int(r.max_retries or 0),
+            "url": getattr(ep, "url", None),
+            "secret": getattr(ep, "secret", None),
+            "active": bool(ep is not None and ep.is_active),
+        })
+    return out
+
+
+def apply_results(
+    db: Session,
+    results: Sequence[Dict[str, Any]],
+    *,
+    now: Optional[datetime] = None,
+    base_seconds: int = 30,
+) -> Dict[str, int]:
+    """
+    results: dicts za claim_due_events + ok, status_code, error, permanent,
+    duration_ms, body, headers, signature. Huandika hali za events na logs
+    kwa transaction moja.
+    """
+    if not results:
+        return {"delivered": 0, "retry": 0, "failed": 0}
+    now = now or _utcnow()
+    events: List[Dict[str, Any]] = []
+    logs: List[Dict[str, Any]] = []
+    delivered = retry = failed = 0
+    for r in results:
+        attempt = int(r.get("attempt") or 0) + 1
+        row: Dict[str, Any] = {
+            "id": r["id"],
+            "attempt": attempt,
+            "last_status_code": r.get("status_code"),
+            "last_error": (str(r.get("error") or "")[:255] or None),
+            "updated_at": now,
+        }
+        next_retry = None
+        backoff = 0
+        if r.get("ok"):
+            row.update(status=WebhookEventStatus.delivered, delivered_at=now, next_attempt_at=now)
+            delivered += 1
+        elif not r.get("permanent") and attempt < int(r.get("max_retries") or 0):
+            backoff = int(retry_delay(attempt, base=base_seconds))
+            next_retry = now + timedelta(seconds=backoff)
+            row.update(status=WebhookEventStatus.pending, next_attempt_at=next_retry)
+            retry += 1
+        else:
+            row.update(status=WebhookEventStatus.failed, next_attempt_at=now)
+            failed += 1
+        events.append(row)
+        if r.get("user_id") is not None:
+            logs.append({
+                "user_id": r["user_id"],
+                "endpoint_id": r["endpoint_id"],
+                "target_url": str(r.get("url") or "")[:255],
+                "event_type": r["event_type"],
+                "payload": r.get("payload"),
+                "request_id": str(r["id"]),
+                "correlation_id": r.get("correlation_id"),
+                "headers": r.get("headers"),
+                "signature": r.get("signature"),
+                "verified_signature": False,
+                "response_code": r.get("status_code"),
+                "response_body": r.get("body"),
+                "error_message": row["last_error"],
+                "success": bool(r.get("ok")),
+                "attempt": attempt,
+                "max_retries": int(r.get("max_retries") or 0),
+                "backoff_seconds": backoff,
+                "next_retry_at": next_retry,
+                "duration_ms": r.get("duration_ms"),
+                "sent_at": r.get("sent_at") or now,
+            })
+    try:
+        db.execute(update(WebhookEvent), events)
+        if logs:
+            db.execute(insert(WebhookDeliveryLog), logs)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"delivered": delivered, "retry": retry, "failed": failed}
+
+
+def release_events(db: Session, ids: Sequence[int], at: Optional[datetime] = None) -> int:
+    """Rudisha events ambazo hazikutumwa (shutdown / circuit breaker wazi) bila kuhesabu attempt."""
+    if not ids:
+        return 0
+    res = db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id.in_(list(ids)), WebhookEvent.status == WebhookEventStatus.sending)
+        .values(status=WebhookEventStatus.pending, next_attempt_at=at or _utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return int(res.rowcount or 0)
+
+
+def queue_stats(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    now = now or _utcnow()
+    rows = db.execute(
+        select(WebhookEvent.status, func.count()).group_by(WebhookEvent.status)
+    ).all()
+    out = {getattr(s, "value", s): int(n) for s, n in rows}
+    out["due"] = int(db.execute(
+        select(func.count()).where(WebhookEvent.status.in_(DUE_STATUSES), WebhookEvent.next_attempt_at <= now)
+    ).scalar() or 0)
+    return out
@@ -24,14 +24,16 @@ Vingine (optional):
   DATABASE_SSLMODE=require|verify-ca|verify-full  (default: require in prod)
   DATABASE_SSLROOTCERT=/path/to/ca.pem
   DB_APPLICATION_NAME="smartbiz-backend"
+  DB_ASYNC_ENABLED=true|false                     (jenga AsyncEngine ya asyncpg; default: true)
+  DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW      (default: sawa na DB_POOL_SIZE / DB_MAX_OVERFLOW)
 """
 
 from __future__ import annotations
 
 import os
 import sys
-from contextlib import contextmanager
-from typing import Iterator, Dict, Any
+from contextlib import contextmanager, asynccontextmanager
+from typing import AsyncIterator, Iterator, Dict, Any
 
 from sqlalchemy import create_engine, text, event
 from sqlalchemy.engine.url import make_url
@@ -58,6 +60,9 @@ POOL_TIMEOUT = int(_env("DB_POOL_TIMEOUT", "30"))
 POOL_RECYCLE = int(_env("DB_POOL_RECYCLE", "1800"))  # sekunde (30min)
 STATEMENT_TIMEOUT_MS = int(_env("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = usiweke
 APP_NAME = _env("DB_APPLICATION_NAME", "smartbiz-backend")
+ASYNC_ENABLED = _env("DB_ASYNC_ENABLED", "true").lower() == "true"
+ASYNC_POOL_SIZE = int(_env("DB_ASYNC_POOL_SIZE", str(POOL_SIZE)))
+ASYNC_MAX_OVERFLOW = int(_env("DB_ASYNC_MAX_OVERFLOW", str(MAX_OVERFLOW)))
 
 # ───────────────────────────── Helpers ─────────────────────────────
 
@@ -82,6 +87,13 @@ def _coerce_postgres(url: str) -> str:
         url = url.replace("postgresql://", "postgresql+psycopg2://", 1)
     return url
 
+def _coerce_asyncpg(url: str) -> str:
+    # URL ileile ya sync, driver tu ndiyo hubadilika: asyncpg
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
 def _compose_from_parts() -> str:
     user = _env("DB_USER", "postgres")
     pwd  = _env("DB_PASSWORD", "")
@@ -127,6 +139,35 @@ def _ssl_connect_args(url: str) -> Dict[str, Any]:
         args["sslrootcert"] = sslrootcert
     return args
 
+def _asyncpg_connect_args() -> Dict[str, Any]:
+    """
+    asyncpg haielewi sslmode/options za libpq; tunatafsiri mipangilio ileile
+    (SSL, UTC, application_name, statement_timeout) kuwa server_settings.
+    """
+    args: Dict[str, Any] = {}
+    sslmode = _env("DATABASE_SSLMODE") or ("require" if IS_PROD else None)
+    sslrootcert = _env("DATABASE_SSLROOTCERT") or None
+    if sslrootcert or sslmode in {"verify-ca", "verify-full"}:
+        import ssl as _ssl
+        ctx = _ssl.create_default_context(cafile=sslrootcert)
+        if sslmode == "verify-ca":
+            ctx.check_hostname = False
+        args["ssl"] = ctx
+    elif sslmode and sslmode != "disable":
+        args["ssl"] = sslmode
+
+    server_settings: Dict[str, str] = {"timezone": "UTC"}
+    if APP_NAME:
+        server_settings["application_name"] = APP_NAME
+    if STATEMENT_TIMEOUT_MS and STATEMENT_TIMEOUT_MS > 0:
+        server_settings["statement_timeout"] = str(int(STATEMENT_TIMEOUT_MS))
+    args["server_settings"] = server_settings
+
+    # pgbouncer (transaction mode) haiwezi prepared statements za asyncpg
+    if USE_PGBOUNCER:
+        args["statement_cache_size"] = 0
+    return args
+
 # ───────────────────────────── Engine & Session ─────────────────────────────
 
 DB_URL = _validate_url(_choose_database_url())
@@ -191,6 +232,77 @@ def get_db() -> Iterator:
     finally:
         db.close()
 
+# ───────────────────────────── Async engine & session ─────────────────────────────
+# Njia sambamba kwa `async def` routes / websocket hubs: haizuii event loop.
+# Hujengwa kwa uvivu (lazy) ili app iendelee kuboot hata kama asyncpg haipo.
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    """Rudisha AsyncEngine (asyncpg) iliyojengwa kutoka DATABASE_URL ileile."""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        return _async_engine
+    if not ASYNC_ENABLED:
+        raise RuntimeError("Async DB imezimwa (DB_ASYNC_ENABLED=false).")
+
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+    kwargs: Dict[str, Any] = dict(
+        pool_pre_ping=True,
+        echo=ECHO_SQL,
+        connect_args=_asyncpg_connect_args(),
+    )
+    if USE_PGBOUNCER:
+        kwargs["poolclass"] = NullPool
+    else:
+        kwargs.update(
+            pool_size=ASYNC_POOL_SIZE,
+            max_overflow=ASYNC_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+        )
+
+    _async_engine = create_async_engine(_coerce_asyncpg(DB_URL), **kwargs)
+    _AsyncSessionLocal = async_sessionmaker(
+        bind=_async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,  # objects zibaki zinasomeka baada ya commit (response_model)
+    )
+    print(f"[DB] Async engine ready: {_mask_url(_coerce_asyncpg(DB_URL))}")
+    return _async_engine
+
+def get_async_sessionmaker():
+    """async_sessionmaker iliyofungwa kwenye AsyncEngine ya pamoja."""
+    if _AsyncSessionLocal is None:
+        get_async_engine()
+    return _AsyncSessionLocal
+
+async def get_async_db() -> AsyncIterator:
+    """FastAPI dependency: async with AsyncSessionLocal() as db: yield db"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+@asynccontextmanager
+async def async_session_scope() -> AsyncIterator:
+    """Async sawa na session_scope(): commit ikifaulu, rollback ikikwama."""
+    async with get_async_sessionmaker()() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+async def dispose_async_engine() -> None:
+    """Funga pool ya async (tumia kwenye shutdown ya lifespan)."""
+    global _async_engine, _AsyncSessionLocal
+    eng, _async_engine, _AsyncSessionLocal = _async_engine, None, None
+    if eng is not None:
+        await eng.dispose()
+
 # ───────────────────────────── Convenience context ─────────────────────────────
 
 @contextmanager
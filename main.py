@@ -29,14 +29,16 @@ import types
 import anyio
 import logging
 import inspect
+import functools
 import importlib
 import importlib.util as _importlib_util
 import pkgutil as _pkgutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple, Callable, Any
 from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.cors import CORSMiddleware
@@ -162,6 +164,8 @@ except Exception:  # pragma: no cover
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from backend.utils.startup import CRITICAL_MODELS, LazyRouterMiddleware, Startup, timeline as startup_timeline
+
 def get_db():
     """
     FastAPI dependency to yield a DB session.
@@ -289,7 +293,7 @@ def _import_all_models() -> List[str]:
     loaded: List[str] = []
     for fq in _walk_pkg("backend.models"):
         try:
-            importlib.import_module(fq)
+            startup_timeline.timed_import(fq, "model")
             loaded.append(fq)
         except Exception as e:
             log.error("Model import failed: %s → %s", fq, e)
@@ -352,57 +356,225 @@ async def _maybe_start_scheduler(tg: anyio.abc.TaskGroup) -> None:
     await _start_callable_in_tg(tg, entry)
     log.info("Scheduler started using %s()", entry.__name__)
 
-async def _auto_end_live_loop(tg: anyio.abc.TaskGroup) -> None:
+def _with_db(fn: Callable[..., Any], *args, **kwargs) -> Callable[[], Any]:
+    """Wrap `fn(db, ...)` so every call gets (and closes) its own session."""
+    def _call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return _call
+
+async def _call_job(fn: Callable[[], Any]) -> Any:
+    if inspect.iscoroutinefunction(fn):
+        return await fn()
+    return await anyio.to_thread.run_sync(fn)
+
+async def _run_periodic(
+    name: str,
+    fn: Callable[[], Any],
+    interval: float = 0.0,
+    *,
+    setup: Callable[[], Any] | None = None,
+    wake: Any = None,
+    delay_first: bool = False,
+    final: bool = False,
+) -> None:
     """
-    Periodically end inactive livestreams.
-    ENABLE_CRON_AUTO_END / CRON_AUTO_END_INTERVAL.
+    The one background loop: optional `setup()`, then `fn()` every `interval`
+    seconds (sync callables run in a thread; interval 0 = run once, e.g. a
+    long-running worker). `delay_first` waits one interval before the first
+    run; `wake` (an object with `is_set()`) cuts the wait short; `final` runs
+    `fn` once more on shutdown. Errors are logged and never end the loop.
     """
-    if not _env_bool("ENABLE_CRON_AUTO_END", True):
-        return
-    try:
-        from backend.cronjobs.auto_end_live import auto_end_inactive_streams  # type: ignore
-    except Exception:
-        log.info("auto_end_live cron not found; skipping")
-        return
-
-    interval = max(15, _env_int("CRON_AUTO_END_INTERVAL", 60))  # seconds
+    async def _wait() -> None:
+        if wake is None:
+            await anyio.sleep(interval)
+            return
+        tick, waited = min(0.05, interval), 0.0
+        while waited < interval and not wake.is_set():
+            await anyio.sleep(tick)
+            waited += tick
 
-    async def _loop():
+    if setup is not None:
+        try:
+            await _call_job(setup)
+        except Exception as e:
+            log.warning("%s setup error: %s", name, e)
+    try:
+        if delay_first:
+            if not interval:
+                return
+            await _wait()
         while True:
             try:
-                await anyio.to_thread.run_sync(auto_end_inactive_streams)
+                await _call_job(fn)
             except Exception as e:
-                log.warning("auto_end_live error: %s", e)
-            await anyio.sleep(interval)
-
-    tg.start_soon(_loop)
-    log.info("Auto-end-live cron loop started (interval=%ss)", interval)
-
-async def _badge_updater_loop(tg: anyio.abc.TaskGroup) -> None:
+                log.warning("%s error: %s", name, e)
+            if not interval:
+                return
+            await _wait()
+    finally:
+        if final:
+            with anyio.CancelScope(shield=True), suppress(Exception):
+                await _call_job(fn)
+
+# Job builders: import lazily (a missing module just skips the job) and return
+# the keyword arguments for _run_periodic.
+def _job_auto_end_live() -> Dict[str, Any]:
+    """End inactive livestreams. CRON_AUTO_END_INTERVAL."""
+    from backend.cronjobs.auto_end_live import auto_end_inactive_streams  # type: ignore
+    return {"fn": auto_end_inactive_streams, "interval": max(15, _env_int("CRON_AUTO_END_INTERVAL", 60))}
+
+def _job_badge_updater() -> Dict[str, Any]:
+    """Recompute badges / ranks. BADGE_UPDATER_INTERVAL."""
+    from backend.cronjobs.badge_updater import run as _run_badges  # type: ignore
+    return {"fn": _run_badges, "interval": max(300, _env_int("BADGE_UPDATER_INTERVAL", 3600))}
+
+def _job_presence_flush() -> Dict[str, Any]:
+    """Warm the live presence index, then write-behind flush to live_viewers. PRESENCE_FLUSH_INTERVAL."""
+    from backend.services.live_presence import flush_presence, warm_presence  # type: ignore
+
+    warm = _with_db(warm_presence)
+
+    def _warm():
+        log.info("Presence index warmed (%s viewers)", warm())
+
+    return {
+        "fn": _with_db(flush_presence), "setup": _warm, "delay_first": True,
+        "interval": max(2, _env_int("PRESENCE_FLUSH_INTERVAL", 10)),
+    }
+
+def _job_replay_counters() -> Dict[str, Any]:
+    """Flush buffered replay counters every REPLAY_COUNTER_FLUSH_MS (earlier when full, once more on shutdown)."""
+    from backend.services.replay_counters import FLUSH_MS, counters, flush_counters  # type: ignore
+    return {
+        "fn": _with_db(flush_counters), "interval": FLUSH_MS / 1000.0,
+        "wake": counters.flush_wanted, "delay_first": True, "final": True,
+    }
+
+def _job_wallet_compaction() -> Dict[str, Any]:
     """
-    Periodically recompute badges / ranks.
-    ENABLE_BADGE_UPDATER / BADGE_UPDATER_INTERVAL.
+    Fold pending coin-wallet credits every WALLET_COMPACT_INTERVAL_MS (earlier at
+    WALLET_COMPACT_THRESHOLD); reconcile against the ledger every
+    WALLET_RECONCILE_INTERVAL seconds (0 = off), in the same loop so the two
+    never overlap. WALLET_RECONCILE_FIX.
     """
-    if not _env_bool("ENABLE_BADGE_UPDATER", True):
-        return
-    try:
-        from backend.cronjobs.badge_updater import run as _run_badges  # type: ignore
-    except Exception:
-        log.info("badge_updater cron not found; skipping")
-        return
+    from backend.services.wallet_ledger import COMPACT_INTERVAL_MS, compact_pending, hot, reconcile  # type: ignore
 
-    interval = max(300, _env_int("BADGE_UPDATER_INTERVAL", 3600))  # seconds
+    reconcile_every = max(0, _env_int("WALLET_RECONCILE_INTERVAL", 3600))  # seconds
+    fix = _env_bool("WALLET_RECONCILE_FIX", False)
+    compact, check = _with_db(compact_pending), _with_db(reconcile, fix=fix)
+    last = [time.monotonic()]
 
-    async def _loop():
-        while True:
-            try:
-                await anyio.to_thread.run_sync(_run_badges)
-            except Exception as e:
-                log.warning("badge_updater error: %s", e)
-            await anyio.sleep(interval)
+    def _run():
+        compact()
+        if reconcile_every and time.monotonic() - last[0] >= reconcile_every:
+            last[0] = time.monotonic()
+            bad = check()
+            if bad:
+                log.warning("wallet reconcile: %s mismatches (fix=%s)", len(bad), fix)
+
+    return {"fn": _run, "interval": COMPACT_INTERVAL_MS / 1000.0, "wake": hot.flush_wanted, "delay_first": True}
+
+def _job_gift_rollup() -> Dict[str, Any]:
+    """Materialize per-minute gift timeline rollups for ended replays. GIFT_ROLLUP_INTERVAL."""
+    from backend.services.gift_timeline import build_pending_rollups  # type: ignore
+
+    build = _with_db(build_pending_rollups)
 
-    tg.start_soon(_loop)
-    log.info("Badge-updater cron loop started (interval=%ss)", interval)
+    def _run():
+        built = build()
+        if built:
+            log.info("gift timeline rollups built: %s", len(built))
+
+    return {"fn": _run, "interval": max(15, _env_int("GIFT_ROLLUP_INTERVAL", 60))}
+
+def _job_leaderboard() -> Dict[str, Any]:
+    """
+    Rebuild the in-memory gift leaderboards from every gift source and subscribe
+    to cluster updates. LEADERBOARD_REBUILD_INTERVAL (default 900s; the periodic
+    rebuild corrects drift from writes that bypass the gift routes, refunds and
+    lost backplane messages; 0 = startup only).
+    """
+    from backend.services.gift_leaderboard import leaderboard  # type: ignore
+    return {
+        "fn": _with_db(leaderboard.rebuild_from_db), "setup": leaderboard.subscribe,
+        "interval": max(0, _env_int("LEADERBOARD_REBUILD_INTERVAL", 900)),
+    }
+
+def _job_notification_counters() -> Dict[str, Any]:
+    """
+    Bind unread-notification counters to the loop and subscribe to cluster
+    updates; reconcile against COUNT(*) every NOTIF_UNREAD_RECONCILE_INTERVAL
+    seconds (0 = off).
+    """
+    from backend.services.notification_counters import unread_counters  # type: ignore
+
+    check = _with_db(unread_counters.reconcile, fix=True)
+
+    def _run():
+        bad = check()
+        if bad:
+            log.warning("unread counters reconcile: fixed %s users", len(bad))
+
+    return {
+        "fn": _run, "setup": unread_counters.start, "delay_first": True,
+        "interval": max(0, _env_int("NOTIF_UNREAD_RECONCILE_INTERVAL", 3600)),
+    }
+
+def _job_trending_index() -> Dict[str, Any]:
+    """Recompute the /explore/trending index. TRENDING_REFRESH_SEC."""
+    from backend.services.trending_index import REFRESH_SEC, refresh_trending  # type: ignore
+    return {"fn": _with_db(refresh_trending), "interval": REFRESH_SEC}
+
+def _job_broadcast_resume() -> Dict[str, Any]:
+    """Resume broadcast jobs whose lease expired from their saved cursor. BROADCAST_RESUME_INTERVAL."""
+    from backend.services.broadcast_runner import runner as broadcast_runner  # type: ignore
+    return {"fn": broadcast_runner.resume_unfinished, "interval": max(5, _env_int("BROADCAST_RESUME_INTERVAL", 60))}
+
+def _job_webhook_engine() -> Dict[str, Any]:
+    """Deliver queued webhooks (long-running; tuning via WEBHOOK_*, see services.webhook_engine)."""
+    from backend.services import webhook_engine  # type: ignore
+    return {"fn": webhook_engine.run}
+
+def _job_email_worker() -> Dict[str, Any]:
+    """Send queued mail via the SMTP pool (long-running; tuning via EMAIL_*, see utils.email_sender)."""
+    from backend.utils import email_sender  # type: ignore
+    return {"fn": email_sender.worker.run}
+
+# name → (enable flag, default, builder). Every background loop is listed here.
+_BACKGROUND_JOBS: Dict[str, Tuple[str, bool, Callable[[], Dict[str, Any]]]] = {
+    "auto_end_live": ("ENABLE_CRON_AUTO_END", True, _job_auto_end_live),
+    "badge_updater": ("ENABLE_BADGE_UPDATER", True, _job_badge_updater),
+    "presence_flush": ("ENABLE_PRESENCE_FLUSH", True, _job_presence_flush),
+    "replay_counters": ("ENABLE_REPLAY_COUNTER_FLUSH", True, _job_replay_counters),
+    "wallet_compaction": ("ENABLE_WALLET_COMPACTION", True, _job_wallet_compaction),
+    "gift_rollup": ("ENABLE_GIFT_ROLLUP", True, _job_gift_rollup),
+    "leaderboard": ("ENABLE_LEADERBOARD_ENGINE", True, _job_leaderboard),
+    "notification_counters": ("ENABLE_NOTIF_UNREAD_COUNTERS", True, _job_notification_counters),
+    "trending_index": ("ENABLE_TRENDING_INDEX", True, _job_trending_index),
+    "broadcast_resume": ("ENABLE_BROADCAST_RESUME", True, _job_broadcast_resume),
+    "webhook_engine": ("ENABLE_WEBHOOK_ENGINE", True, _job_webhook_engine),
+    "email_worker": ("ENABLE_EMAIL_WORKER", True, _job_email_worker),
+}
+
+async def _start_background_jobs(tg: anyio.abc.TaskGroup) -> List[str]:
+    """Start every enabled job in _BACKGROUND_JOBS on the task group; returns the started names."""
+    started: List[str] = []
+    for name, (flag, default, build) in _BACKGROUND_JOBS.items():
+        if not _env_bool(flag, default):
+            continue
+        try:
+            spec = build()
+        except Exception as e:
+            log.info("%s not available (%s); skipping", name, e)
+            continue
+        tg.start_soon(functools.partial(_run_periodic, name, **spec))
+        started.append(name)
+        log.info("%s loop started (interval=%ss)", name, spec.get("interval", 0))
+    return started
 
 # ────────────────────────────── Lifespan (startup / shutdown) ──────────────────────────────
 @asynccontextmanager
@@ -410,30 +582,55 @@ async def lifespan(app: FastAPI):
     """
     Startup:
       - Reload DB engine from env
-      - Import all models (register mappers deterministically)
-      - Warm DB connections
+      - Import the models the mappers need (all models without a fresh
+        startup manifest or with AUTO_CREATE_TABLES) while the DB pool warms
+        up in a thread
       - Ping DB
       - Optionally Base.metadata.create_all() (if not strict prod)
       - Check for duplicate mappers
       - Launch background cron loops in a TaskGroup
+      - Record each step on the startup timeline (GET /__startup, admin only)
+      - Once ready, import deferred routers in the background (one per tick)
 
     Shutdown:
       - Cancel TaskGroup nicely
+      - Dispose the async (asyncpg) pool if it was ever opened
+      - Close the websocket pub/sub backplane
     """
+    boot: Startup = app.state.startup
+    create_tables = _env_bool("AUTO_CREATE_TABLES", ENV != "production")
+
     # make sure DB engine matches env's DATABASE_URL
     with suppress(Exception):
         reload_engine_from_env()
 
-    # Import all ORM models BEFORE touching sessions
-    loaded_models = _import_all_models()
-    log.info("Models loaded: %s", loaded_models)
-
-    # Pre-warm DB pool
-    try:
-        ok_warm = await anyio.to_thread.run_sync(warm_db)
-        log.info("DB warm-up: %s", "OK" if ok_warm else "FAILED")
-    except Exception as e:
-        log.warning("DB warm-up error: %s", e)
+    # Pre-warm DB pool (network I/O) in a thread while models import here
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-warm") as pool:
+        warm = pool.submit(warm_db)
+
+        # Import ORM models BEFORE touching sessions
+        with startup_timeline.phase("models"):
+            if boot.models.lazy and not create_tables:
+                # mapper-required set only; routers loaded later bring the rest
+                boot.models.install_hook()
+                boot.models.import_required(CRITICAL_MODELS)
+                loaded_models = boot.models.eager = boot.models.loaded()
+                try:
+                    from sqlalchemy.orm import configure_mappers
+                    configure_mappers()
+                except Exception as e:
+                    log.error("Mapper configuration failed: %s", e)
+            else:
+                boot.models.mode = "all"
+                loaded_models = boot.models.eager = _import_all_models()
+        log.info("Models loaded (%s, %d): %s", boot.models.mode, len(loaded_models), loaded_models)
+
+        with startup_timeline.phase("db_warm"):
+            try:
+                ok_warm = warm.result()
+                log.info("DB warm-up: %s", "OK" if ok_warm else "FAILED")
+            except Exception as e:
+                log.warning("DB warm-up error: %s", e)
 
     ok, ms, err = _db_ping()
     log.info(
@@ -447,12 +644,15 @@ async def lifespan(app: FastAPI):
         log.error("Database ping failed at startup (%s)", err)
 
     # Auto create tables (dev/staging). In prod default is off.
-    if (os.getenv("AUTO_CREATE_TABLES", "1" if ENV != "production" else "0")
-        .lower()
-        in {"1", "true", "yes", "on"}):
-        with suppress(Exception):
+    if create_tables:
+        with startup_timeline.phase("create_tables"), suppress(Exception):
             Base.metadata.create_all(bind=engine, checkfirst=True)
             log.info("Tables verified/created")
+        with suppress(Exception):
+            # create_all haiongezi indexes kwenye table iliyopo (FTS/pg_trgm ya products);
+            # production: alembic revision e4fa6b8c3d59
+            from backend.services.product_search import ensure_search_indexes  # type: ignore
+            ensure_search_indexes(engine)
 
     # Detect broken duplicate mappers
     if (os.getenv("FAIL_ON_DUP_MAPPERS", "0").lower() in {"1", "true", "yes", "on"}):
@@ -466,12 +666,21 @@ async def lifespan(app: FastAPI):
     tg = await anyio.create_task_group().__aenter__()
     app.state.task_group = tg  # debug handle
 
-    with suppress(Exception):
-        await _maybe_start_scheduler(tg)
-    with suppress(Exception):
-        await _auto_end_live_loop(tg)
-    with suppress(Exception):
-        await _badge_updater_loop(tg)
+    with startup_timeline.phase("background"):
+        with suppress(Exception):
+            await _maybe_start_scheduler(tg)
+        with suppress(Exception):
+            await _start_background_jobs(tg)
+        with suppress(Exception):
+            from backend.utils.http_client import get_http  # type: ignore
+            get_http()  # outbound keep-alive pools; closed on shutdown
+
+    startup_timeline.mark_ready()
+    log.info("Startup ready in %.0f ms (rss=%s MB)", startup_timeline.ready_ms, startup_timeline.ready_rss_mb)
+
+    # deferred routers: import them now, one per loop tick, so the middleware only covers the race
+    if boot.routers is not None and boot.routers.pending and _env_bool("STARTUP_BACKGROUND_ROUTERS", True):
+        tg.start_soon(boot.routers.load_pending)
 
     try:
         yield
@@ -480,6 +689,15 @@ async def lifespan(app: FastAPI):
         with suppress(Exception):
             tg.cancel_scope.cancel()
             await tg.__aexit__(None, None, None)
+        with suppress(Exception):
+            from backend.db import dispose_async_engine  # type: ignore
+            await dispose_async_engine()
+        with suppress(Exception):
+            from backend.utils.ws_backplane import close_backplane  # type: ignore
+            await close_backplane()
+        with suppress(Exception):
+            from backend.utils.http_client import close_http_clients  # type: ignore
+            await close_http_clients()
         log.info("Shutting down SmartBiz")
 
 # ────────────────────────────── CORS config ──────────────────────────────
@@ -557,6 +775,8 @@ def create_app() -> FastAPI:
         openapi_url="/openapi.json",
         lifespan=lifespan,
     )
+    boot = app.state.startup = Startup()
+    lazy = boot.lazy_routers(app)
 
     # normalize /foo vs /foo/
     app.router.redirect_slashes = True
@@ -582,6 +802,8 @@ def create_app() -> FastAPI:
     app.add_middleware(SecurityHeaders)
     app.add_middleware(NoCookieMiddleware)
     app.add_middleware(RequestIDTiming)
+    # optional routers from the startup manifest load on their first request
+    app.add_middleware(LazyRouterMiddleware, routers=lazy)
 
     # ─────────────────────── Router mounting ───────────────────────
     _routes_logger = logging.getLogger("smartbiz.routes")
@@ -598,7 +820,7 @@ def create_app() -> FastAPI:
         if not spec:
             _routes_logger.warning("%s not found", mod_name)
             return False
-        mod = importlib.import_module(mod_name)
+        mod = startup_timeline.timed_import(mod_name, "router")
         if not hasattr(mod, attr):
             _routes_logger.warning("%s found but has no '%s'", mod_name, attr)
             return False
@@ -638,23 +860,29 @@ def create_app() -> FastAPI:
         _include_if_exists("backend.routes.customers")
 
     # 5. Autoscan other backend.routes.* that expose `router`
-    with suppress(Exception):
+    #    (fresh manifest entries are deferred to their first request)
+    lazy.begin()
+    with startup_timeline.phase("routers"), suppress(Exception):
         import backend.routes as _routes_pkg  # type: ignore
-        for m in _pkgutil.walk_packages(_routes_pkg.__path__, prefix="backend.routes."):  # type: ignore[attr-defined]
+        for order, m in enumerate(_pkgutil.walk_packages(_routes_pkg.__path__, prefix="backend.routes.")):  # type: ignore[attr-defined]
             fq = m.name
             base = fq.rsplit(".", 1)[-1]
             if base.startswith("_") or any(tag in fq for tag in (".__disabled__", ".disabled", ".bak", ".backup")):
                 continue
-            if fq in mounted_modules:
+            if fq in mounted_modules or lazy.defer(fq, order):
                 continue
             try:
-                mod = importlib.import_module(fq)
+                mod = startup_timeline.timed_import(fq, "router")
                 if hasattr(mod, "router"):
+                    n = len(app.router.routes)
                     app.include_router(getattr(mod, "router"))
+                    lazy.track(order, app.router.routes[n:])
                     mounted_modules.add(fq)
                     _routes_logger.info("Auto-included %s.router", fq)
             except Exception as e:
                 _routes_logger.error("Failed auto-include %s: %s", fq, e)
+    if lazy.pending:
+        _routes_logger.info("Deferred %d routers until first request", len(lazy.pending))
 
     # 6. Optional helper aggregators
     with suppress(Exception):
@@ -765,6 +993,16 @@ def create_app() -> FastAPI:
             log.info("Registered routes:\n%s", nice)
         return sorted(items, key=lambda x: (x["path"], ",".join(x["methods"])))
 
+    # startup timeline: phases, slowest imports, deferred routers, RSS (admin only)
+    try:
+        from backend.dependencies import check_admin  # type: ignore
+
+        @app.get("/__startup", include_in_schema=False, dependencies=[Depends(check_admin)])
+        def __startup(top: int = 50):
+            return boot.snapshot(top=top)
+    except Exception as e:
+        log.warning("/__startup disabled (admin dependency unavailable: %s)", e)
+
     # about / mask DB url
     @app.get("/_about")
     def _about():
@@ -836,7 +1074,8 @@ def create_app() -> FastAPI:
     return app
 
 # ────────────────────────────── Singleton ASGI app ──────────────────────────────
-app = create_app()
+with startup_timeline.phase("create_app"):
+    app = create_app()
 
 # ────────────────────────────── Local dev runner ──────────────────────────────
 if __name__ == "__main__":  # pragma: no cover
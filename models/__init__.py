@@ -53,6 +53,9 @@ _PKG_PATH = _THIS_DIR
 _ENV = (os.getenv("ENVIRONMENT") or "development").strip().lower()
 _DEV = _ENV in {"dev", "development", "local"}
 _STRICT = os.getenv("STRICT_MODE", "0").strip().lower() in {"1", "true", "yes", "on", "y"}
+# MODELS_AUTOLOAD=0: usipakie models zote kwenye import ya package (utils.startup
+# huuweka manifest ikiwa fresh; lifespan hupakia closure ya mappers tu)
+_AUTOLOAD = os.getenv("MODELS_AUTOLOAD", "1").strip().lower() in {"1", "true", "yes", "on", "y"}
 
 def _env_list(name: str) -> List[str]:
     raw = os.getenv(name) or ""
@@ -267,8 +270,25 @@ def load_models() -> tuple[List[str], List[str]]:
             raise
         return _LOADED, _SKIPPED
 
-# Run immediately on import (common usage)
-load_models()
+def __getattr__(name: str):
+    """
+    `from backend.models import X` bila autoload: chukua mapper iliyosajiliwa,
+    vinginevyo pakia models zote mara moja (tabia ya zamani).
+    """
+    if name.startswith("__"):
+        raise AttributeError(name)
+    for mapper in getattr(Base.registry, "mappers", ()):
+        if mapper.class_.__name__ == name:
+            return mapper.class_
+    if not _LOADED_ONCE:
+        load_models()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Run immediately on import (common usage), unless MODELS_AUTOLOAD=0
+if _AUTOLOAD:
+    load_models()
 
 # ───────────────── Manual promotions & backward-compat exports ────────────────
 def _promote(name: str, obj) -> None:
@@ -0,0 +1,84 @@
+# backend/models/broadcast_job.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import enum
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import DateTime, Enum as SQLEnum, Index, Integer, String, Text, func, text as sa_text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.db import Base
+from backend.models._types import JSON_VARIANT, as_mutable_json
+
+
+class BroadcastStatus(str, enum.Enum):
+    queued   = "queued"    # imeundwa, haijaanza
+    running  = "running"   # worker ameichukua (ana lease)
+    done     = "done"      # audience yote imepitiwa
+    failed   = "failed"    # kosa lisilorekebishika (mf. payload mbovu)
+    canceled = "canceled"  # admin ameisimamisha
+
+
+class BroadcastJob(Base):
+    """
+    Maendeleo ya broadcast moja (services.broadcast_runner).
+    - `payload`: BroadcastPayload iliyohifadhiwa (message, channels, filters, ...)
+    - `last_user_id`: keyset cursor (users.id DESC) ya chunk iliyokamilika mwisho
+    - `lease_until` / `worker_id`: worker mmoja tu huendesha job; akifa, lease
+      huisha na job huendelea kutoka `last_user_id` kwenye worker mwingine
+    """
+    __tablename__ = "broadcast_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    admin_id: Mapped[Optional[str]] = mapped_column(String(64), index=True)  # users.id (UUID/int) kama string
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(120), index=True)
+
+    status: Mapped[BroadcastStatus] = mapped_column(
+        SQLEnum(BroadcastStatus, name="broadcast_status", native_enum=False, validate_strings=True),
+        default=BroadcastStatus.queued,
+        nullable=False,
+        index=True,
+    )
+    payload: Mapped[Dict[str, Any]] = mapped_column(as_mutable_json(JSON_VARIANT), nullable=False)
+
+    # ---------- Progress ----------
+    last_user_id: Mapped[Optional[str]] = mapped_column(String(64))
+    total:        Mapped[Optional[int]] = mapped_column(Integer)
+    processed:    Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))
+    skipped:      Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))
+    per_channel:  Mapped[Optional[Dict[str, Any]]] = mapped_column(as_mutable_json(JSON_VARIANT))
+    error:        Mapped[Optional[str]] = mapped_column(Text)
+
+    # ---------- Lease ----------
+    worker_id:   Mapped[Optional[str]] = mapped_column(String(64))
+    lease_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), index=True)
+
+    # ---------- Audit ----------
+    started_at:  Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_broadcast_jobs_status_lease", "status", "lease_until"),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": getattr(self.status, "value", self.status),
+            "total": self.total,
+            "processed": int(self.processed or 0),
+            "skipped": int(self.skipped or 0),
+            "per_channel": dict(self.per_channel or {}),
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "created_at": self.created_at,
+        }
@@ -0,0 +1,45 @@
+# backend/models/coin_wallet.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Integer, String, UniqueConstraint, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.db import Base
+from backend.models._types import DECIMAL_TYPE
+
+
+class CoinWallet(Base):
+    """
+    Wallet ya coins (1:1 na User) — `routes/coin_wallet`.
+
+    `balance` ni salio lililokunjwa (folded) kutoka ledger (`coin_wallet_txns`):
+    debits/adjust huandikwa moja kwa moja hapa chini ya row lock, lakini credits
+    huongezwa kwenye ledger tu na kukunjwa baadaye (services.wallet_ledger.compact).
+    Salio linalotumika = balance + SUM(credits ambazo bado hazijakunjwa).
+    """
+    __tablename__ = "coin_wallets"
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_coin_wallets_user_id"),
+        CheckConstraint("balance >= 0", name="ck_coin_wallets_balance_nonneg"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    balance: Mapped[Decimal] = mapped_column(DECIMAL_TYPE, nullable=False, server_default=text("0"))
+    currency: Mapped[str] = mapped_column(String(8), nullable=False, server_default=text("'TZS'"))
+    compacted_at: Mapped[Optional[dt.datetime]] = mapped_column(DateTime(timezone=True))
+
+    created_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<CoinWallet id={self.id} user={self.user_id} bal={self.balance} {self.currency}>"
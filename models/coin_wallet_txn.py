@@ -0,0 +1,53 @@
+# backend/models/coin_wallet_txn.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.db import Base
+from backend.models._types import DECIMAL_TYPE
+
+
+class CoinWalletTxn(Base):
+    """
+    Ledger ya CoinWallet (chanzo cha ukweli): SUM(delta) ya rows zote za wallet
+    = salio lake.
+
+    - `delta`: +credit / -debit / ±adjust; `amount` ni thamani kamili (>0).
+    - `folded`: tayari imo kwenye `coin_wallets.balance`. Credits huingia
+      folded=false; debits/adjust/opening huingia folded=true (zimeandikwa
+      kwenye balance kwenye transaction hiyo hiyo).
+    - `balance_after`: hujulikana kwa debits/adjust tu (credits haziishiki lock).
+    - Idempotency: UNIQUE(wallet_id, idempotency_key).
+    """
+    __tablename__ = "coin_wallet_txns"
+    __table_args__ = (
+        UniqueConstraint("wallet_id", "idempotency_key", name="uq_cwt_wallet_idem"),
+        Index("ix_cwt_wallet_id", "wallet_id", "id"),
+        Index(
+            "ix_cwt_unfolded", "wallet_id",
+            postgresql_where=text("folded = false"), sqlite_where=text("folded = 0"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    wallet_id: Mapped[int] = mapped_column(ForeignKey("coin_wallets.id", ondelete="CASCADE"), nullable=False)
+    type: Mapped[str] = mapped_column(String(16), nullable=False)      # deposit|withdraw|opening|adjust
+    amount: Mapped[Decimal] = mapped_column(DECIMAL_TYPE, nullable=False)
+    delta: Mapped[Decimal] = mapped_column(DECIMAL_TYPE, nullable=False)
+    balance_after: Mapped[Optional[Decimal]] = mapped_column(DECIMAL_TYPE)
+    folded: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"))
+    currency: Mapped[Optional[str]] = mapped_column(String(8))
+    reference: Mapped[Optional[str]] = mapped_column(String(80))
+    idempotency_key: Mapped[Optional[str]] = mapped_column(String(128))
+    created_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<CoinWalletTxn id={self.id} wallet={self.wallet_id} {self.type} {self.delta} folded={self.folded}>"
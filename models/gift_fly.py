@@ -52,6 +52,33 @@ class Currency(str, enum.Enum):
     OTHER = "OTHER"
 
 
+# -------- Value cleaners (validators + normalize_row) --------
+_STR_MAXLEN = {"gift_name": 120, "gift_code": 64, "message": 240, "image_url": 512}
+
+
+def _clean_qty(value: Any) -> int:
+    iv = int(value or 1)
+    if iv < 1:
+        raise ValueError("quantity must be >= 1")
+    if iv > 1_000_000:
+        raise ValueError("quantity looks unrealistic")
+    return iv
+
+
+def _clean_unit(value: Decimal | int | float | str) -> Decimal:
+    d = value if isinstance(value, Decimal) else Decimal(str(value))
+    if d < 0:
+        raise ValueError("unit_value must be >= 0")
+    # Normalize to 2dp for money display/consistency
+    return d.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _clean_str(key: str, value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.strip()[: _STR_MAXLEN[key]] or None
+
+
 # -------- Model --------
 class GiftFly(Base):
     """
@@ -162,28 +189,15 @@ class GiftFly(Base):
     # ------- Validators -------
     @validates("quantity")
     def _validate_qty(self, _key, value: int) -> int:
-        iv = int(value or 1)
-        if iv < 1:
-            raise ValueError("quantity must be >= 1")
-        if iv > 1_000_000:
-            raise ValueError("quantity looks unrealistic")
-        return iv
+        return _clean_qty(value)
 
     @validates("unit_value")
     def _validate_unit(self, _key, value: Decimal | int | float | str) -> Decimal:
-        d = value if isinstance(value, Decimal) else Decimal(str(value))
-        if d < 0:
-            raise ValueError("unit_value must be >= 0")
-        # Normalize to 2dp for money display/consistency
-        return d.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        return _clean_unit(value)
 
-    @validates("gift_name", "gift_code", "message", "image_url")
+    @validates(*_STR_MAXLEN)
     def _trim_strs(self, key: str, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return None
-        v = value.strip()
-        maxlen = {"gift_name": 120, "gift_code": 64, "message": 240, "image_url": 512}[key]
-        return v[:maxlen] or None
+        return _clean_str(key, value)
 
     # ------- Domain helpers -------
     def set_amount(self, unit: Decimal | int | float | str, qty: int = 1) -> None:
@@ -244,6 +258,20 @@ class GiftFly(Base):
 
 
 # -------- Normalizers (events) --------
+def normalize_row(row: dict[str, Any]) -> dict[str, Any]:
+    """
+    Validators + `before_insert` kwa row ya Core insert (services.gift_ingest
+    haipiti ORM). ValueError = row mbovu.
+    """
+    for key in _STR_MAXLEN:
+        if key in row:
+            row[key] = _clean_str(key, row[key])
+    row["quantity"] = _clean_qty(row.get("quantity"))
+    if row.get("unit_value") is not None:
+        row["unit_value"] = _clean_unit(row["unit_value"])
+    return row
+
+
 @listens_for(GiftFly, "before_insert")
 def _giftfly_before_insert(_mapper, _conn, target: GiftFly) -> None:  # pragma: no cover
     # clamp strings (already handled in validators, but safe if direct assignment bypassed)
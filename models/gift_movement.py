@@ -272,6 +272,25 @@ class GiftMovement(Base):
 
 
 # ---------------- Normalizers / denormalized amount ----------------
+def _legacy_amount(unit_coins: Optional[Decimal], quantity: Optional[int]) -> int:
+    total = (unit_coins or Decimal("0")) * Decimal(quantity or 0)
+    return int(max(0, total.to_integral_value(rounding="ROUND_DOWN")))
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Sheria za `before_insert` kwa row ya Core insert (services.gift_ingest
+    haipiti ORM, hivyo listener haiitwi): currency, gift_code, `amount`.
+    """
+    if row.get("currency"):
+        row["currency"] = row["currency"].strip().upper()
+    if row.get("gift_code"):
+        row["gift_code"] = " ".join(row["gift_code"].strip().split())
+    if not row.get("amount"):
+        row["amount"] = _legacy_amount(row.get("unit_coins"), row.get("quantity", 1))
+    return row
+
+
 @listens_for(GiftMovement, "before_insert")
 def _gm_before_insert(_m, _c, t: GiftMovement) -> None:  # pragma: no cover
     if t.currency:
@@ -280,8 +299,7 @@ def _gm_before_insert(_m, _c, t: GiftMovement) -> None:  # pragma: no cover
         t.gift_code = " ".join(t.gift_code.strip().split())
     # sync legacy int `amount` kwa usahihi kama haijapangwa
     if not t.amount:
-        total = (t.unit_coins or Decimal("0")) * Decimal(t.quantity or 0)
-        t.amount = int(max(0, total.to_integral_value(rounding="ROUND_DOWN")))
+        t.amount = _legacy_amount(t.unit_coins, t.quantity)
 
 
 @listens_for(GiftMovement, "before_update")
@@ -291,8 +309,7 @@ def _gm_before_update(_m, _c, t: GiftMovement) -> None:  # pragma: no cover
     if t.gift_code:
         t.gift_code = " ".join(t.gift_code.strip().split())
     # endelea kusawazisha `amount`
-    total = (t.unit_coins or Decimal("0")) * Decimal(t.quantity or 0)
-    t.amount = int(max(0, total.to_integral_value(rounding="ROUND_DOWN")))
+    t.amount = _legacy_amount(t.unit_coins, t.quantity)
 
 
 # ---------------- Indexes & Constraints ----------------
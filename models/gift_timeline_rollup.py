@@ -0,0 +1,64 @@
+# backend/models/gift_timeline_rollup.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    func,
+    text as sa_text,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.db import Base
+
+
+class GiftTimelineMinute(Base):
+    """
+    Rollup ya gift_fly_events kwa (stream, dakika, gift_name) — hujazwa mara
+    moja replay ikiisha (services.gift_timeline.build_rollup). Timeline za
+    buckets za dakika (1m/5m/...) husomwa hapa badala ya events zote.
+    """
+    __tablename__ = "gift_timeline_minutes"
+    __table_args__ = (
+        UniqueConstraint("stream_id", "minute_epoch", "gift_name", name="uq_gtm_stream_minute_gift"),
+        Index("ix_gtm_stream_minute", "stream_id", "minute_epoch"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    stream_id: Mapped[int] = mapped_column(
+        ForeignKey("live_streams.id", ondelete="CASCADE"), nullable=False
+    )
+    minute_epoch: Mapped[int] = mapped_column(BigInteger, nullable=False)  # unix seconds, % 60 == 0
+    gift_name: Mapped[str] = mapped_column(String(120), nullable=False)
+    gifts: Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))     # idadi ya events
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))  # SUM(quantity)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<GiftTimelineMinute stream={self.stream_id} t={self.minute_epoch} {self.gift_name}={self.gifts}>"
+
+
+class GiftTimelineRollup(Base):
+    """Hali ya rollup kwa stream: ipo = minutes zimejazwa hadi `last_event_id`."""
+    __tablename__ = "gift_timeline_rollups"
+
+    stream_id: Mapped[int] = mapped_column(
+        ForeignKey("live_streams.id", ondelete="CASCADE"), primary_key=True
+    )
+    last_event_id: Mapped[Optional[int]] = mapped_column(Integer)
+    events: Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))
+    minutes: Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))
+    built_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<GiftTimelineRollup stream={self.stream_id} events={self.events} minutes={self.minutes}>"
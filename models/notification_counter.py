@@ -0,0 +1,39 @@
+# backend/models/notification_counter.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Integer, func, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.db import Base
+
+
+class NotificationCounter(Base):
+    """
+    Idadi ya arifa ambazo hazijasomwa (`notifications.read = false`) kwa kila
+    mtumiaji — hudumishwa na services.notification_counters kwenye transaction
+    ile ile ya create/read/read-all/delete, hivyo `/notifications/unread/count`
+    haihitaji COUNT(*).
+
+    - `version`: huongezeka kila badiliko; caches/websocket clients hupuuza
+      thamani yenye version ya zamani.
+    - Row hukosekana hadi mara ya kwanza inapohitajika (seed kwa COUNT moja).
+    """
+    __tablename__ = "notification_counters"
+    __table_args__ = (
+        CheckConstraint("unread >= 0", name="ck_notif_counter_unread_nonneg"),
+    )
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    unread: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<NotificationCounter user={self.user_id} unread={self.unread} v={self.version}>"
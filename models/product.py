@@ -9,6 +9,7 @@ from decimal import Decimal
 from typing import Optional, List, TYPE_CHECKING, Dict, Any
 
 from sqlalchemy import (
+    DDL,
     CheckConstraint,
     DateTime,
     Enum as SQLEnum,
@@ -24,7 +25,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
     # hybrid_method for can_fulfill; hybrid_property for others
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
-from sqlalchemy.event import listens_for
+from sqlalchemy.event import listen, listens_for
 
 from backend.db import Base
 from backend.models._types import JSON_VARIANT, DECIMAL_TYPE, as_mutable_json
@@ -45,6 +46,15 @@ def _slugify(s: str, *, max_len: int = 120) -> str:
 def _utcnow() -> dt.datetime:
     return dt.datetime.now(dt.timezone.utc)
 
+# Search document ya Postgres (FTS). Index ya GIN (ix_products_search_tsv) ni
+# expression hii hii — services.product_search huitumia neno kwa neno ili planner
+# aitumie index. Config 'simple' = bila stemming (Kiswahili + Kiingereza).
+SEARCH_TSV_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(sku, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
 # ───────────── Enums ─────────────
 class ProductStatus(str, enum.Enum):
     draft = "draft"
@@ -258,6 +268,11 @@ class Product(Base):
         Index("ix_products_owner_created", "owner_id", "created_at"),
         Index("ix_products_status_currency", "status", "currency"),
         Index("ix_products_publish_status", "published_at", "status"),
+        # Search (Postgres pekee): FTS + pg_trgm kwa ILIKE/similarity ya name
+        Index("ix_products_search_tsv", text(f"({SEARCH_TSV_SQL})"),
+              postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_products_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
         CheckConstraint(
             "price >= 0 AND compare_at_price >= 0 AND cost >= 0",
             name="ck_product_prices_nonneg",
@@ -296,3 +311,9 @@ def _product_before_update(_m, _c, target: Product) -> None:  # pragma: no cover
     if target.currency:
         target.currency = target.currency.strip().upper()
 
+# pg_trgm lazima iwepo kabla ya ix_products_name_trgm
+listen(
+    Product.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,79 @@
+# backend/models/webhook_event.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import enum
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    CheckConstraint,
+    DateTime,
+    Enum as SQLEnum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    text as sa_text,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.db import Base
+
+
+class WebhookEventStatus(str, enum.Enum):
+    pending   = "pending"    # inasubiri (au retry imepangwa kwenye next_attempt_at)
+    sending   = "sending"    # worker ameichukua (lease hadi next_attempt_at)
+    delivered = "delivered"  # 2xx
+    failed    = "failed"     # retries zimeisha / kosa la kudumu
+
+
+class WebhookEvent(Base):
+    """
+    Foleni ya kudumu (outbox) ya webhooks kwa services.webhook_engine.
+    Row moja = tukio moja kwa endpoint moja. Request path huandika row tu;
+    engine huchukua rows zilizofika muda kwa `FOR UPDATE SKIP LOCKED`.
+    """
+    __tablename__ = "webhook_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    endpoint_id: Mapped[int] = mapped_column(
+        ForeignKey("webhook_endpoints.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, index=True)
+
+    event_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # JSON iliyo-serialize (bytes zilezile husainiwa)
+    correlation_id: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+
+    status: Mapped[WebhookEventStatus] = mapped_column(
+        SQLEnum(WebhookEventStatus, name="webhook_event_status", native_enum=False, validate_strings=True),
+        default=WebhookEventStatus.pending,
+        nullable=False,
+    )
+    attempt:     Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("0"))
+    max_retries: Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa_text("3"))
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    last_status_code: Mapped[Optional[int]] = mapped_column(Integer)
+    last_error:       Mapped[Optional[str]] = mapped_column(String(255))
+
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    __table_args__ = (
+        # claim query: WHERE status IN (pending, sending) AND next_attempt_at <= now ORDER BY next_attempt_at
+        Index("ix_webhook_events_due", "status", "next_attempt_at"),
+        CheckConstraint("attempt >= 0 AND max_retries >= 0", name="ck_webhook_event_attempts_nonneg"),
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"<WebhookEvent id={self.id} endpoint={self.endpoint_id} {self.event_type} {self.status} attempt={self.attempt}>"
@@ -13,6 +13,7 @@ from pydantic import BaseModel, Field
 
 from backend.dependencies import get_current_user
 from backend.models.user import User
+from backend.utils.rate_limit import RateLimiter
 logger = logging.getLogger("smartbiz.ai")
 
 router = APIRouter(prefix="/ai-assistant", tags=["AI Assistant"])
@@ -43,21 +44,13 @@ except Exception:  # noqa: BLE001
         pass
 
 # ----------------------- Lightweight rate limit -----------------------
-# per-user sliding window (requests/minute). Mobile-first: rahisi na nyepesi.
-_RATE: Dict[str, list[float]] = {}
+# per-user GCRA (requests/minute), store ya pamoja — utils.rate_limit
 RATE_WINDOW_SEC = 60
 RATE_MAX_REQ = int(os.getenv("AI_RATE_LIMIT_PER_MIN", "20"))  # admin unaweza kubadili .env
+_LIMIT = RateLimiter("ai_assistant", RATE_MAX_REQ, RATE_WINDOW_SEC)
 
-def _rate_ok(user_key: str) -> bool:
-    now = time.time()
-    q = _RATE.setdefault(user_key, [])
-    # safisha zamani
-    while q and now - q[0] > RATE_WINDOW_SEC:
-        q.pop(0)
-    if len(q) >= RATE_MAX_REQ:
-        return False
-    q.append(now)
-    return True
+async def _rate_ok(user_key: str) -> bool:
+    return (await _LIMIT.ahit(user_key)).allowed
 
 
 # ----------------------------- Models -----------------------------
@@ -238,7 +231,7 @@ async def ask_ai(
 
     # ---- Rate limit per user ----
     key = f"{getattr(current_user, 'id', 'anon')}|{getattr(current_user, 'email', '')}"
-    if not _rate_ok(key):
+    if not await _rate_ok(key):
         raise HTTPException(status_code=429, detail="Rate limit exceeded. Try again shortly.")
 
     # ---- Sanitize/normalize ----
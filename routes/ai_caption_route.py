@@ -4,10 +4,17 @@ from backend.schemas.user import UserOut
 import math
 from typing import List, Dict, Optional, AsyncGenerator, Literal
 
-from fastapi import APIRouter, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field, validator
 
+from backend.auth import get_current_user
+from backend.dependencies import check_admin
+from backend.models.user import User
+from backend.services.ai_batcher import BatchItemResult, get_batcher
+from backend.utils.access_control import require_plan
+from backend.utils.ai_gateway import AINotConfigured
+
 router = APIRouter(prefix="/caption-ai", tags=["AI Captions"])
 
 # -----------------------------------------------------------------------------
@@ -233,3 +240,109 @@ async def generate_caption(data: CaptionRequest):
     # Isipofika hapa tayari, format haijatambuliwa (lakini validator inatulinda)
     raise HTTPException(status_code=422, detail="Unsupported format")
 
+
+
+# -----------------------------------------------------------------------------
+# Batched generation (caption / title / hashtags) + replay backfill
+# -----------------------------------------------------------------------------
+class GenItem(BaseModel):
+    id: Optional[str] = Field(default=None, max_length=64, description="Kitambulisho chako (kinarudishwa kama kilivyo).")
+    text: str = Field(..., min_length=1, max_length=8000, description="Maelezo ya bidhaa / transcript ya replay.")
+
+
+class GenRequest(BaseModel):
+    task: Literal["caption", "title", "hashtags", "replay"] = "caption"
+    language: str = Field(default="sw")
+    items: List[GenItem] = Field(..., min_length=1, max_length=200)
+
+    @validator("language")
+    def _norm_lang(cls, v: str) -> str:
+        v = (v or "").strip().lower().replace("_", "-")
+        return v or "sw"
+
+
+class GenResult(BaseModel):
+    id: Optional[str] = None
+    title: Optional[str] = None
+    caption: Optional[str] = None
+    hashtags: List[str] = []
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class GenResponse(BaseModel):
+    task: str
+    language: str
+    items: List[GenResult]
+
+
+class BackfillRequest(BaseModel):
+    language: str = Field(default="sw")
+    overwrite: bool = Field(default=False, description="Andika upya hata replays zenye title tayari.")
+    limit: Optional[int] = Field(default=None, ge=1, description="Idadi ya juu ya replays za kupitia.")
+
+
+@router.post(
+    "/generate",
+    response_model=GenResponse,
+    summary="Generate captions/titles/hashtags for many items (micro-batched)",
+    dependencies=[Depends(require_plan(["Pro", "Business"]))],
+)
+async def generate_batch(data: GenRequest, response: Response, current_user: User = Depends(get_current_user)):
+    """
+    Kila kipengee huwasilishwa kwa `services.ai_batcher`: maombi ya wakati mmoja
+    (ya route hii na nyingine) hupakiwa kwenye prompts chache chini ya bajeti ya
+    tokens; vipengee vilivyokwisha tengenezwa hurudi kutoka cache.
+    """
+    batcher = get_batcher()
+    results = await batcher.submit_many(
+        data.task, [it.text for it in data.items], data.language, owner=f"user:{current_user.id}"
+    )
+    out: List[GenResult] = []
+    for it, res in zip(data.items, results):
+        if isinstance(res, AINotConfigured):
+            raise HTTPException(status_code=503, detail="AI provider not configured")
+        if isinstance(res, BatchItemResult):
+            out.append(GenResult(id=it.id, cached=res.cached, **res.fields))
+        else:
+            out.append(GenResult(id=it.id, error=str(res)[:200]))
+    if out and all(r.error for r in out):
+        raise HTTPException(status_code=502, detail=out[0].error)
+    response.headers["Cache-Control"] = "no-store"
+    return GenResponse(task=data.task, language=data.language, items=out)
+
+
+@router.get("/stats", summary="Batcher stats (batches, cache hits, token budget)")
+async def batch_stats(_admin: User = Depends(check_admin)):
+    return get_batcher().snapshot()
+
+
+@router.post(
+    "/backfill",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Backfill title/caption/hashtags kwa maktaba yote ya replays (admin)",
+)
+async def start_backfill(data: BackfillRequest, _admin: User = Depends(check_admin)):
+    from backend.services.replay_backfill import runner
+    if runner.running():
+        raise HTTPException(status_code=409, detail="Backfill job already running")
+    lang = (data.language or "sw").strip().lower() or "sw"
+    job = runner.start(lang=lang, overwrite=data.overwrite, limit=data.limit)
+    return job.as_dict()
+
+
+@router.get("/backfill/{job_id}", summary="Hali ya backfill job")
+async def backfill_status(job_id: str, _admin: User = Depends(check_admin)):
+    from backend.services.replay_backfill import runner
+    job = runner.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job.as_dict(), "batcher": get_batcher().snapshot()}
+
+
+@router.delete("/backfill/{job_id}", summary="Simamisha backfill job")
+async def cancel_backfill(job_id: str, _admin: User = Depends(check_admin)):
+    from backend.services.replay_backfill import runner
+    if not runner.cancel(job_id):
+        raise HTTPException(status_code=404, detail="No running job with that id")
+    return {"detail": "cancelling"}
@@ -18,6 +18,8 @@ from pydantic import BaseModel, Field
 from backend.auth import get_current_user
 from backend.models.user import User
 from backend.utils.access_control import require_plan
+from backend.utils.ai_gateway import AIGatewayError, get_gateway
+from backend.utils.rate_limit import RateLimiter
 
 logger = logging.getLogger("smartbiz.airesponder")
 
@@ -53,18 +55,12 @@ except ImportError:
         pass
 
 # -------------------------- Rate limiting -------------------------- #
-_RATE: Dict[str, List[float]] = {}
 RATE_MAX_PER_MIN = int(os.getenv("AI_RATE_LIMIT_PER_MIN", "30"))
 RATE_WINDOW = 60.0
+_LIMIT = RateLimiter("ai_responder", RATE_MAX_PER_MIN, RATE_WINDOW)
 
-def _rate_ok(key: str) -> bool:
-    now = time.time()
-    q = _RATE.setdefault(key, [])
-    q[:] = [t for t in q if now - t <= RATE_WINDOW]  # purge old
-    if len(q) >= RATE_MAX_PER_MIN:
-        return False
-    q.append(now)
-    return True
+async def _rate_ok(key: str) -> bool:
+    return (await _LIMIT.ahit(key)).allowed
 
 # ------------------------------ Schemas ------------------------------ #
 class PromptRequest(BaseModel):
@@ -107,29 +103,15 @@ async def _chat_once(messages: list[dict], model: str, temperature: float, max_t
     if not OPENAI_API_KEY:
         raise HTTPException(status_code=503, detail="AI not configured (missing API key).")
 
+    # cache + single-flight + async retries (utils.ai_gateway)
     try:
-        if _USING_ASYNC and _async_client:
-            resp = await _async_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            return resp.choices[0].message.content or "", getattr(resp, "usage", None)
-        else:
-            import openai  # type: ignore
-            def _call():
-                return openai.ChatCompletion.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-            resp = await asyncio.to_thread(_call)
-            return resp["choices"][0]["message"]["content"], resp.get("usage")
-    except Exception as e:
-        logger.exception("OpenAI chat error: %s", e)
+        res = await get_gateway().acomplete(messages, model, temperature, max_tokens)
+    except AIGatewayError as e:
+        logger.warning("OpenAI chat error: %s", e)
         raise HTTPException(status_code=502, detail=f"Upstream AI error: {str(e)}")
+    if res.cached:
+        logger.debug("AI response served from cache (model=%s)", model)
+    return res.text, res.usage
 
 async def _stream_sse(messages: list[dict], model: str, temperature: float, max_tokens: int) -> AsyncGenerator[bytes, None]:
     if not OPENAI_API_KEY:
@@ -183,7 +165,7 @@ async def auto_reply_bot(body: PromptRequest, current_user: User = Depends(get_c
         raise HTTPException(status_code=503, detail="AI not configured (missing API key).")
 
     key = f"{current_user.id}|{current_user.email}"
-    if not _rate_ok(key):
+    if not await _rate_ok(key):
         raise HTTPException(status_code=429, detail="Rate limit exceeded.")
 
     if not body.prompt.strip():
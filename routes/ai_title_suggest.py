@@ -1,5 +1,5 @@
 from __future__ import annotations
-from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -8,6 +8,12 @@ from typing import List, Optional
 import uuid
 from datetime import datetime
 
+from backend.auth import get_current_user
+from backend.models.user import User
+from backend.services.ai_batcher import get_batcher
+from backend.utils.access_control import require_plan
+from backend.utils.ai_gateway import AIGatewayError
+
 app = FastAPI(title="Title Suggester Pro", version="1.0.0")
 
 # Mount static files and templates
@@ -20,17 +26,35 @@ router = APIRouter()
 class SuggestionRequest(BaseModel):
     events: List[str]
     session_id: Optional[str] = None
+    use_ai: bool = False  # model (micro-batched) ipo /suggest-title/ai tu (auth + plan)
+    language: str = "sw"
 
 class SuggestionResponse(BaseModel):
     suggested_title: str
     session_id: str
     timestamp: str
+    source: str = "rules"
+    hashtags: List[str] = []
 
 # Store session history (in production, use a proper database)
 session_history = {}
 
 @router.post("/suggest-title", response_model=SuggestionResponse)
 async def suggest_title(request: SuggestionRequest):
+    if request.use_ai:
+        raise HTTPException(status_code=403, detail="AI titles require login: use /suggest-title/ai")
+    return await _suggest(request, owner=None)
+
+@router.post(
+    "/suggest-title/ai",
+    response_model=SuggestionResponse,
+    dependencies=[Depends(require_plan(["Pro", "Business"]))],
+)
+async def suggest_title_ai(request: SuggestionRequest, current_user: User = Depends(get_current_user)):
+    return await _suggest(request, owner=f"user:{current_user.id}")
+
+async def _suggest(request: SuggestionRequest, owner: Optional[str]) -> SuggestionResponse:
+    """`owner` = user wa AI batcher; None = kanuni tu (bila AI)."""
     if not request.events:
         raise HTTPException(status_code=400, detail="Events list cannot be empty")
     
@@ -39,10 +63,20 @@ async def suggest_title(request: SuggestionRequest):
     
     # Simple suggestion logic (extended from original)
     suggested_title = "?? SmartBiz Replay"  # Default
-    
+    source, hashtags = "rules", []
+
+    if owner is not None:
+        try:
+            res = await get_batcher().submit("title", "\n".join(request.events), request.language, owner=owner)
+            suggested_title, hashtags, source = res.fields["title"], res.fields["hashtags"], "ai"
+        except (AIGatewayError, ValueError):
+            pass
+
     events_lower = [event.lower() for event in request.events]
     
-    if any("big gift" in event for event in events_lower):
+    if source == "ai":
+        pass
+    elif any("big gift" in event for event in events_lower):
         suggested_title = "🎁 Gift Rain Show"
     elif any("peak moment" in event for event in events_lower):
         suggested_title = "🚀 Peak Power Experience"
@@ -63,13 +97,16 @@ async def suggest_title(request: SuggestionRequest):
     session_history[session_id].append({
         "events": request.events,
         "suggestion": suggested_title,
+        "source": source,
         "timestamp": timestamp
     })
     
     return SuggestionResponse(
         suggested_title=suggested_title,
         session_id=session_id,
-        timestamp=timestamp
+        timestamp=timestamp,
+        source=source,
+        hashtags=hashtags,
     )
 
 @router.get("/history/{session_id}")
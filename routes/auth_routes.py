@@ -27,6 +27,7 @@ from sqlalchemy.inspection import inspect as sa_inspect
 # ──────────────────────────────────────────────────────────────────────
 from backend.db import get_db, Base
 from backend.models.user import User  # canonical path only!
+from backend.utils.rate_limit import RateLimiter
 
 # ──────────────────────────────────────────────────────────────────────
 # Security helpers (hash/verify)
@@ -133,17 +134,10 @@ ALLOW_REG = (
 
 LOGIN_RATE_MAX_PER_MIN = int(os.getenv("LOGIN_RATE_LIMIT_PER_MIN", "20"))
 _RATE_WIN = 60.0
-_LOGIN_BUCKET: Dict[str, List[float]] = {}
-
-def _rate_ok(key: str) -> bool:
-    now = time.time()
-    q = _LOGIN_BUCKET.setdefault(key, [])
-    while q and (now - q[0]) > _RATE_WIN:
-        q.pop(0)
-    if len(q) >= LOGIN_RATE_MAX_PER_MIN:
-        return False
-    q.append(now)
-    return True
+_LOGIN_LIMIT = RateLimiter("login", LOGIN_RATE_MAX_PER_MIN, _RATE_WIN, strict=True)  # brute-force: dirisha kamili
+
+async def _rate_ok(key: str) -> bool:
+    return (await _LOGIN_LIMIT.ahit(key)).allowed
 
 # ──────────────────────────────────────────────────────────────────────
 # Normalizers
@@ -461,7 +455,7 @@ async def login(request: Request, response: Response, db: Session = Depends(get_
         # Simple IP+identifier rate limit
         ip = (request.client.host if request.client else "unknown").strip()
         rl_key = f"{ip}|{ident[:24]}"
-        if not _rate_ok(rl_key):
+        if not await _rate_ok(rl_key):
             raise HTTPException(status_code=429, detail="too_many_requests")
 
         # Find user using column-safe logic
@@ -15,6 +15,7 @@ from backend.dependencies import get_current_user, get_admin_user
 from backend.schemas import balance_schemas
 from backend.crud import balance_crud
 from backend.models.user import User as UserModel
+from backend.utils.rate_limit import Decision, IdempotencyKeys, RateLimiter
 
 logger = logging.getLogger("smartbiz.wallet")
 
@@ -25,39 +26,21 @@ MIN_WITHDRAW = float(os.getenv("MIN_WITHDRAW_AMOUNT", "1.0"))          # USD/you
 MAX_WITHDRAW = float(os.getenv("MAX_WITHDRAW_AMOUNT", "1000000.0"))    # kikomo cha juu
 WITHDRAW_RATE_MAX_PER_MIN = int(os.getenv("WITHDRAW_RATE_PER_MIN", "5"))
 
-# in-memory sliding window rate bucket per user
-_RATE: Dict[int, list[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}  # (user_id, key) -> ts
+# rate limit (strict: kamwe zaidi ya N kwa dakika) + idempotency za pamoja — utils.rate_limit
 _IDEMP_TTL = 10 * 60  # dk 10
+_LIMIT = RateLimiter("withdraw", WITHDRAW_RATE_MAX_PER_MIN, 60.0, strict=True)
+_IDEMP = IdempotencyKeys("withdraw", _IDEMP_TTL)
 
-def _rate_ok(user_id: int) -> int:
-    """Rudisha iliyosalia baada ya kuingia kwenye dirisha la dakika."""
-    now = time.time()
-    q = _RATE.setdefault(user_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= WITHDRAW_RATE_MAX_PER_MIN:
-        return 0
-    q.append(now)
-    return max(0, WITHDRAW_RATE_MAX_PER_MIN - len(q))
+def _rate_ok(user_id: int) -> Decision:
+    """Ingiza ombi kwenye bucket ya dakika ya mtumiaji (allowed + remaining)."""
+    return _LIMIT.hit(user_id)
 
 def _check_idempotency(user_id: int, key: Optional[str]) -> None:
     """Zuia marudio ya haraka kwa idempotency key (hiari)."""
     if not key:
         return
-    now = time.time()
-    # purge old
-    stale = []
-    for (uid, k), ts in _IDEMP.items():
-        if now - ts > _IDEMP_TTL:
-            stale.append((uid, k))
-    for s in stale:
-        _IDEMP.pop(s, None)
-
-    token = (user_id, key.strip())
-    if token in _IDEMP:
+    if not _IDEMP.claim((user_id, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 
 # --------------------------- Endpoints --------------------------- #
@@ -93,9 +76,9 @@ def request_withdrawal(
     idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     # --- Rate limit ---
-    remaining = _rate_ok(current_user.id)
-    response.headers["X-RateLimit-Remaining"] = str(remaining)
-    if remaining <= 0:
+    rl = _rate_ok(current_user.id)
+    response.headers["X-RateLimit-Remaining"] = str(rl.remaining)
+    if not rl.allowed:
         raise HTTPException(status_code=429, detail="Too many withdrawal attempts. Try again shortly.")
 
     # --- Idempotency (optional but recommended by clients) ---
@@ -143,7 +126,7 @@ def request_withdrawal(
         logger.exception("create_withdraw_request failed: %s", e)
         # on failure, free idempotency slot for next retry
         if idempotency_key:
-            _IDEMP.pop((current_user.id, idempotency_key), None)
+            _IDEMP.release((current_user.id, idempotency_key.strip()))
         raise HTTPException(status_code=500, detail="Failed to create withdrawal request")
 
     response.headers["Cache-Control"] = "no-store"
@@ -1,8 +1,8 @@
 from __future__ import annotations
 # backend/routes/broadcast.py
 import os
+import json
 import time
-import asyncio
 import logging
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Iterable, Literal
@@ -15,16 +15,23 @@ from sqlalchemy import or_, and_, func
 from backend.db import get_db
 from backend.models.user import User
 from backend.dependencies import check_admin
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
 from backend.schemas import BroadcastMessage  # ukitumia yako ya awali bado itafanya kazi
 
-# Telegram adapter (lazima ipo kwenye mradi wako)
-from backend.utils.telegram_bot import send_telegram_message
-
-# Hiari: adapters wengine kama watakuwepo
-with suppress(Exception):
-    from backend.utils.whatsapp_bot import send_whatsapp_message  # type: ignore
-with suppress(Exception):
-    from backend.utils.sms_gateway import send_sms  # type: ignore
+from backend.services.broadcast_runner import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    MAX_CONCURRENCY,
+    SafeDict,  # noqa: F401  (back-compat kwa imports za zamani)
+    audience_filters,
+    cancel_job,
+    count_audience,
+    create_job,
+    fetch_chunk,
+    load_job,
+    render_message as _render_message,
+    runner,
+)
 
 # Hiari: audit logger kama uliweka ile route
 with suppress(Exception):
@@ -37,43 +44,22 @@ router = APIRouter(prefix="/broadcast", tags=["Broadcasts"])
 # ----------------------------- Config ----------------------------- #
 # Throttling ya jumla kwa maombi ya broadcast (per admin)
 BROADCAST_RATE_PER_MIN = int(os.getenv("BROADCAST_RATE_PER_MIN", "5"))
-_RATE: Dict[int, List[float]] = {}
+_LIMIT = RateLimiter("broadcast", BROADCAST_RATE_PER_MIN, 60.0)
 
-# Idempotency (in-memory); unaweza kubadili kwenda Redis/DB
-_IDEMP: Dict[tuple[int, str], float] = {}
+# Idempotency (store ya pamoja — utils.rate_limit; Redis kwa RATE_LIMIT_BACKEND=redis)
 _IDEMP_TTL = 10 * 60  # sekunde
+_IDEMP = IdempotencyKeys("broadcast", _IDEMP_TTL)
 
-# Limits za batching / concurrency (mobile-safe)
-DEFAULT_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "200"))
-DEFAULT_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
-MAX_CONCURRENCY = 50
-
-# Retry policy
-MAX_RETRIES = 3
-BASE_BACKOFF = 0.7  # sekunde
-
-
-def _rate_ok(admin_id: int) -> None:
-    now = time.time()
-    q = _RATE.setdefault(admin_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= BROADCAST_RATE_PER_MIN:
+async def _rate_ok(admin_id: int) -> None:
+    if not (await _LIMIT.ahit(admin_id)).allowed:
         raise HTTPException(status_code=429, detail="Too many broadcast attempts. Try again shortly.")
-    q.append(now)
 
 
-def _check_idempotency(admin_id: int, key: Optional[str]) -> None:
+async def _check_idempotency(admin_id: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = time.time()
-    stale = [(uid, k) for (uid, k), ts in _IDEMP.items() if now - ts > _IDEMP_TTL]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (admin_id, key.strip())
-    if token in _IDEMP:
+    if not await _IDEMP.aclaim((admin_id, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 
 # ----------------------------- Schemas ext ----------------------------- #
@@ -97,6 +83,7 @@ try:
         created_to: Optional[datetime] = None
         # control
         dry_run: bool = False
+        wait: bool = Field(True, description="Jibu baada ya kutuma (kama zamani); wait=false → job ya background, 202 + job_id")
         schedule_at: Optional[datetime] = None
         batch_size: int = Field(DEFAULT_BATCH_SIZE, ge=1, le=5000)
         concurrency: int = Field(DEFAULT_CONCURRENCY, ge=1, le=MAX_CONCURRENCY)
@@ -105,116 +92,10 @@ except Exception:
 
 
 # ----------------------------- Utils ----------------------------- #
-class SafeDict(dict):
-    def __missing__(self, key):
-        return "{" + key + "}"  # acha placeholder badala ya ku-fail
-
-def _ctx_for_user(u: User, extra: Dict[str, Any]) -> Dict[str, Any]:
-    first_name = ""
-    if getattr(u, "full_name", None):
-        first_name = str(u.full_name).split()[0]
-    return {
-        "user_id": u.id,
-        "email": u.email,
-        "username": u.username,
-        "full_name": u.full_name,
-        "first_name": first_name,
-        "phone_number": u.phone_number,
-        "language": u.language,
-        "plan": u.subscription_status,
-        "business_name": getattr(u, "business_name", None),
-        **(extra or {}),
-    }
-
-def _render_message(tpl: str, user: User, variables: Dict[str, Any]) -> str:
-    ctx = _ctx_for_user(user, variables)
-    # str.format_map bila kuvunjika
-    return str(tpl).format_map(SafeDict(ctx))
-
-async def _send_one_channel(channel: str, user: User, text: str) -> dict:
-    """
-    Rudisha dict yenye status kwa channel moja: {"ok": bool, "err": str|None}
-    """
-    try:
-        if channel == "telegram":
-            tid = getattr(user, "telegram_id", None)
-            if not tid:
-                return {"ok": False, "err": "no_telegram"}
-            await send_telegram_message(tid, text)
-            return {"ok": True, "err": None}
-
-        if channel == "whatsapp":
-            if "send_whatsapp_message" not in globals():
-                return {"ok": False, "err": "wa_adapter_missing"}
-            phone = getattr(user, "phone_number", None)
-            if not phone:
-                return {"ok": False, "err": "no_phone"}
-            with suppress(Exception):
-                await send_whatsapp_message(phone, text)  # type: ignore
-            return {"ok": True, "err": None}
-
-        if channel == "sms":
-            if "send_sms" not in globals():
-                return {"ok": False, "err": "sms_adapter_missing"}
-            phone = getattr(user, "phone_number", None)
-            if not phone:
-                return {"ok": False, "err": "no_phone"}
-            with suppress(Exception):
-                await send_sms(phone, text)  # type: ignore
-            return {"ok": True, "err": None}
-
-        return {"ok": False, "err": "unsupported_channel"}
-    except Exception as e:
-        return {"ok": False, "err": str(e)}
-
-async def _send_user(user: User, channels: List[str], text: str, sem: asyncio.Semaphore) -> Dict[str, Any]:
-    """
-    Tuma kwa user mmoja kwenye channels kadhaa, na retries.
-    """
-    out: Dict[str, Any] = {"user_id": user.id, "results": {}}
-    async with sem:
-        for ch in channels:
-            retries = 0
-            backoff = BASE_BACKOFF
-            while True:
-                res = await _send_one_channel(ch, user, text)
-                if res["ok"] or retries >= MAX_RETRIES:
-                    out["results"][ch] = res
-                    break
-                await asyncio.sleep(backoff)
-                retries += 1
-                backoff *= 2.0
-    return out
-
-
-def _query_audience(db: Session, p: BroadcastPayload) -> List[User]:
-    q = db.query(User)
-
-    # filters
-    if p.user_ids:
-        q = q.filter(User.id.in_(p.user_ids))
-    if p.roles:
-        q = q.filter(User.role.in_(p.roles))
-    if p.plans:
-        q = q.filter(User.subscription_status.in_(p.plans))
-    if p.language:
-        q = q.filter(func.lower(User.language) == p.language.strip().lower())
-    if p.has_telegram is True:
-        q = q.filter(User.telegram_id.isnot(None))
-    if p.has_telegram is False:
-        q = q.filter(User.telegram_id.is_(None))
-    if p.has_phone is True:
-        q = q.filter(User.phone_number.isnot(None))
-    if p.has_phone is False:
-        q = q.filter(or_(User.phone_number.is_(None), User.phone_number == ""))
-    if p.created_from and hasattr(User, "created_at"):
-        q = q.filter(User.created_at >= p.created_from)
-    if p.created_to and hasattr(User, "created_at"):
-        q = q.filter(User.created_at <= p.created_to)
-
-    # order kwa id ya juu â†’ rahisi kwa cursor/infinite scroll
-    q = q.order_by(User.id.desc())
-    return q.all()
+def _payload_dict(p: BroadcastPayload) -> Dict[str, Any]:
+    if hasattr(p, "model_dump"):
+        return p.model_dump(mode="json")
+    return json.loads(p.json())
 
 
 def _maybe_schedule(db: Session, payload: BroadcastPayload, admin_id: int) -> Optional[dict]:
@@ -228,7 +109,6 @@ def _maybe_schedule(db: Session, payload: BroadcastPayload, admin_id: int) -> Op
 
     # 1) ScheduledMessage (kama upo)
     with suppress(Exception):
-from backend.models.scheduled_message import ScheduledMessage
         from backend.schemas.scheduled import ScheduledMessageCreate  # type: ignore
         from backend.crud.schedule_crud import create_scheduled_message  # type: ignore
 
@@ -289,8 +169,8 @@ async def broadcast_message(
     idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     # Throttling ya maombi ya admin huyu + idempotency
-    _rate_ok(current_admin.id)
-    _check_idempotency(current_admin.id, idempotency_key)
+    await _rate_ok(current_admin.id)
+    await _check_idempotency(current_admin.id, idempotency_key)
 
     # Scheduling?
     sched_info = _maybe_schedule(db, payload, admin_id=current_admin.id)
@@ -316,21 +196,20 @@ async def broadcast_message(
             "id": sched_info.get("id"),
         }
 
-    # Tanguliza selection ya audience
-    users = _query_audience(db, payload)
-    total = len(users)
+    pd = _payload_dict(payload)
+    clauses = audience_filters(pd)
 
-    # Dry-run?
+    # Dry-run? COUNT + row moja ya sample (hakuna kusoma audience yote)
     if getattr(payload, "dry_run", False):
-        sample_text = None
-        if users:
-            sample_text = _render_message(payload.message, users[0], payload.variables or {})
+        total = count_audience(db, clauses)
+        first = fetch_chunk(db, clauses, None, 1)
+        sample = first[0] if first else None
         response.headers["Cache-Control"] = "no-store"
         return {
             "dry_run": True,
             "total_recipients": total,
-            "sample_user_id": users[0].id if users else None,
-            "sample_message": sample_text,
+            "sample_user_id": sample.id if sample else None,
+            "sample_message": _render_message(payload.message, sample, payload.variables or {}) if sample else None,
             "filters": {
                 "roles": payload.roles, "plans": payload.plans,
                 "language": payload.language, "has_telegram": payload.has_telegram,
@@ -338,63 +217,49 @@ async def broadcast_message(
             },
         }
 
-    # Real send: batch + concurrency
-    batch_size = max(1, min(int(getattr(payload, "batch_size", DEFAULT_BATCH_SIZE)), 5000))
-    concurrency = max(1, min(int(getattr(payload, "concurrency", DEFAULT_CONCURRENCY)), MAX_CONCURRENCY))
-    sem = asyncio.Semaphore(concurrency)
-
-    per_channel = {ch: {"ok": 0, "fail": 0} for ch in payload.channels}
-    skipped = 0
-    tasks: List[asyncio.Task] = []
-    sent_results: List[Dict[str, Any]] = []
-
-    async def _process_user(u: User):
-        text = _render_message(payload.message, u, payload.variables or {})
-        res = await _send_user(u, payload.channels, text, sem)
-        sent_results.append(res)
-
-    # batch loop
-    for i in range(0, total, batch_size):
-        chunk = users[i : i + batch_size]
-        tasks = [asyncio.create_task(_process_user(u)) for u in chunk]
-        await asyncio.gather(*tasks)
-
-        # (Optional) kidogo kupumzika kati ya batches kwa heshima ya provider limits
-        await asyncio.sleep(0.1)
-
-    # Aggregate results
-    for r in sent_results:
-        for ch, info in r["results"].items():
-            if info.get("ok"):
-                per_channel[ch]["ok"] += 1
-            else:
-                err = info.get("err")
-                if err in {"no_telegram", "no_phone"}:
-                    skipped += 1
-                per_channel[ch]["fail"] += 1
-
-    # Audit (hiari)
-    with suppress(Exception):
-        if "emit_audit" in globals():
-            emit_audit(
-                db,
-                action="broadcast.send",
-                status="success",
-                severity="info",
-                actor_id=current_admin.id,
-                actor_email=current_admin.email,
-                resource_type="broadcast",
-                resource_id=None,
-                meta={"total": total, "channels": payload.channels, "per_channel": per_channel, "skipped": skipped},
-            )
-
+    # Real send: job inayodumu (keyset chunks + progress kwenye DB)
+    pd["batch_size"] = max(1, min(int(getattr(payload, "batch_size", DEFAULT_BATCH_SIZE)), 5000))
+    pd["concurrency"] = max(1, min(int(getattr(payload, "concurrency", DEFAULT_CONCURRENCY)), MAX_CONCURRENCY))
+    job = create_job(db, admin_id=current_admin.id, payload=pd, idempotency_key=idempotency_key)
     response.headers["Cache-Control"] = "no-store"
+
+    if getattr(payload, "wait", True):
+        summary = await runner.run(job.id)
+        if summary is None:
+            raise HTTPException(status_code=500, detail="Broadcast failed")
+        return {"message": "✅ Broadcast processed", **summary}
+
+    runner.start(job.id)
+    response.status_code = status.HTTP_202_ACCEPTED
     return {
-        "message": "âœ… Broadcast processed",
-        "total_recipients": total,
-        "skipped_missing_contact": skipped,
-        "per_channel": per_channel,
-        "batch_size": batch_size,
-        "concurrency": concurrency,
+        "message": "📢 Broadcast queued",
+        "job_id": job.id,
+        "status": "queued",
+        "batch_size": pd["batch_size"],
+        "concurrency": pd["concurrency"],
     }
 
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Hali ya broadcast job (progress)",
+    dependencies=[Depends(check_admin)],
+)
+def get_broadcast_job(job_id: int, response: Response, db: Session = Depends(get_db)):
+    job = load_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast job not found")
+    job.pop("payload", None)
+    response.headers["Cache-Control"] = "no-store"
+    return job
+
+
+@router.post(
+    "/jobs/{job_id}/cancel",
+    summary="Sitisha broadcast job (chunk inayoendelea itamalizika)",
+    dependencies=[Depends(check_admin)],
+)
+def cancel_broadcast_job(job_id: int, db: Session = Depends(get_db)):
+    if not cancel_job(db, job_id):
+        raise HTTPException(status_code=409, detail="Job is not running")
+    return {"job_id": job_id, "status": "canceled"}
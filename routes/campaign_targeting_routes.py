@@ -20,6 +20,7 @@ from backend.auth import get_current_user
 from backend.models.user import User
 from backend.models.customer import Customer
 from backend.schemas.targeting import TargetingCriteria
+from backend.utils.rate_limit import RateLimiter
 
 # Targeting engine (best effort)
 try:
@@ -43,16 +44,11 @@ ALLOWED_SORT = ("id", "created_at", "updated_at", "last_active_at", "lifetime_va
 ALLOWED_ORDER = ("asc", "desc")
 TARGETING_RATE_PER_MIN = int(os.getenv("TARGETING_RATE_PER_MIN", "20"))
 
-_RATE: Dict[int, List[float]] = {}  # per-user sliding window
+_LIMIT = RateLimiter("targeting", TARGETING_RATE_PER_MIN, 60.0)  # per-user GCRA
 
 def _rate_ok(user_id: int) -> None:
-    now = time.time()
-    q = _RATE.setdefault(user_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= TARGETING_RATE_PER_MIN:
+    if not _LIMIT.allow(user_id):
         raise HTTPException(status_code=429, detail="Too many targeting requests. Try again shortly.")
-    q.append(now)
 
 def _clamp_limit(limit: Optional[int]) -> int:
     if not limit:
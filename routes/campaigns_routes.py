@@ -19,6 +19,7 @@ from backend.dependencies import get_current_user
 from backend.models.campaign import Campaign
 from backend.models.product import Product
 from backend.models.user import User
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
 # ====== Schemas (tumia zako, toa fallback endapo hazipo) ======
 try:
     from backend.schemas import CampaignCreate, CampaignOut, CampaignUpdate
@@ -63,9 +64,9 @@ MAX_DAYS = int(os.getenv("CAMPAIGN_MAX_DAYS", "365"))
 MAX_ACTIVE_PER_PRODUCT = int(os.getenv("CAMPAIGN_MAX_ACTIVE_PER_PRODUCT", "1"))
 
 CREATE_RATE_PER_MIN = int(os.getenv("CAMPAIGN_CREATE_RATE_PER_MIN", "10"))
-_RATE: Dict[int, List[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}
 _IDEMP_TTL = 10 * 60  # sekunde
+_LIMIT = RateLimiter("campaign_create", CREATE_RATE_PER_MIN, 60.0)
+_IDEMP = IdempotencyKeys("campaign_create", _IDEMP_TTL)
 
 ALLOWED_SORT = ("created_at", "updated_at", "starts_at", "ends_at", "id")
 ALLOWED_ORDER = ("asc", "desc")
@@ -77,25 +78,14 @@ def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 def _rate_ok(uid: int) -> None:
-    now = time.time()
-    q = _RATE.setdefault(uid, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= CREATE_RATE_PER_MIN:
+    if not _LIMIT.allow(uid):
         raise HTTPException(status_code=429, detail="Too many create attempts. Try again shortly.")
-    q.append(now)
 
 def _check_idempotency(uid: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = time.time()
-    stale = [(k_uid, k) for (k_uid, k), ts in _IDEMP.items() if now - ts > _IDEMP_TTL]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (uid, key.strip())
-    if token in _IDEMP:
+    if not _IDEMP.claim((uid, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 def _compute_status(starts_at: Optional[datetime], ends_at: Optional[datetime]) -> str:
     now = _utcnow()
@@ -202,7 +192,7 @@ def create_campaign(
         db.rollback()
         # on failure: allow next try with same idempotency key
         if idempotency_key:
-            _IDEMP.pop((current_user.id, idempotency_key), None)
+            _IDEMP.release((current_user.id, idempotency_key.strip()))
         raise HTTPException(status_code=500, detail=f"Create failed: {e}")
 
     # Headers for mobile
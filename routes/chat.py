@@ -15,6 +15,7 @@ from sqlalchemy import or_, and_
 from backend.db import get_db
 from backend.auth import get_current_user
 from backend.models.user import User
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
 
 # Schemas
 from backend.schemas import ChatCreate, ChatOut
@@ -36,46 +37,27 @@ MAX_LIMIT = 200
 DEFAULT_LIMIT = 50
 ALLOWED_ORDER = ("asc", "desc")
 
-# Memory guards (badala ya Redis; unaweza kubadilisha baadaye)
-_USER_RATE: Dict[int, List[float]] = {}
-_ROOM_RATE: Dict[tuple[int, str], List[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}
+# Guards za pamoja (utils.rate_limit; Redis kwa RATE_LIMIT_BACKEND=redis)
 _IDEMP_TTL = 10 * 60  # sekunde
+_USER_LIMIT = RateLimiter("chat_user", RATE_PER_MINUTE, 60.0)
+_ROOM_LIMIT = RateLimiter("chat_room", ROOM_RATE_PER_MINUTE, 60.0)
+_IDEMP = IdempotencyKeys("chat_send", _IDEMP_TTL)
 
 # ------------------------- Helpers ------------------------- #
 def _rate_ok(user_id: int, room_id: Optional[str] = None) -> None:
-    now = time.time()
-
     # Global per-user
-    q = _USER_RATE.setdefault(user_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= RATE_PER_MINUTE:
+    if not _USER_LIMIT.allow(user_id):
         raise HTTPException(status_code=429, detail="Too many messages per minute")
-    q.append(now)
 
     # Per-room per-user
-    if room_id:
-        key = (user_id, room_id)
-        rq = _ROOM_RATE.setdefault(key, [])
-        while rq and (now - rq[0]) > 60.0:
-            rq.pop(0)
-        if len(rq) >= ROOM_RATE_PER_MINUTE:
-            raise HTTPException(status_code=429, detail="Room flood protection")
-        rq.append(now)
+    if room_id and not _ROOM_LIMIT.allow((user_id, room_id)):
+        raise HTTPException(status_code=429, detail="Room flood protection")
 
 def _idempotency_check(user_id: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = time.time()
-    # safisha
-    stale = [(k_uid, k) for (k_uid, k), ts in _IDEMP.items() if now - ts > _IDEMP_TTL]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (user_id, key.strip())
-    if token in _IDEMP:
+    if not _IDEMP.claim((user_id, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate send (Idempotency-Key)")
-    _IDEMP[token] = now
 
 def _clamp_limit(limit: Optional[int]) -> int:
     if not limit:
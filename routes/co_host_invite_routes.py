@@ -16,6 +16,7 @@ from sqlalchemy import and_, or_, func
 from backend.db import get_db
 from backend.auth import get_current_user
 from backend.models.user import User  # for type hints
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
 
 # ---- Models ----
 try:
@@ -65,34 +66,22 @@ DEFAULT_LIMIT = 50
 ALLOWED_SORT = ("id", "sent_at", "created_at", "updated_at", "status")
 ALLOWED_ORDER = ("asc", "desc")
 
-_RATE: Dict[int, List[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}
 _IDEMP_TTL = 10 * 60  # sekunde
+_LIMIT = RateLimiter("cohost_invite", RATE_PER_MIN, 60.0)
+_IDEMP = IdempotencyKeys("cohost_invite", _IDEMP_TTL)
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 def _rate_ok(inviter_id: int) -> None:
-    now = time.time()
-    q = _RATE.setdefault(inviter_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= RATE_PER_MIN:
+    if not _LIMIT.allow(inviter_id):
         raise HTTPException(status_code=429, detail="Too many invites this minute")
-    q.append(now)
 
 def _idempotency_check(uid: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = time.time()
-    # safisha keys zilizopitwa
-    stale = [(k_uid, k) for (k_uid, k), ts in _IDEMP.items() if now - ts > _IDEMP_TTL]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (uid, key.strip())
-    if token in _IDEMP:
+    if not _IDEMP.claim((uid, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 def _clamp_limit(limit: Optional[int]) -> int:
     if not limit:
@@ -212,7 +201,7 @@ def send_invite(
         # on failure, ruhusu retry ya idempotency key
         if idempotency_key:
             with suppress(Exception):
-                _IDEMP.pop((inviter_id, idempotency_key), None)
+                _IDEMP.release((inviter_id, idempotency_key.strip()))
         raise HTTPException(status_code=500, detail=f"Invite create failed: {e}")
 
     # Headers
@@ -16,6 +16,7 @@ from sqlalchemy import func
 from backend.db import get_db
 from backend.auth import get_current_user
 from backend.models.user import User
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
 
 try:
     from backend.models.co_host import CoHost   # model yako
@@ -61,34 +62,22 @@ DEFAULT_LIMIT = 50
 ALLOWED_SORT = ("id", "created_at", "updated_at", "status")
 ALLOWED_ORDER = ("asc", "desc")
 
-_RATE: Dict[int, List[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}
 _IDEMP_TTL = 10 * 60  # s
+_LIMIT = RateLimiter("cohost", RATE_PER_MIN, 60.0)
+_IDEMP = IdempotencyKeys("cohost", _IDEMP_TTL)
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 def _rate_ok(inviter_id: int) -> None:
-    now = time.time()
-    q = _RATE.setdefault(inviter_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= RATE_PER_MIN:
+    if not _LIMIT.allow(inviter_id):
         raise HTTPException(status_code=429, detail="Too many invites this minute")
-    q.append(now)
 
 def _idempotency_check(uid: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = time.time()
-    # safisha zilizopitwa
-    stale = [(k_uid, k) for (k_uid, k), ts in _IDEMP.items() if now - ts > _IDEMP_TTL]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (uid, key.strip())
-    if token in _IDEMP:
+    if not _IDEMP.claim((uid, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 def _clamp_limit(v: Optional[int]) -> int:
     if not v:
@@ -196,7 +185,7 @@ def invite_cohost(
         # ruhusu retry ya idempotency
         if idempotency_key:
             with suppress(Exception):
-                _IDEMP.pop((inviter_id, idempotency_key), None)
+                _IDEMP.release((inviter_id, idempotency_key.strip()))
         raise HTTPException(status_code=500, detail=f"Invite create failed: {e}")
 
     response.headers["Cache-Control"] = "no-store"
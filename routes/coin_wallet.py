@@ -15,7 +15,10 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func
 
 from backend.db import get_db
+from backend.utils.pagination import TOTAL_MODE_PATTERN, paginate, set_page_headers
 from backend import models
+from backend.services import wallet_ledger
+from backend.services.wallet_ledger import IdempotencyMismatch, InsufficientFunds, WalletError, WalletNotFound
 
 # -------- Auth & RBAC (best effort) --------
 try:
@@ -77,7 +80,7 @@ except Exception:
         wallet_id: int
         type: str
         amount: Decimal
-        balance_after: Decimal
+        balance_after: Optional[Decimal] = None  # credits: haijulikani hadi compaction
         currency: Optional[str] = None
         reference: Optional[str] = None
         idempotency_key: Optional[str] = None
@@ -117,6 +120,27 @@ def _etag_wallet(w) -> str:
     base = f"{getattr(w, 'id', '')}-{getattr(w, 'balance', '')}-{getattr(w, 'updated_at', '')}"
     return 'W/"' + hashlib.sha256(str(base).encode("utf-8")).hexdigest()[:16] + '"'
 
+def _wallet_out(db: Session, w, response: Optional[Response] = None):
+    """Response ya wallet; `balance` = salio linalotumika (balance + credits zinazosubiri)."""
+    out = CoinWalletResponse(
+        id=w.id,
+        user_id=w.user_id,
+        balance=_q(wallet_ledger.available(db, w)),
+        currency=getattr(w, "currency", WALLET_CURRENCY),
+        created_at=getattr(w, "created_at", None),
+        updated_at=getattr(w, "updated_at", None),
+    )
+    if response is not None:
+        response.headers["Cache-Control"] = "no-store"
+        response.headers["ETag"] = _etag_wallet(out)
+    return out
+
+def _my_wallet(db: Session, current_user):
+    w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == current_user.id).first()
+    if not w:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    return w
+
 # ============================== CREATE (me) ==============================
 @router.post(
     "/me",
@@ -134,17 +158,16 @@ def create_my_wallet(
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    # Heshimu default 0 kama balance ya mwanzo
+    # Heshimu default 0 kama balance ya mwanzo (huandikwa kwenye ledger kama `opening`)
     init_balance = _q(payload.balance if getattr(payload, "balance", None) else Decimal("0"))
 
     # Idempotent via unique(user_id)
     try:
-        w = models.CoinWallet(user_id=user_id, balance=init_balance, currency=WALLET_CURRENCY)
-        if hasattr(w, "created_at") and not getattr(w, "created_at", None):
-            w.created_at = _utcnow()
-        if hasattr(w, "updated_at"):
-            w.updated_at = _utcnow()
-        db.add(w)
+        now = _utcnow()
+        w = models.CoinWallet(
+            user_id=user_id, balance=init_balance, currency=WALLET_CURRENCY, created_at=now, updated_at=now,
+        )
+        wallet_ledger.open_wallet(db, w, init_balance)
         db.commit()
         db.refresh(w)
     except IntegrityError:
@@ -154,13 +177,7 @@ def create_my_wallet(
         if not w:
             raise HTTPException(status_code=500, detail="Wallet create race detected")
 
-    response.headers["Cache-Control"] = "no-store"
-    response.headers["ETag"] = _etag_wallet(w)
-
-    # Pydantic v1/v2 friendly
-    if hasattr(CoinWalletResponse, "model_validate"):
-        return CoinWalletResponse.model_validate(w, from_attributes=True)  # type: ignore
-    return CoinWalletResponse.model_validate(w)  # type: ignore
+    return _wallet_out(db, w, response)
 
 # ============================== GET (me) ==============================
 @router.get(
@@ -173,12 +190,29 @@ def get_my_wallet(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == current_user.id).first()
-    if not w:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-    response.headers["Cache-Control"] = "no-store"
-    response.headers["ETag"] = _etag_wallet(w)
-    return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
+    return _wallet_out(db, _my_wallet(db, current_user), response)
+
+# ============================== ADMIN: reconcile / compact ==============================
+@router.post(
+    "/reconcile",
+    summary="(Admin) Linganisha balances na ledger (fix=true huandika balance kutoka ledger)",
+    dependencies=[Depends(check_admin)]
+)
+def admin_reconcile(
+    db: Session = Depends(get_db),
+    fix: bool = Query(False),
+    wallet_id: Optional[int] = Query(None),
+):
+    rows = wallet_ledger.reconcile(db, fix=fix, wallet_ids=[wallet_id] if wallet_id else None)
+    return {"mismatches": len(rows), "fixed": sum(1 for r in rows if r["fixed"]), "items": rows}
+
+@router.post(
+    "/compact",
+    summary="(Admin) Kunja credits zinazosubiri kwenye balances sasa hivi",
+    dependencies=[Depends(check_admin)]
+)
+def admin_compact(db: Session = Depends(get_db)):
+    return wallet_ledger.compact_pending(db)
 
 # ============================== ADMIN: GET by user_id ==============================
 @router.get(
@@ -191,13 +225,13 @@ def admin_get_wallet(user_id: int, db: Session = Depends(get_db)):
     w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == user_id).first()
     if not w:
         raise HTTPException(status_code=404, detail="Wallet not found")
-    return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
+    return _wallet_out(db, w)
 
 # ============================== PUT (admin only) ==============================
 @router.put(
     "/{user_id}",
     response_model=CoinWalletResponse,
-    summary="(Admin) weka balance moja kwa moja",
+    summary="(Admin) weka balance moja kwa moja (tofauti huandikwa kama `adjust`)",
     dependencies=[Depends(check_admin)]
 )
 def admin_update_wallet(
@@ -205,23 +239,24 @@ def admin_update_wallet(
     wallet_data: CoinWalletUpdate,
     db: Session = Depends(get_db)
 ):
-    w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == user_id).with_for_update(of=models.CoinWallet).first()
+    w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == user_id).first()
     if not w:
         raise HTTPException(status_code=404, detail="Wallet not found")
-
-    w.balance = _q(wallet_data.balance)
-    if hasattr(w, "updated_at"):
-        w.updated_at = _utcnow()
-    db.commit()
-    db.refresh(w)
-    return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
+    target = _q(wallet_data.balance)
+    if target < Decimal("0"):
+        raise HTTPException(status_code=422, detail="Balance must be >= 0")
+    try:
+        w = wallet_ledger.set_balance(db, w.id, target, reference="admin")
+    except WalletError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _wallet_out(db, w)
 
 # ============================== DEPOSIT (me) ==============================
 @router.post(
     "/me/deposit",
     response_model=CoinWalletResponse,
     status_code=status.HTTP_200_OK,
-    summary="Weka fedha kwenye wallet (idempotent + ledger ikiwa ipo)"
+    summary="Weka fedha kwenye wallet (append kwenye ledger, bila lock; idempotent)"
 )
 def deposit_my_wallet(
     payload: DepositRequest,
@@ -231,68 +266,31 @@ def deposit_my_wallet(
     idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     amount = _parse_amount(payload.amount)
-
-    # Idempotency check via ledger table if available
-    if LedgerModel and idempotency_key:
-        dup = db.query(LedgerModel).filter(
-            LedgerModel.wallet_id == models.CoinWallet.id,  # logical, refined below after we get wallet
-        )
-
-    # Lock wallet row
-    w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == current_user.id)\
-        .with_for_update(of=models.CoinWallet).first()
-    if not w:
-        raise HTTPException(status_code=404, detail="Wallet not found")
+    w = _my_wallet(db, current_user)
 
     # (Optional) guard currency
     currency = getattr(w, "currency", WALLET_CURRENCY)
     if payload.currency and payload.currency != currency:
         raise HTTPException(status_code=422, detail=f"Currency mismatch. Wallet is {currency}")
 
-    # Idempotency via ledger: check after we know wallet id
-    if LedgerModel and idempotency_key:
-        dup = db.query(LedgerModel).filter(
-            LedgerModel.wallet_id == w.id,
-            LedgerModel.idempotency_key == idempotency_key,
-        ).first()
-        if dup:
-            # Already applied: return current wallet state
-            response.headers["Cache-Control"] = "no-store"
-            response.headers["ETag"] = _etag_wallet(w)
-            return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
-
-    # Apply deposit
-    w.balance = _q(Decimal(w.balance) + amount)
-    if hasattr(w, "updated_at"):
-        w.updated_at = _utcnow()
-    db.flush()  # get wallet id
-
-    # Ledger write (if model exists)
-    if LedgerModel:
-        txn = LedgerModel(
-            wallet_id=w.id,
-            type="deposit",
-            amount=amount,
-            balance_after=w.balance,
-            currency=currency,
-            reference=getattr(payload, "reference", None),
-            idempotency_key=idempotency_key,
-            created_at=_utcnow(),
+    # Credit = INSERT moja kwenye ledger; balance hukunjwa na compaction (services.wallet_ledger)
+    try:
+        wallet_ledger.credit(
+            db, w.id, amount, type="deposit", currency=currency,
+            reference=getattr(payload, "reference", None), idempotency_key=idempotency_key,
         )
-        db.add(txn)
-
-    db.commit()
-    db.refresh(w)
+    except IdempotencyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key already used with a different request")
+    except WalletNotFound:
+        raise HTTPException(status_code=404, detail="Wallet not found")
 
-    response.headers["Cache-Control"] = "no-store"
-    response.headers["ETag"] = _etag_wallet(w)
-    return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
+    return _wallet_out(db, w, response)
 
 # ============================== WITHDRAW (me) ==============================
 @router.post(
     "/me/withdraw",
     response_model=CoinWalletResponse,
-    summary="Toa fedha (salio lazima litoche; idempotent + ledger ikiwa ipo)"
+    summary="Toa fedha (salio lazima litoshe; idempotent + ledger)"
 )
 def withdraw_my_wallet(
     payload: WithdrawRequest,
@@ -302,58 +300,29 @@ def withdraw_my_wallet(
     idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     amount = _parse_amount(payload.amount)
-
-    # Lock wallet
-    w = db.query(models.CoinWallet).filter(models.CoinWallet.user_id == current_user.id)\
-        .with_for_update(of=models.CoinWallet).first()
-    if not w:
-        raise HTTPException(status_code=404, detail="Wallet not found")
+    w = _my_wallet(db, current_user)
 
     currency = getattr(w, "currency", WALLET_CURRENCY)
     if payload.currency and payload.currency != currency:
         raise HTTPException(status_code=422, detail=f"Currency mismatch. Wallet is {currency}")
 
-    # Idempotency via ledger if available
-    if LedgerModel and idempotency_key:
-        dup = db.query(LedgerModel).filter(
-            LedgerModel.wallet_id == w.id,
-            LedgerModel.idempotency_key == idempotency_key,
-            LedgerModel.type == "withdraw",
-        ).first()
-        if dup:
-            response.headers["Cache-Control"] = "no-store"
-            response.headers["ETag"] = _etag_wallet(w)
-            return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
-
-    # Check balance
-    new_balance = _q(Decimal(w.balance) - amount)
-    if new_balance < Decimal("0"):
-        raise HTTPException(status_code=409, detail="Insufficient balance")
-    w.balance = new_balance
-    if hasattr(w, "updated_at"):
-        w.updated_at = _utcnow()
-    db.flush()
-
-    # Ledger
-    if LedgerModel:
-        txn = LedgerModel(
-            wallet_id=w.id,
-            type="withdraw",
-            amount=amount,
-            balance_after=w.balance,
-            currency=currency,
-            reference=getattr(payload, "reference", None),
-            idempotency_key=idempotency_key,
-            created_at=_utcnow(),
+    # Lock ya wallet + kukunja credits zinazosubiri kama balance haitoshi
+    try:
+        wallet_ledger.debit(
+            db, w.id, amount, type="withdraw", currency=currency,
+            reference=getattr(payload, "reference", None), idempotency_key=idempotency_key,
         )
-        db.add(txn)
+    except InsufficientFunds:
+        raise HTTPException(status_code=409, detail="Insufficient balance")
+    except IdempotencyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key already used with a different request")
+    except WalletNotFound:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    except WalletError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    db.commit()
     db.refresh(w)
-
-    response.headers["Cache-Control"] = "no-store"
-    response.headers["ETag"] = _etag_wallet(w)
-    return CoinWalletResponse.model_validate(w, from_attributes=True) if hasattr(CoinWalletResponse, "model_validate") else CoinWalletResponse.model_validate(w)  # type: ignore
+    return _wallet_out(db, w, response)
 
 # ============================== TRANSACTIONS (me) ==============================
 @router.get(
@@ -369,6 +338,8 @@ def list_my_transactions(
     offset: int = Query(0, ge=0),
     type_eq: Optional[str] = Query(None, description="deposit/withdraw"),
     order: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor ya ukurasa uliopita (badala ya offset)"),
+    total_mode: str = Query("exact", regex=TOTAL_MODE_PATTERN, description="exact|estimate|none"),
 ):
     if not LedgerModel:
         raise HTTPException(status_code=501, detail="Ledger not available")
@@ -381,14 +352,14 @@ def list_my_transactions(
     if type_eq:
         q = q.filter(LedgerModel.type == type_eq)
 
-    q = q.order_by(LedgerModel.id.asc() if order == "asc" else LedgerModel.id.desc())
-    total = q.count()
-    rows = q.offset(offset).limit(limit).all()
+    page = paginate(
+        db, q, [LedgerModel.id],
+        limit=limit, desc=(order != "asc"), cursor=cursor, offset=offset, total=total_mode,
+    )
+    rows = page.items
 
     response.headers["Cache-Control"] = "no-store"
-    response.headers["X-Total-Count"] = str(total)
-    response.headers["X-Limit"] = str(limit)
-    response.headers["X-Offset"] = str(offset)
+    set_page_headers(response, page, limit=limit, offset=offset)
 
     # Pydantic v1/v2
     out: List[Any] = []
@@ -13,6 +13,8 @@ from fastapi import (
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
+
 # ---- DB session ----
 try:
     from backend.db import get_db  # preferred
@@ -75,10 +77,10 @@ MAX_LIMIT = 200
 DEFAULT_LIMIT = 50
 ALLOWED_ORDER = ("asc", "desc")
 
-_RATE_USER: Dict[int, List[float]] = {}
-_RATE_VIDEO: Dict[tuple[int, int], List[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}
 _IDEMP_TTL = 10 * 60  # seconds
+_USER_LIMIT = RateLimiter("comment_user", RATE_PER_MIN, 60.0)
+_VIDEO_LIMIT = RateLimiter("comment_video", RATE_PER_VIDEO_PER_MIN, 60.0)
+_IDEMP = IdempotencyKeys("comment", _IDEMP_TTL)
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
@@ -89,34 +91,16 @@ def _clamp_limit(v: Optional[int]) -> int:
     return max(1, min(int(v), MAX_LIMIT))
 
 def _rate_ok(user_id: int, video_post_id: Optional[int]) -> None:
-    now = time.time()
-    q = _RATE_USER.setdefault(user_id, [])
-    while q and (now - q[0]) > 60.0:
-        q.pop(0)
-    if len(q) >= RATE_PER_MIN:
+    if not _USER_LIMIT.allow(user_id):
         raise HTTPException(status_code=429, detail="Too many comments this minute")
-    q.append(now)
-
-    if video_post_id is not None:
-        key = (user_id, int(video_post_id))
-        vq = _RATE_VIDEO.setdefault(key, [])
-        while vq and (now - vq[0]) > 60.0:
-            vq.pop(0)
-        if len(vq) >= RATE_PER_VIDEO_PER_MIN:
-            raise HTTPException(status_code=429, detail="Slow down on this video")
-        vq.append(now)
+    if video_post_id is not None and not _VIDEO_LIMIT.allow((user_id, int(video_post_id))):
+        raise HTTPException(status_code=429, detail="Slow down on this video")
 
 def _idempotency_check(uid: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = time.time()
-    stale = [(k_uid, k) for (k_uid, k), ts in _IDEMP.items() if now - ts > _IDEMP_TTL]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (uid, key.strip())
-    if token in _IDEMP:
+    if not _IDEMP.claim((uid, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 def _validate_text(t: str) -> str:
     txt = (t or "").strip()
@@ -15,6 +15,8 @@ from fastapi import (
 from pydantic import BaseModel, Field, condecimal, constr
 from starlette.concurrency import run_in_threadpool
 
+from backend.utils.rate_limit import IdempotencyKeys, RateLimiter
+
 # -------- Auth (require login). Badilisha kama una require_plan([...]) --------
 try:
     from backend.auth import get_current_user
@@ -79,36 +81,23 @@ RATE_PER_MIN = int(os.getenv("CREATOR_RATE_PER_MIN", "12"))
 REQUEST_TIMEOUT_SEC = int(os.getenv("CREATOR_TIMEOUT_SEC", "60"))
 IDEMP_TTL_SEC = int(os.getenv("CREATOR_IDEMP_TTL_SEC", "900"))  # 15m
 
-# in-memory guards (badilisha kwa Redis ikibidi)
-_RATE: Dict[int, List[float]] = {}
-_IDEMP: Dict[tuple[int, str], float] = {}
+# guards za pamoja (utils.rate_limit; Redis kwa RATE_LIMIT_BACKEND=redis)
+_LIMIT = RateLimiter("creator", RATE_PER_MIN, 60.0)
+_IDEMP = IdempotencyKeys("creator", IDEMP_TTL_SEC)
 _LOCKS: Dict[int, asyncio.Lock] = {}
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
-def _rate_ok(user_id: int) -> None:
-    now = asyncio.get_event_loop().time()
-    bucket = _RATE.setdefault(user_id, [])
-    # safisha >60s
-    while bucket and (now - bucket[0]) > 60.0:
-        bucket.pop(0)
-    if len(bucket) >= RATE_PER_MIN:
+async def _rate_ok(user_id: int) -> None:
+    if not (await _LIMIT.ahit(user_id)).allowed:
         raise HTTPException(status_code=429, detail="Too many requests this minute")
-    bucket.append(now)
 
-def _idempotency_check(user_id: int, key: Optional[str]) -> None:
+async def _idempotency_check(user_id: int, key: Optional[str]) -> None:
     if not key:
         return
-    now = asyncio.get_event_loop().time()
-    # cleanup
-    stale = [(uid, k) for (uid, k), ts in list(_IDEMP.items()) if (now - ts) > IDEMP_TTL_SEC]
-    for s in stale:
-        _IDEMP.pop(s, None)
-    token = (user_id, key.strip())
-    if token in _IDEMP:
+    if not await _IDEMP.aclaim((user_id, key.strip())):
         raise HTTPException(status_code=409, detail="Duplicate request (Idempotency-Key)")
-    _IDEMP[token] = now
 
 def _etag(payload: Dict[str, Any]) -> str:
     raw = repr(payload).encode("utf-8")
@@ -150,8 +139,8 @@ async def generate_feature(
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     # Guards
-    _rate_ok(user_id)
-    _idempotency_check(user_id, idempotency_key)
+    await _rate_ok(user_id)
+    await _idempotency_check(user_id, idempotency_key)
 
     # Basic normalization
     prompt = data.prompt.strip()
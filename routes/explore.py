@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from backend.db import get_db
+from backend.utils.pagination import TOTAL_MODE_PATTERN, paginate, set_page_headers
 
 # ==================== Schemas ====================
 # Jaribu kutumia schema halisi; ukikosa, tumia fallback hapa chini.
@@ -51,6 +52,8 @@ try:
 except Exception as e:
     raise RuntimeError("?? Missing model: backend.models.LiveStream") from e
 
+from backend.services.trending_index import hybrid_score as _index_hybrid_score, trending_index
+
 router = APIRouter(prefix="/explore", tags=["Explore"])
 
 # ===================== Helpers =====================
@@ -119,6 +122,8 @@ def get_featured_streams(
     # paging
     limit: int = Query(30, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor ya ukurasa uliopita (badala ya offset)"),
+    total_mode: str = Query("exact", pattern=TOTAL_MODE_PATTERN, description="exact|estimate|none"),
     # caching
     if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
 ):
@@ -136,12 +141,11 @@ def get_featured_streams(
         since=since,
     )
 
-    # Order: most recent featured first (fallback to id)
-    order_col = getattr(LiveStream, "started_at", getattr(LiveStream, "id"))
-    q = q.order_by(order_col.desc())
-
-    total = q.count()
-    rows = q.offset(offset).limit(limit).all()
+    # Order: most recent featured first (fallback to id); id = tie-breaker ya keyset
+    started = getattr(LiveStream, "started_at", None)
+    cols = [started, LiveStream.id] if started is not None else [LiveStream.id]
+    page = paginate(db, q, cols, limit=limit, desc=True, cursor=cursor, offset=offset, total=total_mode)
+    rows = page.items
 
     etag = _etag_from_rows(rows)
     if if_none_match and if_none_match == etag:
@@ -149,61 +153,24 @@ def get_featured_streams(
 
     response.headers["ETag"] = etag
     response.headers["Cache-Control"] = "public, max-age=20"
-    response.headers["X-Total-Count"] = str(total)
-    response.headers["X-Limit"] = str(limit)
-    response.headers["X-Offset"] = str(offset)
+    set_page_headers(response, page, limit=limit, offset=offset)
 
     return _serialize_many(rows)
 
 # ===================== Trending =====================
+
 def _hybrid_score(v: int, g: int, started_at: Optional[datetime]) -> float:
     """
     Hybrid scoring:
       score = (viewers*10 + gifts*3) * decay(hours_since_start)
       decay(t) = 0.8 ** t
     """
-    v = max(0, v or 0)
-    g = max(0, g or 0)
-    age_h = 0.0
-    if started_at:
-        age_h = max(0.0, (_utcnow() - started_at).total_seconds() / 3600.0)
-    base = v * 10.0 + g * 3.0
-    return base * (0.8 ** age_h)
+    return _index_hybrid_score(v, g, started_at, _utcnow())
 
-@router.get(
-    "/trending",
-    response_model=List[LiveStreamExploreOut],
-    summary="Trending live streams (hybrid algorithm + filters + pagination + ETag/304)"
-)
-def get_trending_streams(
-    response: Response,
-    db: Session = Depends(get_db),
-    # filters
-    language: Optional[str] = Query(None),
-    category: Optional[str] = Query(None),
-    country: Optional[str] = Query(None),
-    min_viewers: Optional[int] = Query(1, ge=0),
-    since: Optional[datetime] = Query(None),
-    # algo
-    algo: str = Query("hybrid", description="hybrid|viewers|gifts|recent"),
-    pool: int = Query(400, ge=50, le=2000, description="Candidate pool before scoring"),
-    # paging
-    limit: int = Query(20, ge=1, le=200),
-    offset: int = Query(0, ge=0),
-    # caching
-    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
-):
+def _trending_from_db(db: Session, *, algo: str, pool: int, limit: int, offset: int, **filters):
+    """Njia ya zamani (SQL + scoring ya Python) — hutumika index ikiwa haipo/imechakaa."""
     # 1) Candidate query (cheap ordering to pull a good pool)
-    q = db.query(LiveStream)
-    q = _apply_common_filters(
-        q,
-        is_live=True,
-        language=language,
-        category=category,
-        country=country,
-        min_viewers=min_viewers,
-        since=since,
-    )
+    q = _apply_common_filters(db.query(LiveStream), is_live=True, **filters)
 
     # cheap pre-sort to capture likely trending candidates
     viewers = getattr(LiveStream, "viewers_count", None)
@@ -234,9 +201,9 @@ def get_trending_streams(
         if algo == "gifts":
             return float(getattr(r, "gifts_count", 0) or 0)
         if algo == "recent":
+            # more recent → higher
             st = getattr(r, "started_at", None)
-            # more recent ? higher (use negative ts for ascending sort)
-            return -(_best_ts(r).timestamp()) if st else 0.0
+            return st.timestamp() if st else 0.0
         # hybrid
         return _hybrid_score(
             getattr(r, "viewers_count", 0) or 0,
@@ -250,8 +217,58 @@ def get_trending_streams(
         key=lambda r: (score_row(r), getattr(r, "id", 0)),
         reverse=True,
     )
+    return cand_sorted[offset: offset + limit], total
 
-    rows = cand_sorted[offset: offset + limit]
+@router.get(
+    "/trending",
+    response_model=List[LiveStreamExploreOut],
+    summary="Trending live streams (hybrid algorithm + filters + pagination + ETag/304)"
+)
+def get_trending_streams(
+    response: Response,
+    db: Session = Depends(get_db),
+    # filters
+    language: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    country: Optional[str] = Query(None),
+    min_viewers: Optional[int] = Query(1, ge=0),
+    since: Optional[datetime] = Query(None),
+    # algo
+    algo: str = Query("hybrid", description="hybrid|viewers|gifts|recent"),
+    pool: int = Query(400, ge=50, le=2000, description="Candidate pool before scoring (SQL fallback only)"),
+    # paging
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    # caching
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
+    snap = trending_index.snapshot()
+    if snap is not None:
+        # Index iliyopangwa mapema: slice tu (scores zote za live, si pool pekee)
+        ranked = snap.view(algo, language=language, category=category, country=country, min_viewers=min_viewers)
+        if since is not None:
+            cut = since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+            ranked = [
+                r for r in ranked
+                if getattr(r, "started_at", None) is not None
+                and (r.started_at if r.started_at.tzinfo else r.started_at.replace(tzinfo=timezone.utc)) >= cut
+            ]
+        total = len(ranked)
+        rows = ranked[offset: offset + limit]
+        response.headers["X-Trending-Version"] = str(snap.version)
+    else:
+        rows, total = _trending_from_db(
+            db,
+            algo=algo,
+            pool=pool,
+            limit=limit,
+            offset=offset,
+            language=language,
+            category=category,
+            country=country,
+            min_viewers=min_viewers,
+            since=since,
+        )
 
     etag = _etag_from_rows(rows)
     if if_none_match and if_none_match == etag:
@@ -263,4 +280,4 @@ def get_trending_streams(
     response.headers["X-Limit"] = str(limit)
     response.headers["X-Offset"] = str(offset)
 
-    return _serialize_many(rows)
\ No newline at end of file
+    return _serialize_many(rows)
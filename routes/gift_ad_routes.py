@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
+import logging
 from typing import List, Optional
 
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
@@ -16,6 +18,9 @@ from backend.schemas.gift_ad import (
 from backend.crud import gift_ad_crud
 from backend.models.gift_transaction import GiftTransaction
 from backend.models.ad_earning import AdEarning
+from backend.services.gift_leaderboard import leaderboard
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/smartcoin",
@@ -33,6 +38,20 @@ def _force_sender(payload: GiftTransactionCreate, user_id: int) -> GiftTransacti
         return payload.copy(update={"sender_id": user_id})
 
 
+def _feed_leaderboard(tx) -> None:
+    """Gift ya stream isiyo na movement iingie leaderboard (sawa na gift_values() ya rebuild)."""
+    stream_id = getattr(tx, "stream_id", None)
+    if stream_id is None or getattr(tx, "movement_id", None) is not None:
+        return
+    try:
+        from_thread.run(
+            leaderboard.publish_gift, stream_id, tx.sender_id,
+            tx.total_coins or 0, getattr(tx, "created_at", None),
+        )
+    except Exception as e:
+        log.warning("leaderboard feed failed for gift tx %s: %s", getattr(tx, "id", None), e)
+
+
 # -------- Endpoints --------
 @router.post("/send-gift", response_model=GiftTransactionOut, status_code=status.HTTP_201_CREATED)
 def send_gift(
@@ -59,13 +78,13 @@ def send_gift(
     try:
         # Support idempotency without breaking older CRUD signatures
         try:
-            return gift_ad_crud.send_gift_and_credit(db, gift, idempotency_key=idempotency_key)
+            tx = gift_ad_crud.send_gift_and_credit(db, gift, idempotency_key=idempotency_key)
         except TypeError:
             # Fallback if CRUD has not been updated for idempotency_key
             if idempotency_key:
                 # If your DB has a unique index on (idempotency_key), this will raise IntegrityError on dup
                 pass
-            return gift_ad_crud.send_gift_and_credit(db, gift)
+            tx = gift_ad_crud.send_gift_and_credit(db, gift)
     except IntegrityError as ie:
         db.rollback()
         # Heuristic: if DB constraint for idempotency triggers
@@ -77,6 +96,9 @@ def send_gift(
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to send gift") from exc
 
+    _feed_leaderboard(tx)
+    return tx
+
 
 @router.post("/credit-ad", response_model=AdEarningOut)
 def credit_ad_earning(
@@ -2,108 +2,78 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 from datetime import datetime, timezone
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 from fastapi import (
     APIRouter, Depends, HTTPException, Header, Query, status, WebSocket
 )
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 from starlette.concurrency import run_in_threadpool
 
 from backend.db import get_db
 from backend.auth import get_current_user
+from backend.dependencies import check_admin
 from backend.models.user import User
-from backend.models.gift_fly import GiftFly
+from backend.models.gift_fly import GiftFly, normalize_row
 from backend.schemas.gift_fly_schemas import GiftFlyCreate, GiftFlyOut
+from backend.services.gift_ingest import ComboTracker, DuplicateGift, GiftIngestor, Ingested, InvalidGift
+from backend.services.gift_leaderboard import leaderboard
+from backend.services.gift_prices import prices
 from backend.utils.websocket_manager import WebSocketManager
 
 router = APIRouter(prefix="/gift-fly", tags=["Gift Fly"])
 manager = WebSocketManager()  # shared hub for this module
 
 # ===== Config =====
-COMBO_WINDOW_SECONDS: float = 2.0  # repeat same gift within this window => combo++
 MAX_GIFT_NAME_LEN: int = 120
 NOW = lambda: datetime.now(timezone.utc)
 
 # ===== Helpers =====
-async def _db_commit_refresh(db: Session, instance) -> None:
-    """
-    Commit + refresh without blocking the event loop.
-    We run the blocking DB calls in a threadpool.
-    """
-    try:
-        await run_in_threadpool(db.commit)
-    except Exception:
-        await run_in_threadpool(db.rollback)
-        raise
-    await run_in_threadpool(db.refresh, instance)
-
-async def _create_gift_fly(
-    db: Session,
-    *,
-    stream_id: int,
-    user_id: int,
-    gift_name: str,
-    idempotency_key: Optional[str],
-    combo_count: Optional[int],
-) -> GiftFly:
-    """Create and commit a GiftFly row (optionally using extra columns if present)."""
-    def _sync_create() -> GiftFly:
-        kwargs = dict(
-            stream_id=stream_id,
-            user_id=user_id,
-            gift_name=gift_name,
-            sent_at=NOW(),
-        )
-        # Optional fields only if your model defines them
-        if hasattr(GiftFly, "idempotency_key") and idempotency_key:
-            kwargs["idempotency_key"] = idempotency_key
-        if hasattr(GiftFly, "combo_count") and combo_count is not None:
-            kwargs["combo_count"] = combo_count
-
-        obj = GiftFly(**kwargs)
-        db.add(obj)
-        return obj
-
-    obj = await run_in_threadpool(_sync_create)
-    await _db_commit_refresh(db, obj)
-    return obj
-
 def _iso(ts: datetime) -> str:
     """Return an ISO-8601 UTC timestamp with 'Z' suffix."""
     if ts.tzinfo is None:
         ts = ts.replace(tzinfo=timezone.utc)
     return ts.isoformat().replace("+00:00", "Z")
 
-async def _get_last_user_gift(db: Session, stream_id: int, user_id: int) -> Optional[GiftFly]:
-    """Fetch the most recent gift by this user on this stream."""
-    def _sync_get():
-        return (
-            db.query(GiftFly)
-            .filter(GiftFly.stream_id == stream_id, GiftFly.user_id == user_id)
-            .order_by(GiftFly.sent_at.desc())
-            .first()
-        )
-    return await run_in_threadpool(_sync_get)
+def _payload(g: Ingested) -> dict:
+    r = g.row
+    return {
+        "type": "gift_fly",
+        "event_id": g.id,
+        "stream_id": r["stream_id"],
+        "user_id": r["user_id"],
+        "gift_name": r["gift_name"],
+        "combo_count": r["meta"]["combo"],
+        "timestamp": _iso(r["created_at"]),
+    }
+
+def _batch_room(stream_id: int) -> str:
+    """Room of sockets that joined with ?batch=1."""
+    return f"{stream_id}:batch"
 
-def _calc_combo(prev: Optional[GiftFly], gift_name: str) -> int:
+async def _broadcast_batch(batch: List[Ingested]) -> None:
     """
-    If the same gift is sent again within COMBO_WINDOW_SECONDS, increment combo.
-    Otherwise, start at 1.
+    After each committed batch: the stream room gets the usual one `gift_fly`
+    frame per gift; sockets that opted in (?batch=1) get a single
+    `gift_fly_batch` frame per stream with `events`.
     """
-    if not prev or prev.gift_name != gift_name:
-        return 1
-    prev_ts = prev.sent_at.replace(tzinfo=prev.sent_at.tzinfo or timezone.utc)
-    delta = (NOW() - prev_ts).total_seconds()
-    base = getattr(prev, "combo_count", 1)
-    return base + 1 if delta <= COMBO_WINDOW_SECONDS else 1
+    by_stream: Dict[int, List[dict]] = {}
+    for g in batch:
+        r = g.row
+        await leaderboard.publish_gift(r["stream_id"], r["user_id"], r["unit_value"] * r["quantity"], r["created_at"])
+        by_stream.setdefault(r["stream_id"], []).append(_payload(g))
+    for stream_id, events in by_stream.items():
+        for msg in events:
+            await manager.broadcast(stream_id, msg)
+        await manager.broadcast(_batch_room(stream_id), {"type": "gift_fly_batch", "stream_id": stream_id, "events": events})
+
+combos = ComboTracker()
+ingestor = GiftIngestor(GiftFly, on_commit=_broadcast_batch, combos=combos, normalize=normalize_row)
 
 # ===== HTTP Endpoints =====
 @router.post("/", response_model=GiftFlyOut, status_code=status.HTTP_201_CREATED)
 async def send_gift(
     data: GiftFlyCreate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
@@ -114,8 +84,13 @@ async def send_gift(
     - `user_id` is taken from the authenticated session (client-provided value is ignored).
 
     Functionality:
-    - Combo counting: increments `combo_count` when the same gift repeats quickly.
-    - Idempotency (optional): use `Idempotency-Key` header if your model has that column.
+    - Combo counting: increments `combo_count` when the same gift repeats quickly
+      (in-memory per stream/user, see services.gift_ingest.ComboTracker).
+    - Value: `unit_value` comes from the gift catalog (services.gift_prices) and
+      feeds the gift leaderboard once committed.
+    - Group commit: the row is written together with other gifts arriving in the
+      same few milliseconds; the response is sent once that commit succeeds.
+    - Idempotency (optional): use `Idempotency-Key` header.
     """
     user_id = int(current_user.id)
     stream_id = int(data.stream_id)
@@ -128,39 +103,39 @@ async def send_gift(
 
     # TODO: optionally check stream permissions/visibility for this user.
 
-    last_gift = await _get_last_user_gift(db, stream_id, user_id)
-    combo_count = _calc_combo(last_gift, gift_name)
-
+    unit = await prices.coins_for(gift_name)
+    now = NOW()
+    row = {
+        "stream_id": stream_id,
+        "user_id": user_id,
+        "gift_name": gift_name,
+        "unit_value": unit,
+        "quantity": 1,
+        "meta": {},  # combo: writer huiweka (ComboTracker) kabla ya INSERT
+        "idempotency_key": idempotency_key or None,
+        "created_at": now,
+        "updated_at": now,
+    }
     try:
-        new_gift = await _create_gift_fly(
-            db=db,
-            stream_id=stream_id,
-            user_id=user_id,
-            gift_name=gift_name,
-            idempotency_key=idempotency_key,
-            combo_count=combo_count,
-        )
-    except IntegrityError as ie:
+        new_gift = await ingestor.submit(row)
+    except DuplicateGift as ie:
         # Likely a unique violation on idempotency_key
         raise HTTPException(status_code=409, detail="Duplicate request (idempotency)") from ie
-    except HTTPException:
-        raise
+    except InvalidGift as ie:
+        # CHECK/FK violation (e.g. ck_gfe_name_len): bad input, not a duplicate
+        raise HTTPException(status_code=422, detail="Gift rejected by validation constraints") from ie
     except Exception as exc:
         raise HTTPException(status_code=500, detail="Failed to create gift event") from exc
 
-    # Broadcast real-time event to all sockets in this stream room
-    payload = {
-        "type": "gift_fly",
-        "event_id": getattr(new_gift, "id", None),
-        "stream_id": stream_id,
-        "user_id": user_id,
-        "gift_name": gift_name,
-        "combo_count": getattr(new_gift, "combo_count", combo_count),
-        "timestamp": _iso(new_gift.sent_at),
-    }
-    await manager.broadcast(stream_id, payload)
+    r = new_gift.row
+    return GiftFlyOut(
+        id=new_gift.id, stream_id=stream_id, user_id=user_id, gift_name=r["gift_name"],
+        sent_at=now, combo_count=r["meta"]["combo"],
+    )
 
-    return new_gift
+@router.get("/stats", summary="Gift ingestion stats (batches, rows, commit time)")
+async def ingest_stats(_admin: User = Depends(check_admin)):
+    return {**ingestor.snapshot(), "combo_keys": len(combos)}
 
 @router.get("/stream/{stream_id}/recent", response_model=List[GiftFlyOut])
 async def recent_gifts(
@@ -182,12 +157,18 @@ async def recent_gifts(
 
 # ===== WebSocket Endpoint =====
 @router.websocket("/ws/{stream_id}")
-async def ws_endpoint(websocket: WebSocket, stream_id: int):
+async def ws_endpoint(
+    websocket: WebSocket,
+    stream_id: int,
+    batch: bool = Query(False, description="One `gift_fly_batch` frame per committed batch instead of one frame per gift"),
+):
     """
     Minimal WebSocket room for the given stream_id.
+    Query `batch=1` opts into `gift_fly_batch` frames; other clients are unchanged.
     In production, you should authenticate the connection (e.g., token in query/header).
     """
-    await manager.connect(stream_id, websocket)
+    room = _batch_room(stream_id) if batch else stream_id
+    await manager.connect(room, websocket)
     try:
         while True:
             # Keep the socket alive. If you expect client messages, handle them here.
@@ -197,4 +178,4 @@ async def ws_endpoint(websocket: WebSocket, stream_id: int):
         # Socket closed or errored; fall through to cleanup.
         pass
     finally:
-        await manager.disconnect(stream_id, websocket)
+        await manager.disconnect(room, websocket)
@@ -3,16 +3,19 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import List, Optional, Any, Dict
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, WebSocket, status
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 from starlette.concurrency import run_in_threadpool
 
 from backend.db import get_db
 from backend.auth import get_current_user
+from backend.dependencies import check_admin
 from backend.models.user import User
-from backend.models.gift_movement import GiftMovement
+from backend.models.gift_movement import GiftMovement, normalize_row
 from backend.schemas.gift_movement_schemas import GiftMovementCreate
+from backend.services.gift_ingest import DuplicateGift, GiftIngestor, Ingested, InvalidGift
+from backend.services.gift_leaderboard import leaderboard
+from backend.services.gift_prices import prices
 from backend.utils.websocket_manager import WebSocketManager
 
 router = APIRouter(prefix="/gift-movements", tags=["Gift Movements"])
@@ -22,15 +25,6 @@ NOW = lambda: datetime.now(timezone.utc)
 
 
 # ---------- Helpers ----------
-async def _commit_refresh(db: Session, instance):
-    try:
-        await run_in_threadpool(db.commit)
-    except Exception:
-        await run_in_threadpool(db.rollback)
-        raise
-    await run_in_threadpool(db.refresh, instance)
-
-
 def _iso(ts: datetime) -> str:
     if ts.tzinfo is None:
         ts = ts.replace(tzinfo=timezone.utc)
@@ -46,61 +40,115 @@ def _asdict_safe(model) -> Dict[str, Any]:
     return out
 
 
+def _batch_room(stream_id: Any) -> str:
+    """Room ya sockets zilizojiunga na ?batch=1."""
+    return f"{stream_id}:batch"
+
+
+async def _after_commit(batch: List[Ingested]) -> None:
+    """
+    Leaderboard + broadcast kwa batch iliyokwisha commit: room ya stream hupata
+    `gift_movement` moja kwa kila gift (kama zamani); sockets za ?batch=1 hupata
+    `gift_movement_batch` moja kwa stream.
+    """
+    by_stream: Dict[int, List[Dict[str, Any]]] = {}
+    for g in batch:
+        r = g.row
+        await leaderboard.publish_gift(r["stream_id"], r["sender_id"], r["amount"], r["created_at"])
+        by_stream.setdefault(r["stream_id"], []).append({
+            "type": "gift_movement",
+            "movement": {
+                "id": g.id,
+                "stream_id": r["stream_id"],
+                "user_id": r["sender_id"],
+                "gift_name": r["meta"]["gift_name"],
+                "sent_at": _iso(r["created_at"]),
+            },
+            "data": r["meta"]["request"],
+        })
+    for stream_id, events in by_stream.items():
+        for msg in events:
+            await manager.broadcast(str(stream_id), msg)
+        await manager.broadcast(
+            _batch_room(stream_id), {"type": "gift_movement_batch", "stream_id": stream_id, "events": events}
+        )
+
+
+ingestor = GiftIngestor(GiftMovement, on_commit=_after_commit, normalize=normalize_row)
+
+
 # ---------- Endpoints ----------
 @router.post("/send", status_code=status.HTTP_201_CREATED)
 async def send_gift(
     data: GiftMovementCreate,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
     """
     Tuma tukio la *gift movement* kwa stream.
-    - **Security**: Ikiwa `GiftMovement` ina `user_id`, tunalazimisha kutoka `current_user`.
-    - **UTC timestamps**: `sent_at` ni TZ-aware (ISO8601 kwa clients).
-    - **Idempotency (optional)**: tumia `Idempotency-Key` (weka unique index kwenye DB).
-    - **Non-blocking**: DB ops zinaenda threadpool; WebSocket ni async.
+    - **Security**: `sender_id` hulazimishwa kutoka `current_user`.
+    - **UTC timestamps**: `created_at` ni TZ-aware (ISO8601 kwa clients).
+    - **Idempotency (optional)**: tumia `Idempotency-Key` (unique index kwenye DB).
+    - **Thamani**: `unit_coins` hutoka catalog ya gifts (services.gift_prices)
+      na huingia leaderboard baada ya commit.
+    - **Group commit**: row huandikwa pamoja na gifts nyingine za milliseconds
+      hizo hizo (services.gift_ingest); jibu hurudi baada ya commit hiyo.
     """
     if getattr(data, "stream_id", None) in (None, 0):
         raise HTTPException(status_code=422, detail="stream_id is required")
 
     payload = data.dict()
-
-    # Force user_id kutoka session endapo column ipo
-    if hasattr(GiftMovement, "user_id"):
-        payload["user_id"] = current_user.id
-
-    # Timestamps TZ-aware
-    payload["sent_at"] = NOW()
-
-    # Idempotency optional
-    if hasattr(GiftMovement, "idempotency_key") and idempotency_key:
-        payload["idempotency_key"] = idempotency_key
-
-    # Unda na hifadhi
+    gift_name = " ".join(str(payload.get("gift_name") or "").split())
+    unit = await prices.coins_for(gift_name)
+    now = NOW()
+    row = {
+        "stream_id": int(data.stream_id),
+        "sender_id": current_user.id,
+        "gift_code": gift_name[:50] or None,
+        "unit_coins": unit,
+        "quantity": 1,  # amount: normalize_row (sheria za before_insert)
+        "meta": {"gift_name": gift_name, "request": payload},
+        "idempotency_key": idempotency_key or None,
+        "created_at": now,
+        "updated_at": now,
+    }
     try:
-        movement = GiftMovement(**payload)
-        db.add(movement)
-        await _commit_refresh(db, movement)
-    except IntegrityError as ie:
+        movement = await ingestor.submit(row)
+    except DuplicateGift as ie:
         # Mfano: UNIQUE (idempotency_key) ikigonga duplicate request
         raise HTTPException(status_code=409, detail="Duplicate request (idempotency)") from ie
+    except InvalidGift as ie:
+        raise HTTPException(status_code=422, detail="Gift rejected by validation constraints") from ie
     except Exception as exc:
         raise HTTPException(status_code=500, detail="Failed to create gift movement") from exc
 
-    # Tuma broadcast kwa room ya stream
-    broadcast = {
-        "type": "gift_movement",
-        "movement": {
-            **_asdict_safe(movement),
-            "sent_at": _iso(movement.sent_at),
-        },
-        # Optional: rudisha pia fields zingine kutoka request (mf. path/coords) bila kuvuruga schema
-        "data": data.dict(),
-    }
-    await manager.broadcast(str(getattr(movement, "stream_id", data.stream_id)), broadcast)
+    return {"message": "Gift sent", "movement_id": movement.id}
+
+
+@router.get("/stats", summary="Takwimu za ingestion (batches, rows, commit time)")
+async def ingest_stats(_admin: User = Depends(check_admin)):
+    return ingestor.snapshot()
 
-    return {"message": "Gift sent", "movement_id": getattr(movement, "id", None)}
+
+@router.websocket("/ws/{stream_id}")
+async def ws_endpoint(
+    websocket: WebSocket,
+    stream_id: int,
+    batch: bool = Query(False, description="Frame moja `gift_movement_batch` kwa kila batch badala ya frame kwa kila gift"),
+):
+    """
+    Room ya WebSocket ya gift movements za stream. Query `batch=1` = frames za
+    `gift_movement_batch`; clients wengine hupata `gift_movement` kama kawaida.
+    """
+    room = _batch_room(stream_id) if batch else str(stream_id)
+    await manager.connect(room, websocket)
+    try:
+        while True:
+            await websocket.receive_text()
+    except Exception:
+        pass
+    finally:
+        await manager.disconnect(room, websocket)
 
 
 @router.get("/stream/{stream_id}")
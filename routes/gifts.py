@@ -2,7 +2,7 @@
 from __future__ import annotations
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import and_
@@ -13,6 +13,7 @@ from backend.models.user import User
 from backend.schemas.gift import GiftCreate, GiftOut
 from backend.models.gift import Gift
 from backend.crud import gift_crud
+from backend.utils.pagination import TOTAL_MODE_PATTERN, paginate, set_page_headers
 
 router = APIRouter(prefix="/gifts", tags=["Gifts"])
 
@@ -23,6 +24,41 @@ def _normalize_name(name: str) -> str:
 def _is_admin(user: User) -> bool:
     return getattr(user, "role", None) in {"admin", "owner"}
 
+def _filtered_gifts(
+    db: Session,
+    q: Optional[str],
+    is_active: Optional[bool],
+    tier: Optional[int],
+    min_price: Optional[float],
+    max_price: Optional[float],
+):
+    qset = db.query(Gift)
+    if q:
+        qset = qset.filter(Gift.name.ilike(f"%{q.strip()}%"))
+
+    conds = []
+    if is_active is not None and hasattr(Gift, "is_active"):
+        conds.append(Gift.is_active == is_active)
+    if tier is not None and hasattr(Gift, "tier"):
+        conds.append(Gift.tier == tier)
+    if min_price is not None and hasattr(Gift, "price"):
+        conds.append(Gift.price >= min_price)
+    if max_price is not None and hasattr(Gift, "price"):
+        conds.append(Gift.price <= max_price)
+    if conds:
+        qset = qset.filter(and_(*conds))
+    return qset
+
+def _order_cols(order: str) -> list:
+    """Sort column + Gift.id (tie-breaker ya keyset)."""
+    colmap = {
+        "created_at": getattr(Gift, "created_at", None),
+        "price": getattr(Gift, "price", None),
+        "name": getattr(Gift, "name", None),
+    }
+    col = colmap.get(order, getattr(Gift, "created_at", None))
+    return [col, Gift.id] if col is not None else [Gift.id]
+
 # ---------- Create ----------
 @router.post("/", response_model=GiftOut, status_code=status.HTTP_201_CREATED)
 def create_gift(
@@ -89,6 +125,7 @@ def create_gift(
 # ---------- List (legacy: returns List[GiftOut]) ----------
 @router.get("/", response_model=List[GiftOut])
 def list_gifts(
+    response: Response,
     db: Session = Depends(get_db),
     q: Optional[str] = Query(None, description="Search by name (ILIKE)"),
     is_active: Optional[bool] = Query(None),
@@ -99,49 +136,33 @@ def list_gifts(
     sort: str = Query("desc", pattern="^(asc|desc)$"),
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor ya ukurasa uliopita (badala ya offset)"),
 ):
     """
     Orodha ya gifts (legacy response). Ina filters + pagination lakini inarudisha List tu bila meta.
     Fields zinazotumika kwa filters zinategemea columns kwenye model yako (Gift).
+    Ukurasa unaofuata: tuma `cursor` kutoka header `X-Next-Cursor`.
     """
-    qset = db.query(Gift)
-
-    if q:
-        like = f"%{q.strip()}%"
-        qset = qset.filter(Gift.name.ilike(like))
-
-    conds = []
-    if is_active is not None and hasattr(Gift, "is_active"):
-        conds.append(Gift.is_active == is_active)
-    if tier is not None and hasattr(Gift, "tier"):
-        conds.append(Gift.tier == tier)
-    if min_price is not None and hasattr(Gift, "price"):
-        conds.append(Gift.price >= min_price)
-    if max_price is not None and hasattr(Gift, "price"):
-        conds.append(Gift.price <= max_price)
-
-    if conds:
-        qset = qset.filter(and_(*conds))
-
-    # ordering
-    colmap = {
-        "created_at": getattr(Gift, "created_at", None),
-        "price": getattr(Gift, "price", None),
-        "name": getattr(Gift, "name", None),
-    }
-    col = colmap.get(order, getattr(Gift, "created_at", None))
-    if col is not None:
-        qset = qset.order_by(col.asc() if sort == "asc" else col.desc())
-
-    return qset.offset(offset).limit(limit).all()
+    page = paginate(
+        db,
+        _filtered_gifts(db, q, is_active, tier, min_price, max_price),
+        _order_cols(order),
+        limit=limit,
+        desc=(sort != "asc"),
+        cursor=cursor,
+        offset=offset,
+    )
+    set_page_headers(response, page, limit=limit, offset=offset)
+    return page.items
 
 # ---------- Page (new: items + meta) ----------
 from pydantic import BaseModel, Field
 
 class PageMeta(BaseModel):
-    total: int
+    total: Optional[int] = None
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 class GiftPage(BaseModel):
     items: List[GiftOut]
@@ -159,35 +180,24 @@ def list_gifts_page(
     sort: str = Query("desc", pattern="^(asc|desc)$"),
     limit: int = Query(30, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="meta.next_cursor ya ukurasa uliopita"),
+    total_mode: str = Query("exact", pattern=TOTAL_MODE_PATTERN, description="exact|estimate|none"),
 ):
     """
     Orodha ya gifts (paged) yenye `items + meta` — inafaa kwa mobile infinite scroll.
+    Tumia `meta.next_cursor` kwa ukurasa unaofuata (keyset; hakuna OFFSET ya kina).
     """
-    qset = db.query(Gift)
-
-    if q:
-        like = f"%{q.strip()}%"
-        qset = qset.filter(Gift.name.ilike(like))
-
-    if is_active is not None and hasattr(Gift, "is_active"):
-        qset = qset.filter(Gift.is_active == is_active)
-    if tier is not None and hasattr(Gift, "tier"):
-        qset = qset.filter(Gift.tier == tier)
-    if min_price is not None and hasattr(Gift, "price"):
-        qset = qset.filter(Gift.price >= min_price)
-    if max_price is not None and hasattr(Gift, "price"):
-        qset = qset.filter(Gift.price <= max_price)
-
-    total = qset.count()
-
-    colmap = {
-        "created_at": getattr(Gift, "created_at", None),
-        "price": getattr(Gift, "price", None),
-        "name": getattr(Gift, "name", None),
-    }
-    col = colmap.get(order, getattr(Gift, "created_at", None))
-    if col is not None:
-        qset = qset.order_by(col.asc() if sort == "asc" else col.desc())
-
-    items = qset.offset(offset).limit(limit).all()
-    return GiftPage(items=items, meta=PageMeta(total=total, limit=limit, offset=offset))
+    page = paginate(
+        db,
+        _filtered_gifts(db, q, is_active, tier, min_price, max_price),
+        _order_cols(order),
+        limit=limit,
+        desc=(sort != "asc"),
+        cursor=cursor,
+        offset=offset,
+        total=total_mode,
+    )
+    return GiftPage(
+        items=page.items,
+        meta=PageMeta(total=page.total, limit=limit, offset=offset, next_cursor=page.next_cursor),
+    )
@@ -13,7 +13,7 @@ from sqlalchemy.orm import Session
 from zoneinfo import ZoneInfo
 
 from backend.db import get_db
-from backend.models.gift_movement import GiftMovement
+from backend.services.gift_leaderboard import gift_values, leaderboard
 # If you gate access, uncomment:
 # from backend.auth import get_current_user
 # from backend.models.user import User
@@ -23,7 +23,7 @@ router = APIRouter(prefix="/leaderboard", tags=["Leaderboards"])
 # ---------- Schemas ----------
 class LeaderboardEntry(BaseModel):
     sender_id: int
-    total_value: Decimal = Field(..., description="Sum of GiftMovement.total_value in the period")
+    total_value: Decimal = Field(..., description="Sum of gift coin values (movements, fly-ins, transactions) in the period")
     gift_count: int = Field(..., description="Number of gifts by this sender in the period")
     rank: int = Field(..., description="1 = highest total")
 
@@ -77,6 +77,13 @@ def _rank_rows(rows: List[tuple]) -> List[LeaderboardEntry]:
         ranked.append(LeaderboardEntry(sender_id=sender_id, total_value=total_dec, gift_count=int(gift_count or 0), rank=rank))
     return ranked
 
+def _memory_entries(rows: List[tuple]) -> List[LeaderboardEntry]:
+    """rows kutoka leaderboard engine: (sender_id, total_value, gift_count, rank) — rank ni ya global."""
+    return [
+        LeaderboardEntry(sender_id=sid, total_value=total, gift_count=cnt, rank=rank)
+        for sid, total, cnt, rank in rows
+    ]
+
 def _query_period(
     db: Session,
     stream_id: int,
@@ -85,24 +92,26 @@ def _query_period(
     limit: int,
     offset: int,
 ):
-    sum_expr = func.coalesce(func.sum(GiftMovement.total_value), 0)
-    cnt_expr = func.count(GiftMovement.id)
+    gv = gift_values()
+    sum_expr = func.coalesce(func.sum(gv.c.value), 0)
+    cnt_expr = func.count()
 
     q = (
         db.query(
-            GiftMovement.sender_id,
+            gv.c.sender_id,
             sum_expr.label("total_value"),
             cnt_expr.label("gift_count"),
         )
         .filter(
             and_(
-                GiftMovement.stream_id == stream_id,
-                GiftMovement.sent_at >= start_utc,
-                GiftMovement.sent_at < end_utc,
+                gv.c.stream_id == stream_id,
+                gv.c.sender_id.is_not(None),
+                gv.c.ts >= start_utc,
+                gv.c.ts < end_utc,
             )
         )
-        .group_by(GiftMovement.sender_id)
-        .order_by(sum_expr.desc(), GiftMovement.sender_id.asc())
+        .group_by(gv.c.sender_id)
+        .order_by(sum_expr.desc(), gv.c.sender_id.asc())
         .offset(offset)
         .limit(limit)
     )
@@ -123,8 +132,12 @@ def daily_leaderboard(
     tzinfo = _parse_tz(tz)
     start_utc, end_utc = _day_bounds(tzinfo, date_override)
 
-    rows = _query_period(db, stream_id, start_utc, end_utc, limit, offset)
-    items = _rank_rows(rows)
+    day = date_override or datetime.now(tzinfo).date()
+    if leaderboard.covers(tz, day):
+        items = _memory_entries(leaderboard.daily(stream_id, day, limit, offset))
+    else:
+        rows = _query_period(db, stream_id, start_utc, end_utc, limit, offset)
+        items = _rank_rows(rows)
     return LeaderboardPage(
         items=items,
         period_start=start_utc,
@@ -146,8 +159,13 @@ def weekly_leaderboard(
     tzinfo = _parse_tz(tz)
     start_utc, end_utc = _rolling_days_bounds(tzinfo, days)
 
-    rows = _query_period(db, stream_id, start_utc, end_utc, limit, offset)
-    items = _rank_rows(rows)
+    first_day = datetime.now(tzinfo).date() - timedelta(days=days - 1)
+    if leaderboard.covers(tz, first_day):
+        # Muunganiko wa daily buckets (hakuna rescan ya gift_movements)
+        items = _memory_entries(leaderboard.rolling(stream_id, days, limit, offset))
+    else:
+        rows = _query_period(db, stream_id, start_utc, end_utc, limit, offset)
+        items = _rank_rows(rows)
     return LeaderboardPage(
         items=items,
         period_start=start_utc,
@@ -8,6 +8,10 @@ from typing import Dict, Set, Optional
 import anyio
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException
 
+from backend.utils.ws_broadcast import BroadcastReport, encode_message, fan_out
+from backend.utils.ws_outbox import OUTBOX_SIZE, Outbox, coalesce_key, outbox_metrics
+from backend.utils.ws_batcher import EventBatcher, build_frames
+
 router = APIRouter()
 
 # ---- Tunables (adjust for your scale) ----
@@ -25,50 +29,116 @@ class ConnectionManager:
     """
     Simple, room-based WebSocket manager with:
       - room membership
-      - safe broadcast (per-connection timeout)
+      - safe broadcast (encode-once, concurrent, per-connection timeout)
+      - per-connection bounded outbound queue (utils.ws_outbox) so a broadcast
+        only enqueues; slow phones are coalesced/dropped/evicted by policy
+      - opt-in batching (utils.ws_batcher): sockets that joined with ?batch=1
+        get one JSON array frame per tick with counts/likes/presence collapsed
       - presence counts
     """
-    def __init__(self) -> None:
+    def __init__(self, outbox_size: int = OUTBOX_SIZE) -> None:
         self.rooms: Dict[str, Set[WebSocket]] = {}
+        self.outbox_size = outbox_size
+        self.outboxes: Dict[WebSocket, Outbox] = {}
+        self.batched: Set[WebSocket] = set()
+        self.batcher = EventBatcher(self._flush_batch)
 
     async def accept(self, ws: WebSocket) -> None:
         await ws.accept()
 
-    def join(self, room_id: str, ws: WebSocket) -> None:
+    def join(self, room_id: str, ws: WebSocket, batch: bool = False) -> None:
         self.rooms.setdefault(room_id, set()).add(ws)
+        if batch:
+            self.batched.add(ws)
+        if self.outbox_size and ws not in self.outboxes:
+            self.outboxes[ws] = Outbox(
+                ws, maxsize=self.outbox_size, send_timeout=SEND_TIMEOUT_SEC, on_evict=self._on_evict
+            ).start()
 
     def leave(self, ws: WebSocket) -> None:
         # remove from all rooms safely
         for conns in self.rooms.values():
             if ws in conns:
                 conns.discard(ws)
+        self.batched.discard(ws)
+        ob = self.outboxes.pop(ws, None)
+        if ob is not None:
+            ob.close()
+
+    async def _on_evict(self, ws: WebSocket) -> None:
+        self.leave(ws)
 
     def count(self, room_id: str) -> int:
         return len(self.rooms.get(room_id, set()))
 
+    def queue_metrics(self) -> dict:
+        out = outbox_metrics(self.outboxes.values())
+        out["capacity"] = self.outbox_size
+        return out
+
     async def _safe_send_json(self, ws: WebSocket, payload: dict) -> bool:
+        ob = self.outboxes.get(ws)
+        if ob is not None:
+            return ob.offer(encode_message(payload), coalesce_key(payload))
         try:
             msg = json.dumps(payload, ensure_ascii=False)
-            async with anyio.fail_after(SEND_TIMEOUT_SEC):
+            with anyio.fail_after(SEND_TIMEOUT_SEC):
                 await ws.send_text(msg)
             return True
         except Exception:
             return False
 
-    async def broadcast_room(self, room_id: str, payload: dict, exclude: Optional[WebSocket] = None) -> None:
+    async def _flush_batch(self, room_id: str, items: list) -> None:
+        conns = [ws for ws in self.rooms.get(room_id, set()) if ws in self.batched]
+        dead: list[WebSocket] = []
+        for ws, text in build_frames(items, conns).items():
+            ob = self.outboxes.get(ws)
+            if ob is not None:
+                if not ob.offer(text) and ob.closed:
+                    dead.append(ws)
+                continue
+            try:
+                with anyio.fail_after(SEND_TIMEOUT_SEC):
+                    await ws.send_text(text)
+            except Exception:
+                dead.append(ws)
+        for ws in dead:
+            self.leave(ws)
+
+    async def broadcast_room(self, room_id: str, payload: dict, exclude: Optional[WebSocket] = None) -> BroadcastReport:
         conns = list(self.rooms.get(room_id, set()))
         if not conns:
-            return
-        # send sequentially with per-connection timeout; drop broken sockets
-        to_drop: list[WebSocket] = []
-        for ws in conns:
-            if exclude is not None and ws is exclude:
-                continue
-            ok = await self._safe_send_json(ws, payload)
-            if not ok:
-                to_drop.append(ws)
-        for ws in to_drop:
+            return BroadcastReport()
+        if self.batched:
+            # batched sockets get this event in the next tick's array frame
+            if any(ws in self.batched for ws in conns):
+                self.batcher.add(room_id, payload, exclude)
+                conns = [ws for ws in conns if ws not in self.batched]
+            if not conns:
+                return BroadcastReport()
+        if self.outbox_size:
+            # encode once, then O(1) enqueue per connection; writers drain at client speed
+            text, key = encode_message(payload), coalesce_key(payload)
+            report = BroadcastReport()
+            for ws in conns:
+                if exclude is not None and ws is exclude:
+                    continue
+                report.recipients += 1
+                ob = self.outboxes.get(ws)
+                if ob is not None and ob.offer(text, key):
+                    report.delivered += 1
+                else:
+                    report.dropped += 1
+                    if ob is None or ob.closed:
+                        report.dead.add(ws)
+            for ws in report.dead:
+                self.leave(ws)
+            return report
+        # encode once, concurrent sends with per-connection timeout; drop broken/slow sockets
+        report = await fan_out(conns, payload, exclude=exclude, send_timeout=SEND_TIMEOUT_SEC)
+        for ws in report.dead:
             self.leave(ws)
+        return report
 
 
 manager = ConnectionManager()
@@ -149,17 +219,19 @@ async def ws_live_chat(
     room_id: str,
     user_id: str = Query("anonymous", description="Client-provided user id (optional)"),
     echo: bool = Query(True, description="Echo the sender's message back to them"),
+    batch: bool = Query(False, description="Receive one JSON array frame per tick instead of one frame per event"),
 ):
     """
     Room-based live chat:
       - Path param `room_id` selects the room
       - Query `user_id` is optional (supply your authenticated user id)
       - Query `echo` controls whether the sender also receives their own broadcast
+      - Query `batch=1` opts into batched array frames (counts/likes/presence collapsed)
       - JSON envelope supported: {"type":"chat_message","message":"hi","...extra"}
     """
     _check_origin(websocket)
     await manager.accept(websocket)
-    manager.join(room_id, websocket)
+    manager.join(room_id, websocket, batch=batch)
 
     limiter = RateLimiter()
 
@@ -207,5 +279,6 @@ async def ws_live_chat_global(
     websocket: WebSocket,
     user_id: str = Query("anonymous"),
     echo: bool = Query(True),
+    batch: bool = Query(False),
 ):
-    await ws_live_chat(websocket, room_id="global", user_id=user_id, echo=echo)
+    await ws_live_chat(websocket, room_id="global", user_id=user_id, echo=echo, batch=batch)
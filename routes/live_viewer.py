@@ -8,14 +8,17 @@ import anyio
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, ConfigDict, Field
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select
 
-from backend.db import get_db
+from backend.db import get_db, get_async_db
 from backend.auth import get_current_user
 from backend.models.user import User
 from backend.models.live_viewer import LiveViewer
 from backend.schemas.live_viewer_schemas import LiveViewerIn, LiveViewerOut
+from backend.services.live_presence import presence
+from backend.utils.pagination import TOTAL_MODE_PATTERN, decode_cursor, encode_cursor, paginate
 
 # Optional realtime broadcast (safe if missing)
 try:
@@ -30,9 +33,10 @@ UTC_NOW = lambda: datetime.now(timezone.utc)
 
 # ---------- DTOs ----------
 class PageMeta(BaseModel):
-    total: int
+    total: Optional[int] = None
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 class ViewerPage(BaseModel):
     items: List[LiveViewerOut]
@@ -76,11 +80,20 @@ def _apply_active_filter(q, ttl_seconds: Optional[int]) :
             q = q.filter(LiveViewer.left_at.is_(None))
     return q
 
+async def _find_active(
+    db: AsyncSession, user_id: int, stream_id: int, *, newest: bool = False
+) -> Optional[LiveViewer]:
+    """Active viewer row for (user, stream) via the async session."""
+    stmt = select(LiveViewer).filter_by(user_id=user_id, stream_id=stream_id, is_active=True)
+    if newest:
+        stmt = stmt.order_by(LiveViewer.id.desc())
+    return (await db.execute(stmt.limit(1))).scalars().first()
+
 # ---------- Endpoints ----------
 @router.post("/join", response_model=LiveViewerOut, status_code=status.HTTP_201_CREATED)
 async def join_stream(
     data: LiveViewerIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     response: Response = None,
 ):
@@ -88,21 +101,18 @@ async def join_stream(
     Idempotent join:
       - Forces user_id from session (never trust client).
       - If an active row already exists, returns it with 200 OK and refreshes `last_seen`.
+      - Runs on the async (asyncpg) session so the event loop is never blocked.
     """
     payload = _force_user(data, current_user.id)
 
     # Look for an already-active session
-    existing = (
-        db.query(LiveViewer)
-          .filter_by(user_id=payload.user_id, stream_id=payload.stream_id, is_active=True)
-          .first()
-    )
+    existing = await _find_active(db, payload.user_id, payload.stream_id)
     if existing:
         # Soft refresh presence
         if hasattr(existing, "last_seen"):
             existing.last_seen = UTC_NOW()
-            db.commit()
-            db.refresh(existing)
+            await db.commit()
+            await db.refresh(existing)
         if response is not None:
             response.status_code = status.HTTP_200_OK
         return existing
@@ -118,26 +128,23 @@ async def join_stream(
     try:
         viewer = LiveViewer(**values)
         db.add(viewer)
-        db.commit()
-        db.refresh(viewer)
+        await db.commit()
+        await db.refresh(viewer)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         # Handle races: fetch the row created by a concurrent request
-        viewer = (
-            db.query(LiveViewer)
-              .filter_by(user_id=payload.user_id, stream_id=payload.stream_id, is_active=True)
-              .order_by(LiveViewer.id.desc())
-              .first()
-        )
+        viewer = await _find_active(db, payload.user_id, payload.stream_id, newest=True)
         if viewer is None:
             raise HTTPException(status_code=409, detail="Join conflict")
         if response is not None:
             response.status_code = status.HTTP_200_OK
         return viewer
     except Exception as exc:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to join stream: {exc}")
 
+    presence.join(payload.stream_id, payload.user_id, row_id=viewer.id)
+
     # Broadcast (optional)
     await _broadcast(payload.stream_id, {
         "type": "viewer_joined",
@@ -152,7 +159,7 @@ async def join_stream(
 @router.post("/leave", response_model=LiveViewerOut)
 async def leave_stream(
     data: LiveViewerIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -162,11 +169,7 @@ async def leave_stream(
     """
     payload = _force_user(data, current_user.id)
 
-    viewer = (
-        db.query(LiveViewer)
-          .filter_by(user_id=payload.user_id, stream_id=payload.stream_id, is_active=True)
-          .first()
-    )
+    viewer = await _find_active(db, payload.user_id, payload.stream_id)
     if not viewer:
         raise HTTPException(status_code=404, detail="Viewer not found in active session")
 
@@ -177,12 +180,14 @@ async def leave_stream(
     if hasattr(viewer, "last_seen"):
         viewer.last_seen = UTC_NOW()
     try:
-        db.commit()
-        db.refresh(viewer)
+        await db.commit()
+        await db.refresh(viewer)
     except Exception as exc:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to leave stream: {exc}")
 
+    presence.leave(payload.stream_id, payload.user_id)
+
     # Broadcast (optional)
     await _broadcast(payload.stream_id, {
         "type": "viewer_left",
@@ -203,8 +208,17 @@ def heartbeat(
     """
     Update presence for an active viewer without sending chat data.
     Mobile clients can call this every ~20–60 seconds.
+
+    Known viewers are refreshed in the in-memory presence index only; the
+    `last_seen_at` write happens in the periodic write-behind flush.
     """
     payload = _force_user(data, current_user.id)
+    row_id = presence.row_id(payload.stream_id, payload.user_id)
+    if row_id is not None:
+        presence.heartbeat(payload.stream_id, payload.user_id)
+        return {"id": row_id, "stream_id": payload.stream_id, "user_id": payload.user_id}
+
+    # Unknown to this worker (restart / joined elsewhere): verify once against the DB
     viewer = (
         db.query(LiveViewer)
           .filter_by(user_id=payload.user_id, stream_id=payload.stream_id, is_active=True)
@@ -221,6 +235,7 @@ def heartbeat(
     except Exception as exc:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update heartbeat: {exc}")
+    presence.heartbeat(payload.stream_id, payload.user_id, row_id=viewer.id)
     return viewer
 
 
@@ -232,7 +247,11 @@ def count_active_viewers(
 ):
     """
     Return the number of active viewers for a stream, honoring a presence TTL.
+    Served from the in-memory presence index once it is warm (single worker only).
     """
+    if presence.serves(stream_id):
+        return CountOut(stream_id=stream_id, active=presence.count(stream_id, ttl_seconds))
+
     q = db.query(func.count(LiveViewer.id)).filter(LiveViewer.stream_id == stream_id)
     q = _apply_active_filter(q, ttl_seconds)
 
@@ -251,22 +270,52 @@ def list_active_viewers(
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
     order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="meta.next_cursor ya ukurasa uliopita (badala ya offset)"),
+    total_mode: str = Query("exact", pattern=TOTAL_MODE_PATTERN, description="exact|estimate|none"),
 ):
     """
     Paged listing of active viewers, deterministic ordering by last_seen/joined_at.
+    Served from the in-memory presence index once it is warm (single worker only).
+    Use `meta.next_cursor` for the next page (keyset; no deep OFFSET).
     """
+    if presence.serves(stream_id):
+        spec = f"presence:{order}"
+        after = None
+        if cursor:
+            try:
+                ts, uid = decode_cursor(cursor, spec)
+                after = (float(ts), int(uid))
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid or expired cursor")
+        items, total = presence.active(
+            stream_id, ttl_seconds, limit=limit + 1, offset=offset, order=order, after=after,
+        )
+        nxt = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            nxt = encode_cursor(spec, [last["last_seen_at"].timestamp(), last["user_id"]])
+        return ViewerPage(
+            items=items,
+            meta=PageMeta(total=total if total_mode != "none" else None, limit=limit, offset=offset, next_cursor=nxt),
+        )
+
     base = db.query(LiveViewer).filter(LiveViewer.stream_id == stream_id)
     base = _apply_active_filter(base, ttl_seconds)
 
-    total = base.count()
-
-    # Prefer last_seen if available, else joined_at, else id
+    # Prefer last_seen if available, else joined_at, else id (id = tie-breaker ya keyset)
     if hasattr(LiveViewer, "last_seen"):
-        base = base.order_by(LiveViewer.last_seen.asc() if order == "asc" else LiveViewer.last_seen.desc())
+        cols = [LiveViewer.last_seen, LiveViewer.id]
     elif hasattr(LiveViewer, "joined_at"):
-        base = base.order_by(LiveViewer.joined_at.asc() if order == "asc" else LiveViewer.joined_at.desc())
+        cols = [LiveViewer.joined_at, LiveViewer.id]
     else:
-        base = base.order_by(LiveViewer.id.asc() if order == "asc" else LiveViewer.id.desc())
+        cols = [LiveViewer.id]
 
-    items = base.offset(offset).limit(limit).all()
-    return ViewerPage(items=items, meta=PageMeta(total=total, limit=limit, offset=offset))
+    page = paginate(
+        db, base, cols,
+        limit=limit, desc=(order != "asc"), cursor=cursor, offset=offset, total=total_mode,
+    )
+    return ViewerPage(
+        items=page.items,
+        meta=PageMeta(total=page.total, limit=limit, offset=offset, next_cursor=page.next_cursor),
+    )
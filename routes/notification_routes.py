@@ -3,17 +3,18 @@
 from __future__ import annotations
 from typing import List, Optional, Dict, Any
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, WebSocket, status
 from pydantic import BaseModel, Field, ConfigDict
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
 
-from backend.db import get_db
-from backend.auth import get_current_user
+from backend.db import SessionLocal, get_db
+from backend.auth import decode_token, get_current_user
 from backend.models.user import User
 from backend.schemas.notification import NotificationCreate, NotificationOut
 from backend.crud import notification_crud
+from backend.services.notification_counters import message as unread_message, unread_counters
 
 # Optional: use model directly for fallbacks if CRUD lacks a method
 try:
@@ -21,6 +22,9 @@ try:
 except Exception:  # pragma: no cover
     Notification = None  # type: ignore
 
+# Read flag column (`read` on the current model; `is_read` on older ones)
+_READ = (getattr(Notification, "read", None) or getattr(Notification, "is_read", None)) if Notification else None
+
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
 ALLOWED_CREATORS = {"admin", "owner", "system"}  # extend as needed
@@ -107,8 +111,8 @@ def get_my_notifications(
             items = notification_crud.get_user_notifications(db, user_id=current_user.id, skip=skip, limit=limit)  # type: ignore
             return items
         q = db.query(Notification).filter(Notification.user_id == current_user.id)
-        if unread_only and hasattr(Notification, "is_read"):
-            q = q.filter(Notification.is_read.is_(False))
+        if unread_only and _READ is not None:
+            q = q.filter(_READ.is_(False))
         col = getattr(Notification, "created_at", getattr(Notification, "id"))
         q = q.order_by(col.asc() if order == "asc" else col.desc())
         return q.offset(skip).limit(limit).all()
@@ -128,8 +132,8 @@ def get_my_notifications_page(
     """
     if Notification:
         base = db.query(Notification).filter(Notification.user_id == current_user.id)
-        if unread_only and hasattr(Notification, "is_read"):
-            base = base.filter(Notification.is_read.is_(False))
+        if unread_only and _READ is not None:
+            base = base.filter(_READ.is_(False))
         total = base.count()
         col = getattr(Notification, "created_at", getattr(Notification, "id"))
         base = base.order_by(col.asc() if order == "asc" else col.desc())
@@ -148,22 +152,11 @@ def unread_count(
 ):
     """
     Return the number of unread notifications for the current user.
+    O(1): served from the per-user counter (services.notification_counters),
+    not a COUNT(*). Prefer the `/notifications/ws` push over polling this.
     """
-    if Notification and hasattr(Notification, "is_read"):
-        count = (
-            db.query(func.count(getattr(Notification, "id")))
-            .filter(Notification.user_id == current_user.id, Notification.is_read.is_(False))
-            .scalar()
-            or 0
-        )
-        return {"unread": int(count)}
-    # CRUD fallback (assumes it can handle unread_only)
-    try:
-        items = notification_crud.get_user_notifications(db, user_id=current_user.id, skip=0, limit=10_000, unread_only=True)  # type: ignore
-        return {"unread": len(items)}
-    except TypeError:
-        # No unread filter available
-        return {"unread": 0}
+    unread, version = unread_counters.snapshot(db, current_user.id)
+    return {"unread": unread, "version": version}
 
 
 @router.put("/{notif_id}/read", response_model=NotificationOut)
@@ -177,19 +170,21 @@ def mark_as_read(
     Mark a single notification as read (ownership enforced).
     """
     # Enforce ownership before mutating
+    already_read = False
     if Notification:
         obj = db.query(Notification).filter(getattr(Notification, "id") == notif_id).first()
         if not obj:
             raise HTTPException(status_code=404, detail="Notification not found")
         if getattr(obj, "user_id", None) != current_user.id:
             raise HTTPException(status_code=403, detail="Not your notification")
+        already_read = bool(getattr(obj, "read", False))
     # Perform update using CRUD
     notif = notification_crud.mark_notification_as_read(db, notif_id)
     if not notif:
         raise HTTPException(status_code=404, detail="Notification not found")
     if getattr(notif, "user_id", None) != current_user.id:
         raise HTTPException(status_code=403, detail="Not your notification")
-    if getattr(notif, "is_read", False) and prefer == "return=minimal":
+    if already_read and prefer == "return=minimal":
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     return notif
 
@@ -202,9 +197,11 @@ def mark_all_as_read(
     """
     Mark all of the current user's notifications as read.
     """
-    if Notification and hasattr(Notification, "is_read"):
-        q = db.query(Notification).filter(Notification.user_id == current_user.id, Notification.is_read.is_(False))
-        updated = q.update({Notification.is_read: True}, synchronize_session=False)  # type: ignore
+    if Notification and _READ is not None:
+        q = db.query(Notification).filter(Notification.user_id == current_user.id, _READ.is_(False))
+        updated = q.update({_READ: True}, synchronize_session=False)  # type: ignore
+        # bulk UPDATE skips ORM events: adjust the counter in the same transaction
+        unread_counters.adjust(db, current_user.id, -int(updated))
         db.commit()
         return {"updated": int(updated)}
     # CRUD fallback (loop)
@@ -243,3 +240,39 @@ def delete_notification(
     db.delete(obj)
     db.commit()
     return {"detail": "Deleted"}
+
+
+# ---------- Unread push ----------
+def _unread_snapshot(user_id: int):
+    db = SessionLocal()
+    try:
+        return unread_counters.snapshot(db, user_id)
+    finally:
+        db.close()
+
+
+@router.websocket("/ws")
+async def notifications_ws(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Unread-count push: sends {"type": "notification_unread", "unread": n, "version": v}
+    on connect and on every change, so clients can stop polling /unread/count.
+    Ignore messages whose `version` is lower than the last one seen.
+    Auth: `?token=<access token>` or `Authorization: Bearer <token>`.
+    """
+    raw = token or (websocket.headers.get("authorization") or "").partition(" ")[2]
+    try:
+        user_id = int(decode_token(raw)["sub"])
+    except Exception:
+        await websocket.close(code=4401)
+        return
+    await unread_counters.hub.connect(user_id, websocket)
+    try:
+        unread, version = await run_in_threadpool(_unread_snapshot, user_id)
+        await unread_counters.hub.send_personal(websocket, unread_message(unread, version))
+        while True:
+            # Keep the socket alive; client messages (e.g. pings) are ignored.
+            await websocket.receive_text()
+    except Exception:
+        pass
+    finally:
+        await unread_counters.hub.disconnect(user_id, websocket)
@@ -10,7 +10,6 @@ from fastapi import (
     APIRouter, Depends, Query, Header, Response, HTTPException, status
 )
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
 
 from backend.db import get_db
 from backend.auth import get_current_user
@@ -65,27 +64,6 @@ def _serialize_many(rows: List[Any]) -> List[ProductOut]:
             out.append(ProductOut.model_validate(r))
     return out
 
-def _py_score(row: Any, q_tokens: List[str]) -> float:
-    """
-    Relevance ya haraka upande wa app iwapo DB haina FTS/pg_trgm.
-    Uzito: name*3 + category*1.5 + description*1
-    """
-    name = (getattr(row, "name", "") or "").lower()
-    cat  = (getattr(row, "category", "") or "").lower()
-    desc = (getattr(row, "description", "") or "").lower()
-    score = 0.0
-    for t in q_tokens:
-        if t in name: score += 3.0
-        if t in cat:  score += 1.5
-        if t in desc: score += 1.0
-    # boost for in_stock / price popularity if fields zipo
-    if getattr(row, "in_stock", None):
-        score *= 1.05
-    pop = getattr(row, "popularity", None)
-    if isinstance(pop, (int, float)) and pop > 0:
-        score *= (1.0 + min(pop, 1000) / 2000.0)
-    return score
-
 # ======================= SEARCH =======================
 @router.get(
     "/search",
@@ -120,62 +98,25 @@ def search_products(
     if not q_norm:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty query")
 
-    # 1) Base query + security scoping
-    qry = db.query(Product)
-
-    # scope kwa tenant: Product.owner_id lazima ilindwe kama ipo
-    if mine_only and hasattr(Product, "owner_id"):
-        qry = qry.filter(Product.owner_id == getattr(current_user, "id", None))
-
-    # 2) Basic filters
-    if category and hasattr(Product, "category"):
-        qry = qry.filter(func.lower(Product.category) == category.lower())
-    if min_price is not None and hasattr(Product, "price"):
-        qry = qry.filter(Product.price >= min_price)
-    if max_price is not None and hasattr(Product, "price"):
-        qry = qry.filter(Product.price <= max_price)
-    if in_stock is not None and hasattr(Product, "in_stock"):
-        qry = qry.filter(Product.in_stock.is_(bool(in_stock)))
-
-    # 3) Search: jaribu DB-side kwanza (ILIKE); ukipata FTS/pg_trgm, unaweza kupanua
-    like = f"%{q_norm}%"
-    parts = []
-    if hasattr(Product, "name"):        parts.append(Product.name.ilike(like))
-    if hasattr(Product, "description"): parts.append(Product.description.ilike(like))
-    if hasattr(Product, "category"):    parts.append(Product.category.ilike(like))
-    if parts:
-        qry = qry.filter(or_(*parts))
-
-    total = qry.count()
-
-    # 4) Sorting
-    #   - relevance: tutasort app-side (Python) kwa usahihi zaidi
-    #   - vingine: DB order_by
-    if sort_by != "relevance":
-        col_map = {
-            "price":      getattr(Product, "price", None),
-            "created_at": getattr(Product, "created_at", None),
-            "updated_at": getattr(Product, "updated_at", None),
-            "popularity": getattr(Product, "popularity", None),  # kama una field hii
-        }
-        col = col_map.get(sort_by)
-        if col is None:
-            # fallback
-            col = getattr(Product, "updated_at", getattr(Product, "id"))
-        qry = qry.order_by(col.asc() if order == "asc" else col.desc())
-        rows = qry.offset(offset).limit(limit).all()
-    else:
-        # Relevance ranking upande wa app (portable na mwepesi)
-        # Tuna-chota pool kubwa kidogo ili relevance iwe na maana
-        pool_size = min(max(limit * 4, 80), 400)
-        pre_sorted = qry.order_by(
-            # cheap hints
-            getattr(Product, "updated_at", getattr(Product, "id")).desc()
-        ).limit(pool_size + offset + limit).all()
-
-        tokens = [t for t in q_norm.lower().split() if t]
-        ranked = sorted(pre_sorted, key=lambda r: (_py_score(r, tokens), getattr(r, "id", 0)), reverse=True)
-        rows = ranked[offset: offset + limit]
+    # 1-4) Search backend: Postgres FTS/pg_trgm (rank ndani ya SQL) au inverted
+    #      index ya tenant (SQLite/tests) — angalia services.product_search
+    owner_id = getattr(current_user, "id", None) if mine_only and hasattr(Product, "owner_id") else None
+    if mine_only and owner_id is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    params = SearchParams(
+        q=q_norm,
+        owner_id=owner_id,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        in_stock=in_stock,
+        sort_by=sort_by,
+        order=order,
+        limit=limit,
+        offset=offset,
+    )
+    rows, total, backend = run_search(db, params)
+    response.headers["X-Search-Backend"] = backend
 
     # 5) ETag / 304
     etag = _etag_rows(rows)
@@ -6,13 +6,15 @@ from datetime import datetime, timezone
 from typing import Optional, List, Any, Dict
 
 from fastapi import (
-    APIRouter, Depends, HTTPException, status, Query, Header, Response, Path
+    APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Header, Response, Path
 )
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from pydantic import BaseModel, Field
 
 from backend.db import get_db
 from backend.auth import get_current_user
+from backend.dependencies import check_admin
 
 # ====== Schemas (tumia zako; hizi ni fallback kama hazipo) ====================
 with suppress(Exception):
@@ -74,9 +76,9 @@ CRUD_GET    = getattr(_crud, "get_subscription", None) if "_crud" in globals() e
 CRUD_PATCH  = getattr(_crud, "update_subscription", None) if "_crud" in globals() else None
 CRUD_DELETE = getattr(_crud, "delete_subscription", None) if "_crud" in globals() else None
 
-# (Hiari) webpush sender utility ukishaweka
+# Dispatcher ya web-push (VAPID cache + pooled fan-out + pruning ya 404/410)
 with suppress(Exception):
-    from backend.utils.webpush import send_webpush  # type: ignore
+    from backend.utils import push_notifier  # type: ignore
 
 router = APIRouter(prefix="/push", tags=["Push Notifications"])
 
@@ -368,13 +370,13 @@ def unsubscribe(
         db.commit()
     return {"detail": "Unsubscribed"}
 
-# ================= Test push (optional; hutumia util yako) =================
+# ================= Test push =================
 @router.post(
     "/subscriptions/{sub_id}/test",
     response_model=dict,
     summary="Tuma test notification kwa subscription moja"
 )
-def test_push(
+async def test_push(
     sub_id: int,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -386,11 +388,43 @@ def test_push(
         raise HTTPException(status_code=404, detail="Subscription not found")
     _assert_owner(row, current_user.id)
 
-    # Tumia webpush sender yako ukipo
-    if "send_webpush" in globals():
-        payload = {"title": "SmartBiz", "body": "Test push successful âœ…"}
-        send_webpush(row, payload)  # andika util yako ipokee endpoint/keys
-        return {"detail": "Sent"}
-    # fallback (bila kutuma halisi)
-    return {"detail": "Simulated send (configure backend.utils.webpush.send_webpush)"}  # noqa: E501
+    if "push_notifier" not in globals():
+        return {"detail": "Simulated send (push dispatcher unavailable)"}
+    payload = {"title": "SmartBiz", "body": "Test push successful ✅"}
+    ok = await push_notifier.send_push_async(db, row, payload)
+    return {"detail": "Sent" if ok else "Failed"}
+
+# ================= Fan-out (admin) =================
+class PushFanoutIn(BaseModel):
+    title: str = Field(..., min_length=1, max_length=120)
+    body: str = Field(..., min_length=1, max_length=1000)
+    url: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+    user_ids: Optional[List[int]] = Field(None, description="Wapokeaji mahususi")
+    follower_of: Optional[int] = Field(None, description="Followers wote wa user huyu (mf. live imeanza)")
+    ttl: Optional[int] = Field(None, ge=0, le=2419200)
+    urgency: Optional[str] = Field(None, pattern="^(very-low|low|normal|high)$")
+    topic: Optional[str] = Field(None, max_length=32)
 
+@router.post(
+    "/fanout",
+    response_model=dict,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Tuma push kwa watumiaji wengi (background; 404/410 hufutwa)",
+    dependencies=[Depends(check_admin)],
+)
+async def push_fanout(payload: PushFanoutIn, background: BackgroundTasks):
+    if "push_notifier" not in globals():
+        raise HTTPException(status_code=503, detail="Push dispatcher unavailable")
+    if (payload.user_ids is None) == (payload.follower_of is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of user_ids or follower_of")
+
+    message = {"title": payload.title, "body": payload.body, "url": payload.url, **(payload.data or {})}
+    opts: Dict[str, Any] = {"urgency": payload.urgency, "topic": payload.topic}
+    if payload.ttl is not None:
+        opts["ttl"] = payload.ttl
+    if payload.follower_of is not None:
+        background.add_task(push_notifier.push_to_followers, payload.follower_of, message, **opts)
+    else:
+        background.add_task(push_notifier.push_to_audience, payload.user_ids, message, **opts)
+    return {"detail": "Queued"}
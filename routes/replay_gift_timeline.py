@@ -1,6 +1,7 @@
 from __future__ import annotations
 # backend/routes/gift_timeline.py
 import hashlib
+import json
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
@@ -8,16 +9,17 @@ from fastapi import (
     APIRouter, Depends, HTTPException, Query, Header, Response
 )
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import func, or_, select
 
 from backend.db import get_db
 
-# Model: tunatarajia haya mashamba yapo: id, stream_id, gift_name, sent_at (datetime), position (float)
+# Model: id, stream_id, gift_name, created_at (au sent_at), position (hiari)
 GiftFly = None
 try:
     from backend.models.gift_fly import GiftFly  # type: ignore
+    from backend.services.gift_timeline import BUCKETS as _BUCKETS, TIME_COL as _TIME_COL, bucketed_timeline
 except Exception:
-    pass
+    GiftFly = None
 
 router = APIRouter(prefix="/replay", tags=["Replay Timeline"])
 
@@ -25,33 +27,40 @@ router = APIRouter(prefix="/replay", tags=["Replay Timeline"])
 def _utc() -> datetime:
     return datetime.now(timezone.utc)
 
+def _ts(r: Any) -> Optional[datetime]:
+    return getattr(r, "sent_at", None) or getattr(r, "created_at", None)
+
 def _etag(rows: List[Any], extra: str = "") -> str:
     if not rows:
         seed = f"0|{extra}"
     else:
-        last = max(getattr(r, "sent_at", None) or getattr(r, "id", 0) for r in rows)
+        last = max(getattr(r, "id", 0) or 0 for r in rows)
         seed = f"{len(rows)}|{last}|{extra}"
     return 'W/"' + hashlib.sha256(seed.encode()).hexdigest()[:16] + '"'
 
+def _etag_items(items: List[Dict[str, Any]], extra: str = "") -> str:
+    body = json.dumps(items, separators=(",", ":"), sort_keys=True)
+    return 'W/"' + hashlib.sha256(f"{extra}|{body}".encode()).hexdigest()[:16] + '"'
+
 def _compact_row(r: Any) -> Dict[str, Any]:
     # compact kwa mobile: fungua jina fupi
+    t = _ts(r)
     return {
         "g": r.gift_name,
-        "t": (r.sent_at.isoformat() if getattr(r, "sent_at", None) else None),
+        "t": (t.isoformat() if t else None),
         "p": getattr(r, "position", None),
         "id": getattr(r, "id", None),
     }
 
 def _full_row(r: Any) -> Dict[str, Any]:
+    t = _ts(r)
     return {
         "id": getattr(r, "id", None),
         "gift_name": r.gift_name,
-        "timestamp": (r.sent_at.isoformat() if getattr(r, "sent_at", None) else None),
+        "timestamp": (t.isoformat() if t else None),
         "position": getattr(r, "position", None),
     }
 
-_BUCKETS = {"10s": 10, "30s": 30, "1m": 60, "5m": 300}
-
 # ---------- main endpoint ----------
 @router.get(
     "/gift-timeline/{stream_id}",
@@ -71,6 +80,8 @@ def get_gift_timeline(
     # output/paging
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
+    cursor: Optional[int] = Query(None, ge=1, description="Raw: keyset cursor (X-Next-Cursor ya ukurasa uliopita)"),
+    include_total: bool = Query(False, description="Raw: ongeza X-Total-Count (COUNT ya ziada)"),
     order: str = Query("asc", pattern="^(asc|desc)$"),
     compact: bool = Query(True, description="True=payload ndogo kwa mobile"),
     bucket: str = Query("raw", pattern="^(raw|10s|30s|1m|5m)$",
@@ -80,71 +91,67 @@ def get_gift_timeline(
     if not GiftFly:
         raise HTTPException(status_code=500, detail="GiftFly model haijapatikana")
 
-    q = db.query(GiftFly).filter(GiftFly.stream_id == stream_id)
+    # position haipo kwenye kila schema — chuja tu kama column ipo
+    pos_filters = []
+    if hasattr(GiftFly, "position"):
+        if min_pos is not None:
+            pos_filters.append(GiftFly.position >= float(min_pos))
+        if max_pos is not None:
+            pos_filters.append(GiftFly.position <= float(max_pos))
+
+    # bucketed mode: GROUP BY ndani ya DB (au rollup ya dakika kwa replay zilizoisha)
+    if bucket != "raw":
+        items, source = bucketed_timeline(
+            db, stream_id, _BUCKETS[bucket],
+            since=since, until=until, gifts=gifts, since_id=since_id,
+            extra_filters=pos_filters, limit=limit, offset=offset, compact=compact,
+        )
+        tag = _etag_items(items, extra=f"{stream_id}|{bucket}|{offset}|{limit}|{compact}")
+        if if_none_match and if_none_match == tag:
+            return Response(status_code=304)
+        response.headers["ETag"] = tag
+        response.headers["Cache-Control"] = "public, max-age=10"
+        response.headers["X-Timeline-Source"] = source
+        return items
 
+    where = [GiftFly.stream_id == stream_id, *pos_filters]
     if since:
-        q = q.filter(GiftFly.sent_at >= since)
+        where.append(_TIME_COL >= since)
     if until:
-        q = q.filter(GiftFly.sent_at <= until)
-    if min_pos is not None:
-        q = q.filter(GiftFly.position >= float(min_pos))
-    if max_pos is not None:
-        q = q.filter(GiftFly.position <= float(max_pos))
-    if since_id is not None and hasattr(GiftFly, "id"):
-        q = q.filter(GiftFly.id > since_id)
+        where.append(_TIME_COL <= until)
+    if since_id is not None:
+        where.append(GiftFly.id > since_id)
     if gifts:
         # CASE-insensitive like → badilisha kama unataka exact match
         ors = [GiftFly.gift_name.ilike(g) if "%" in g else (GiftFly.gift_name == g) for g in gifts]
-        if ors:
-            q = q.filter(and_(*ors)) if len(ors) == 1 else q.filter(or_(*ors))  # type: ignore[name-defined]
-
-    # mpangilio
-    order_col = getattr(GiftFly, "sent_at", getattr(GiftFly, "id"))
-    q = q.order_by(order_col.asc() if order == "asc" else order_col.desc())
-
-    # raw mode (default): paginate at DB
-    if bucket == "raw":
-        total = q.count()
-        rows = q.offset(offset).limit(limit).all()
-        tag = _etag(rows, extra=f"{stream_id}|raw|{offset}|{limit}|{order}")
-        if if_none_match and if_none_match == tag:
-            return Response(status_code=304)
-        response.headers["ETag"] = tag
-        response.headers["Cache-Control"] = "public, max-age=5"
-        response.headers["X-Total-Count"] = str(total)
-        response.headers["X-Limit"] = str(limit)
-        response.headers["X-Offset"] = str(offset)
-        serializer = _compact_row if compact else _full_row
-        return [serializer(r) for r in rows]
-
-    # bucketed mode: leta hadi N kubwa kidogo, kisha group kwa sekunde/bucket
-    raw = q.limit(min(limit * 10, 20000)).all()
-    tag = _etag(raw, extra=f"{stream_id}|{bucket}")
+        where.append(ors[0] if len(ors) == 1 else or_(*ors))
+
+    # raw mode: keyset kwa id (id hufuata mpangilio wa muda wa kuingizwa);
+    # offset inabaki kwa clients wa zamani wasiotuma cursor
+    page_where = list(where)
+    if cursor is not None:
+        page_where.append(GiftFly.id > cursor if order == "asc" else GiftFly.id < cursor)
+    stmt = (
+        select(GiftFly)
+        .where(*page_where)
+        .order_by(GiftFly.id.asc() if order == "asc" else GiftFly.id.desc())
+        .limit(limit)
+    )
+    if cursor is None and offset:
+        stmt = stmt.offset(offset)
+    rows = db.execute(stmt).scalars().all()
+
+    tag = _etag(rows, extra=f"{stream_id}|raw|{cursor}|{offset}|{limit}|{order}")
     if if_none_match and if_none_match == tag:
         return Response(status_code=304)
     response.headers["ETag"] = tag
-    response.headers["Cache-Control"] = "public, max-age=10"
-
-    bucket_s = _BUCKETS[bucket]
-    # group in python (rahisi, portable)
-    from collections import defaultdict
-    series = defaultdict(lambda: {"count": 0, "by_gift": defaultdict(int)})
-    for r in raw:
-        if not getattr(r, "sent_at", None):
-            continue
-        ts = int(r.sent_at.timestamp())
-        bstart = ts - (ts % bucket_s)
-        key = datetime.fromtimestamp(bstart, tz=timezone.utc).isoformat()
-        series[key]["count"] += 1
-        series[key]["by_gift"][r.gift_name] += 1
-
-    items = []
-    for k in sorted(series.keys()):
-        entry = series[k]
-        # compact au full
-        if compact:
-            items.append({"t": k, "n": entry["count"], "g": dict(entry["by_gift"])})
-        else:
-            items.append({"bucket_start": k, "total": entry["count"], "by_gift": dict(entry["by_gift"])})
-    # rudisha na optional limit/offset kwa bucketed pia
-    return items[offset: offset + limit]
+    response.headers["Cache-Control"] = "public, max-age=5"
+    response.headers["X-Limit"] = str(limit)
+    response.headers["X-Offset"] = str(offset)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    if include_total:
+        total = db.execute(select(func.count()).select_from(GiftFly).where(*where)).scalar_one()
+        response.headers["X-Total-Count"] = str(total)
+    serializer = _compact_row if compact else _full_row
+    return [serializer(r) for r in rows]
@@ -18,6 +18,7 @@ from backend.models.user import User
 from backend.utils.telegram_bot import send_telegram_message
 from backend.utils.whatsapp import send_whatsapp_message
 from backend.utils.sms import send_sms_message
+from backend.utils.rate_limit import IdempotencyKeys
 
 router = APIRouter(prefix="/replies", tags=["Replies"])
 
@@ -66,25 +67,17 @@ class ReplyResult(BaseModel):
 
 # --------------------------- Idempotency (fallback) ---------------------------
 # Kipaumbele: DB column `idempotency_key` kwenye jedwali la ReplyLog (ikiguswa chini).
-# Fallback ya in-memory (per process) â€” TTL ~ 5 min.
-_IDEMP_CACHE: Dict[str, float] = {}
+# Fallback: utils.rate_limit (memory au Redis kwa RATE_LIMIT_BACKEND) â€” TTL ~ 5 min.
 _IDEMP_TTL = 300.0  # sekunde
+_IDEMP = IdempotencyKeys("reply", _IDEMP_TTL)
 
 def _idem_key(user_id: int, payload: ReplyRequest, idem_hdr: Optional[str]) -> str:
     # Ikiwa header ipo, itumike kama key kuu (salama kwa retries).
     base = idem_hdr or f"{user_id}:{payload.platform}:{payload.chat_id}:{hash(payload.message)}"
     return base
 
-def _idem_seen(key: str) -> bool:
-    now = time.time()
-    # safisha harakaharaka
-    for k, t in list(_IDEMP_CACHE.items()):
-        if now - t > _IDEMP_TTL:
-            _IDEMP_CACHE.pop(k, None)
-    if key in _IDEMP_CACHE:
-        return True
-    _IDEMP_CACHE[key] = now
-    return False
+async def _idem_seen(key: str) -> bool:
+    return not await _IDEMP.aclaim(key)
 
 # --------------------------- Dispatch Helpers ---------------------------
 @dataclass
@@ -137,7 +130,7 @@ async def send_reply(
     # 2) Idempotency (fallback in-memory). Ikiwa una ReplyLog na column idempotency_key
     # unaweza kusogeza ulinzi huu DB-level.
     key = _idem_key(current_user.id, payload, idempotency_key)
-    seen = _idem_seen(key)
+    seen = await _idem_seen(key)
     if seen and idempotency_key:
         # Ikiwa header ilikuwepo, chukulia kwamba ni retry halali â†’ usitume tena
         return ReplyResult(
@@ -24,6 +24,7 @@ class GiftFlyOut(BaseModel):
     user_id: Optional[int] = None
     gift_name: Optional[str] = None
     sent_at: Optional[datetime] = None
+    combo_count: Optional[int] = Field(None, description='Combo position of this gift (set on create)')
 
     if P2:
         model_config = ConfigDict(from_attributes=True, extra="ignore")
@@ -0,0 +1,385 @@
+# backend/services/ai_batcher.py
+# -*- coding: utf-8 -*-
+"""
+Micro-batching ya kazi za AI (caption / title / hashtags) juu ya utils.ai_gateway.
+
+- Kazi (`submit(task, text, lang, owner=...)`) hukusanywa kwenye foleni ya
+  (task, lang, model, owner) kwa dirisha fupi (AI_BATCH_WINDOW_MS) au hadi foleni ijae
+  (AI_BATCH_MAX_ITEMS / AI_BATCH_MAX_INPUT_TOKENS), kisha hupakiwa kwenye
+  prompt MOJA yenye vipengee vingi (JSON array in → JSON array out).
+  `owner` (user / tenant) ni sehemu ya key: maandishi ya waombaji tofauti
+  hayaingii kwenye prompt moja (model huona inputs zote za batch).
+- Batches huendeshwa kwa pamoja hadi AI_BATCH_CONCURRENCY, chini ya bajeti
+  moja ya tokens kwa dakika (token bucket, AI_TOKENS_PER_MIN). Makadirio
+  hulipwa kabla ya ombi; usage halisi hurekebisha bucket baadaye.
+- Majibu hugawanywa kwa waombaji (Future kwa kila kipengee). Kipengee
+  kisichorudi/kilichoharibika hujaribiwa tena peke yake mara moja.
+- Cache ya kila kipengee (key = task + lang + model + maandishi yaliyosafishwa)
+  na single-flight: maombi yanayofanana hushiriki Future moja, kwa hiyo
+  backfill ikirudiwa au routes mbili zikiomba kitu kimoja hakuna tokens mpya.
+
+Batcher hufungwa kwenye event loop yake (`get_batcher()` kwa loop inayoendesha).
+
+ENV:
+  AI_BATCH_MODEL               (default: OPENAI_MODEL au gpt-3.5-turbo)
+  AI_BATCH_WINDOW_MS=40
+  AI_BATCH_MAX_ITEMS=16
+  AI_BATCH_MAX_INPUT_TOKENS=6000
+  AI_BATCH_CONCURRENCY=4
+  AI_TOKENS_PER_MIN=90000      0 = bila kikomo
+  AI_BATCH_ITEM_MAX_CHARS=4000 maandishi marefu hukatwa kabla ya kupakiwa
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.utils.ai_gateway import AIGateway, AIGatewayError, AIResult, ResponseCache, get_gateway
+
+log = logging.getLogger("smartbiz.ai_batcher")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+BATCH_MODEL = (os.getenv("AI_BATCH_MODEL") or os.getenv("OPENAI_MODEL") or "gpt-3.5-turbo").strip()
+BATCH_WINDOW_MS = max(0, _env_int("AI_BATCH_WINDOW_MS", 40))
+BATCH_MAX_ITEMS = max(1, _env_int("AI_BATCH_MAX_ITEMS", 16))
+BATCH_MAX_INPUT_TOKENS = max(256, _env_int("AI_BATCH_MAX_INPUT_TOKENS", 6000))
+BATCH_CONCURRENCY = max(1, _env_int("AI_BATCH_CONCURRENCY", 4))
+TOKENS_PER_MIN = max(0, _env_int("AI_TOKENS_PER_MIN", 90000))
+ITEM_MAX_CHARS = max(200, _env_int("AI_BATCH_ITEM_MAX_CHARS", 4000))
+
+# task → fields zinazotakiwa kwenye jibu la kila kipengee
+TASKS: Dict[str, Tuple[str, ...]] = {
+    "caption": ("caption", "hashtags"),
+    "title": ("title", "hashtags"),
+    "hashtags": ("hashtags",),
+    "replay": ("title", "caption", "hashtags"),
+}
+_FIELD_RULES = {
+    "title": "title: max 80 characters, catchy, no quotes",
+    "caption": "caption: 1-2 sentences, max 220 characters, may include 1 emoji",
+    "hashtags": "hashtags: 3-6 short lowercase tags without '#'",
+}
+_OUT_TOKENS = {"title": 30, "caption": 70, "hashtags": 25}
+_PROMPT_OVERHEAD_TOKENS = 120
+
+
+def estimate_tokens(text: str) -> int:
+    """Makadirio ya haraka (~4 chars/token) bila tokenizer."""
+    return len(text) // 4 + 1
+
+
+def _clean(text: str) -> str:
+    return " ".join((text or "").split())[:ITEM_MAX_CHARS]
+
+
+def item_key(task: str, lang: str, model: str, text: str) -> str:
+    return hashlib.sha256(f"{task}|{lang}|{model}|{text}".encode("utf-8")).hexdigest()
+
+
+_TAG_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _norm_tags(raw: Any) -> List[str]:
+    if isinstance(raw, str):
+        raw = re.split(r"[,\s]+", raw)
+    out: List[str] = []
+    for t in raw or []:
+        tag = _TAG_RE.sub("", str(t).lower())
+        if tag and f"#{tag}" not in out:
+            out.append(f"#{tag}")
+    return out[:8]
+
+
+def _norm_item(task: str, obj: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(obj, dict):
+        return None
+    out: Dict[str, Any] = {}
+    for f in TASKS[task]:
+        if f == "hashtags":
+            out[f] = _norm_tags(obj.get(f))
+            if not out[f]:
+                return None
+            continue
+        val = " ".join(str(obj.get(f) or "").split()).strip("\"' ")
+        if len(val) < 4:
+            return None
+        out[f] = val[:160] if f == "title" else val[:500]
+    return out
+
+
+def parse_batch(text: str, n: int) -> Dict[int, Any]:
+    """JSON array (au {"items": [...]}) → {index: object}; index hutoka "i" au nafasi."""
+    s = (text or "").strip()
+    a, b = s.find("["), s.rfind("]")
+    try:
+        data = json.loads(s[a:b + 1]) if a != -1 and b > a else json.loads(s)
+    except ValueError:
+        return {}
+    if isinstance(data, dict):
+        data = data.get("items") or []
+    out: Dict[int, Any] = {}
+    for pos, obj in enumerate(data if isinstance(data, list) else []):
+        idx = obj.get("i", pos) if isinstance(obj, dict) else pos
+        try:
+            idx = int(idx)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= idx < n and idx not in out:
+            out[idx] = obj
+    return out
+
+
+def build_messages(task: str, lang: str, texts: Sequence[str]) -> List[Dict[str, str]]:
+    fields = TASKS[task]
+    shape = ", ".join(f'"{f}": ...' for f in fields)
+    rules = "; ".join(_FIELD_RULES[f] for f in fields)
+    system = (
+        "You write short social-media metadata for live-commerce replays and products on SmartBiz. "
+        f"Respond in language '{lang}'. You receive a JSON array of inputs {{\"i\": index, \"text\": ...}}. "
+        f"Return ONLY a JSON array with exactly {len(texts)} objects, one per input, "
+        f"each {{\"i\": index, {shape}}}. Rules: {rules}."
+    )
+    user = json.dumps([{"i": i, "text": t} for i, t in enumerate(texts)], ensure_ascii=False)
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+@dataclass
+class BatchItemResult:
+    fields: Dict[str, Any]
+    usage: Dict[str, int] = field(default_factory=dict)   # sehemu ya usage ya batch
+    model: str = ""
+    cached: bool = False
+    batch_size: int = 1
+
+
+class TokenBudget:
+    """Token bucket ya tokens/dakika inayoshirikiwa na batches zote (FIFO)."""
+
+    def __init__(self, per_minute: int = TOKENS_PER_MIN) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._t = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_ms = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._t) * self.rate)
+        self._t = now
+
+    async def acquire(self, n: int) -> None:
+        if self.capacity <= 0:
+            return
+        need = min(float(n), self.capacity)
+        async with self._lock:
+            t0 = time.monotonic()
+            while True:
+                self._refill()
+                if self.tokens >= need:
+                    self.tokens -= need
+                    break
+                await asyncio.sleep((need - self.tokens) / self.rate)
+            self.waited_ms += (time.monotonic() - t0) * 1000.0
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Rekebisha makadirio kwa usage halisi (bucket inaweza kuwa na deni)."""
+        if self.capacity <= 0 or actual <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(float(estimated), self.capacity) - actual)
+
+
+QueueKey = Tuple[str, str, str, str]   # (task, lang, model, owner)
+
+
+@dataclass
+class _Job:
+    text: str
+    key: str
+    est: int
+    fut: "asyncio.Future[BatchItemResult]"
+
+
+class AIBatcher:
+    def __init__(
+        self,
+        *,
+        gateway: Optional[AIGateway] = None,
+        model: str = BATCH_MODEL,
+        window_ms: int = BATCH_WINDOW_MS,
+        max_items: int = BATCH_MAX_ITEMS,
+        max_input_tokens: int = BATCH_MAX_INPUT_TOKENS,
+        concurrency: int = BATCH_CONCURRENCY,
+        budget: Optional[TokenBudget] = None,
+        cache: Optional[ResponseCache] = None,
+    ) -> None:
+        self.gateway = gateway
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_items = max_items
+        self.max_input_tokens = max_input_tokens
+        self.budget = budget or TokenBudget()
+        self.cache = cache or ResponseCache()
+        self._sem = asyncio.Semaphore(concurrency)
+        self._queues: Dict[QueueKey, List[_Job]] = {}
+        self._queued_tokens: Dict[QueueKey, int] = {}
+        self._timers: Dict[QueueKey, asyncio.TimerHandle] = {}
+        self._pending: Dict[str, "asyncio.Future[BatchItemResult]"] = {}
+        self._tasks: set = set()
+        self.stats: Dict[str, int] = {
+            "items": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "batched_items": 0,
+            "split_retries": 0, "failed": 0, "tokens": 0,
+        }
+
+    def _gw(self) -> AIGateway:
+        return self.gateway or get_gateway()
+
+    async def submit(
+        self, task: str, text: str, lang: str = "sw", *, owner: Any, model: Optional[str] = None
+    ) -> BatchItemResult:
+        if task not in TASKS:
+            raise ValueError(f"unknown task {task!r}")
+        model = model or self.model
+        lang = (lang or "sw").strip().lower()
+        text = _clean(text)
+        if not text:
+            raise ValueError("empty text")
+        self.stats["items"] += 1
+        key = item_key(task, lang, model, text)
+        hit = self.cache.get(key)
+        if hit is not None:
+            self.stats["cache_hits"] += 1
+            return BatchItemResult(json.loads(hit.text), {}, hit.model, cached=True)
+        fut = self._pending.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(fut)
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending[key] = fut
+        fut.add_done_callback(lambda _f, k=key: self._pending.pop(k, None))
+        qkey = (task, lang, model, str(owner))
+        q = self._queues.setdefault(qkey, [])
+        est = estimate_tokens(text)
+        q.append(_Job(text, key, est, fut))
+        self._queued_tokens[qkey] = self._queued_tokens.get(qkey, 0) + est
+        if len(q) >= self.max_items or self._queued_tokens[qkey] >= self.max_input_tokens:
+            self._flush(qkey)
+        elif qkey not in self._timers:
+            self._timers[qkey] = loop.call_later(self.window, self._flush, qkey)
+        return await asyncio.shield(fut)
+
+    def _flush(self, qkey: QueueKey) -> None:
+        timer = self._timers.pop(qkey, None)
+        if timer is not None:
+            timer.cancel()
+        jobs = self._queues.pop(qkey, None)
+        self._queued_tokens.pop(qkey, None)
+        if not jobs:
+            return
+        t = asyncio.get_running_loop().create_task(self._run_batch(qkey, jobs))
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, qkey: QueueKey, jobs: List[_Job], *, split: bool = True) -> None:
+        task, lang, model, _owner = qkey
+        out_tokens = sum(_OUT_TOKENS[f] for f in TASKS[task]) * len(jobs) + 16
+        est = _PROMPT_OVERHEAD_TOKENS + sum(j.est for j in jobs) + out_tokens
+        try:
+            async with self._sem:
+                await self.budget.acquire(est)
+                res: Optional[AIResult] = None
+                try:
+                    res = await self._gw().acomplete(
+                        build_messages(task, lang, [j.text for j in jobs]), model,
+                        temperature=0.4, max_tokens=min(4096, out_tokens),
+                    )
+                finally:
+                    used = 0 if res is None or res.cached else int((res.usage or {}).get("total_tokens") or 0)
+                    self.budget.settle(est, used)
+                    self.stats["tokens"] += used
+        except BaseException as e:
+            err = e if isinstance(e, AIGatewayError) else AIGatewayError(f"{type(e).__name__}: {e}", status=500)
+            self.stats["failed"] += len(jobs)
+            for j in jobs:
+                if not j.fut.done():
+                    j.fut.set_exception(err)
+                    j.fut.exception()
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        self.stats["batches"] += 1
+        self.stats["batched_items"] += len(jobs)
+        parsed = parse_batch(res.text, len(jobs))
+        share = {k: int(v) // len(jobs) for k, v in (res.usage or {}).items() if isinstance(v, (int, float))}
+        missing: List[_Job] = []
+        for i, j in enumerate(jobs):
+            item = _norm_item(task, parsed.get(i))
+            if item is None:
+                missing.append(j)
+                continue
+            self.cache.put(j.key, AIResult(json.dumps(item, ensure_ascii=False), share, res.model))
+            if not j.fut.done():
+                j.fut.set_result(BatchItemResult(item, share, res.model, cached=res.cached, batch_size=len(jobs)))
+        if not missing:
+            return
+        if split and len(jobs) > 1:
+            # model ilichanganya/ruka vipengee → kila kimoja peke yake (mara moja tu)
+            self.stats["split_retries"] += len(missing)
+            await asyncio.gather(*(self._run_batch(qkey, [j], split=False) for j in missing))
+            return
+        self.stats["failed"] += len(missing)
+        for j in missing:
+            if not j.fut.done():
+                j.fut.set_exception(AIGatewayError("unparseable model output", status=502))
+                j.fut.exception()
+
+    async def submit_many(
+        self, task: str, texts: Sequence[str], lang: str = "sw", *, owner: Any, model: Optional[str] = None
+    ) -> List[Any]:
+        """Wasilisha vingi kwa mkupuo; hurudisha BatchItemResult au Exception kwa kila kimoja."""
+        async def one(t: str) -> Any:
+            try:
+                return await self.submit(task, t, lang, owner=owner, model=model)
+            except Exception as e:
+                return e
+        return list(await asyncio.gather(*(one(t) for t in texts)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        s: Dict[str, Any] = dict(self.stats)
+        s["avg_batch_size"] = round(s["batched_items"] / s["batches"], 2) if s["batches"] else 0.0
+        s["queued"] = sum(len(q) for q in self._queues.values())
+        s["in_flight"] = len(self._tasks)
+        s["budget_wait_ms"] = round(self.budget.waited_ms, 1)
+        return s
+
+
+_batchers: Dict[int, AIBatcher] = {}
+
+
+def get_batcher() -> AIBatcher:
+    """Batcher ya event loop inayoendesha (foleni/timers/futures haziwezi kuvuka loops)."""
+    loop = asyncio.get_running_loop()
+    b = _batchers.get(id(loop))
+    if b is None:
+        if len(_batchers) > 8:
+            _batchers.clear()
+        b = _batchers[id(loop)] = AIBatcher()
+    return b
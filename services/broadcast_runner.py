@@ -0,0 +1,506 @@
+# backend/services/broadcast_runner.py
+# -*- coding: utf-8 -*-
+"""
+Broadcast runner: hutuma broadcast kwa audience kubwa kwa memory isiyokua.
+
+- Audience husomwa kwa chunks za keyset (`users.id < :last ORDER BY id DESC
+  LIMIT :batch`) na columns za templating tu (id, majina, email, simu,
+  telegram id, lugha, plan) — hakuna ORM objects za User zinazoshikiliwa.
+- Kila chunk hutumia session fupi yake; ujumbe hu-render kwa kila user
+  wakati wa kutuma, kisha results hujumlishwa na kutupwa.
+- Baada ya kila chunk maendeleo (cursor, counters) huandikwa kwenye
+  `broadcast_jobs`, na lease ya job hurefushwa. Worker akifa, lease huisha na
+  `resume_unfinished()` (lifespan loop) huendeleza job kutoka cursor ya mwisho.
+  Chunk iliyokuwa njiani inaweza kutumwa tena (at-least-once).
+
+ENV:
+  BROADCAST_BATCH_SIZE       (default 200)   users kwa chunk
+  BROADCAST_CONCURRENCY      (default 10)    sends kwa wakati mmoja
+  BROADCAST_JOB_LEASE_SEC    (default 600)   muda wa lease ya job bila progress
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set
+
+from sqlalchemy import false, func, literal_column, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal
+from backend.models.broadcast_job import BroadcastJob, BroadcastStatus
+from backend.models.user import User
+
+# Telegram adapter (lazima ipo kwenye mradi)
+from backend.utils.telegram_bot import send_telegram_message
+
+# Hiari: adapters wengine kama watakuwepo (wote hutumia utils.http_client pools)
+with suppress(Exception):
+    from backend.utils.whatsapp import send_whatsapp_message_async as send_whatsapp_message  # type: ignore
+with suppress(Exception):
+    from backend.utils.sms import send_sms_message as send_sms  # type: ignore
+
+# Hiari: audit logger
+with suppress(Exception):
+    from backend.routes.audit_log import emit_audit  # type: ignore
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+DEFAULT_BATCH_SIZE = _env_int("BROADCAST_BATCH_SIZE", 200)
+DEFAULT_CONCURRENCY = _env_int("BROADCAST_CONCURRENCY", 10)
+MAX_CONCURRENCY = 50
+LEASE_SEC = max(30, _env_int("BROADCAST_JOB_LEASE_SEC", 600))
+
+# Retry policy
+MAX_RETRIES = 3
+BASE_BACKOFF = 0.7  # sekunde
+
+# Hakuna maana ya kurudia: contact/adapter haipo
+NO_RETRY_ERRORS = {"no_telegram", "no_phone", "wa_adapter_missing", "sms_adapter_missing", "unsupported_channel"}
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ----------------------------- Audience ----------------------------- #
+def _col(*names: str):
+    """Column ya kwanza iliyopo kwenye User (schema hutofautiana kati ya deployments)."""
+    for n in names:
+        c = getattr(User, n, None)
+        if c is not None:
+            return c
+    return None
+
+
+def _labelled(label: str, *names: str):
+    c = _col(*names)
+    return (c if c is not None else literal_column("NULL")).label(label)
+
+
+def audience_columns() -> List[Any]:
+    """Columns za templating/kutuma tu; majina yanalingana na attributes za User za zamani."""
+    return [
+        User.id.label("id"),
+        _labelled("email", "email"),
+        _labelled("username", "username"),
+        _labelled("full_name", "full_name"),
+        _labelled("phone_number", "phone_number", "phone"),
+        _labelled("telegram_id", "telegram_id"),
+        _labelled("language", "language", "preferred_language"),
+        _labelled("subscription_status", "subscription_status", "plan"),
+        _labelled("business_name", "business_name"),
+    ]
+
+
+def _as_dt(v: Any) -> Optional[datetime]:
+    if v is None or isinstance(v, datetime):
+        return v
+    return datetime.fromisoformat(str(v))
+
+
+def audience_filters(f: Mapping[str, Any]) -> List[Any]:
+    """WHERE clauses kutoka payload (dict ya BroadcastPayload)."""
+    clauses: List[Any] = []
+    phone = _col("phone_number", "phone")
+    tg = _col("telegram_id")
+    lang = _col("language", "preferred_language")
+    plan = _col("subscription_status", "plan")
+    created = _col("created_at")
+
+    if f.get("user_ids"):
+        clauses.append(User.id.in_(f["user_ids"]))
+    if f.get("roles"):
+        clauses.append(User.role.in_(f["roles"]))
+    if f.get("plans") and plan is not None:
+        clauses.append(plan.in_(f["plans"]))
+    if f.get("language") and lang is not None:
+        clauses.append(func.lower(lang) == str(f["language"]).strip().lower())
+    if f.get("has_telegram") is True:
+        clauses.append(tg.isnot(None) if tg is not None else false())
+    if f.get("has_telegram") is False and tg is not None:
+        clauses.append(tg.is_(None))
+    if f.get("has_phone") is True and phone is not None:
+        clauses.append(phone.isnot(None))
+    if f.get("has_phone") is False and phone is not None:
+        clauses.append(or_(phone.is_(None), phone == ""))
+    if f.get("created_from") and created is not None:
+        clauses.append(created >= _as_dt(f["created_from"]))
+    if f.get("created_to") and created is not None:
+        clauses.append(created <= _as_dt(f["created_to"]))
+    return clauses
+
+
+def _id_value(raw: Optional[str]) -> Any:
+    """Cursor huhifadhiwa kama string; rudisha kwa aina ya users.id (UUID/int)."""
+    if raw is None:
+        return None
+    try:
+        py = User.id.type.python_type
+    except Exception:
+        py = str
+    if py is uuid.UUID:
+        return uuid.UUID(raw)
+    if py is int:
+        return int(raw)
+    return raw
+
+
+def fetch_chunk(db: Session, clauses: Sequence[Any], after: Optional[str], limit: int) -> List[Any]:
+    """Chunk moja ya audience (Row objects nyepesi), id DESC baada ya `after`."""
+    stmt = select(*audience_columns()).where(*clauses)
+    if after is not None:
+        stmt = stmt.where(User.id < _id_value(after))
+    return list(db.execute(stmt.order_by(User.id.desc()).limit(limit)).all())
+
+
+def count_audience(db: Session, clauses: Sequence[Any]) -> int:
+    return int(db.execute(select(func.count(User.id)).where(*clauses)).scalar() or 0)
+
+
+# ----------------------------- Render / send ----------------------------- #
+class SafeDict(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"  # acha placeholder badala ya ku-fail
+
+
+def ctx_for_user(u: Any, extra: Dict[str, Any]) -> Dict[str, Any]:
+    full_name = getattr(u, "full_name", None)
+    first_name = str(full_name).split()[0] if full_name else ""
+    return {
+        "user_id": u.id,
+        "email": getattr(u, "email", None),
+        "username": getattr(u, "username", None),
+        "full_name": full_name,
+        "first_name": first_name,
+        "phone_number": getattr(u, "phone_number", None),
+        "language": getattr(u, "language", None),
+        "plan": getattr(u, "subscription_status", None),
+        "business_name": getattr(u, "business_name", None),
+        **(extra or {}),
+    }
+
+
+def render_message(tpl: str, user: Any, variables: Dict[str, Any]) -> str:
+    # str.format_map bila kuvunjika
+    return str(tpl).format_map(SafeDict(ctx_for_user(user, variables)))
+
+
+async def send_one_channel(channel: str, user: Any, text: str) -> dict:
+    """Rudisha dict yenye status kwa channel moja: {"ok": bool, "err": str|None}"""
+    try:
+        if channel == "telegram":
+            tid = getattr(user, "telegram_id", None)
+            if not tid:
+                return {"ok": False, "err": "no_telegram"}
+            await send_telegram_message(tid, text)
+            return {"ok": True, "err": None}
+
+        if channel == "whatsapp":
+            if "send_whatsapp_message" not in globals():
+                return {"ok": False, "err": "wa_adapter_missing"}
+            phone = getattr(user, "phone_number", None)
+            if not phone:
+                return {"ok": False, "err": "no_phone"}
+            with suppress(Exception):
+                await send_whatsapp_message(phone, text)  # type: ignore
+            return {"ok": True, "err": None}
+
+        if channel == "sms":
+            if "send_sms" not in globals():
+                return {"ok": False, "err": "sms_adapter_missing"}
+            phone = getattr(user, "phone_number", None)
+            if not phone:
+                return {"ok": False, "err": "no_phone"}
+            with suppress(Exception):
+                await asyncio.to_thread(send_sms, phone, text)  # type: ignore
+            return {"ok": True, "err": None}
+
+        return {"ok": False, "err": "unsupported_channel"}
+    except Exception as e:
+        return {"ok": False, "err": str(e)}
+
+
+async def send_user(user: Any, channels: List[str], tpl: str, variables: Dict[str, Any],
+                    sem: asyncio.Semaphore) -> Dict[str, Any]:
+    """Tuma kwa user mmoja kwenye channels kadhaa, na retries. Text hu-render ndani ya semaphore."""
+    out: Dict[str, Any] = {"user_id": user.id, "results": {}}
+    async with sem:
+        text = render_message(tpl, user, variables)
+        for ch in channels:
+            retries = 0
+            backoff = BASE_BACKOFF
+            while True:
+                res = await send_one_channel(ch, user, text)
+                if res["ok"] or retries >= MAX_RETRIES or res["err"] in NO_RETRY_ERRORS:
+                    out["results"][ch] = res
+                    break
+                await asyncio.sleep(backoff)
+                retries += 1
+                backoff *= 2.0
+    return out
+
+
+# ----------------------------- Job persistence ----------------------------- #
+def create_job(db: Session, *, admin_id: Any, payload: Dict[str, Any],
+               idempotency_key: Optional[str] = None) -> BroadcastJob:
+    job = BroadcastJob(
+        admin_id=str(admin_id) if admin_id is not None else None,
+        idempotency_key=(idempotency_key or "").strip() or None,
+        status=BroadcastStatus.queued,
+        payload=payload,
+        per_channel={ch: {"ok": 0, "fail": 0} for ch in payload.get("channels") or []},
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def load_job(db: Session, job_id: int) -> Optional[Dict[str, Any]]:
+    job = db.get(BroadcastJob, job_id)
+    if job is None:
+        return None
+    return {
+        **job.to_dict(),
+        "payload": dict(job.payload or {}),
+        "last_user_id": job.last_user_id,
+        "admin_id": job.admin_id,
+    }
+
+
+def _claimable(now: datetime):
+    return or_(
+        BroadcastJob.status == BroadcastStatus.queued,
+        (BroadcastJob.status == BroadcastStatus.running)
+        & or_(BroadcastJob.lease_until.is_(None), BroadcastJob.lease_until < now),
+    )
+
+
+def claim_jobs(db: Session, job_id: Optional[int] = None, *, limit: int = 5) -> List[int]:
+    """
+    Chukua jobs (queued au zenye lease iliyoisha) kwa UPDATE moja yenye
+    `FOR UPDATE SKIP LOCKED`; workers wengi hawachukui job moja.
+    """
+    now = _utcnow()
+    pick = select(BroadcastJob.id).where(_claimable(now))
+    if job_id is not None:
+        pick = pick.where(BroadcastJob.id == job_id)
+    pick = pick.order_by(BroadcastJob.id).limit(limit).with_for_update(skip_locked=True)
+    stmt = (
+        update(BroadcastJob)
+        .where(BroadcastJob.id.in_(pick.scalar_subquery()))
+        .values(
+            status=BroadcastStatus.running,
+            worker_id=WORKER_ID,
+            lease_until=now + timedelta(seconds=LEASE_SEC),
+            started_at=func.coalesce(BroadcastJob.started_at, now),
+        )
+        .returning(BroadcastJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        ids = [r[0] for r in db.execute(stmt).all()]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return ids
+
+
+def _owned(job_id: int):
+    return (
+        BroadcastJob.id == job_id,
+        BroadcastJob.status == BroadcastStatus.running,
+        BroadcastJob.worker_id == WORKER_ID,
+    )
+
+
+def save_progress(db: Session, job_id: int, **values: Any) -> bool:
+    """
+    Andika maendeleo na urefushe lease. False ikiwa job si yetu tena
+    (imesitishwa au worker mwingine ameichukua baada ya lease kuisha).
+    """
+    values["lease_until"] = _utcnow() + timedelta(seconds=LEASE_SEC)
+    res = db.execute(
+        update(BroadcastJob).where(*_owned(job_id)).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return bool(res.rowcount)
+
+
+def finish_job(db: Session, job_id: int, status: BroadcastStatus, error: Optional[str] = None) -> None:
+    db.execute(
+        update(BroadcastJob).where(*_owned(job_id))
+        .values(status=status, error=error, finished_at=_utcnow(), lease_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def cancel_job(db: Session, job_id: int) -> bool:
+    res = db.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id, BroadcastJob.status.in_((BroadcastStatus.queued, BroadcastStatus.running)))
+        .values(status=BroadcastStatus.canceled, finished_at=_utcnow(), lease_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return bool(res.rowcount)
+
+
+# ----------------------------- Runner ----------------------------- #
+class BroadcastRunner:
+    """Huendesha jobs zilizochukuliwa na worker huyu; state yote muhimu iko DB."""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, *, pause: float = 0.1) -> None:
+        self.session_factory = session_factory
+        self.pause = pause
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _db(self, fn: Callable[..., Any], *args: Any, **kw: Any) -> Any:
+        def _call():
+            db = self.session_factory()
+            try:
+                return fn(db, *args, **kw)
+            finally:
+                db.close()
+        return await asyncio.to_thread(_call)
+
+    def _spawn(self, coro: Any, job_id: int) -> None:
+        t = asyncio.create_task(coro, name=f"broadcast-job-{job_id}")
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def start(self, job_id: int) -> None:
+        """Anzisha job kwenye background (route isisubiri audience yote)."""
+        self._spawn(self.run(job_id), job_id)
+
+    async def run(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Chukua na uendeshe job hadi mwisho; None ikiwa worker mwingine anaishikilia."""
+        if not await self._db(claim_jobs, job_id):
+            return None
+        return await self._run_claimed(job_id)
+
+    async def resume_unfinished(self) -> int:
+        """Chukua jobs zilizoachwa (lease imeisha) na uziendeleze kutoka cursor yake."""
+        ids = await self._db(claim_jobs)
+        for jid in ids:
+            log.info("resuming broadcast job %s", jid)
+            self._spawn(self._run_claimed(jid), jid)
+        return len(ids)
+
+    async def _run_claimed(self, job_id: int) -> Optional[Dict[str, Any]]:
+        job = await self._db(load_job, job_id)
+        if not job:
+            return None
+        try:
+            return await self._drive(job_id, job)
+        except Exception as e:
+            log.exception("broadcast job %s failed", job_id)
+            with suppress(Exception):
+                await self._db(finish_job, job_id, BroadcastStatus.failed, str(e)[:1000])
+            return None
+
+    async def _drive(self, job_id: int, job: Dict[str, Any]) -> Dict[str, Any]:
+        p = job["payload"]
+        channels: List[str] = list(p.get("channels") or ["telegram"])
+        tpl = str(p.get("message") or "")
+        variables = dict(p.get("variables") or {})
+        batch_size = max(1, min(int(p.get("batch_size") or DEFAULT_BATCH_SIZE), 5000))
+        concurrency = max(1, min(int(p.get("concurrency") or DEFAULT_CONCURRENCY), MAX_CONCURRENCY))
+        clauses = audience_filters(p)
+        sem = asyncio.Semaphore(concurrency)
+
+        per_channel: Dict[str, Dict[str, int]] = {ch: {"ok": 0, "fail": 0} for ch in channels}
+        for ch, v in (job.get("per_channel") or {}).items():
+            if ch in per_channel:
+                per_channel[ch] = {"ok": int(v.get("ok", 0)), "fail": int(v.get("fail", 0))}
+        processed = int(job.get("processed") or 0)
+        skipped = int(job.get("skipped") or 0)
+        cursor = job.get("last_user_id")
+        total = job.get("total")
+
+        if total is None:
+            total = await self._db(count_audience, clauses)
+            await self._db(save_progress, job_id, total=total)
+
+        stopped = False
+        while True:
+            rows = await self._db(fetch_chunk, clauses, cursor, batch_size)
+            if not rows:
+                break
+            results = await asyncio.gather(*(send_user(r, channels, tpl, variables, sem) for r in rows))
+            for res in results:
+                for ch, info in res["results"].items():
+                    if info.get("ok"):
+                        per_channel[ch]["ok"] += 1
+                    else:
+                        if info.get("err") in {"no_telegram", "no_phone"}:
+                            skipped += 1
+                        per_channel[ch]["fail"] += 1
+            processed += len(rows)
+            cursor = str(rows[-1].id)
+            del rows, results
+
+            stopped = not await self._db(
+                save_progress, job_id,
+                last_user_id=cursor, processed=processed, skipped=skipped,
+                per_channel={k: dict(v) for k, v in per_channel.items()},
+            )
+            if stopped:
+                log.info("broadcast job %s stopped (canceled or lease lost) at %s users", job_id, processed)
+                break
+            # kidogo kupumzika kati ya batches kwa heshima ya provider limits
+            await asyncio.sleep(self.pause)
+
+        if not stopped:
+            await self._db(finish_job, job_id, BroadcastStatus.done)
+
+        summary = {
+            "job_id": job_id,
+            "total_recipients": total,
+            "processed": processed,
+            "skipped_missing_contact": skipped,
+            "per_channel": per_channel,
+            "batch_size": batch_size,
+            "concurrency": concurrency,
+        }
+        with suppress(Exception):
+            if "emit_audit" in globals():
+                await self._db(
+                    lambda db: emit_audit(  # type: ignore
+                        db,
+                        action="broadcast.send",
+                        status="success",
+                        severity="info",
+                        actor_id=job.get("admin_id"),
+                        resource_type="broadcast",
+                        resource_id=str(job_id),
+                        meta={"total": total, "channels": channels, "per_channel": per_channel, "skipped": skipped},
+                    )
+                )
+        return summary
+
+
+runner = BroadcastRunner()
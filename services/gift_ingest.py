@@ -0,0 +1,304 @@
+# backend/services/gift_ingest.py
+# -*- coding: utf-8 -*-
+"""
+Ingestion ya gifts kwa group commit (`/gift-fly`, `/gift-movements/send`).
+
+- Route hujenga row (dict) na `await ingestor.submit(row)`; jibu hurudi baada
+  ya row kuwa kwenye commit iliyofanikiwa (ack = durable), lakini gifts nyingi
+  hushiriki INSERT moja ya rows nyingi + commit moja.
+- INSERT ni ya Core (haipiti validators/listeners za ORM): `normalize=` (mf.
+  `models.gift_movement.normalize_row`) hutumika kwa kila row kwenye `submit`;
+  ValueError → `InvalidGift`.
+- Kila row hupata id yake: INSERT ... RETURNING ya rows nyingi pale dialect
+  inaporuhusu mpangilio wa parameters, vinginevyo INSERT kwa kila row ndani
+  ya transaction ileile (`inserted_primary_key`).
+- Writer mmoja kwa ingestor: gift ya kwanza huanzisha timer ya
+  GIFT_INGEST_FLUSH_MS (au mara moja foleni ikifika GIFT_INGEST_MAX_BATCH).
+  Commit ikiendelea, gifts mpya hujikusanya kwa batch inayofuata, hivyo
+  ukubwa wa batch hufuata kasi ya DB yenyewe.
+- Idempotency: keys zilizopo huchujwa kwa SELECT moja kwa batch (na ndani ya
+  batch). INSERT ikigonga IntegrityError (worker mwingine), batch hiyo
+  hurudiwa row kwa row ndani ya savepoints ili row mbovu tu ikataliwe:
+  unique violation → `DuplicateGift`, CHECK/FK → `InvalidGift`.
+- Combos (`ComboTracker`, ukipitisha `combos=`) huhesabiwa kwenye memory kwa
+  (stream, user) — hakuna SELECT ya gift ya mwisho. Writer huweka
+  `meta["combo"]` kabla ya INSERT (kutoka hali iliyokwisha commit + rows za
+  mbele kwenye batch hiyo) na hali husogezwa kwa rows zilizo-commit tu, hivyo
+  batch iliyoshindwa haiongezi combo ya batch zinazofuata. Cache ni ya process hii; gift
+  iliyotangulia kwenye worker mwingine huanza combo upya.
+- `on_commit(batch)` huitwa baada ya kila commit (broadcast/leaderboard kwa
+  batch nzima badala ya kila gift).
+
+ENV:
+  GIFT_INGEST_FLUSH_MS=5
+  GIFT_INGEST_MAX_BATCH=500
+  GIFT_COMBO_WINDOW_SEC=2.0
+  GIFT_COMBO_MAX_KEYS=100000
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+def _env_float(k: str, default: float) -> float:
+    try:
+        return float(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+FLUSH_MS = max(0, _env_int("GIFT_INGEST_FLUSH_MS", 5))
+MAX_BATCH = max(1, _env_int("GIFT_INGEST_MAX_BATCH", 500))
+COMBO_WINDOW_SEC = max(0.0, _env_float("GIFT_COMBO_WINDOW_SEC", 2.0))
+COMBO_MAX_KEYS = max(1, _env_int("GIFT_COMBO_MAX_KEYS", 100_000))
+
+
+class DuplicateGift(Exception):
+    """Idempotency key tayari imetumika (unique violation)."""
+
+
+class InvalidGift(Exception):
+    """Row imekataliwa na CHECK/FK constraint (data mbovu, si marudio)."""
+
+
+def _is_unique_violation(e: IntegrityError) -> bool:
+    code = getattr(e.orig, "pgcode", None) or getattr(e.orig, "sqlstate", None)
+    if code:
+        return code == "23505"
+    return "unique" in str(e.orig).lower()
+
+
+@dataclass
+class Ingested:
+    id: int
+    row: Dict[str, Any]
+
+
+class ComboTracker:
+    """(stream_id, user_id) → (gift_name, wakati, combo); LRU yenye kikomo."""
+
+    def __init__(self, window: float = COMBO_WINDOW_SEC, max_keys: int = COMBO_MAX_KEYS) -> None:
+        self.window = window
+        self.max_keys = max_keys
+        self._last: "OrderedDict[Tuple[int, Any], Tuple[str, dt.datetime, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _step(self, prev: Optional[Tuple[str, dt.datetime, int]], gift_name: str, now: dt.datetime) -> int:
+        if prev is not None and prev[0] == gift_name and (now - prev[1]).total_seconds() <= self.window:
+            return prev[2] + 1
+        return 1
+
+    def assign(self, rows: List[Dict[str, Any]]) -> None:
+        """Weka `meta["combo"]` kwa rows (kwa mpangilio) bila kubadilisha hali."""
+        pending: Dict[Tuple[int, Any], Tuple[str, dt.datetime, int]] = {}
+        with self._lock:
+            for r in rows:
+                k = (r["stream_id"], r["user_id"])
+                prev = pending.get(k) or self._last.get(k)
+                combo = self._step(prev, r["gift_name"], r["created_at"])
+                pending[k] = (r["gift_name"], r["created_at"], combo)
+                r["meta"] = {**(r.get("meta") or {}), "combo": combo}
+
+    def commit(self, rows: List[Dict[str, Any]]) -> None:
+        """Sogeza hali kwa rows zilizo-commit (baada ya `assign`)."""
+        with self._lock:
+            for r in rows:
+                k = (r["stream_id"], r["user_id"])
+                self._last[k] = (r["gift_name"], r["created_at"], r["meta"]["combo"])
+                self._last.move_to_end(k)
+            while len(self._last) > self.max_keys:
+                self._last.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+
+Result = Union[Ingested, BaseException]
+OnCommit = Callable[[List[Ingested]], Awaitable[None]]
+
+
+class GiftIngestor:
+    def __init__(
+        self,
+        model: Any,
+        *,
+        on_commit: Optional[OnCommit] = None,
+        combos: Optional[ComboTracker] = None,
+        normalize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        flush_ms: int = FLUSH_MS,
+        max_batch: int = MAX_BATCH,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.model = model
+        self.on_commit = on_commit
+        self.combos = combos
+        self.normalize = normalize
+        self.flush_s = flush_ms / 1000.0
+        self.max_batch = max_batch
+        self._session_factory = session_factory
+        self._buf: List[Tuple[Dict[str, Any], "asyncio.Future[Ingested]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writer: Optional["asyncio.Task[None]"] = None
+        self.stats: Dict[str, Any] = {
+            "submitted": 0, "rows": 0, "batches": 0, "duplicates": 0, "rejected": 0, "errors": 0,
+            "fallback_batches": 0, "max_batch": 0, "commit_ms": 0.0,
+        }
+
+    # ----- async side -----
+    async def submit(self, row: Dict[str, Any]) -> Ingested:
+        """Weka row kwenye batch ijayo; rudisha baada ya commit yake."""
+        if self.normalize is not None:
+            try:
+                row = self.normalize(row)
+            except (ValueError, TypeError, ArithmeticError) as e:
+                self.stats["rejected"] += 1
+                raise InvalidGift(str(e)[:200]) from e
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[Ingested]" = loop.create_future()
+        self._buf.append((row, fut))
+        self.stats["submitted"] += 1
+        if self._writer is None:
+            if len(self._buf) >= self.max_batch or not self.flush_s:
+                self._start_writer()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.flush_s, self._start_writer)
+        return await asyncio.shield(fut)
+
+    def _start_writer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._writer is None and self._buf:
+            self._writer = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            while self._buf:
+                batch, self._buf = self._buf[: self.max_batch], self._buf[self.max_batch:]
+                if self.combos is not None:
+                    self.combos.assign([r for r, _ in batch])
+                t0 = time.perf_counter()
+                try:
+                    results: List[Result] = await asyncio.to_thread(self._write, [r for r, _ in batch])
+                except Exception as e:
+                    log.warning("gift ingest batch (%s rows) failed: %s", len(batch), e)
+                    self.stats["errors"] += len(batch)
+                    results = [e] * len(batch)
+                self.stats["commit_ms"] += (time.perf_counter() - t0) * 1000.0
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+                ok: List[Ingested] = []
+                for (_, fut), res in zip(batch, results):
+                    if fut.done():
+                        continue
+                    if isinstance(res, Ingested):
+                        fut.set_result(res)
+                        ok.append(res)
+                    else:
+                        fut.set_exception(res)
+                        fut.exception()  # mwombaji akiwa ameondoka, usionye "never retrieved"
+                if ok and self.combos is not None:
+                    self.combos.commit([g.row for g in ok])
+                if ok and self.on_commit is not None:
+                    try:
+                        await self.on_commit(ok)
+                    except Exception as e:
+                        log.warning("gift ingest on_commit failed: %s", e)
+        finally:
+            self._writer = None
+            if self._buf:
+                self._start_writer()
+
+    async def flush(self) -> None:
+        """Subiri foleni iliyopo iandikwe (shutdown/tests)."""
+        self._start_writer()
+        while self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    # ----- sync side (thread) -----
+    def _insert(self, db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        t = self.model.__table__
+        dialect = db.get_bind().dialect
+        if len(rows) > 1 and getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+            res = db.execute(insert(t).returning(t.c.id, sort_by_parameter_order=True), rows)
+            ids = list(res.scalars())
+        else:
+            # bila RETURNING ya rows nyingi: row moja moja (RETURNING / lastrowid), commit bado ni moja
+            ids = [db.execute(insert(t), r).inserted_primary_key[0] for r in rows]
+        if len(ids) != len(rows) or any(pk is None for pk in ids):
+            raise RuntimeError(f"{t.name}: insert did not return ids for every row")
+        return ids
+
+    def _write(self, rows: List[Dict[str, Any]]) -> List[Result]:
+        out: List[Optional[Result]] = [None] * len(rows)
+        db = self._session_factory()
+        try:
+            col = self.model.idempotency_key
+            keys = [r["idempotency_key"] for r in rows if r.get("idempotency_key")]
+            taken = set(db.execute(select(col).where(col.in_(keys))).scalars()) if keys else set()
+            todo: List[int] = []
+            for i, r in enumerate(rows):
+                k = r.get("idempotency_key")
+                if k and k in taken:
+                    out[i] = DuplicateGift(k)
+                    continue
+                if k:
+                    taken.add(k)
+                todo.append(i)
+            if todo:
+                try:
+                    ids = self._insert(db, [rows[i] for i in todo])
+                    db.commit()
+                    for i, pk in zip(todo, ids):
+                        out[i] = Ingested(pk, rows[i])
+                except IntegrityError:
+                    db.rollback()
+                    self.stats["fallback_batches"] += 1
+                    self._write_each(db, rows, todo, out)
+        finally:
+            db.close()
+        self.stats["rows"] += sum(isinstance(r, Ingested) for r in out)
+        self.stats["duplicates"] += sum(isinstance(r, DuplicateGift) for r in out)
+        self.stats["rejected"] += sum(isinstance(r, InvalidGift) for r in out)
+        return out  # type: ignore[return-value]
+
+    def _write_each(self, db: Session, rows: List[Dict[str, Any]], todo: List[int], out: List[Optional[Result]]) -> None:
+        for i in todo:
+            try:
+                with db.begin_nested():
+                    pk = self._insert(db, [rows[i]])[0]
+                out[i] = Ingested(pk, rows[i])
+            except IntegrityError as e:
+                exc = DuplicateGift if _is_unique_violation(e) else InvalidGift
+                out[i] = exc(str(e.orig)[:200])
+        db.commit()
+
+    def snapshot(self) -> Dict[str, Any]:
+        s = dict(self.stats)
+        s["queued"] = len(self._buf)
+        s["avg_batch"] = round(s["rows"] / s["batches"], 1) if s["batches"] else 0.0
+        s["commit_ms"] = round(s["commit_ms"], 1)
+        return s
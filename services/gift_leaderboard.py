@@ -0,0 +1,262 @@
+# backend/services/gift_leaderboard.py
+# -*- coding: utf-8 -*-
+"""
+Leaderboard za gifts zinazosasishwa kadri gifts zinavyoingia (in-memory).
+
+- Kila stream ina "daily buckets" (siku ya LEADERBOARD_TZ) zenye jumla kwa
+  kila sender, pamoja na orodha iliyopangwa (bisect) ya (-total, sender_id)
+  kwa rank lookup na paging bila ORDER BY/OFFSET ya SQL.
+- Dirisha la siku N (rolling weekly) ni muunganiko wa daily buckets; matokeo
+  huhifadhiwa na kusasishwa moja kwa moja gift mpya ikiingia leo.
+- Vyanzo (`gift_values()`): gift_movements (amount), gift_fly
+  (unit_value*quantity) na gift_transactions zisizo na movement_id (zenye
+  movement tayari zimehesabiwa). Routes zote tatu huita `publish_gift()` na
+  thamani ile ile baada ya commit; SQL fallback ya routes/leaderboard_routes
+  husoma union hiyo hiyo.
+- Startup: `rebuild_from_db()` hujaza buckets za siku LEADERBOARD_RETENTION_DAYS
+  zilizopita kutoka vyanzo hivyo; main lifespan huirudia kila
+  LEADERBOARD_REBUILD_INTERVAL ili kurekebisha drift (gift zilizoandikwa nje
+  ya routes hizo, refunds, ujumbe wa backplane uliopotea).
+- Workers wengi: `publish_gift()` hutuma ongezeko kwenye ws backplane ili
+  kila worker asasishe leaderboard yake.
+
+ENV:
+  LEADERBOARD_TZ=Africa/Dar_es_Salaam
+  LEADERBOARD_RETENTION_DAYS=31
+  LEADERBOARD_REBUILD_INTERVAL=900   (main.py) rebuild ya mara kwa mara; 0 = startup tu
+"""
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+import json
+import logging
+import os
+import threading
+import uuid
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+
+from backend.models.gift_fly import GiftFly
+from backend.models.gift_movement import GiftMovement
+from backend.models.gift_transaction import GiftTransaction, GiftTxnStatus
+
+log = logging.getLogger(__name__)
+
+TZ_NAME = (os.getenv("LEADERBOARD_TZ") or "Africa/Dar_es_Salaam").strip()
+try:
+    RETENTION_DAYS = max(1, int(os.getenv("LEADERBOARD_RETENTION_DAYS", "31")))
+except Exception:
+    RETENTION_DAYS = 31
+
+# Column names hutofautiana kati ya matoleo ya GiftMovement
+VALUE_COL = getattr(GiftMovement, "total_value", None) or GiftMovement.amount
+TIME_COL = getattr(GiftMovement, "sent_at", None) or GiftMovement.created_at
+
+Row = Tuple[int, Decimal, int, int]  # (sender_id, total_value, gift_count, rank)
+
+
+def gift_values():
+    """Subquery (stream_id, sender_id, value, ts) ya gifts kutoka kila njia ya kuandika."""
+    dead = (GiftTxnStatus.failed, GiftTxnStatus.canceled, GiftTxnStatus.refunded)
+    return union_all(
+        select(
+            GiftMovement.stream_id.label("stream_id"), GiftMovement.sender_id.label("sender_id"),
+            VALUE_COL.label("value"), TIME_COL.label("ts"),
+        ),
+        select(GiftFly.stream_id, GiftFly.user_id, GiftFly.unit_value * GiftFly.quantity, GiftFly.created_at),
+        select(
+            GiftTransaction.stream_id, GiftTransaction.sender_id,
+            GiftTransaction.total_coins, GiftTransaction.created_at,
+        ).where(
+            GiftTransaction.movement_id.is_(None),
+            GiftTransaction.stream_id.is_not(None),
+            GiftTransaction.status.not_in(dead),
+        ),
+    ).subquery("gift_values")
+
+
+class _Board:
+    """Jumla kwa sender + orodha iliyopangwa kwa (-total, sender_id)."""
+
+    __slots__ = ("totals", "counts", "order")
+
+    def __init__(self) -> None:
+        self.totals: Dict[int, Decimal] = {}
+        self.counts: Dict[int, int] = {}
+        self.order: List[Tuple[Decimal, int]] = []
+
+    def add(self, sender_id: int, value: Decimal, count: int = 1) -> None:
+        old = self.totals.get(sender_id)
+        if old is not None:
+            i = bisect.bisect_left(self.order, (-old, sender_id))
+            if i < len(self.order) and self.order[i] == (-old, sender_id):
+                del self.order[i]
+        new = (old or Decimal("0")) + value
+        self.totals[sender_id] = new
+        self.counts[sender_id] = self.counts.get(sender_id, 0) + count
+        bisect.insort(self.order, (-new, sender_id))
+
+    def merge(self, other: "_Board") -> None:
+        for sid, total in other.totals.items():
+            self.totals[sid] = self.totals.get(sid, Decimal("0")) + total
+            self.counts[sid] = self.counts.get(sid, 0) + other.counts.get(sid, 0)
+        self.order = sorted((-t, s) for s, t in self.totals.items())
+
+    def rank_of(self, total: Decimal) -> int:
+        """Competition rank: 1 + idadi ya senders wenye jumla kubwa zaidi."""
+        return bisect.bisect_left(self.order, (-total, -1 << 62)) + 1
+
+    def page(self, limit: int, offset: int) -> List[Row]:
+        out: List[Row] = []
+        for neg, sid in self.order[offset: offset + limit]:
+            total = -neg
+            out.append((sid, total, self.counts.get(sid, 0), self.rank_of(total)))
+        return out
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+
+class GiftLeaderboard:
+    def __init__(self, tz_name: str = TZ_NAME, retention_days: int = RETENTION_DAYS) -> None:
+        self.tz_name = tz_name
+        self.tz = ZoneInfo(tz_name)
+        self.retention_days = retention_days
+        self._days: Dict[int, Dict[dt.date, _Board]] = {}
+        # (stream_id, days) → (last_day, board) — rolling windows zilizounganishwa
+        self._windows: Dict[Tuple[int, int], Tuple[dt.date, _Board]] = {}
+        self._lock = threading.Lock()
+        self._node = uuid.uuid4().hex
+        self.ready = False
+
+    # ----- helpers -----
+    def local_day(self, ts: dt.datetime) -> dt.date:
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=dt.timezone.utc)
+        return ts.astimezone(self.tz).date()
+
+    def today(self) -> dt.date:
+        return dt.datetime.now(self.tz).date()
+
+    def covers(self, tz_name: str, first_day: dt.date) -> bool:
+        """Je, ombi (tz, siku ya kwanza) linaweza kujibiwa kutoka memory?"""
+        return (
+            self.ready
+            and tz_name == self.tz_name
+            and first_day > self.today() - dt.timedelta(days=self.retention_days)
+        )
+
+    def _prune_nolock(self, stream_days: Dict[dt.date, _Board]) -> None:
+        floor = self.today() - dt.timedelta(days=self.retention_days)
+        for d in [d for d in stream_days if d <= floor]:
+            stream_days.pop(d, None)
+
+    # ----- writes -----
+    def record(self, stream_id: int, sender_id: Optional[int], value: Any, ts: Optional[dt.datetime] = None) -> None:
+        if sender_id is None:
+            return
+        day = self.local_day(ts or dt.datetime.now(dt.timezone.utc))
+        amount = value if isinstance(value, Decimal) else Decimal(str(value or 0))
+        with self._lock:
+            stream_days = self._days.setdefault(int(stream_id), {})
+            board = stream_days.get(day)
+            if board is None:
+                board = stream_days[day] = _Board()
+                self._prune_nolock(stream_days)
+            board.add(int(sender_id), amount)
+            for (sid, days), (last_day, win) in self._windows.items():
+                if sid == int(stream_id) and 0 <= (last_day - day).days < days:
+                    win.add(int(sender_id), amount)
+
+    # ----- reads -----
+    def daily(self, stream_id: int, day: dt.date, limit: int, offset: int) -> List[Row]:
+        with self._lock:
+            board = self._days.get(int(stream_id), {}).get(day)
+            return board.page(limit, offset) if board else []
+
+    def rolling(self, stream_id: int, days: int, limit: int, offset: int) -> List[Row]:
+        last = self.today()
+        key = (int(stream_id), int(days))
+        with self._lock:
+            cached = self._windows.get(key)
+            if cached is None or cached[0] != last:
+                win = _Board()
+                stream_days = self._days.get(int(stream_id), {})
+                for i in range(days):
+                    b = stream_days.get(last - dt.timedelta(days=i))
+                    if b:
+                        win.merge(b)
+                self._windows[key] = (last, win)
+                cached = self._windows[key]
+            return cached[1].page(limit, offset)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "tz": self.tz_name,
+                "streams": len(self._days),
+                "day_buckets": sum(len(v) for v in self._days.values()),
+                "cached_windows": len(self._windows),
+            }
+
+    # ----- startup rebuild -----
+    def rebuild_from_db(self, db: Session, *, batch: int = 5000) -> int:
+        since = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=self.retention_days + 1)
+        gv = gift_values()
+        stmt = (
+            select(gv.c.stream_id, gv.c.sender_id, gv.c.value, gv.c.ts)
+            .where(gv.c.ts >= since, gv.c.sender_id.is_not(None))
+            .execution_options(yield_per=batch)
+        )
+        fresh: Dict[int, Dict[dt.date, _Board]] = {}
+        n = 0
+        for stream_id, sender_id, value, ts in db.execute(stmt):
+            day = self.local_day(ts)
+            board = fresh.setdefault(int(stream_id), {}).setdefault(day, _Board())
+            board.add(int(sender_id), value if isinstance(value, Decimal) else Decimal(str(value or 0)))
+            n += 1
+        with self._lock:
+            self._days = fresh
+            self._windows.clear()
+            self.ready = True
+        log.info("gift leaderboard rebuilt: %s gifts, %s streams", n, len(fresh))
+        return n
+
+    # ----- cluster sync (ws backplane) -----
+    async def publish_gift(self, stream_id: int, sender_id: Optional[int], value: Any,
+                           ts: Optional[dt.datetime] = None) -> None:
+        """Rekodi hapa na utume kwa workers wengine."""
+        ts = ts or dt.datetime.now(dt.timezone.utc)
+        self.record(stream_id, sender_id, value, ts)
+        if sender_id is None:
+            return
+        try:
+            from backend.utils.ws_backplane import channel_for, get_backplane
+            body = json.dumps({"o": self._node, "s": int(stream_id), "u": int(sender_id),
+                               "v": str(value), "t": ts.isoformat()})
+            await get_backplane().publish(channel_for("leaderboard"), body.encode("utf-8"))
+        except Exception as e:
+            log.warning("leaderboard publish failed: %s", e)
+
+    async def subscribe(self) -> None:
+        from backend.utils.ws_backplane import channel_for, get_backplane
+
+        async def _on_remote(data: bytes) -> None:
+            try:
+                msg = json.loads(data)
+            except Exception:
+                return
+            if msg.get("o") == self._node:
+                return
+            self.record(msg["s"], msg["u"], Decimal(msg["v"]), dt.datetime.fromisoformat(msg["t"]))
+
+        await get_backplane().subscribe(channel_for("leaderboard"), _on_remote)
+
+
+leaderboard = GiftLeaderboard()
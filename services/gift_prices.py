@@ -0,0 +1,87 @@
+# backend/services/gift_prices.py
+# -*- coding: utf-8 -*-
+"""
+Bei (coins) za gifts kutoka catalog (`gifts`) kwa routes za kutuma gifts.
+
+`/gift-movements/send` na `/gift-fly` hupokea jina la gift tu; thamani ya
+coins (unit_coins / unit_value) huchukuliwa hapa ili rows na leaderboard
+zipate thamani halisi badala ya 0. Catalog ni ndogo: snapshot nzima
+(jina/slug → coins) hupakiwa kwa SELECT moja na kuhifadhiwa kwa
+GIFT_PRICE_TTL_SEC. Gift isiyojulikana = 0.
+
+ENV:
+  GIFT_PRICE_TTL_SEC=60
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Dict
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal
+from backend.models.gift_model import Gift
+
+log = logging.getLogger(__name__)
+
+try:
+    PRICE_TTL_SEC = max(0, int(os.getenv("GIFT_PRICE_TTL_SEC", "60")))
+except Exception:
+    PRICE_TTL_SEC = 60
+
+ZERO = Decimal("0")
+
+
+def _key(name: str) -> str:
+    return " ".join(str(name or "").split()).lower()
+
+
+class GiftPrices:
+    def __init__(self, ttl: int = PRICE_TTL_SEC, session_factory: Callable[[], Session] = SessionLocal) -> None:
+        self.ttl = ttl
+        self._session_factory = session_factory
+        self._coins: Dict[str, Decimal] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def fresh(self) -> bool:
+        return bool(self._loaded_at) and time.monotonic() - self._loaded_at < self.ttl
+
+    def load(self) -> int:
+        """Pakia catalog nzima (sync; iite kwenye thread)."""
+        db = self._session_factory()
+        try:
+            rows = db.execute(select(Gift.name, Gift.slug, Gift.coins)).all()
+        finally:
+            db.close()
+        snap: Dict[str, Decimal] = {}
+        for name, slug, coins in rows:
+            value = coins if isinstance(coins, Decimal) else Decimal(str(coins or 0))
+            if slug:
+                snap[_key(slug)] = value
+            snap[_key(name)] = value  # jina hushinda slug likigongana
+        with self._lock:
+            self._coins = snap
+            self._loaded_at = time.monotonic()
+        return len(snap)
+
+    def coins(self, name: str) -> Decimal:
+        """Bei kutoka snapshot iliyopo (bila DB)."""
+        return self._coins.get(_key(name), ZERO)
+
+    async def coins_for(self, name: str) -> Decimal:
+        if not self.fresh():
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                log.warning("gift price load failed: %s", e)
+        return self.coins(name)
+
+
+prices = GiftPrices()
@@ -0,0 +1,227 @@
+# backend/services/gift_timeline.py
+# -*- coding: utf-8 -*-
+"""
+Gift timeline ya replay kwa buckets (10s/30s/1m/5m) — GROUP BY ndani ya DB.
+
+- Bucket = floor(epoch(created_at) / s) * s kwa integer arithmetic
+  (Postgres: extract(epoch); SQLite: strftime('%s'); MySQL: unix_timestamp).
+- Pagination ya buckets hufanyika DB (subquery ya buckets za ukurasa).
+- Replay ikiisha, `build_rollup` hujaza gift_timeline_minutes mara moja
+  (stream × dakika × gift). Buckets za dakika nzima (1m/5m) kwa streams zenye
+  rollup husomwa hapo — gharama hutegemea urefu wa stream, si idadi ya gifts.
+- `build_pending_rollups` (lifespan loop) huchukua streams zilizoisha
+  zisizo na rollup.
+
+ENV:
+  GIFT_ROLLUP_GRACE_SEC=120     subiri baada ya ended_at (gifts za mwisho ziingie)
+  GIFT_ROLLUP_BATCH=20          streams kwa mzunguko mmoja
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, Integer, cast, delete, distinct, func, insert, literal, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from backend.models.gift_fly import GiftFly
+from backend.models.gift_timeline_rollup import GiftTimelineMinute, GiftTimelineRollup
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+ROLLUP_GRACE_SEC = max(0, _env_int("GIFT_ROLLUP_GRACE_SEC", 120))
+ROLLUP_BATCH = max(1, _env_int("GIFT_ROLLUP_BATCH", 20))
+
+BUCKETS = {"10s": 10, "30s": 30, "1m": 60, "5m": 300}
+
+# GiftFly haina `sent_at`; muda wa tukio ni created_at
+TIME_COL = getattr(GiftFly, "sent_at", None) or GiftFly.created_at
+
+
+def _dialect(db: Session) -> str:
+    try:
+        return db.get_bind().dialect.name
+    except Exception:
+        return "unknown"
+
+
+def epoch_expr(db: Session, col: Any):
+    """Sekunde za unix (integer) za column ya muda, kwa dialect ya session."""
+    name = _dialect(db)
+    if name == "sqlite":
+        return cast(func.strftime("%s", col), Integer)
+    if name in ("mysql", "mariadb"):
+        return cast(func.unix_timestamp(col), BigInteger)
+    return cast(func.floor(func.extract("epoch", col)), BigInteger)
+
+
+def bucket_expr(epoch: Any, seconds: int):
+    """floor(epoch / s) * s — s huandikwa kama literal ili SELECT na GROUP BY ziwe expression moja (Postgres)."""
+    s = literal_column(str(int(seconds)))
+    return (epoch // s) * s
+
+
+def _gift_filter(col: Any, gifts: Optional[Sequence[str]]):
+    if not gifts:
+        return None
+    ors = [col.ilike(g) if "%" in g else (col == g) for g in gifts]
+    return ors[0] if len(ors) == 1 else or_(*ors)
+
+
+def _iso(epoch: int) -> str:
+    return dt.datetime.fromtimestamp(int(epoch), tz=dt.timezone.utc).isoformat()
+
+
+def _shape(rows: List[Tuple[int, str, int]], compact: bool) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    cur: Optional[int] = None
+    for b, gift, n in rows:
+        if b != cur:
+            cur = b
+            items.append({"t": _iso(b), "n": 0, "g": {}} if compact
+                         else {"bucket_start": _iso(b), "total": 0, "by_gift": {}})
+        entry = items[-1]
+        by = entry["g"] if compact else entry["by_gift"]
+        by[gift] = by.get(gift, 0) + int(n)
+        if compact:
+            entry["n"] += int(n)
+        else:
+            entry["total"] += int(n)
+    return items
+
+
+def has_rollup(db: Session, stream_id: int) -> bool:
+    return db.get(GiftTimelineRollup, stream_id) is not None
+
+
+def bucketed_timeline(
+    db: Session,
+    stream_id: int,
+    bucket_s: int,
+    *,
+    since: Optional[dt.datetime] = None,
+    until: Optional[dt.datetime] = None,
+    gifts: Optional[Sequence[str]] = None,
+    since_id: Optional[int] = None,
+    extra_filters: Sequence[Any] = (),
+    limit: int = 500,
+    offset: int = 0,
+    compact: bool = True,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Hurudisha (items, source) — source ni "rollup" au "events". Buckets hupangwa
+    kwa muda (asc); limit/offset ni ya buckets.
+    """
+    aligned_since = since is None or (since.second == 0 and since.microsecond == 0)
+    use_rollup = (
+        bucket_s % 60 == 0
+        and until is None and since_id is None and not extra_filters and aligned_since
+        and has_rollup(db, stream_id)
+    )
+    if use_rollup:
+        M = GiftTimelineMinute
+        b = bucket_expr(M.minute_epoch, bucket_s)
+        where = [M.stream_id == stream_id]
+        if since is not None:
+            where.append(M.minute_epoch >= int(since.timestamp()))
+        gf = _gift_filter(M.gift_name, gifts)
+        if gf is not None:
+            where.append(gf)
+        name, count = M.gift_name, func.sum(M.gifts)
+        source = "rollup"
+    else:
+        b = bucket_expr(epoch_expr(db, TIME_COL), bucket_s)
+        where = [GiftFly.stream_id == stream_id, *extra_filters]
+        if since is not None:
+            where.append(TIME_COL >= since)
+        if until is not None:
+            where.append(TIME_COL <= until)
+        if since_id is not None:
+            where.append(GiftFly.id > since_id)
+        gf = _gift_filter(GiftFly.gift_name, gifts)
+        if gf is not None:
+            where.append(gf)
+        name, count = GiftFly.gift_name, func.count()
+        source = "events"
+
+    page = select(distinct(b)).where(*where).order_by(b).offset(offset).limit(limit)
+    rows = db.execute(
+        select(b.label("b"), name, count)
+        .where(*where, b.in_(page.scalar_subquery()))
+        .group_by(b, name)
+        .order_by(b, name)
+    ).all()
+    return _shape([(int(r[0]), r[1], int(r[2] or 0)) for r in rows], compact), source
+
+
+# ───────────────────────────── Rollup ─────────────────────────────
+def build_rollup(db: Session, stream_id: int) -> Dict[str, int]:
+    """(Re)jaza minutes za stream moja kwa INSERT ... SELECT ... GROUP BY moja."""
+    last_id, events = db.execute(
+        select(func.max(GiftFly.id), func.count()).where(GiftFly.stream_id == stream_id)
+    ).one()
+    minute = bucket_expr(epoch_expr(db, TIME_COL), 60)
+    db.execute(delete(GiftTimelineMinute).where(GiftTimelineMinute.stream_id == stream_id))
+    minutes = 0
+    if events:
+        sel = (
+            select(
+                literal(stream_id),
+                minute,
+                GiftFly.gift_name,
+                func.count(),
+                func.coalesce(func.sum(GiftFly.quantity), 0),
+            )
+            .where(GiftFly.stream_id == stream_id, GiftFly.id <= last_id)
+            .group_by(minute, GiftFly.gift_name)
+        )
+        res = db.execute(
+            insert(GiftTimelineMinute).from_select(
+                ["stream_id", "minute_epoch", "gift_name", "gifts", "quantity"], sel
+            )
+        )
+        minutes = int(res.rowcount or 0)
+    state = db.get(GiftTimelineRollup, stream_id) or GiftTimelineRollup(stream_id=stream_id)
+    state.last_event_id = last_id
+    state.events = int(events or 0)
+    state.minutes = minutes
+    state.built_at = dt.datetime.now(dt.timezone.utc)
+    db.add(state)
+    db.commit()
+    return {"stream_id": stream_id, "events": int(events or 0), "minutes": minutes}
+
+
+def build_pending_rollups(db: Session, limit: int = ROLLUP_BATCH) -> List[Dict[str, int]]:
+    """Streams zilizoisha (ended_at + grace) ambazo bado hazina rollup."""
+    from backend.models.live_stream import LiveStream
+
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=ROLLUP_GRACE_SEC)
+    ids = db.execute(
+        select(LiveStream.id)
+        .outerjoin(GiftTimelineRollup, GiftTimelineRollup.stream_id == LiveStream.id)
+        .where(
+            LiveStream.ended_at.is_not(None),
+            LiveStream.ended_at <= cutoff,
+            GiftTimelineRollup.stream_id.is_(None),
+        )
+        .order_by(LiveStream.ended_at.desc())
+        .limit(limit)
+    ).scalars().all()
+    out = []
+    for sid in ids:
+        try:
+            out.append(build_rollup(db, sid))
+        except Exception as e:
+            db.rollback()
+            log.warning("gift rollup for stream %s failed: %s", sid, e)
+    return out
@@ -0,0 +1,344 @@
+# backend/services/live_presence.py
+# -*- coding: utf-8 -*-
+"""
+Presence ya watazamaji wa live ndani ya memory (bila Redis).
+
+Kila stream ina "buckets" za muda (BUCKET_SEC kila moja). Heartbeat humhamisha
+mtazamaji kutoka bucket yake ya zamani kwenda ya sasa (O(1)); kuisha muda ni
+kufuta bucket nzima iliyopitwa na MAX_TTL (O(1) kwa bucket). Counts na orodha
+za active husomwa hapa badala ya `SELECT count(*)` kwenye live_viewers.
+
+Write-behind: `flush_presence()` huandika kwa pamoja (UPDATE moja kwa stream)
+last_seen_at ya heartbeats na kuzima rows za waliopitwa na muda. Main lifespan
+huiendesha kila PRESENCE_FLUSH_INTERVAL sekunde.
+
+Kumbuka: index ni ya kila process. Flush ya expiry huzima row tu ikiwa
+last_seen_at ya DB nayo imepitwa na muda, hivyo worker mwingine anayeendelea
+kupokea heartbeats za mtazamaji huyo hazuiwi. Kwa sababu hiyo reads (count /
+orodha ya active) hujibiwa kutoka index pale tu kuna worker mmoja; ikiwa
+WEB_CONCURRENCY > 1 (uvicorn/gunicorn) routes husoma DB, ambayo flush huiweka
+karibu na wakati (PRESENCE_FLUSH_INTERVAL).
+
+ENV:
+  PRESENCE_BUCKET_SEC=5
+  PRESENCE_MAX_TTL_SEC=600
+  PRESENCE_FLUSH_CHUNK=500        users kwa UPDATE moja ya heartbeats
+  WEB_CONCURRENCY=1               workers wa server; >1 → reads hutoka DB
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.live_viewer import LiveViewer
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+BUCKET_SEC = max(1, _env_int("PRESENCE_BUCKET_SEC", 5))
+MAX_TTL_SEC = max(BUCKET_SEC, _env_int("PRESENCE_MAX_TTL_SEC", 600))
+FLUSH_CHUNK = max(1, _env_int("PRESENCE_FLUSH_CHUNK", 500))   # users kwa UPDATE moja (ukubwa wa CASE)
+WORKERS = max(1, _env_int("WEB_CONCURRENCY", 1))
+
+
+class _StreamPresence:
+    __slots__ = ("seen", "bucket_of", "buckets", "oldest", "row_id")
+
+    def __init__(self) -> None:
+        self.seen: Dict[int, float] = {}          # user_id → last heartbeat (epoch)
+        self.bucket_of: Dict[int, int] = {}       # user_id → bucket index
+        self.buckets: Dict[int, Set[int]] = {}    # bucket index → user_ids
+        self.oldest: Optional[int] = None         # bucket ya zamani zaidi isiyofutwa
+        self.row_id: Dict[int, int] = {}          # user_id → LiveViewer.id
+
+    def touch(self, user_id: int, ts: float) -> None:
+        b = int(ts // BUCKET_SEC)
+        old = self.bucket_of.get(user_id)
+        if old is not None and old != b:
+            s = self.buckets.get(old)
+            if s is not None:
+                s.discard(user_id)
+                if not s:
+                    self.buckets.pop(old, None)
+        self.seen[user_id] = ts
+        self.bucket_of[user_id] = b
+        self.buckets.setdefault(b, set()).add(user_id)
+        if self.oldest is None or b < self.oldest:
+            self.oldest = b
+
+    def remove(self, user_id: int) -> None:
+        b = self.bucket_of.pop(user_id, None)
+        self.seen.pop(user_id, None)
+        self.row_id.pop(user_id, None)
+        if b is not None:
+            s = self.buckets.get(b)
+            if s is not None:
+                s.discard(user_id)
+                if not s:
+                    self.buckets.pop(b, None)
+
+    def expire(self, now: float) -> Set[int]:
+        """Futa buckets zote zilizo nje ya MAX_TTL; rudisha user_ids zilizoondoka."""
+        gone: Set[int] = set()
+        if self.oldest is None:
+            return gone
+        cutoff_b = int((now - MAX_TTL_SEC) // BUCKET_SEC)
+        b = self.oldest
+        while b < cutoff_b:
+            users = self.buckets.pop(b, None)
+            if users:
+                for uid in users:
+                    self.bucket_of.pop(uid, None)
+                    self.seen.pop(uid, None)
+                    self.row_id.pop(uid, None)
+                gone |= users
+            b += 1
+        self.oldest = min(self.buckets) if self.buckets else None
+        return gone
+
+    def count(self, now: float, ttl: int) -> int:
+        if ttl >= MAX_TTL_SEC:
+            return len(self.seen)
+        cutoff = now - ttl
+        cutoff_b = int(cutoff // BUCKET_SEC)
+        total = 0
+        for b, users in self.buckets.items():
+            if b > cutoff_b:
+                total += len(users)
+            elif b == cutoff_b:
+                total += sum(1 for u in users if self.seen.get(u, 0.0) >= cutoff)
+        return total
+
+
+class PresenceIndex:
+    """Index ya presence ya process nzima (thread-safe; sync routes hukimbia kwenye threadpool)."""
+
+    def __init__(self) -> None:
+        self._streams: Dict[int, _StreamPresence] = {}
+        self._lock = threading.Lock()
+        self._dirty_seen: Dict[int, Dict[int, float]] = {}
+        self._dirty_gone: Dict[int, Set[int]] = {}
+        self.warmed = False
+
+    # ----- writes -----
+    def heartbeat(self, stream_id: int, user_id: int, *, row_id: Optional[int] = None,
+                  now: Optional[float] = None, persist: bool = True) -> None:
+        ts = now if now is not None else time.time()
+        with self._lock:
+            sp = self._streams.get(stream_id)
+            if sp is None:
+                sp = self._streams[stream_id] = _StreamPresence()
+            sp.touch(user_id, ts)
+            if row_id is not None:
+                sp.row_id[user_id] = row_id
+            if persist:
+                self._dirty_seen.setdefault(stream_id, {})[user_id] = ts
+            gone = self._dirty_gone.get(stream_id)
+            if gone:
+                gone.discard(user_id)
+
+    def join(self, stream_id: int, user_id: int, row_id: Optional[int] = None) -> None:
+        # row ya join tayari imeandikwa na route; hapa ni cache tu
+        self.heartbeat(stream_id, user_id, row_id=row_id, persist=False)
+
+    def leave(self, stream_id: int, user_id: int) -> None:
+        with self._lock:
+            sp = self._streams.get(stream_id)
+            if sp is not None:
+                sp.remove(user_id)
+                if not sp.seen:
+                    self._streams.pop(stream_id, None)
+            seen = self._dirty_seen.get(stream_id)
+            if seen:
+                seen.pop(user_id, None)
+
+    # ----- reads -----
+    def _expire_nolock(self, stream_id: int, sp: _StreamPresence, now: float) -> None:
+        gone = sp.expire(now)
+        if gone:
+            self._dirty_gone.setdefault(stream_id, set()).update(gone)
+
+    def row_id(self, stream_id: int, user_id: int) -> Optional[int]:
+        with self._lock:
+            sp = self._streams.get(stream_id)
+            return sp.row_id.get(user_id) if sp is not None else None
+
+    def count(self, stream_id: int, ttl_seconds: int = 60) -> int:
+        now = time.time()
+        with self._lock:
+            sp = self._streams.get(stream_id)
+            if sp is None:
+                return 0
+            self._expire_nolock(stream_id, sp, now)
+            return sp.count(now, ttl_seconds)
+
+    def active(
+        self,
+        stream_id: int,
+        ttl_seconds: int = 60,
+        *,
+        limit: int = 50,
+        offset: int = 0,
+        order: str = "desc",
+        after: Optional[Tuple[float, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Orodha ya active (iliyopangwa kwa last_seen) + jumla. `after` = (ts, user_id) ya cursor."""
+        now = time.time()
+        cutoff = now - ttl_seconds
+        with self._lock:
+            sp = self._streams.get(stream_id)
+            if sp is None:
+                return [], 0
+            self._expire_nolock(stream_id, sp, now)
+            rows = [(ts, uid, sp.row_id.get(uid)) for uid, ts in sp.seen.items() if ts >= cutoff]
+        desc = order != "asc"
+        rows.sort(reverse=desc)
+        if after is not None:
+            page = [r for r in rows if ((r[0], r[1]) < after if desc else (r[0], r[1]) > after)][:limit]
+        else:
+            page = rows[offset: offset + limit]
+        items = [
+            {
+                "id": rid,
+                "stream_id": stream_id,
+                "user_id": uid,
+                "last_seen_at": dt.datetime.fromtimestamp(ts, dt.timezone.utc),
+            }
+            for ts, uid, rid in page
+        ]
+        return items, len(rows)
+
+    def has_stream(self, stream_id: int) -> bool:
+        with self._lock:
+            return stream_id in self._streams
+
+    def serves(self, stream_id: int) -> bool:
+        """Je, reads za stream hii zijibiwe hapa? Hapana kukiwa na workers >1 (index ni ya process moja)."""
+        if WORKERS > 1:
+            return False
+        return self.warmed or self.has_stream(stream_id)
+
+    # ----- write-behind -----
+    def drain(self) -> Tuple[Dict[int, Dict[int, float]], Dict[int, Set[int]]]:
+        """Chukua (na safisha) mabadiliko yanayosubiri kuandikwa DB."""
+        now = time.time()
+        with self._lock:
+            for sid, sp in list(self._streams.items()):
+                self._expire_nolock(sid, sp, now)
+                if not sp.seen:
+                    self._streams.pop(sid, None)
+            seen, self._dirty_seen = self._dirty_seen, {}
+            gone, self._dirty_gone = self._dirty_gone, {}
+        return seen, gone
+
+    def requeue(self, seen: Dict[int, Dict[int, float]], gone: Dict[int, Set[int]]) -> None:
+        """Rudisha mabadiliko ambayo flush imeshindwa kuandika."""
+        with self._lock:
+            for sid, users in seen.items():
+                cur = self._dirty_seen.setdefault(sid, {})
+                for uid, ts in users.items():
+                    cur[uid] = max(ts, cur.get(uid, 0.0))
+            for sid, users in gone.items():
+                self._dirty_gone.setdefault(sid, set()).update(users)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "viewers": sum(len(sp.seen) for sp in self._streams.values()),
+                "pending_heartbeats": sum(len(v) for v in self._dirty_seen.values()),
+                "pending_expired": sum(len(v) for v in self._dirty_gone.values()),
+                "bucket_sec": BUCKET_SEC,
+                "max_ttl_sec": MAX_TTL_SEC,
+            }
+
+
+presence = PresenceIndex()
+
+
+def warm_presence(db: Session, index: PresenceIndex = presence) -> int:
+    """Jaza index kutoka rows za live_viewers zilizo hai (baada ya restart)."""
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=MAX_TTL_SEC)
+    rows = db.execute(
+        select(LiveViewer.id, LiveViewer.stream_id, LiveViewer.user_id, LiveViewer.last_seen_at)
+        .where(
+            LiveViewer.is_active.is_(True),
+            LiveViewer.user_id.is_not(None),
+            LiveViewer.last_seen_at >= cutoff,
+        )
+    ).all()
+    for rid, sid, uid, seen_at in rows:
+        index.heartbeat(int(sid), int(uid), row_id=int(rid), now=seen_at.timestamp(), persist=False)
+    index.warmed = True
+    return len(rows)
+
+
+def flush_presence(db: Session, index: PresenceIndex = presence) -> Dict[str, int]:
+    """
+    Andika presence iliyokusanywa: UPDATE moja kwa stream (kwa vipande vya
+    FLUSH_CHUNK) kwa heartbeats — kila mtumiaji hupata `last_seen_at` yake
+    kupitia CASE — na UPDATE moja kwa stream kwa waliopitwa na muda.
+    """
+    seen, gone = index.drain()
+    if not seen and not gone:
+        return {"heartbeats": 0, "expired": 0}
+    stale_cut = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=MAX_TTL_SEC)
+    hb = ex = 0
+    try:
+        for sid, users in seen.items():
+            if not users:
+                continue
+            items = list(users.items())
+            for i in range(0, len(items), FLUSH_CHUNK):
+                chunk = dict(items[i:i + FLUSH_CHUNK])
+                seen_at = case(
+                    {uid: dt.datetime.fromtimestamp(ts, dt.timezone.utc) for uid, ts in chunk.items()},
+                    value=LiveViewer.user_id,
+                    else_=LiveViewer.last_seen_at,
+                )
+                res = db.execute(
+                    update(LiveViewer)
+                    .where(
+                        LiveViewer.stream_id == sid,
+                        LiveViewer.user_id.in_(list(chunk)),
+                        LiveViewer.is_active.is_(True),
+                    )
+                    .values(last_seen_at=seen_at)
+                    .execution_options(synchronize_session=False)
+                )
+                hb += int(res.rowcount or 0)
+        for sid, users in gone.items():
+            if not users:
+                continue
+            res = db.execute(
+                update(LiveViewer)
+                .where(
+                    LiveViewer.stream_id == sid,
+                    LiveViewer.user_id.in_(list(users)),
+                    LiveViewer.is_active.is_(True),
+                    LiveViewer.last_seen_at < stale_cut,
+                )
+                .values(is_active=False, left_at=func.coalesce(LiveViewer.last_seen_at, func.now()))
+                .execution_options(synchronize_session=False)
+            )
+            ex += int(res.rowcount or 0)
+        db.commit()
+    except Exception:
+        db.rollback()
+        index.requeue(seen, gone)
+        raise
+    return {"heartbeats": hb, "expired": ex}
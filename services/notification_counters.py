@@ -0,0 +1,296 @@
+# backend/services/notification_counters.py
+# -*- coding: utf-8 -*-
+"""
+Kaunta za arifa ambazo hazijasomwa (unread) kwa kila mtumiaji.
+
+Write path (write-through): ORM events za Notification (after_insert /
+after_update ya `read` / after_delete) huongeza au kupunguza row ya
+`notification_counters` kwenye connection ile ile ya flush — transaction moja
+na badiliko lenyewe, hivyo rollback hurudisha vyote viwili. Bulk updates
+zisizopita ORM (read-all) huita `adjust(db, user_id, delta)`.
+
+Read path: cache ya process (user_id → unread, version) yenye kikomo (LRU) na
+TTL; miss = SELECT kwa PK. Row ikikosekana: COUNT(*) MOJA + INSERT (seed).
+
+Baada ya commit: cache husasishwa mara moja (version mpya tu hukubaliwa) na
+mabadiliko hutangazwa kwenye ws backplane (`channel_for("notif-unread")`).
+Kila worker husasisha cache yake na kusukuma
+{"type": "notification_unread", "unread": n, "version": v} kwa websockets za
+mtumiaji huyo zilizounganishwa kwake (`hub`), hivyo clients hawahitaji poll.
+
+ENV:
+  NOTIF_UNREAD_CACHE_MAX=200000     kikomo cha watumiaji kwenye cache
+  NOTIF_UNREAD_CACHE_TTL_SEC=300    kinga kama ujumbe wa backplane umepotea
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, event, func, inspect, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+from backend.models.notification import Notification
+from backend.models.notification_counter import NotificationCounter
+from backend.utils.websocket_manager import WebSocketManager
+from backend.utils.ws_backplane import InProcessBackplane, channel_for, get_backplane
+
+log = logging.getLogger("smartbiz.notif_counters")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+CACHE_MAX = max(1, _env_int("NOTIF_UNREAD_CACHE_MAX", 200_000))
+CACHE_TTL_SEC = max(1, _env_int("NOTIF_UNREAD_CACHE_TTL_SEC", 300))
+
+_N = Notification.__table__
+_C = NotificationCounter.__table__
+_PENDING = "notif_unread_pending"   # session.info: user_id → (unread, version) za kutangaza baada ya commit
+CHANNEL = "notif-unread"
+
+
+def message(unread: int, version: int) -> Dict[str, Any]:
+    return {"type": "notification_unread", "unread": int(unread), "version": int(version)}
+
+
+class UnreadCounters:
+    def __init__(self, cache_max: int = CACHE_MAX, ttl: float = CACHE_TTL_SEC) -> None:
+        self.cache_max = cache_max
+        self.ttl = ttl
+        self._cache: "OrderedDict[int, Tuple[int, int, float]]" = OrderedDict()   # uid → (unread, version, expiry)
+        self._lock = threading.Lock()
+        self._node = uuid.uuid4().hex
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # sockets za process hii tu; fan-out ya cluster ni kupitia CHANNEL
+        self.hub = WebSocketManager(backplane=InProcessBackplane())
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "seeds": 0, "changes": 0, "published": 0}
+
+    # ----- cache -----
+    def _cached(self, uid: int) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            e = self._cache.get(uid)
+            if e is None or e[2] <= time.monotonic():
+                return None
+            return e[0], e[1]
+
+    def _store(self, uid: int, unread: int, version: int) -> bool:
+        """Weka kwenye cache kama si ya zamani; True kama ni version mpya."""
+        with self._lock:
+            cur = self._cache.get(uid)
+            if cur is not None and cur[1] > version:
+                return False
+            self._cache[uid] = (unread, version, time.monotonic() + self.ttl)
+            self._cache.move_to_end(uid)
+            while len(self._cache) > self.cache_max:
+                self._cache.popitem(last=False)
+            return cur is None or cur[1] < version
+
+    def forget(self, uid: Optional[int] = None) -> None:
+        with self._lock:
+            if uid is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(uid, None)
+
+    # ----- DB -----
+    @staticmethod
+    def _count(conn: Any, uid: int) -> int:
+        return int(conn.execute(
+            select(func.count()).select_from(_N).where(_N.c.user_id == uid, _N.c.read.is_(False))
+        ).scalar_one())
+
+    def _seed(self, conn: Any, uid: int) -> Optional[Tuple[int, int]]:
+        """COUNT + INSERT ya row mpya; None kama mwingine ameiunda kwanza."""
+        n = self._count(conn, uid)
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(_C).values(user_id=uid, unread=n, version=1))
+        except IntegrityError:
+            return None
+        self.stats["seeds"] += 1
+        return n, 1
+
+    def _bump(self, conn: Any, uid: int, delta: int) -> Tuple[int, int]:
+        """unread += delta (haishuki chini ya 0) kwenye transaction ya `conn`."""
+        new = _C.c.unread + delta
+        stmt = (
+            update(_C).where(_C.c.user_id == uid)
+            .values(unread=case((new < 0, 0), else_=new), version=_C.c.version + 1, updated_at=func.now())
+            .returning(_C.c.unread, _C.c.version)
+        )
+        row = conn.execute(stmt).first()
+        if row is None:
+            # COUNT ya seed tayari inajumuisha badiliko hili (flush imeshafanyika)
+            seeded = self._seed(conn, uid)
+            if seeded is not None:
+                return seeded
+            row = conn.execute(stmt).first()   # seed ya mwingine haikuona badiliko letu
+        return int(row[0]), int(row[1])
+
+    def _recount(self, conn: Any, uid: int) -> Tuple[int, int]:
+        n = self._count(conn, uid)
+        row = conn.execute(
+            update(_C).where(_C.c.user_id == uid)
+            .values(unread=n, version=_C.c.version + 1, updated_at=func.now())
+            .returning(_C.c.unread, _C.c.version)
+        ).first()
+        if row is None:
+            return self._seed(conn, uid) or self._recount(conn, uid)
+        return int(row[0]), int(row[1])
+
+    def _pending(self, session: Optional[Session], uid: int, value: Tuple[int, int]) -> None:
+        self.stats["changes"] += 1
+        if session is None:
+            self.forget(uid)
+            return
+        p = session.info.setdefault(_PENDING, {})
+        if uid not in p or p[uid][1] < value[1]:
+            p[uid] = value
+
+    # ----- Public API -----
+    def snapshot(self, db: Session, uid: int) -> Tuple[int, int]:
+        """(unread, version) — O(1) kutoka cache; miss = SELECT kwa PK (au seed na commit)."""
+        hit = self._cached(uid)
+        if hit is not None:
+            self.stats["hits"] += 1
+            return hit
+        self.stats["misses"] += 1
+        row = db.execute(select(_C.c.unread, _C.c.version).where(_C.c.user_id == uid)).first()
+        if row is None:
+            seeded = self._seed(db, uid)
+            db.commit()
+            if seeded is None:
+                row = db.execute(select(_C.c.unread, _C.c.version).where(_C.c.user_id == uid)).first()
+            else:
+                row = seeded
+        n, v = int(row[0]), int(row[1])
+        self._store(uid, n, v)
+        return n, v
+
+    def get(self, db: Session, uid: int) -> int:
+        return self.snapshot(db, uid)[0]
+
+    def adjust(self, db: Session, uid: int, delta: int) -> None:
+        """Kwa bulk updates zisizopita ORM events; tumia kabla ya db.commit()."""
+        if delta:
+            self._pending(db, uid, self._bump(db, uid, delta))
+
+    def reconcile(self, db: Session, *, fix: bool = False, user_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Linganisha counters na COUNT halisi; fix=True huandika thamani sahihi."""
+        q_counts = select(_N.c.user_id, func.count()).where(_N.c.read.is_(False)).group_by(_N.c.user_id)
+        q_rows = select(_C.c.user_id, _C.c.unread)
+        if user_ids is not None:
+            ids = list(user_ids)
+            q_counts = q_counts.where(_N.c.user_id.in_(ids))
+            q_rows = q_rows.where(_C.c.user_id.in_(ids))
+        actual = {int(u): int(n) for u, n in db.execute(q_counts)}
+        out: List[Dict[str, Any]] = []
+        for uid, unread in db.execute(q_rows).all():
+            want = actual.get(int(uid), 0)
+            if int(unread) != want:
+                out.append({"user_id": int(uid), "counter": int(unread), "actual": want, "fixed": fix})
+        if fix and out:
+            for r in out:
+                self._pending(db, r["user_id"], self._recount(db, r["user_id"]))
+            db.commit()
+        return out
+
+    # ----- commit hooks / push -----
+    def _committed(self, changes: Dict[int, Tuple[int, int]]) -> None:
+        for uid, (n, v) in changes.items():
+            self._store(uid, n, v)
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._announce(changes), loop)
+
+    async def _push_local(self, uid: int, n: int, v: int) -> None:
+        if await self.hub.count(uid):
+            await self.hub.broadcast(uid, message(n, v))
+
+    async def _announce(self, changes: Dict[int, Tuple[int, int]]) -> None:
+        for uid, (n, v) in changes.items():
+            await self._push_local(uid, n, v)
+        try:
+            body = json.dumps({"o": self._node, "c": [[u, n, v] for u, (n, v) in changes.items()]})
+            await get_backplane().publish(channel_for(CHANNEL), body.encode("utf-8"))
+            self.stats["published"] += 1
+        except Exception as e:
+            log.warning("unread counter publish failed: %s", e)
+
+    async def start(self) -> None:
+        """Unganisha na event loop (kwa push kutoka threads) na jiunge na CHANNEL."""
+        self._loop = asyncio.get_running_loop()
+
+        async def _on_remote(data: bytes) -> None:
+            try:
+                msg = json.loads(data)
+            except Exception:
+                return
+            if msg.get("o") == self._node:
+                return
+            for uid, n, v in msg.get("c") or ():
+                if self._store(int(uid), int(n), int(v)):
+                    await self._push_local(int(uid), int(n), int(v))
+
+        await get_backplane().subscribe(channel_for(CHANNEL), _on_remote)
+
+
+unread_counters = UnreadCounters()
+
+
+# ───────────────────────────── ORM hooks ─────────────────────────────
+def _change(conn: Any, target: Notification, delta: Optional[int]) -> None:
+    uid = getattr(target, "user_id", None)
+    if uid is None:
+        return
+    c = unread_counters
+    value = c._recount(conn, uid) if delta is None else c._bump(conn, uid, delta)
+    c._pending(object_session(target), uid, value)
+
+
+@event.listens_for(Notification, "after_insert")
+def _notif_counter_insert(_m, conn, t: Notification) -> None:
+    if not t.read:
+        _change(conn, t, +1)
+
+
+@event.listens_for(Notification, "after_update")
+def _notif_counter_update(_m, conn, t: Notification) -> None:
+    hist = inspect(t).attrs.read.history
+    if not hist.has_changes():
+        return
+    if not hist.deleted:
+        _change(conn, t, None)   # thamani ya awali haikupakiwa → hesabu upya
+    elif bool(hist.deleted[0]) != bool(t.read):
+        _change(conn, t, -1 if t.read else +1)
+
+
+@event.listens_for(Notification, "after_delete")
+def _notif_counter_delete(_m, conn, t: Notification) -> None:
+    if not t.read:
+        _change(conn, t, -1)
+
+
+@event.listens_for(Session, "after_commit")
+def _notif_counter_after_commit(session: Session) -> None:
+    changes = session.info.pop(_PENDING, None)
+    if changes:
+        unread_counters._committed(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _notif_counter_after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING, None)
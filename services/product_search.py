@@ -0,0 +1,531 @@
+# backend/services/product_search.py
+# -*- coding: utf-8 -*-
+"""
+Product search (/products/search): relevance bila ILIKE '%q%' + Python scoring.
+
+Backends:
+- Postgres: tsvector (models.product.SEARCH_TSV_SQL, GIN) + pg_trgm kwenye name.
+  Match = tsv @@ prefix-tsquery OR name ILIKE OR name % q (typos); rank =
+  ts_rank_cd + similarity, yote ndani ya SQL; total kwa count(*) OVER().
+- Nyingine (SQLite/tests): inverted index ya Python kwa kila tenant (owner_id).
+  Hujengwa mara ya kwanza tenant anapotafuta, husasishwa kwenye commit ya
+  Product (session events) na kwa delta ya updated_at (workers wengine).
+  Matokeo ya ukurasa husomwa DB kwa id tu.
+
+Uzito wa relevance ni ule wa scoring ya zamani ya route: name 3, sku/tags 1.5,
+description 1; neno la query ni prefix ("sim" → "simu"); maneno yote lazima
+yalingane.
+
+ENV:
+  PRODUCT_SEARCH_BACKEND=auto        auto|pg|memory
+  PRODUCT_SEARCH_TRGM=1              tumia pg_trgm (similarity/ILIKE) kwenye Postgres
+  PRODUCT_SEARCH_MAX_TENANTS=256     indexes za tenants zinazobaki memory (LRU)
+  PRODUCT_SEARCH_REFRESH_SEC=5       delta refresh (updated_at) kwa index ya tenant
+  PRODUCT_SEARCH_REBUILD_SEC=900     rebuild kamili (huondoa zilizofutwa na workers wengine)
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func, literal_column, not_, or_, select, text
+from sqlalchemy.orm import Session
+
+from backend.models.product import SEARCH_TSV_SQL, BackorderPolicy, Product, TrackInventory
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+BACKEND = (os.getenv("PRODUCT_SEARCH_BACKEND", "auto").strip().lower() or "auto")
+USE_TRGM = os.getenv("PRODUCT_SEARCH_TRGM", "1").strip().lower() in {"1", "true", "yes", "on"}
+MAX_TENANTS = max(1, _env_int("PRODUCT_SEARCH_MAX_TENANTS", 256))
+REFRESH_SEC = max(0, _env_int("PRODUCT_SEARCH_REFRESH_SEC", 5))
+REBUILD_SEC = max(60, _env_int("PRODUCT_SEARCH_REBUILD_SEC", 900))
+
+W_NAME, W_TAG, W_DESC = 3.0, 1.5, 1.0
+PREFIX_FACTOR = 0.8          # neno la prefix lina uzito mdogo kuliko neno kamili
+
+_token_re = re.compile(r"\w+", re.UNICODE)
+
+SORT_COLUMNS = ("price", "created_at", "updated_at", "popularity")
+
+
+def tokenize(s: Optional[str]) -> List[str]:
+    return _token_re.findall((s or "").lower())
+
+
+@dataclass
+class SearchParams:
+    q: str
+    owner_id: Optional[int] = None          # None = tenants wote
+    category: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: Optional[bool] = None
+    sort_by: str = "relevance"
+    order: str = "desc"
+    limit: int = 24
+    offset: int = 0
+
+
+def in_stock_expr():
+    """SQL ya Product.in_stock (hybrid haina .expression)."""
+    return or_(
+        Product.track_inventory == TrackInventory.none,
+        (Product.stock_on_hand - Product.stock_reserved - Product.safety_stock) > 0,
+        Product.backorder_policy.in_([BackorderPolicy.allow, BackorderPolicy.preorder]),
+    )
+
+
+def _in_stock_py(track: Any, on_hand: Any, reserved: Any, safety: Any, backorder: Any) -> bool:
+    if track == TrackInventory.none:
+        return True
+    if int(on_hand or 0) - int(reserved or 0) - int(safety or 0) > 0:
+        return True
+    return backorder in (BackorderPolicy.allow, BackorderPolicy.preorder)
+
+
+def _scope_filters(p: SearchParams) -> List[Any]:
+    where: List[Any] = []
+    if p.owner_id is not None:
+        where.append(Product.owner_id == p.owner_id)
+    if p.category and hasattr(Product, "category"):
+        where.append(func.lower(Product.category) == p.category.lower())
+    if p.min_price is not None:
+        where.append(Product.price >= p.min_price)
+    if p.max_price is not None:
+        where.append(Product.price <= p.max_price)
+    if p.in_stock is not None:
+        where.append(in_stock_expr() if p.in_stock else not_(in_stock_expr()))
+    return where
+
+
+def _sort_column(sort_by: str):
+    col = getattr(Product, sort_by, None) if sort_by in SORT_COLUMNS else None
+    return col if col is not None else Product.updated_at
+
+
+# ───────────────────────────── Postgres ─────────────────────────────
+def _tsquery(tokens: Sequence[str]) -> str:
+    # tokens ni \w+ tayari — hakuna operators za tsquery ndani yake
+    return " & ".join(f"{t}:*" for t in tokens)
+
+
+def _search_pg(db: Session, p: SearchParams, tokens: List[str]) -> Tuple[List[Product], int]:
+    tsv = literal_column(f"({SEARCH_TSV_SQL})")
+    tsq = func.to_tsquery(literal_column("'simple'"), _tsquery(tokens))
+    q = p.q.strip()
+    match = [tsv.op("@@")(tsq)]
+    rank = func.ts_rank_cd(tsv, tsq)
+    if USE_TRGM:
+        match += [Product.name.ilike(f"%{q}%"), Product.name.op("%")(q)]
+        rank = rank + func.similarity(Product.name, q)
+
+    where = [*_scope_filters(p), or_(*match)]
+    total_col = func.count().over().label("_total")
+    stmt = select(Product, total_col).where(*where)
+    if p.sort_by == "relevance":
+        stmt = stmt.order_by(rank.desc(), Product.id.desc())
+    else:
+        col = _sort_column(p.sort_by)
+        stmt = stmt.order_by(col.asc() if p.order == "asc" else col.desc(), Product.id.desc())
+    res = db.execute(stmt.offset(p.offset).limit(p.limit)).all()
+    if res:
+        return [r[0] for r in res], int(res[0][1])
+    total = db.execute(select(func.count()).select_from(Product).where(*where)).scalar_one() if p.offset else 0
+    return [], int(total)
+
+
+# ───────────────────────────── Inverted index ─────────────────────────────
+@dataclass
+class _Doc:
+    __slots__ = ("owner_id", "terms", "price", "in_stock", "category", "created", "updated", "popularity", "boost")
+    owner_id: Optional[int]
+    terms: Tuple[str, ...]        # uzito uko kwenye postings
+    price: float
+    in_stock: bool
+    category: Optional[str]
+    created: float
+    updated: float
+    popularity: Optional[float]
+    boost: float                  # in_stock/popularity (sawa na scoring ya zamani)
+
+
+_DOC_COLUMNS = (
+    Product.id, Product.owner_id, Product.name, Product.sku, Product.tags, Product.description,
+    Product.price, Product.track_inventory, Product.stock_on_hand, Product.stock_reserved,
+    Product.safety_stock, Product.backorder_policy, Product.created_at, Product.updated_at,
+)
+
+
+def _ts(v: Any) -> float:
+    try:
+        return v.timestamp() if v is not None else 0.0
+    except Exception:
+        return 0.0
+
+
+_WEIGHTS: Dict[float, float] = {}   # floats za uzito hushirikiwa (postings milioni)
+
+
+def _terms(name: Any, sku: Any, tags: Any, description: Any) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for t in set(tokenize(name)):
+        out[t] = out.get(t, 0.0) + W_NAME
+    extra = [sku or ""]
+    if isinstance(tags, (list, tuple)):
+        extra += [str(x) for x in tags]
+    for t in set(tokenize(" ".join(extra))):
+        out[t] = out.get(t, 0.0) + W_TAG
+    for t in set(tokenize(description)):
+        out[t] = out.get(t, 0.0) + W_DESC
+    return {t: _WEIGHTS.setdefault(w, w) for t, w in out.items()}
+
+
+def _doc_from_values(owner_id, name, sku, tags, description, price, track, on_hand, reserved,
+                     safety, backorder, created, updated, category=None,
+                     popularity=None) -> Tuple[Dict[str, float], _Doc]:
+    """(term → uzito, _Doc) — uzito huenda kwenye postings, doc hubaki na majina ya terms tu."""
+    terms = _terms(name, sku, tags, description)
+    stock = _in_stock_py(track, on_hand, reserved, safety, backorder)
+    pop = popularity if isinstance(popularity, (int, float)) else None
+    boost = 1.05 if stock else 1.0
+    if pop and pop > 0:
+        boost *= 1.0 + min(pop, 1000) / 2000.0
+    return terms, _Doc(
+        owner_id=owner_id,
+        terms=tuple(terms),
+        price=float(price or 0),
+        in_stock=stock,
+        category=(category or None) and str(category).lower(),
+        created=_ts(created),
+        updated=_ts(updated),
+        popularity=pop,
+        boost=boost,
+    )
+
+
+def _doc_from_row(r: Any) -> Tuple[int, Tuple[Dict[str, float], _Doc]]:
+    return r[0], _doc_from_values(*r[1:])
+
+
+def _doc_from_obj(obj: Product) -> Tuple[Dict[str, float], _Doc]:
+    return _doc_from_values(
+        obj.owner_id, obj.name, obj.sku, obj.tags, obj.description, obj.price,
+        obj.track_inventory, obj.stock_on_hand, obj.stock_reserved, obj.safety_stock,
+        obj.backorder_policy, obj.created_at, obj.updated_at,
+        getattr(obj, "category", None), getattr(obj, "popularity", None),
+    )
+
+
+class TenantIndex:
+    """Inverted index ya products za tenant mmoja: term → {product_id: uzito}."""
+
+    def __init__(self, owner_id: Optional[int]) -> None:
+        self.owner_id = owner_id
+        self.docs: Dict[int, _Doc] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self._vocab: Optional[List[str]] = None
+        self.lock = threading.RLock()
+        self.built_at = 0.0
+        self.checked_at = 0.0
+        self.watermark: Any = None       # max(updated_at) iliyoonekana
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def upsert(self, pid: int, entry: Tuple[Dict[str, float], _Doc]) -> None:
+        terms, doc = entry
+        with self.lock:
+            self._remove(pid)
+            self.docs[pid] = doc
+            for t, w in terms.items():
+                plist = self.postings.get(t)
+                if plist is None:
+                    plist = self.postings[t] = {}
+                    self._vocab = None
+                plist[pid] = w
+
+    def remove(self, pid: int) -> None:
+        with self.lock:
+            self._remove(pid)
+
+    def _remove(self, pid: int) -> None:
+        doc = self.docs.pop(pid, None)
+        if doc is None:
+            return
+        for t in doc.terms:
+            plist = self.postings.get(t)
+            if plist is not None:
+                plist.pop(pid, None)
+                if not plist:
+                    del self.postings[t]
+                    self._vocab = None
+
+    def _expand(self, token: str) -> List[str]:
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        vocab = self._vocab
+        i = bisect.bisect_left(vocab, token)
+        out = []
+        while i < len(vocab) and vocab[i].startswith(token):
+            out.append(vocab[i])
+            i += 1
+        return out
+
+    def match(self, tokens: Sequence[str]) -> Dict[int, float]:
+        """pid → score; kila token lazima ilingane (prefix) — AND."""
+        with self.lock:
+            acc: Optional[Dict[int, float]] = None
+            # token yenye postings chache kwanza → intersection ndogo
+            per_token: List[Dict[int, float]] = []
+            for tok in dict.fromkeys(tokens):
+                terms = self._expand(tok)
+                if not terms:
+                    return {}
+                if len(terms) == 1 and terms[0] == tok:
+                    per_token.append(self.postings[tok])   # husomwa tu, haibadilishwi
+                    continue
+                scores: Dict[int, float] = {}
+                for term in terms:
+                    f = 1.0 if term == tok else PREFIX_FACTOR
+                    for pid, w in self.postings[term].items():
+                        s = w * f
+                        if s > scores.get(pid, 0.0):
+                            scores[pid] = s
+                per_token.append(scores)
+            for scores in sorted(per_token, key=len):
+                if acc is None:
+                    acc = dict(scores)
+                else:
+                    acc = {pid: s + scores[pid] for pid, s in acc.items() if pid in scores}
+                if not acc:
+                    return {}
+            return acc or {}
+
+
+class SearchIndexRegistry:
+    """LRU ya TenantIndex kwa owner_id (None = products zote)."""
+
+    def __init__(self, max_tenants: int = MAX_TENANTS) -> None:
+        self.max_tenants = max_tenants
+        self._indexes: "OrderedDict[Optional[int], TenantIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Optional[int], threading.Lock] = {}
+
+    def loaded(self) -> List[TenantIndex]:
+        with self._lock:
+            return list(self._indexes.values())
+
+    def drop(self, owner_id: Optional[int] = None) -> None:
+        with self._lock:
+            if owner_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(owner_id, None)
+
+    def get(self, db: Session, owner_id: Optional[int]) -> TenantIndex:
+        now = time.monotonic()
+        with self._lock:
+            idx = self._indexes.get(owner_id)
+            if idx is not None:
+                self._indexes.move_to_end(owner_id)
+            blk = self._build_locks.setdefault(owner_id, threading.Lock())
+        if idx is not None and now - idx.built_at < REBUILD_SEC:
+            if REFRESH_SEC == 0 or now - idx.checked_at >= REFRESH_SEC:
+                self._refresh(db, idx)
+            return idx
+        with blk:
+            with self._lock:
+                cur = self._indexes.get(owner_id)
+            if cur is not None and cur is not idx:
+                return cur   # thread nyingine imemaliza kujenga
+            idx = self._build(db, owner_id)
+            with self._lock:
+                self._indexes[owner_id] = idx
+                self._indexes.move_to_end(owner_id)
+                while len(self._indexes) > self.max_tenants:
+                    self._indexes.popitem(last=False)
+            return idx
+
+    def _query(self, owner_id: Optional[int]):
+        stmt = select(*_DOC_COLUMNS)
+        if hasattr(Product, "category"):
+            stmt = stmt.add_columns(Product.category)
+        else:
+            stmt = stmt.add_columns(literal_column("NULL"))
+        if hasattr(Product, "popularity"):
+            stmt = stmt.add_columns(Product.popularity)
+        if owner_id is not None:
+            stmt = stmt.where(Product.owner_id == owner_id)
+        return stmt
+
+    def _load(self, db: Session, idx: TenantIndex, stmt) -> int:
+        n = 0
+        for r in db.execute(stmt.execution_options(yield_per=5000)):
+            pid, doc = _doc_from_row(r)
+            idx.upsert(pid, doc)
+            upd = r[13]
+            if upd is not None and (idx.watermark is None or upd > idx.watermark):
+                idx.watermark = upd
+            n += 1
+        return n
+
+    def _build(self, db: Session, owner_id: Optional[int]) -> TenantIndex:
+        t0 = time.perf_counter()
+        idx = TenantIndex(owner_id)
+        n = self._load(db, idx, self._query(owner_id))
+        idx.built_at = idx.checked_at = time.monotonic()
+        log.info("product search index built (owner=%s, docs=%s, %.0fms)",
+                 owner_id, n, (time.perf_counter() - t0) * 1000)
+        return idx
+
+    def _refresh(self, db: Session, idx: TenantIndex) -> None:
+        idx.checked_at = time.monotonic()
+        if idx.watermark is None:
+            return
+        # ">" (si ">="): bulk import huweka updated_at moja kwa rows nyingi — zisisomwe
+        # kila refresh. Writes za process hii huingia kwa commit hooks; za workers
+        # wengine ndani ya sekunde ile ile ya watermark huonekana kwenye rebuild.
+        self._load(db, idx, self._query(idx.owner_id).where(Product.updated_at > idx.watermark))
+
+    # — hooks za commit —
+    def apply(self, changes: Iterable[Tuple[str, int, Any]]) -> None:
+        indexes = self.loaded()
+        if not indexes:
+            return
+        for op, pid, entry in changes:
+            for idx in indexes:
+                if op == "delete" or entry is None:
+                    idx.remove(pid)
+                elif idx.owner_id is None or idx.owner_id == entry[1].owner_id:
+                    idx.upsert(pid, entry)
+                else:
+                    idx.remove(pid)   # owner amebadilika
+
+
+registry = SearchIndexRegistry()
+
+_PENDING_KEY = "_product_search_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_product_changes(session: Session, _ctx) -> None:
+    if not registry.loaded():
+        return
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Product) and obj.id is not None:
+            try:
+                pending.append(("upsert", obj.id, _doc_from_obj(obj)))
+            except Exception:
+                pending.append(("delete", obj.id, None))   # refresh ya delta itairudisha
+    for obj in session.deleted:
+        if isinstance(obj, Product) and obj.id is not None:
+            pending.append(("delete", obj.id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_product_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        registry.apply(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_product_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _search_memory(db: Session, p: SearchParams, tokens: List[str]) -> Tuple[List[Product], int]:
+    idx = registry.get(db, p.owner_id)
+    scores = idx.match(tokens)
+    docs = idx.docs
+    cat = p.category.lower() if p.category and hasattr(Product, "category") else None
+
+    def ok(d: _Doc) -> bool:
+        if p.min_price is not None and d.price < p.min_price:
+            return False
+        if p.max_price is not None and d.price > p.max_price:
+            return False
+        if p.in_stock is not None and d.in_stock != bool(p.in_stock):
+            return False
+        return cat is None or d.category == cat
+
+    filtered = p.min_price is not None or p.max_price is not None or p.in_stock is not None or cat is not None
+    if filtered:
+        cands = [(pid, s, docs[pid]) for pid, s in scores.items() if pid in docs and ok(docs[pid])]
+    else:
+        cands = [(pid, s, docs[pid]) for pid, s in scores.items() if pid in docs]
+    total = len(cands)
+    k = p.offset + p.limit
+    if p.sort_by == "relevance":
+        top = heapq.nlargest(k, cands, key=lambda c: (c[1] * c[2].boost, c[0]))
+    else:
+        attr = {"price": "price", "created_at": "created", "updated_at": "updated",
+                "popularity": "popularity"}.get(p.sort_by, "updated")
+        key = lambda c: (getattr(c[2], attr) or 0, c[0])  # noqa: E731
+        top = (heapq.nsmallest if p.order == "asc" else heapq.nlargest)(k, cands, key=key)
+    ids = [c[0] for c in top[p.offset:k]]
+    if not ids:
+        return [], total
+    by_id = {r.id: r for r in db.execute(select(Product).where(Product.id.in_(ids))).scalars()}
+    return [by_id[i] for i in ids if i in by_id], total
+
+
+# ───────────────────────────── API ─────────────────────────────
+def backend_for(db: Session) -> str:
+    if BACKEND in ("pg", "memory"):
+        return BACKEND
+    try:
+        return "pg" if db.get_bind().dialect.name == "postgresql" else "memory"
+    except Exception:
+        return "memory"
+
+
+def search_products(db: Session, p: SearchParams) -> Tuple[List[Product], int, str]:
+    """(rows za ukurasa, total, backend)."""
+    tokens = tokenize(p.q)
+    if not tokens:
+        return [], 0, "none"
+    backend = backend_for(db)
+    if backend == "pg":
+        rows, total = _search_pg(db, p, tokens)
+    else:
+        rows, total = _search_memory(db, p, tokens)
+    return rows, total, backend
+
+
+def ensure_search_indexes(engine: Any) -> None:
+    """
+    Kwa DB zilizopo (create_all haiongezi indexes kwenye table iliyopo) —
+    Postgres pekee, pamoja na AUTO_CREATE_TABLES (dev/staging). Production
+    hupata extension na indexes kupitia alembic revision e4fa6b8c3d59
+    (CREATE INDEX CONCURRENTLY).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        if USE_TRGM:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)"
+            ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_products_search_tsv ON products USING gin (({SEARCH_TSV_SQL}))"
+        ))
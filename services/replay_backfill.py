@@ -0,0 +1,215 @@
+# backend/services/replay_backfill.py
+# -*- coding: utf-8 -*-
+"""
+Backfill ya title + caption + hashtags kwa maktaba yote ya replays.
+
+- Replays (live_streams zilizoisha) husomwa kwa keyset (`id > :cursor ORDER
+  BY id LIMIT :page`); bila `overwrite` zile zenye `replay_titles` tayari
+  huachwa kwenye SQL (NOT EXISTS), hivyo job ikirudiwa huendelea palipobaki.
+- Transcript ya kila ukurasa hutoka kwenye `replay_captions` kwa query MOJA
+  (stream_id IN ...), huunganishwa kwa ordinal na kukatwa urefu.
+- Ukurasa mzima huwasilishwa kwa services.ai_batcher kwa pamoja; batcher
+  huupakia kwenye prompts chache chini ya bajeti ya tokens. Job ni ya admin
+  juu ya replays zilizochapishwa (live_streams haina owner), hivyo owner wa
+  batcher ni BACKFILL_OWNER: haichanganywi na maombi ya users.
+- Matokeo huandikwa kwenye `replay_titles` (generated_title, keywords =
+  hashtags, meta.caption, tokens) kwa commit moja kwa ukurasa.
+
+Hali ya jobs huhifadhiwa kwenye memory ya process (`runner.jobs`).
+
+ENV:
+  REPLAY_BACKFILL_PAGE=64             replays kwa ukurasa
+  REPLAY_BACKFILL_TRANSCRIPT_CHARS=3000
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from backend.db import SessionLocal
+from backend.models.live_stream import LiveStream
+from backend.models.replay_caption import ReplayCaption
+from backend.models.replay_title import ReplayTitle, TitleSource
+from backend.services.ai_batcher import BatchItemResult, get_batcher
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+PAGE_SIZE = max(1, _env_int("REPLAY_BACKFILL_PAGE", 64))
+TRANSCRIPT_CHARS = max(200, _env_int("REPLAY_BACKFILL_TRANSCRIPT_CHARS", 3000))
+BACKFILL_OWNER = "system:replay-backfill"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class BackfillJob:
+    id: str
+    lang: str = "sw"
+    overwrite: bool = False
+    limit: Optional[int] = None
+    status: str = "queued"          # queued | running | done | failed | cancelled
+    cursor: int = 0
+    scanned: int = 0
+    generated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    tokens: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=_utcnow)
+    finished_at: Optional[datetime] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# ───────────────────────────── DB (sync, ndani ya thread) ─────────────────────────────
+def fetch_page(db: Session, cursor: int, limit: int, overwrite: bool) -> List[Tuple[int, str, str]]:
+    """[(stream_id, stream_title, transcript)] kwa replays zinazofuata baada ya cursor."""
+    q = (
+        select(LiveStream.id, LiveStream.title)
+        .where(LiveStream.ended_at.is_not(None), LiveStream.id > cursor)
+        .order_by(LiveStream.id)
+        .limit(limit)
+    )
+    if not overwrite:
+        q = q.where(~exists().where(ReplayTitle.live_stream_id == LiveStream.id))
+    streams = db.execute(q).all()
+    if not streams:
+        return []
+    parts: Dict[int, List[str]] = {}
+    sizes: Dict[int, int] = {}
+    rows = db.execute(
+        select(ReplayCaption.stream_id, ReplayCaption.caption_text)
+        .where(ReplayCaption.stream_id.in_([s.id for s in streams]))
+        .order_by(ReplayCaption.stream_id, ReplayCaption.ordinal)
+    )
+    for sid, text in rows:
+        if sizes.get(sid, 0) >= TRANSCRIPT_CHARS or not text:
+            continue
+        parts.setdefault(sid, []).append(text)
+        sizes[sid] = sizes.get(sid, 0) + len(text) + 1
+    return [(s.id, s.title or "", " ".join(parts.get(s.id, []))[:TRANSCRIPT_CHARS]) for s in streams]
+
+
+def save_results(db: Session, results: List[Tuple[int, BatchItemResult]], lang: str) -> int:
+    if not results:
+        return 0
+    ids = [sid for sid, _ in results]
+    existing = {
+        r.live_stream_id: r
+        for r in db.execute(select(ReplayTitle).where(ReplayTitle.live_stream_id.in_(ids))).scalars()
+    }
+    for sid, res in results:
+        row = existing.get(sid)
+        if row is None:
+            row = ReplayTitle(live_stream_id=sid)
+            db.add(row)
+        row.set_title(res.fields["title"])
+        row.lang = lang
+        row.source = TitleSource.ai
+        row.keywords = list(res.fields.get("hashtags") or [])
+        row.meta = {**(row.meta or {}), "caption": res.fields.get("caption"), "backfill": True}
+        row.model_name = res.model or None
+        row.prompt_tokens = int(res.usage.get("prompt_tokens", 0))
+        row.completion_tokens = int(res.usage.get("completion_tokens", 0))
+        row.total_tokens = int(res.usage.get("total_tokens", 0))
+    db.commit()
+    return len(results)
+
+
+# ───────────────────────────── Runner ─────────────────────────────
+class ReplayBackfillRunner:
+    def __init__(self, session_factory=SessionLocal, page_size: int = PAGE_SIZE) -> None:
+        self._session_factory = session_factory
+        self.page_size = page_size
+        self.jobs: Dict[str, BackfillJob] = {}
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+
+    async def _db(self, fn, *args, **kw):
+        def _call():
+            db = self._session_factory()
+            try:
+                return fn(db, *args, **kw)
+            finally:
+                db.close()
+        return await asyncio.to_thread(_call)
+
+    def running(self) -> List[BackfillJob]:
+        return [self.jobs[j] for j in self._tasks]
+
+    def start(self, *, lang: str = "sw", overwrite: bool = False, limit: Optional[int] = None) -> BackfillJob:
+        for jid in [j for j in self.jobs if j not in self._tasks][:-50]:
+            self.jobs.pop(jid, None)    # historia ya jobs zilizokwisha: 50 za mwisho
+        job = BackfillJob(id=uuid.uuid4().hex[:12], lang=lang, overwrite=overwrite, limit=limit)
+        self.jobs[job.id] = job
+        t = asyncio.get_running_loop().create_task(self.run(job), name=f"replay-backfill-{job.id}")
+        self._tasks[job.id] = t
+        t.add_done_callback(lambda _t, jid=job.id: self._tasks.pop(jid, None))
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        t = self._tasks.get(job_id)
+        if t is None:
+            return False
+        t.cancel()
+        return True
+
+    async def run(self, job: BackfillJob) -> BackfillJob:
+        job.status = "running"
+        batcher = get_batcher()
+        try:
+            while job.limit is None or job.scanned < job.limit:
+                page = self.page_size if job.limit is None else min(self.page_size, job.limit - job.scanned)
+                rows = await self._db(fetch_page, job.cursor, page, job.overwrite)
+                if not rows:
+                    break
+                todo: List[Tuple[int, str]] = []
+                for sid, title, transcript in rows:
+                    text = "\n".join(p for p in (title, transcript) if p)
+                    if len(text) < 20:
+                        job.skipped += 1
+                    else:
+                        todo.append((sid, text))
+                results = await batcher.submit_many("replay", [t for _, t in todo], job.lang, owner=BACKFILL_OWNER)
+                ok: List[Tuple[int, BatchItemResult]] = []
+                for (sid, _), res in zip(todo, results):
+                    if isinstance(res, BatchItemResult):
+                        ok.append((sid, res))
+                        job.tokens += int(res.usage.get("total_tokens", 0))
+                    else:
+                        job.failed += 1
+                        log.warning("replay backfill %s: stream %s failed: %s", job.id, sid, res)
+                job.generated += await self._db(save_results, ok, job.lang)
+                job.scanned += len(rows)
+                job.cursor = rows[-1][0]
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            log.exception("replay backfill %s failed", job.id)
+            job.status, job.error = "failed", str(e)[:500]
+        finally:
+            job.finished_at = _utcnow()
+        return job
+
+
+runner = ReplayBackfillRunner()
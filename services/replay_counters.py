@@ -0,0 +1,293 @@
+# backend/services/replay_counters.py
+# -*- coding: utf-8 -*-
+"""
+Write-behind ya kaunta za replay (views/likes/comments/shares/downloads).
+
+Increments hukusanywa ndani ya memory (shards kwa stream_id, lock kwa kila
+shard) badala ya INSERT+UPDATE kwa kila ombi. `flush_counters()` huunganisha
+deltas zote na kuziandika kwa transaction moja: UPDATE ya executemany kwa
+rows zilizopo + INSERT moja kwa zinazokosekana. Main lifespan huiendesha kila
+REPLAY_COUNTER_FLUSH_MS, au mapema pending ikifika REPLAY_COUNTER_FLUSH_MAX.
+
+Hifadhi: row moja ya ReplayAnalytics kwa (stream, metric, siku) — granularity
+`day`, platform/country NULL. `value` huongezwa kwa delta, `samples` kwa idadi
+ya increments zilizounganishwa. Jumla = SUM(value) ya rows hizo, hivyo row mbili
+za bucket moja (workers wawili wakiingiza kwa wakati mmoja) hazibadilishi
+matokeo.
+
+`get_counters` = thamani ya DB + delta ambayo bado haijaandikwa (ya process hii).
+Idempotency keys hukaguliwa kwenye TTL map yenye kikomo (kwa process).
+
+ENV:
+  REPLAY_COUNTER_SHARDS=16
+  REPLAY_COUNTER_FLUSH_MS=500
+  REPLAY_COUNTER_FLUSH_MAX=5000        increments zinazosubiri kabla ya flush ya mapema
+  REPLAY_IDEM_TTL_SEC=600
+  REPLAY_IDEM_MAX_KEYS=200000
+  REPLAY_COUNTER_BASE_TTL_SEC=5        muda wa cache ya jumla za DB (workers wengine huonekana baada yake)
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.replay_analytics import Granularity, ReplayAnalytics
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+SHARDS = max(1, _env_int("REPLAY_COUNTER_SHARDS", 16))
+FLUSH_MS = max(50, _env_int("REPLAY_COUNTER_FLUSH_MS", 500))
+FLUSH_MAX = max(1, _env_int("REPLAY_COUNTER_FLUSH_MAX", 5000))
+IDEM_TTL_SEC = max(1, _env_int("REPLAY_IDEM_TTL_SEC", 600))
+IDEM_MAX_KEYS = max(1, _env_int("REPLAY_IDEM_MAX_KEYS", 200_000))
+BASE_TTL_SEC = max(0, _env_int("REPLAY_COUNTER_BASE_TTL_SEC", 5))
+
+FIELDS = ("views", "likes", "comments", "shares", "downloads")
+
+
+def _today() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class _IdemKeys:
+    """(stream_id, key) → expiry; LRU yenye kikomo + TTL."""
+
+    def __init__(self, ttl: int = IDEM_TTL_SEC, max_keys: int = IDEM_MAX_KEYS) -> None:
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[Tuple[int, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, stream_id: int, key: str) -> bool:
+        now = time.monotonic()
+        k = (stream_id, key)
+        with self._lock:
+            exp = self._keys.get(k)
+            if exp is not None and exp > now:
+                return False
+            self._keys[k] = now + self.ttl
+            self._keys.move_to_end(k)
+            # ondoa zilizoisha (mwanzo wa OrderedDict ndio za zamani) + kikomo
+            while self._keys:
+                k0, e0 = next(iter(self._keys.items()))
+                if e0 > now and len(self._keys) <= self.max_keys:
+                    break
+                self._keys.popitem(last=False)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class _Shard:
+    __slots__ = ("lock", "pending", "events")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending: Dict[int, Dict[str, int]] = {}   # stream_id → {field: delta}
+        self.events: Dict[int, Dict[str, int]] = {}    # stream_id → {field: idadi ya increments}
+
+
+class ReplayCounters:
+    def __init__(self, shards: int = SHARDS, flush_max: int = FLUSH_MAX) -> None:
+        self._shards = [_Shard() for _ in range(shards)]
+        self._inflight: Dict[int, Dict[str, int]] = {}   # deltas zinazoandikwa sasa
+        self._inflight_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.idem = _IdemKeys()
+        self.flush_max = flush_max
+        self.flush_wanted = threading.Event()
+        self._pending_n = 0
+        self._base: Dict[int, Tuple[Dict[str, int], float]] = {}   # stream_id → (jumla za DB, expiry)
+        self._gen = 0          # huongezeka kila flush; read iliyopishana na flush haiwekwi cache
+        self._flushing = False
+        self.stats: Dict[str, int] = {"increments": 0, "deduped": 0, "flushes": 0, "rows_written": 0}
+
+    def _shard(self, stream_id: int) -> _Shard:
+        return self._shards[stream_id % len(self._shards)]
+
+    def increment(self, stream_id: int, incs: Dict[str, int], idempotency_key: Optional[str] = None) -> bool:
+        """Ongeza deltas kwenye memory. Hurudisha False ikiwa key imeshatumika."""
+        if idempotency_key and not self.idem.claim(stream_id, idempotency_key):
+            self.stats["deduped"] += 1
+            return False
+        sh = self._shard(stream_id)
+        with sh.lock:
+            cur = sh.pending.setdefault(stream_id, {})
+            ev = sh.events.setdefault(stream_id, {})
+            for f, v in incs.items():
+                cur[f] = cur.get(f, 0) + int(v)
+                ev[f] = ev.get(f, 0) + 1
+        self.stats["increments"] += 1
+        self._pending_n += 1
+        if self._pending_n >= self.flush_max:
+            self.flush_wanted.set()
+        return True
+
+    def pending_for(self, stream_id: int) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        sh = self._shard(stream_id)
+        with sh.lock:
+            for f, v in sh.pending.get(stream_id, {}).items():
+                out[f] = out.get(f, 0) + v
+        with self._inflight_lock:
+            for f, v in self._inflight.get(stream_id, {}).items():
+                out[f] = out.get(f, 0) + v
+        return out
+
+    def _db_totals(self, db: Session, stream_id: int) -> Dict[str, int]:
+        now = time.monotonic()
+        cached = self._base.get(stream_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        gen, busy = self._gen, self._flushing
+        rows = db.execute(
+            select(ReplayAnalytics.metric, func.coalesce(func.sum(ReplayAnalytics.value), 0))
+            .where(
+                ReplayAnalytics.live_stream_id == stream_id,
+                ReplayAnalytics.metric.in_(FIELDS),
+                ReplayAnalytics.granularity == Granularity.day,
+                ReplayAnalytics.platform.is_(None),
+                ReplayAnalytics.country.is_(None),
+            )
+            .group_by(ReplayAnalytics.metric)
+        ).all()
+        totals = {f: 0 for f in FIELDS}
+        for metric, total in rows:
+            totals[metric] = int(total or 0)
+        if BASE_TTL_SEC and not busy and not self._flushing and gen == self._gen:
+            self._base[stream_id] = (totals, now + BASE_TTL_SEC)
+        return totals
+
+    def get_counters(self, db: Session, stream_id: int) -> Dict[str, int]:
+        """Jumla za DB (cache fupi) + deltas ambazo bado hazijaandikwa."""
+        out = {"stream_id": stream_id, **self._db_totals(db, stream_id)}
+        for f, v in self.pending_for(stream_id).items():
+            out[f] += v
+        return out
+
+    def _drain(self) -> Tuple[Dict[int, Dict[str, int]], Dict[int, Dict[str, int]]]:
+        """Hamisha pending → inflight (lock order: shard → inflight, sawa na pending_for)."""
+        merged: Dict[int, Dict[str, int]] = {}
+        events: Dict[int, Dict[str, int]] = {}
+        for sh in self._shards:
+            with sh.lock:
+                if sh.pending:
+                    with self._inflight_lock:
+                        self._inflight.update(sh.pending)
+                    merged.update(sh.pending)
+                    events.update(sh.events)
+                    sh.pending, sh.events = {}, {}
+        self._pending_n = 0
+        self.flush_wanted.clear()
+        return merged, events
+
+    def flush(self, db: Session) -> Dict[str, int]:
+        """Andika deltas zote kwa transaction moja; zikishindwa hurudishwa kwenye pending."""
+        with self._flush_lock:
+            self._flushing = True
+            try:
+                deltas, events = self._drain()
+                if not deltas:
+                    return {"streams": 0, "updated": 0, "inserted": 0}
+                try:
+                    res = _write(db, deltas, _today(), events)
+                except Exception:
+                    db.rollback()
+                    self._restore(deltas, events)
+                    raise
+                finally:
+                    with self._inflight_lock:
+                        self._inflight = {}
+                for sid in deltas:
+                    self._base.pop(sid, None)
+            finally:
+                self._gen += 1
+                self._flushing = False
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += res["updated"] + res["inserted"]
+            return res
+
+    def _restore(self, deltas: Dict[int, Dict[str, int]], events: Dict[int, Dict[str, int]]) -> None:
+        for sid, incs in deltas.items():
+            sh = self._shard(sid)
+            with sh.lock:
+                cur = sh.pending.setdefault(sid, {})
+                ev = sh.events.setdefault(sid, {})
+                for f, v in incs.items():
+                    cur[f] = cur.get(f, 0) + v
+                    ev[f] = ev.get(f, 0) + events.get(sid, {}).get(f, 0)
+
+
+def _write(
+    db: Session,
+    deltas: Dict[int, Dict[str, int]],
+    day: dt.datetime,
+    events: Optional[Dict[int, Dict[str, int]]] = None,
+) -> Dict[str, int]:
+    """`events` = idadi ya increments kwa (stream, metric) → `samples`; bila hiyo samples haibadiliki."""
+    t = ReplayAnalytics.__table__
+    events = events or {}
+    existing: Dict[Tuple[int, str], int] = {}
+    for rid, sid, metric in db.execute(
+        select(ReplayAnalytics.id, ReplayAnalytics.live_stream_id, ReplayAnalytics.metric).where(
+            ReplayAnalytics.live_stream_id.in_(list(deltas)),
+            ReplayAnalytics.metric.in_(FIELDS),
+            ReplayAnalytics.granularity == Granularity.day,
+            ReplayAnalytics.period_start == day,
+            ReplayAnalytics.platform.is_(None),
+            ReplayAnalytics.country.is_(None),
+        )
+    ):
+        existing.setdefault((sid, metric), rid)
+
+    ups: List[Dict[str, int]] = []
+    ins: List[Dict[str, object]] = []
+    for sid, incs in deltas.items():
+        for metric, v in incs.items():
+            if not v:
+                continue
+            n = events.get(sid, {}).get(metric, 0)
+            rid = existing.get((sid, metric))
+            if rid is not None:
+                ups.append({"b_id": rid, "b_delta": v, "b_events": n})
+            else:
+                ins.append({
+                    "live_stream_id": sid, "metric": metric, "value": float(v), "samples": n,
+                    "granularity": Granularity.day, "period_start": day,
+                })
+    if ups:
+        db.execute(
+            update(t)
+            .where(t.c.id == bindparam("b_id"))
+            .values(value=t.c.value + bindparam("b_delta"), samples=t.c.samples + bindparam("b_events"),
+                    updated_at=func.now()),
+            ups,
+        )
+    if ins:
+        db.execute(insert(ReplayAnalytics), ins)
+    db.commit()
+    return {"streams": len(deltas), "updated": len(ups), "inserted": len(ins)}
+
+
+counters = ReplayCounters()
+
+
+def flush_counters(db: Session, agg: ReplayCounters = counters) -> Dict[str, int]:
+    return agg.flush(db)
@@ -0,0 +1,175 @@
+# backend/services/trending_index.py
+# -*- coding: utf-8 -*-
+"""
+Index ya trending iliyopangwa mapema kwa `/explore/trending`.
+
+Background loop (main lifespan) husoma live streams zote kila
+TRENDING_REFRESH_SEC, hukokotoa alama za hybrid/viewers/gifts/recent mara moja,
+na kuhifadhi "snapshot" yenye orodha iliyopangwa kwa kila algo. Request ni
+kukata kipande (slice) tu cha orodha hiyo — hakuna `count()` wala kuvuta
+mamia ya ORM rows kwa kila ombi.
+
+Views kwa filter (language, category, country, min_viewers) hutengenezwa mara
+ya kwanza zinapoombwa ndani ya snapshot na kuhifadhiwa hadi snapshot ijayo;
+mpangilio wa orodha ya msingi huhifadhiwa, hivyo ETag ni thabiti kati ya
+refreshes ikiwa ukurasa haujabadilika.
+
+ENV:
+  TRENDING_REFRESH_SEC=5
+  TRENDING_MAX_STALE_SEC=30   (snapshot ya zamani kuliko hii → route hurudi SQL)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from backend.models.live_stream import LiveStream
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+REFRESH_SEC = max(1, _env_int("TRENDING_REFRESH_SEC", 5))
+MAX_STALE_SEC = max(REFRESH_SEC, _env_int("TRENDING_MAX_STALE_SEC", 30))
+
+ALGOS = ("hybrid", "viewers", "gifts", "recent")
+DIMS = tuple(d for d in ("language", "category", "country") if hasattr(LiveStream, d))
+
+ViewKey = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[int]]
+
+
+def hybrid_score(v: int, g: int, started_at: Optional[datetime], now: Optional[datetime] = None) -> float:
+    """score = (viewers*10 + gifts*3) * 0.8 ** hours_since_start"""
+    v = max(0, v or 0)
+    g = max(0, g or 0)
+    age_h = 0.0
+    if started_at:
+        if started_at.tzinfo is None:
+            started_at = started_at.replace(tzinfo=timezone.utc)
+        age_h = max(0.0, ((now or datetime.now(timezone.utc)) - started_at).total_seconds() / 3600.0)
+    return (v * 10.0 + g * 3.0) * (0.8 ** age_h)
+
+
+def _ts(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TrendingSnapshot:
+    """Orodha zilizopangwa za streams za live (immutable baada ya kujengwa)."""
+
+    def __init__(self, rows: List[Any], *, built_at: float, version: int) -> None:
+        now = datetime.fromtimestamp(built_at, timezone.utc)
+        self.built_at = built_at
+        self.version = version
+        self.rows = rows
+        self._viewers = [int(getattr(r, "viewers_count", 0) or 0) for r in rows]
+        scores: Dict[str, List[float]] = {
+            "viewers": [float(v) for v in self._viewers],
+            "gifts": [float(getattr(r, "gifts_count", 0) or 0) for r in rows],
+            "recent": [_ts(getattr(r, "started_at", None)) for r in rows],
+        }
+        scores["hybrid"] = [
+            hybrid_score(v, int(g), getattr(r, "started_at", None), now)
+            for r, v, g in zip(rows, self._viewers, scores["gifts"])
+        ]
+        ids = [int(getattr(r, "id", 0) or 0) for r in rows]
+        # score desc, kisha id desc (sawa na sort ya zamani: stable, hakuna shuffle)
+        self._order: Dict[str, List[int]] = {
+            algo: sorted(range(len(rows)), key=lambda i, s=scores[algo]: (s[i], ids[i]), reverse=True)
+            for algo in ALGOS
+        }
+        self._views: Dict[ViewKey, List[Any]] = {}
+
+    def view(
+        self,
+        algo: str,
+        *,
+        language: Optional[str] = None,
+        category: Optional[str] = None,
+        country: Optional[str] = None,
+        min_viewers: Optional[int] = None,
+    ) -> List[Any]:
+        if algo not in self._order:
+            algo = "hybrid"
+        # filters za columns ambazo model haina hupuuzwa (kama _apply_common_filters)
+        filters = {
+            d: val for d, val in (("language", language), ("category", category), ("country", country))
+            if val and d in DIMS
+        }
+        mv = int(min_viewers) if min_viewers else None
+        key: ViewKey = (algo, filters.get("language"), filters.get("category"), filters.get("country"), mv)
+        cached = self._views.get(key)
+        if cached is not None:
+            return cached
+        out = [
+            self.rows[i]
+            for i in self._order[algo]
+            if (mv is None or self._viewers[i] >= mv)
+            and all(getattr(self.rows[i], d, None) == val for d, val in filters.items())
+        ]
+        self._views[key] = out
+        return out
+
+
+class TrendingIndex:
+    def __init__(self) -> None:
+        self._snap: Optional[TrendingSnapshot] = None
+        self._version = 0
+        self.last_build_ms = 0.0
+
+    def snapshot(self, *, max_stale: float = MAX_STALE_SEC) -> Optional[TrendingSnapshot]:
+        snap = self._snap
+        if snap is None or time.time() - snap.built_at > max_stale:
+            return None
+        return snap
+
+    def load(self, rows: List[Any]) -> TrendingSnapshot:
+        t0 = time.perf_counter()
+        self._version += 1
+        snap = TrendingSnapshot(rows, built_at=time.time(), version=self._version)
+        self._snap = snap  # badiliko la atomic; readers huona snapshot nzima au ya zamani
+        self.last_build_ms = (time.perf_counter() - t0) * 1000.0
+        return snap
+
+    def refresh(self, db: Session) -> int:
+        """Soma live streams zote na ujenge snapshot mpya."""
+        q = db.query(LiveStream)
+        if hasattr(LiveStream, "is_live"):
+            q = q.filter(LiveStream.is_live.is_(True))
+        rows = q.all()
+        db.expunge_all()  # rows huishi zaidi ya session (attrs zilizopakiwa tu hutumika)
+        self.load(rows)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snap
+        return {
+            "ready": snap is not None,
+            "version": snap.version if snap else 0,
+            "streams": len(snap.rows) if snap else 0,
+            "age_sec": round(time.time() - snap.built_at, 1) if snap else None,
+            "views": len(snap._views) if snap else 0,
+            "build_ms": round(self.last_build_ms, 1),
+        }
+
+
+trending_index = TrendingIndex()
+
+
+def refresh_trending(db: Session, index: TrendingIndex = trending_index) -> int:
+    return index.refresh(db)
@@ -0,0 +1,376 @@
+# backend/services/wallet_ledger.py
+# -*- coding: utf-8 -*-
+"""
+Engine ya CoinWallet: ledger ndiyo chanzo cha ukweli, balance ni cache yake.
+
+- credit(): INSERT moja kwenye `coin_wallet_txns` (folded=false) + commit —
+  hakuna lock ya row ya wallet, hivyo host anayepokea maelfu ya credits kwa
+  dakika hapangi foleni nyuma ya row moja. Idempotency = UNIQUE(wallet_id,
+  idempotency_key); duplicate hurudisha row iliyopo ikiwa type na amount
+  zinalingana, vinginevyo `IdempotencyMismatch` (key imetumika kwa ombi jingine).
+- compact(): chini ya lock fupi ya wallet, credits ambazo hazijakunjwa
+  husomwa (ids + delta), huwekwa folded=true kwa ids hizo hizo na jumla
+  yake huongezwa kwenye `balance`. Huendeshwa na loop ya main lifespan kila
+  WALLET_COMPACT_INTERVAL_MS, au mapema wallet ikifikisha
+  WALLET_COMPACT_THRESHOLD credits ambazo hazijakunjwa (kwa process hii).
+- debit(): lock ya wallet (FOR UPDATE); balance isipotosha, credits
+  zinazosubiri hukunjwa kwanza ndani ya lock hiyo hiyo, kisha ukaguzi wa
+  salio. Credits huongeza tu, kwa hiyo salio halishuki chini ya sifuri.
+- available() = balance + SUM(delta ya rows ambazo hazijakunjwa).
+- reconcile(): hulinganisha balance na SUM(delta WHERE folded) kwa kila
+  wallet; `fix=True` huandika upya balance kutoka ledger chini ya lock,
+  isipokuwa wallet haina rows zilizokunjwa kabisa (migration huweka
+  `opening` kwa wallets za zamani).
+
+ENV:
+  WALLET_COMPACT_INTERVAL_MS=1000
+  WALLET_COMPACT_THRESHOLD=200       credits zisizokunjwa kabla ya compaction ya mapema
+  WALLET_COMPACT_MAX_ROWS=5000       rows kwa kila pasi ya compaction ya wallet moja
+  WALLET_COMPACT_MAX_WALLETS=500     wallets kwa kila pasi ya compact_pending
+"""
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models.coin_wallet import CoinWallet
+from backend.models.coin_wallet_txn import CoinWalletTxn
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+COMPACT_INTERVAL_MS = max(50, _env_int("WALLET_COMPACT_INTERVAL_MS", 1000))
+COMPACT_THRESHOLD = max(1, _env_int("WALLET_COMPACT_THRESHOLD", 200))
+COMPACT_MAX_ROWS = max(1, _env_int("WALLET_COMPACT_MAX_ROWS", 5000))
+COMPACT_MAX_WALLETS = max(1, _env_int("WALLET_COMPACT_MAX_WALLETS", 500))
+
+ZERO = Decimal("0")
+
+
+class WalletError(Exception):
+    pass
+
+
+class WalletNotFound(WalletError):
+    pass
+
+
+class InsufficientFunds(WalletError):
+    pass
+
+
+class IdempotencyMismatch(WalletError):
+    """Idempotency key tayari imetumika kwa type/amount tofauti."""
+
+
+@dataclass
+class Posted:
+    txn: CoinWalletTxn
+    duplicate: bool = False
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _dec(v: Any) -> Decimal:
+    return v if isinstance(v, Decimal) else Decimal(str(v or 0))
+
+
+class _Hot:
+    """wallet_id → credits zilizoingia tangu compaction ya mwisho (kwa process)."""
+
+    def __init__(self, threshold: int = COMPACT_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._n: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.flush_wanted = threading.Event()
+
+    def note(self, wallet_id: int) -> None:
+        with self._lock:
+            n = self._n.get(wallet_id, 0) + 1
+            self._n[wallet_id] = n
+        if n >= self.threshold:
+            self.flush_wanted.set()
+
+    def reset(self, wallet_id: int) -> None:
+        with self._lock:
+            self._n.pop(wallet_id, None)
+
+
+hot = _Hot()
+
+
+# ───────────────────────────── Reads ─────────────────────────────
+def pending_credits(db: Session, wallet_id: int) -> Decimal:
+    total = db.execute(
+        select(func.coalesce(func.sum(CoinWalletTxn.delta), 0)).where(
+            CoinWalletTxn.wallet_id == wallet_id, CoinWalletTxn.folded.is_(False)
+        )
+    ).scalar()
+    return _dec(total)
+
+
+def available(db: Session, wallet: CoinWallet) -> Decimal:
+    return _dec(wallet.balance) + pending_credits(db, wallet.id)
+
+
+def _by_key(db: Session, wallet_id: int, key: str) -> Optional[CoinWalletTxn]:
+    return db.execute(
+        select(CoinWalletTxn).where(CoinWalletTxn.wallet_id == wallet_id, CoinWalletTxn.idempotency_key == key)
+    ).scalar_one_or_none()
+
+
+def _replay(dup: CoinWalletTxn, type: str, amount: Decimal) -> "Posted":
+    if dup.type != type or _dec(dup.amount) != amount:
+        raise IdempotencyMismatch(
+            f"idempotency key already used for {dup.type} {dup.amount} (got {type} {amount})"
+        )
+    return Posted(dup, duplicate=True)
+
+
+def _lock(db: Session, wallet_id: int, *, skip_locked: bool = False) -> Optional[CoinWallet]:
+    return db.execute(
+        select(CoinWallet).where(CoinWallet.id == wallet_id).with_for_update(skip_locked=skip_locked)
+    ).scalar_one_or_none()
+
+
+# ───────────────────────────── Writes ─────────────────────────────
+def credit(
+    db: Session,
+    wallet_id: int,
+    amount: Decimal,
+    *,
+    type: str = "deposit",
+    currency: Optional[str] = None,
+    reference: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Posted:
+    """Ongeza credit kwenye ledger (bila lock ya wallet) na commit."""
+    if amount <= ZERO:
+        raise ValueError("credit amount must be positive")
+    txn = CoinWalletTxn(
+        wallet_id=wallet_id, type=type, amount=amount, delta=amount, folded=False,
+        currency=currency, reference=reference, idempotency_key=idempotency_key, created_at=_utcnow(),
+    )
+    db.add(txn)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        dup = _by_key(db, wallet_id, idempotency_key) if idempotency_key else None
+        if dup is None:
+            raise WalletNotFound(wallet_id)
+        return _replay(dup, type, amount)
+    hot.note(wallet_id)
+    return Posted(txn)
+
+
+def _fold_locked(db: Session, wallet: CoinWallet, max_rows: int = COMPACT_MAX_ROWS) -> Decimal:
+    """Kunja credits zinazosubiri kwenye balance (wallet iwe tayari imeshikwa lock)."""
+    folded = ZERO
+    while True:
+        rows = db.execute(
+            select(CoinWalletTxn.id, CoinWalletTxn.delta)
+            .where(CoinWalletTxn.wallet_id == wallet.id, CoinWalletTxn.folded.is_(False))
+            .order_by(CoinWalletTxn.id)
+            .limit(max_rows)
+        ).all()
+        if not rows:
+            break
+        # ids zilezile zilizosomwa → credit iliyocommit baadaye haiguswi hadi pasi ijayo
+        res = db.execute(
+            update(CoinWalletTxn)
+            .where(CoinWalletTxn.id.in_([r.id for r in rows]), CoinWalletTxn.folded.is_(False))
+            .values(folded=True)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount != len(rows):
+            # compaction nyingine ilizikunja kwanza (DB isiyo na row locks, k.m. SQLite)
+            raise WalletError(f"concurrent compaction on wallet {wallet.id}")
+        folded += sum((_dec(r.delta) for r in rows), ZERO)
+        if len(rows) < max_rows:
+            break
+    if folded:
+        wallet.balance = _dec(wallet.balance) + folded
+        wallet.compacted_at = _utcnow()
+    return folded
+
+
+def debit(
+    db: Session,
+    wallet_id: int,
+    amount: Decimal,
+    *,
+    type: str = "withdraw",
+    currency: Optional[str] = None,
+    reference: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Posted:
+    """Toa kiasi kwa atomiki (lock ya wallet); InsufficientFunds salio lisipotosha."""
+    if amount <= ZERO:
+        raise ValueError("debit amount must be positive")
+    w = _lock(db, wallet_id)
+    if w is None:
+        db.rollback()
+        raise WalletNotFound(wallet_id)
+    if idempotency_key:
+        dup = _by_key(db, wallet_id, idempotency_key)
+        if dup is not None:
+            db.rollback()
+            return _replay(dup, type, amount)
+    if _dec(w.balance) < amount:
+        _fold_locked(db, w)
+    if _dec(w.balance) < amount:
+        db.commit()   # hifadhi compaction iliyofanyika
+        hot.reset(wallet_id)
+        raise InsufficientFunds(wallet_id)
+    w.balance = _dec(w.balance) - amount
+    txn = CoinWalletTxn(
+        wallet_id=wallet_id, type=type, amount=amount, delta=-amount, balance_after=w.balance, folded=True,
+        currency=currency, reference=reference, idempotency_key=idempotency_key, created_at=_utcnow(),
+    )
+    db.add(txn)
+    db.commit()
+    return Posted(txn)
+
+
+def set_balance(db: Session, wallet_id: int, target: Decimal, *, reference: Optional[str] = None) -> CoinWallet:
+    """(Admin) weka salio; tofauti huandikwa kama `adjust` ili ledger ibaki kuwa ukweli."""
+    w = _lock(db, wallet_id)
+    if w is None:
+        db.rollback()
+        raise WalletNotFound(wallet_id)
+    _fold_locked(db, w)
+    delta = target - _dec(w.balance)
+    if delta:
+        w.balance = target
+        db.add(CoinWalletTxn(
+            wallet_id=wallet_id, type="adjust", amount=abs(delta), delta=delta, balance_after=target,
+            folded=True, currency=w.currency, reference=reference, created_at=_utcnow(),
+        ))
+    db.commit()
+    hot.reset(wallet_id)
+    return w
+
+
+def open_wallet(db: Session, wallet: CoinWallet, opening: Decimal) -> None:
+    """Ongeza wallet mpya (na row ya `opening` kama salio la mwanzo > 0); mwitaji hufanya commit."""
+    db.add(wallet)
+    db.flush()
+    if opening > ZERO:
+        db.add(CoinWalletTxn(
+            wallet_id=wallet.id, type="opening", amount=opening, delta=opening, balance_after=opening,
+            folded=True, currency=wallet.currency, created_at=_utcnow(),
+        ))
+
+
+# ───────────────────────────── Compaction ─────────────────────────────
+def compact(db: Session, wallet_id: int) -> Decimal:
+    """Kunja credits za wallet moja; wallet ikiwa imeshikwa (debit) inarukwa pasi hii."""
+    w = _lock(db, wallet_id, skip_locked=True)
+    if w is None:
+        db.rollback()
+        return ZERO
+    try:
+        folded = _fold_locked(db, w)
+    except WalletError:
+        db.rollback()
+        return ZERO
+    db.commit()
+    hot.reset(wallet_id)
+    return folded
+
+
+def compact_pending(db: Session, max_wallets: int = COMPACT_MAX_WALLETS) -> Dict[str, Any]:
+    """Pasi moja: wallets zenye credits zisizokunjwa (zenye nyingi kwanza)."""
+    hot.flush_wanted.clear()
+    n = func.count(CoinWalletTxn.id)
+    wallet_ids = db.execute(
+        select(CoinWalletTxn.wallet_id)
+        .where(CoinWalletTxn.folded.is_(False))
+        .group_by(CoinWalletTxn.wallet_id)
+        .order_by(n.desc())
+        .limit(max_wallets)
+    ).scalars().all()
+    db.rollback()
+    total = ZERO
+    for wid in wallet_ids:
+        try:
+            total += compact(db, wid)
+        except Exception as e:
+            db.rollback()
+            log.warning("wallet compaction failed for %s: %s", wid, e)
+    return {"wallets": len(wallet_ids), "folded": total}
+
+
+# ───────────────────────────── Reconciliation ─────────────────────────────
+def reconcile(db: Session, *, fix: bool = False, wallet_ids: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Linganisha `coin_wallets.balance` na SUM(delta) ya rows zilizokunjwa.
+    Hurudisha tofauti zilizopatikana; `fix=True` huweka balance = ledger.
+    Wallet isiyo na row yoyote iliyokunjwa (hakuna `opening`) hairekebishwi
+    kamwe: ledger yake haijulikani, si sifuri (`reason="no_ledger"`).
+    """
+    sums = (
+        select(CoinWalletTxn.wallet_id.label("wallet_id"), func.sum(CoinWalletTxn.delta).label("ledger"))
+        .where(CoinWalletTxn.folded.is_(True))
+        .group_by(CoinWalletTxn.wallet_id)
+        .subquery()
+    )
+    q = select(CoinWallet.id, CoinWallet.balance, func.coalesce(sums.c.ledger, 0)).outerjoin(
+        sums, sums.c.wallet_id == CoinWallet.id
+    )
+    if wallet_ids is not None:
+        q = q.where(CoinWallet.id.in_(list(wallet_ids)))
+    suspects = [(wid, _dec(bal), _dec(led)) for wid, bal, led in db.execute(q) if _dec(bal) != _dec(led)]
+    db.rollback()
+
+    out: List[Dict[str, Any]] = []
+    for wid, bal, led in suspects:
+        # hakiki tena chini ya lock (compaction/debit inaweza kuwa ilikuwa katikati)
+        w = _lock(db, wid)
+        if w is None:
+            db.rollback()
+            continue
+        n_rows, ledger = db.execute(
+            select(func.count(CoinWalletTxn.id), func.coalesce(func.sum(CoinWalletTxn.delta), 0)).where(
+                and_(CoinWalletTxn.wallet_id == wid, CoinWalletTxn.folded.is_(True))
+            )
+        ).one()
+        ledger = _dec(ledger)
+        balance = _dec(w.balance)
+        if balance == ledger:
+            db.rollback()
+            continue
+        row = {"wallet_id": wid, "balance": balance, "ledger": ledger, "diff": balance - ledger, "fixed": False}
+        if not n_rows:
+            row["reason"] = "no_ledger"
+        if fix and n_rows and ledger >= ZERO:
+            w.balance = ledger
+            db.commit()
+            row["fixed"] = True
+        else:
+            db.rollback()
+        log.warning(
+            "wallet %s out of balance: balance=%s ledger=%s fixed=%s%s",
+            wid, balance, ledger, row["fixed"], " (no ledger rows)" if not n_rows else "",
+        )
+        out.append(row)
+    return out
@@ -0,0 +1,341 @@
+# backend/services/webhook_engine.py
+# -*- coding: utf-8 -*-
+"""
+Webhook delivery engine (background, non-blocking).
+
+Request path huandika tu kwenye `webhook_events` (crud.webhook_queue_crud
+.enqueue_event / utils.webhook_sender.send_webhook) na kurudi mara moja.
+Engine hii:
+
+- huchukua events zilizofika muda kwa lease (`FOR UPDATE SKIP LOCKED`), hivyo
+  workers/instances wengi hushiriki foleni;
+- hutuma kwa pamoja kupitia utils.http_client (keep-alive pool kwa host), na
+  kikomo cha concurrency kwa kila endpoint;
+- circuit breaker kwa endpoint: baada ya makosa mfululizo N, endpoint
+  "hufunguliwa" kwa cooldown; events zake haziguswi (haziongezi attempt) hadi
+  probe moja ifanikiwe;
+- retries ni `next_attempt_at` ya baadaye (exponential backoff), si sleep;
+- matokeo (hali za events + WebhookDeliveryLog) huandikwa kwa makundi.
+
+Headers kwa receiver: X-Signature (HMAC-SHA256 ya body, kama secret ipo),
+X-Webhook-Event, X-Webhook-Id (id ya event; tumia kwa idempotency),
+X-Webhook-Attempt.
+
+ENV:
+  ENABLE_WEBHOOK_ENGINE=true
+  WEBHOOK_BATCH=200                  events kwa claim
+  WEBHOOK_MAX_INFLIGHT=1000          claimed-but-unfinished kwa process
+  WEBHOOK_ENDPOINT_CONCURRENCY=4     sends kwa wakati mmoja kwa endpoint
+  WEBHOOK_LEASE_SECONDS=60
+  WEBHOOK_TIMEOUT=10                 sekunde kwa ombi moja
+  WEBHOOK_POLL_INTERVAL=1
+  WEBHOOK_FLUSH_INTERVAL=0.5
+  WEBHOOK_RETRY_BASE_SECONDS=30
+  WEBHOOK_BREAKER_THRESHOLD=5        makosa mfululizo kabla ya kufungua
+  WEBHOOK_BREAKER_COOLDOWN=30        sekunde (huongezeka mara mbili hadi 600)
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from backend.crud import webhook_queue_crud as queue
+from backend.db import SessionLocal
+from backend.utils.http_client import get_http
+from backend.utils.lease_worker import LeaseWorker
+
+log = logging.getLogger("smartbiz.webhook_engine")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(k: str, default: float) -> float:
+    try:
+        return float(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Hali za 4xx ambazo kurudia hakutasaidia (isipokuwa timeout/too-early/rate-limit)
+RETRYABLE_4XX = {408, 425, 429}
+MAX_COOLDOWN = 600.0
+
+
+class CircuitBreaker:
+    """closed → (N makosa mfululizo) → open (cooldown) → half-open (probe 1) → closed/open."""
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = max(1, threshold)
+        self.base_cooldown = cooldown
+        self.failures = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.probing = False
+
+    def is_open(self, now: float) -> bool:
+        return self.open_until > now or self.probing
+
+    def allow(self, now: float) -> bool:
+        if self.open_until == 0.0:
+            return True
+        if now < self.open_until or self.probing:
+            return False
+        self.probing = True  # half-open: ombi moja tu
+        return True
+
+    def record(self, ok: bool, now: float) -> None:
+        if ok:
+            self.failures = 0
+            self.open_until = 0.0
+            self.cooldown = self.base_cooldown
+            self.probing = False
+            return
+        self.failures += 1
+        if self.probing:
+            self.probing = False
+            self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+            self.open_until = now + self.cooldown
+        elif self.failures >= self.threshold:
+            self.open_until = now + self.cooldown
+
+
+def sign(secret: Optional[str], body: bytes) -> Optional[str]:
+    if not secret:
+        return None
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class WebhookEngine(LeaseWorker):
+    """Claim → deliver (per-endpoint caps + breakers) → buffered bulk writes (utils.lease_worker)."""
+
+    name = "Webhook engine"
+    log = log
+
+    def __init__(
+        self,
+        *,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+        endpoint_concurrency: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        timeout: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        retry_base_seconds: Optional[int] = None,
+        breaker_threshold: Optional[int] = None,
+        breaker_cooldown: Optional[float] = None,
+    ) -> None:
+        super().__init__(
+            session_factory=session_factory,
+            batch=batch or max(1, _env_int("WEBHOOK_BATCH", 200)),
+            max_inflight=max_inflight or max(1, _env_int("WEBHOOK_MAX_INFLIGHT", 1000)),
+            lease_seconds=lease_seconds or max(10, _env_int("WEBHOOK_LEASE_SECONDS", 60)),
+            poll_interval=poll_interval or _env_float("WEBHOOK_POLL_INTERVAL", 1.0),
+            flush_interval=flush_interval or _env_float("WEBHOOK_FLUSH_INTERVAL", 0.5),
+        )
+        self.endpoint_concurrency = endpoint_concurrency or max(1, _env_int("WEBHOOK_ENDPOINT_CONCURRENCY", 4))
+        self.timeout = timeout or _env_float("WEBHOOK_TIMEOUT", 10.0)
+        self.retry_base_seconds = retry_base_seconds or _env_int("WEBHOOK_RETRY_BASE_SECONDS", 30)
+        self.breaker_threshold = breaker_threshold or _env_int("WEBHOOK_BREAKER_THRESHOLD", 5)
+        self.breaker_cooldown = breaker_cooldown or _env_float("WEBHOOK_BREAKER_COOLDOWN", 30.0)
+
+        self._sems: Dict[int, asyncio.Semaphore] = {}
+        self._breakers: Dict[int, CircuitBreaker] = {}
+        self._results: List[Dict[str, Any]] = []
+        self._deferred: Dict[float, List[int]] = defaultdict(list)  # open_until (monotonic) → ids
+
+    def _describe(self) -> str:
+        return f"batch={self.batch} inflight={self.max_inflight} per-endpoint={self.endpoint_concurrency}"
+
+    # ----- limits / breakers -----
+    def _sem(self, endpoint_id: int) -> asyncio.Semaphore:
+        sem = self._sems.get(endpoint_id)
+        if sem is None:
+            sem = self._sems[endpoint_id] = asyncio.Semaphore(self.endpoint_concurrency)
+        return sem
+
+    def _breaker(self, endpoint_id: int) -> CircuitBreaker:
+        br = self._breakers.get(endpoint_id)
+        if br is None:
+            br = self._breakers[endpoint_id] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return br
+
+    def _excluded(self) -> List[int]:
+        now = time.monotonic()
+        cap = self.endpoint_concurrency * 4
+        out = {e for e, n in self._inflight.items() if n >= cap}
+        out.update(e for e, br in self._breakers.items() if br.is_open(now))
+        return sorted(out)
+
+    def open_endpoints(self) -> List[int]:
+        now = time.monotonic()
+        return sorted(e for e, br in self._breakers.items() if br.is_open(now))
+
+    def _group(self, ev: Dict[str, Any]) -> int:
+        return ev["endpoint_id"]
+
+    # ----- claim -----
+    def _claim_sync(self, limit: int, exclude: List[int]) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            return queue.claim_due_events(db, _utcnow(), limit=limit, lease_seconds=self.lease_seconds,
+                                          exclude_endpoints=exclude)
+        finally:
+            db.close()
+
+    # ----- deliver -----
+    async def _handle(self, ev: Dict[str, Any]) -> None:
+        eid = ev["endpoint_id"]
+        try:
+            if not ev.get("active") or not ev.get("url"):
+                self._result(ev, ok=False, error="endpoint inactive or missing", permanent=True)
+                return
+            async with self._sem(eid):
+                br = self._breaker(eid)
+                if not br.allow(time.monotonic()):
+                    # breaker wazi: rudisha bila kuhesabu attempt, jaribu baada ya cooldown
+                    self._deferred[br.open_until].append(ev["id"])
+                    self.stats["deferred"] += 1
+                    return
+                ok = await self._post(ev)
+                br.record(ok, time.monotonic())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # pragma: no cover
+            self._result(ev, ok=False, error=f"{type(e).__name__}: {e}")
+
+    async def _post(self, ev: Dict[str, Any]) -> bool:
+        body = ev["payload"].encode("utf-8") if isinstance(ev["payload"], str) else bytes(ev["payload"])
+        signature = sign(ev.get("secret"), body)
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Event": str(ev["event_type"]),
+            "X-Webhook-Id": str(ev["id"]),
+            "X-Webhook-Attempt": str(ev["attempt"] + 1),
+        }
+        if signature:
+            headers["X-Signature"] = signature
+        sent_at = _utcnow()
+        t0 = time.perf_counter()
+        try:
+            res = await get_http().apost(ev["url"], content=body, headers=headers, timeout=self.timeout)
+        except Exception as e:
+            self._result(ev, ok=False, error=f"{type(e).__name__}: {e}" if str(e) else type(e).__name__,
+                         headers=headers, signature=signature, sent_at=sent_at,
+                         duration_ms=int((time.perf_counter() - t0) * 1000))
+            return False
+        code = res.status_code
+        ok = 200 <= code < 300
+        self._result(
+            ev,
+            ok=ok,
+            status_code=code,
+            error=None if ok else f"HTTP {code}",
+            permanent=(400 <= code < 500 and code not in RETRYABLE_4XX),
+            body=res.text[:2000] if res.content else None,
+            headers=headers,
+            signature=signature,
+            sent_at=sent_at,
+            duration_ms=int((time.perf_counter() - t0) * 1000),
+        )
+        # 4xx ya kudumu ni kosa la event, si la endpoint: haifungui breaker
+        return ok or (400 <= code < 500 and code not in RETRYABLE_4XX)
+
+    def _result(self, ev: Dict[str, Any], **kw: Any) -> None:
+        self._results.append({**ev, **kw})
+
+    # ----- bulk writes -----
+    def _pending(self) -> int:
+        return len(self._results) + sum(len(ids) for ids in self._deferred.values())
+
+    def _take(self):
+        snap = (self._results, self._deferred)
+        self._results, self._deferred = [], defaultdict(list)
+        return snap
+
+    def _restore(self, snap) -> None:
+        results, deferred = snap
+        self._results[:0] = results
+        for k, ids in deferred.items():
+            self._deferred[k][:0] = ids
+
+    def _settled(self, snap) -> List[int]:
+        results, deferred = snap
+        return [*(r["id"] for r in results), *(i for ids in deferred.values() for i in ids)]
+
+    def _flush_sync(self, snap) -> Dict[str, int]:
+        results, deferred = snap
+        db = self.session_factory()
+        try:
+            out = queue.apply_results(db, results, base_seconds=self.retry_base_seconds)
+            mono, now = time.monotonic(), _utcnow()
+            for until, ids in deferred.items():
+                at = now + timedelta(seconds=max(0.0, until - mono))
+                out["released"] = out.get("released", 0) + queue.release_events(db, ids, at)
+            return out
+        finally:
+            db.close()
+
+    def _release_sync(self, ids: List[int]) -> int:
+        db = self.session_factory()
+        try:
+            return queue.release_events(db, ids)
+        finally:
+            db.close()
+
+
+_engine: Optional[WebhookEngine] = None
+
+
+def get_engine() -> Optional[WebhookEngine]:
+    return _engine
+
+
+def is_running() -> bool:
+    return bool(_engine and _engine.running)
+
+
+def stats() -> Dict[str, Any]:
+    e = _engine
+    if e is None:
+        return {"running": False}
+    return {
+        "running": e.running,
+        "inflight": len(e._claimed),
+        "open_endpoints": e.open_endpoints(),
+        **e.stats,
+    }
+
+
+async def run() -> None:
+    """Endesha engine hadi ikatishwe (main lifespan task group)."""
+    global _engine
+    if _engine is not None and _engine.running:
+        log.info("Webhook engine already running.")
+        return
+    _engine = WebhookEngine()
+    await _engine.run()
+
+
+def stop() -> None:
+    if _engine is not None:
+        _engine.stop()
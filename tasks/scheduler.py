@@ -5,41 +5,69 @@ Lightweight, production-safe background scheduler for sending queued messages.
 
 Design goals:
 - Non-blocking background task (never blocks Uvicorn workers).
-- Small, jittered polling interval; configurable via env.
-- Safe retries with exponential backoff and jitter.
-- Idempotent CRUD updates; never crash if optional pieces are missing.
-- Clean startup/shutdown with graceful cancellation.
-- Uses a bridge layer so the loop works even if your concrete CRUD isn't ready yet.
+- Claims due messages with `FOR UPDATE SKIP LOCKED` leases, so several
+  workers/instances can share the `scheduled_messages` queue.
+- Per-platform concurrency limits: a slow provider only occupies its own
+  slots; other platforms keep flowing.
+- Retries are scheduled as a future `next_attempt_at` (exponential backoff),
+  never as in-loop sleeps.
+- Sent/failed status is buffered and written in bulk by a flusher task.
+- Clean startup/shutdown: unfinished leases are released on stop.
+
+ENV:
+  ENABLE_SCHEDULER=true
+  SCHEDULER_TICK_SECONDS=2            idle poll interval
+  SCHEDULER_BATCH=200                 max messages per claim
+  SCHEDULER_MAX_INFLIGHT=500          claimed-but-unfinished cap per process
+  SCHEDULER_PLATFORM_CONCURRENCY=16   default concurrent sends per platform
+  SCHEDULER_CONCURRENCY_<PLATFORM>=N  e.g. SCHEDULER_CONCURRENCY_SMS=4
+  SCHEDULER_LEASE_SECONDS=120
+  SCHEDULER_SEND_TIMEOUT=30
+  SCHEDULER_FLUSH_INTERVAL=0.5
+  SCHEDULER_RETRY_BASE_SECONDS=30
 """
 
 from __future__ import annotations
 
 import os
 import asyncio
-import random
 import logging
 import inspect
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Callable, Dict, Any, Optional, Iterable
+from typing import Callable, Dict, Any, List, Optional, Iterable
 
 from sqlalchemy.orm import Session
 
 from backend.db import SessionLocal
-# 👇 Use the bridge so missing CRUD functions never crash the loop.
-from backend.crud import scheduler_bridge as crud
+from backend.crud import scheduler_crud as queue
+from backend.utils.lease_worker import LeaseWorker
 
 # Optional sender utilities (swap with your own providers)
 from backend.utils.telegram_bot import send_telegram_message
-from backend.utils.whatsapp import send_whatsapp_message
+from backend.utils.whatsapp import send_whatsapp_message_async
 from backend.utils.sms import send_sms_message
 
 log = logging.getLogger("smartbiz.scheduler")
 
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(os.getenv(key, "").strip() or default)
+    except Exception:
+        return default
+
+
+def _env_float(key: str, default: float) -> float:
+    try:
+        return float(os.getenv(key, "").strip() or default)
+    except Exception:
+        return default
+
+
 # === Internal state ===
 _bg_task: Optional[asyncio.Task] = None
-_stop_event: Optional[asyncio.Event] = None
-_running: bool = False
+_dispatcher: Optional["Dispatcher"] = None
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
@@ -48,14 +76,18 @@ def _utcnow() -> datetime:
 # If your senders are async, we auto-detect and await; if sync, we run in a thread.
 SENDERS: Dict[str, Callable[..., Any]] = {
     "telegram": send_telegram_message,
-    "whatsapp": send_whatsapp_message,
+    "whatsapp": send_whatsapp_message_async,
     "sms": send_sms_message,
 }
 
 
+class PermanentError(Exception):
+    """Failure that retrying cannot fix (bad recipient, unsupported platform)."""
+
+
 @contextmanager
-def db_session() -> Iterable[Session]:
-    db = SessionLocal()
+def db_session(factory: Callable[[], Session] = SessionLocal) -> Iterable[Session]:
+    db = factory()
     try:
         yield db
     finally:
@@ -70,150 +102,180 @@ async def _maybe_call_sender(sender: Callable[..., Any], to: str, text: str) ->
         await asyncio.to_thread(sender, to, text)  # type: ignore[arg-type]
 
 
-async def _send_with_retries(platform: str, to: str, text: str, *, retries: int = 2) -> None:
-    """
-    Try to send with exponential backoff + jitter.
-    Keep delays short (mobile-first / serverless-friendly).
+class Dispatcher(LeaseWorker):
     """
-    sender = SENDERS.get(platform)
-    if not sender:
-        raise ValueError(f"Unsupported platform: {platform!r}")
-
-    delay = 0.8  # seconds; initial
-    last_exc: Optional[Exception] = None
+    Claim → dispatch (per-platform semaphores) → buffered bulk status writes.
 
-    for attempt in range(retries + 1):
-        try:
-            await _maybe_call_sender(sender, to, text)
-            return
-        except Exception as e:  # pragma: no cover
-            last_exc = e
-            # small jittered backoff so we don't hammer the API on weak networks
-            sleep_for = delay + random.uniform(0.0, 0.4)
-            log.warning("[Scheduler] send attempt %s failed (%s). Retrying in %.2fs",
-                        attempt + 1, type(e).__name__, sleep_for)
-            try:
-                await asyncio.sleep(sleep_for)
-            except asyncio.CancelledError:
-                raise
-            delay *= 1.6
-
-    # Exhausted
-    assert last_exc is not None
-    raise last_exc
-
-
-async def _process_one_message(db: Session, msg: dict) -> None:
-    """
-    Process a single message dict returned by the bridge.
-    Expected keys: id, channel/platform, payload or (recipient, message).
-    Bridge doesn't enforce schema; be defensive.
+    The claim loop only asks for as many messages as there is free capacity,
+    and skips platforms whose in-flight count is already at their cap, so a
+    stalled provider cannot starve the others. The claim/flush/shutdown
+    skeleton lives in utils.lease_worker.LeaseWorker.
     """
-    message_id = msg.get("id")
-    # Flexible payload extraction
-    platform = msg.get("platform") or msg.get("channel") or "in_app"
-    payload = msg.get("payload") or {}
-    to = msg.get("recipient") or payload.get("to") or payload.get("phone") or payload.get("user_id")
-    text = msg.get("message") or payload.get("text") or payload.get("body") or ""
-
-    if not to:
-        raise ValueError("Missing recipient")
-    if not text:
-        raise ValueError("Missing message text")
-
-    # Optional: mark as processing (idempotent if your CRUD supports it)
-    try:
-        # If your CRUD has this function exposed through the bridge, great.
-        # Otherwise it's a no-op and that's fine.
-        from backend.crud import message_queue_crud as qcrud  # optional
-        qcrud.mark_as_processing(db, message_id)
-    except Exception:
-        pass
-
-    # Send
-    await _send_with_retries(platform, str(to), str(text), retries=2)
 
-    # Mark sent (bridge handles missing impl safely)
-    crud.mark_message_sent(db, message_id, sent_at=_utcnow())
-    crud.log_message_event(db, message_id, "info", "Message dispatched successfully")
-
-
-async def _tick_once() -> None:
-    """
-    A single polling tick:
-    - Pull due messages via the bridge (returns [] if not implemented yet).
-    - Process them sequentially by default (safe for small volumes).
-      You can bump to small concurrency with asyncio.gather + semaphore if needed.
-    """
-    with db_session() as db:
-        due = crud.get_due_unsent_messages(db, _utcnow(), limit=100)
-        if not due:
-            return
-
-        # Optional small concurrency (tunable via env)
-        max_conc = max(1, int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "1")))
-        sem = asyncio.Semaphore(max_conc)
-
-        async def _run(msg: dict):
-            async with sem:
-                try:
-                    await _process_one_message(db, msg)
-                except Exception as e:
-                    # Persist failure if your CRUD supports it; otherwise the bridge logs and continues
-                    crud.mark_message_failed(db, msg.get("id"), error=str(e))
-                    crud.log_message_event(db, msg.get("id"), "error", f"Dispatch failed: {e}")
-
-        # Fire tasks; keep it bounded by the semaphore
-        tasks = [asyncio.create_task(_run(m)) for m in due]
+    name = "[Scheduler]"
+    log = log
+
+    def __init__(
+        self,
+        *,
+        session_factory: Callable[[], Session] = SessionLocal,
+        senders: Optional[Dict[str, Callable[..., Any]]] = None,
+        batch: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+        platform_concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        retry_base_seconds: Optional[int] = None,
+    ) -> None:
+        super().__init__(
+            session_factory=session_factory,
+            batch=batch or max(1, _env_int("SCHEDULER_BATCH", 200)),
+            max_inflight=max_inflight or max(1, _env_int("SCHEDULER_MAX_INFLIGHT", 500)),
+            lease_seconds=lease_seconds or max(10, _env_int("SCHEDULER_LEASE_SECONDS", 120)),
+            poll_interval=poll_interval or _env_float("SCHEDULER_TICK_SECONDS", 2.0),
+            flush_interval=flush_interval or _env_float("SCHEDULER_FLUSH_INTERVAL", 0.5),
+        )
+        self.senders = senders if senders is not None else SENDERS
+        self.default_concurrency = default_concurrency or max(1, _env_int("SCHEDULER_PLATFORM_CONCURRENCY", 16))
+        self._conc_override = dict(platform_concurrency or {})
+        self.send_timeout = send_timeout or _env_float("SCHEDULER_SEND_TIMEOUT", 30.0)
+        self.retry_base_seconds = retry_base_seconds or _env_int("SCHEDULER_RETRY_BASE_SECONDS", 30)
+
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self._sent: List[int] = []
+        self._failed: List[Dict[str, Any]] = []
+        self._released: List[int] = []
+
+    def _describe(self) -> str:
+        return f"batch={self.batch} inflight={self.max_inflight} per-platform={self.default_concurrency}"
+
+    # ----- limits -----
+    def concurrency(self, platform: str) -> int:
+        if platform in self._conc_override:
+            return max(1, int(self._conc_override[platform]))
+        return max(1, _env_int(f"SCHEDULER_CONCURRENCY_{platform.upper()}", self.default_concurrency))
+
+    def _platform_cap(self, platform: str) -> int:
+        # foleni fupi juu ya slots za kutuma; ndani ya lease hata provider akiwa mzito
+        return self.concurrency(platform) * 2
+
+    def _sem(self, platform: str) -> asyncio.Semaphore:
+        sem = self._sems.get(platform)
+        if sem is None:
+            sem = self._sems[platform] = asyncio.Semaphore(self.concurrency(platform))
+        return sem
+
+    def _excluded(self) -> List[str]:
+        return [p for p, n in self._inflight.items() if n >= self._platform_cap(p)]
+
+    def _group(self, msg: Dict[str, Any]) -> str:
+        return str(msg.get("platform") or "")
+
+    # ----- claim -----
+    def _claim_sync(self, limit: int, exclude: List[str]) -> List[Dict[str, Any]]:
+        with db_session(self.session_factory) as db:
+            return queue.claim_due_messages(
+                db, _utcnow(), limit=limit, lease_seconds=self.lease_seconds, exclude_platforms=exclude,
+            )
+
+    # ----- send -----
+    async def _handle(self, msg: Dict[str, Any]) -> None:
+        platform = self._group(msg)
+        loop_time = asyncio.get_running_loop().time
+        claimed_at = loop_time()  # task huanza mara tu baada ya claim
         try:
-            await asyncio.gather(*tasks, return_exceptions=False)
-        finally:
-            for t in tasks:
-                if not t.done():
-                    t.cancel()
-
-
-async def _worker_loop(poll_interval: float) -> None:
-    """
-    Main polling loop. Exits when _stop_event is set or the task is cancelled.
-    """
-    global _running
-    _running = True
-    log.info("[Scheduler] started (interval=%.2fs).", poll_interval)
-    assert _stop_event is not None
-    try:
-        while not _stop_event.is_set():
-            try:
-                await _tick_once()
-            except asyncio.CancelledError:
-                raise
-            except Exception as e:  # pragma: no cover
-                # Never crash the loop on a single failure
-                log.exception("[Scheduler] unexpected error: %s", e)
-
-            # Sleep with small jitter to avoid thundering herd
-            jitter = random.uniform(0.0, 2.0)
-            try:
-                await asyncio.sleep(poll_interval + jitter)
-            except asyncio.CancelledError:
-                raise
-    finally:
-        _running = False
-        log.info("[Scheduler] stopped.")
+            sender = self.senders.get(platform)
+            if sender is None:
+                raise PermanentError(f"Unsupported platform: {platform!r}")
+            to, text = msg.get("recipient"), msg.get("message")
+            if not to:
+                raise PermanentError("Missing recipient")
+            if not text:
+                raise PermanentError("Missing message text")
+            async with self._sem(platform):
+                if loop_time() - claimed_at > self.lease_seconds - self.send_timeout:
+                    # lease inakaribia kuisha wakati tukisubiri slot: irudishe foleni badala ya kutuma mara mbili
+                    self._released.append(msg["id"])
+                    return
+                await asyncio.wait_for(_maybe_call_sender(sender, str(to), str(text)), self.send_timeout)
+            self._sent.append(msg["id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            self._failed.append({**msg, "error": err, "permanent": isinstance(e, PermanentError)})
+
+    # ----- bulk writes -----
+    def _pending(self) -> int:
+        return len(self._sent) + len(self._failed) + len(self._released)
+
+    def _take(self):
+        snap = (self._sent, self._failed, self._released)
+        self._sent, self._failed, self._released = [], [], []
+        return snap
+
+    def _restore(self, snap) -> None:
+        sent, failed, released = snap
+        self._sent[:0] = sent
+        self._failed[:0] = failed
+        self._released[:0] = released
+
+    def _settled(self, snap) -> List[int]:
+        sent, failed, released = snap
+        return [*sent, *(f["id"] for f in failed), *released]
+
+    def _flush_sync(self, snap) -> Dict[str, int]:
+        sent, failed, released = snap
+        with db_session(self.session_factory) as db:
+            n_sent = queue.mark_sent_bulk(db, sent)
+            res = queue.record_failures_bulk(db, failed, base_seconds=self.retry_base_seconds)
+            n_rel = queue.release_leases(db, released)
+        return {"sent": n_sent, "released": n_rel, **res}
+
+    def _release_sync(self, ids: List[int]) -> int:
+        with db_session(self.session_factory) as db:
+            return queue.release_leases(db, ids)
 
 
 # ----------------------------- Public API ---------------------------------
 
 def is_running() -> bool:
     """Expose running state for health endpoints."""
-    return _running
+    return bool(_dispatcher and _dispatcher.running)
+
+
+def stats() -> Dict[str, Any]:
+    d = _dispatcher
+    if d is None:
+        return {"running": False}
+    return {
+        "running": d.running,
+        "inflight": len(d._claimed),
+        "per_platform": {p: n for p, n in d._inflight.items() if n},
+        **d.stats,
+    }
 
 
 async def trigger_once() -> None:
     """
-    Manually trigger one scheduler tick (useful for debugging via an admin endpoint).
+    Manually trigger one claim/dispatch/flush cycle (useful for debugging via an admin endpoint).
     """
-    await _tick_once()
+    d = Dispatcher()
+    await d.claim_and_dispatch()
+    await d.drain()
+
+
+async def run() -> None:
+    """Run the dispatcher until cancelled (used by the main lifespan task group)."""
+    global _dispatcher
+    if _dispatcher is not None and _dispatcher.running:
+        log.info("[Scheduler] already running.")
+        return
+    _dispatcher = Dispatcher()
+    await _dispatcher.run()
 
 
 async def start_schedulers() -> None:
@@ -225,32 +287,26 @@ async def start_schedulers() -> None:
         log.info("[Scheduler] disabled via ENABLE_SCHEDULER.")
         return
 
-    global _bg_task, _stop_event
+    global _bg_task
     if _bg_task and not _bg_task.done():
         log.info("[Scheduler] already running.")
         return
 
-    interval = float(os.getenv("SCHEDULER_TICK_SECONDS", "10"))
-    _stop_event = asyncio.Event()
-    _bg_task = asyncio.create_task(_worker_loop(interval))
+    _bg_task = asyncio.create_task(run())
 
 
 async def stop_schedulers() -> None:
     """
     Gracefully stop the background task on shutdown.
     """
-    global _bg_task, _stop_event
+    global _bg_task
+    if _dispatcher is not None:
+        _dispatcher.stop()
     if not _bg_task:
         return
-
-    if _stop_event:
-        _stop_event.set()
-
-    _bg_task.cancel()
     try:
-        await _bg_task
-    except asyncio.CancelledError:
+        await asyncio.wait_for(_bg_task, timeout=10)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
         pass
     finally:
         _bg_task = None
-        _stop_event = None
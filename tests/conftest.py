@@ -0,0 +1,17 @@
+# backend/tests/conftest.py
+# -*- coding: utf-8 -*-
+"""Make `backend.*` importable when pytest runs from the repo root (as main.py does)."""
+from __future__ import annotations
+
+import sys
+import types
+from pathlib import Path
+
+_BACKEND = Path(__file__).resolve().parents[1]
+
+try:
+    import backend  # noqa: F401
+except ImportError:
+    _mod = types.ModuleType("backend")
+    _mod.__path__ = [str(_BACKEND)]  # type: ignore[attr-defined]
+    sys.modules["backend"] = _mod
@@ -0,0 +1,109 @@
+# backend/tests/test_ai_gateway.py
+# -*- coding: utf-8 -*-
+"""utils.ai_gateway dhidi ya model ya uongo (httpx.MockTransport, OpenAI-compatible)."""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from backend.utils.ai_gateway import AIGateway, AIGatewayError, ResponseCache
+from backend.utils.http_client import OutboundHTTP
+
+
+class FakeModel:
+    """POST /v1/chat/completions: hujibu baada ya `delay`; `reject` = 429 (quota/budget)."""
+
+    def __init__(self, delay: float = 0.05, reject: bool = False) -> None:
+        self.delay = delay
+        self.reject = reject
+        self.bodies: List[Dict[str, Any]] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.bodies.append(body)
+        await asyncio.sleep(self.delay)
+        if self.reject:
+            return httpx.Response(
+                429, headers={"Retry-After": "0"},
+                json={"error": {"type": "insufficient_quota", "message": "budget exceeded"}},
+            )
+        return httpx.Response(200, json={
+            "model": body["model"],
+            "choices": [{"message": {"content": f"jibu #{len(self.bodies)}"}}],
+            "usage": {"total_tokens": 42},
+        })
+
+
+def _gateway(model: FakeModel, retries: int = 0) -> AIGateway:
+    http = OutboundHTTP(http2=False, transport=httpx.MockTransport(model))
+    return AIGateway(base_url="http://fake-model.local/v1", api_key="test", http=http,
+                     cache=ResponseCache(ttl=60, max_entries=100), retries=retries)
+
+
+MSGS = [{"role": "user", "content": "Bei ya  viatu ni  ngapi?"}]
+
+
+def test_single_flight_coalesces_identical_concurrent_requests():
+    model = FakeModel(delay=0.1)
+    gw = _gateway(model)
+
+    async def run():
+        return await asyncio.gather(*(gw.acomplete(MSGS, "m", 0.0, 64) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(model.bodies) == 1
+    assert {r.text for r in results} == {"jibu #1"}
+    assert sum(r.coalesced for r in results) == 9
+    assert gw.stats["coalesced"] == 9
+
+
+@pytest.mark.parametrize("kw", [{"temperature": 0.7}, {"temperature": 0.0, "cache": False}])
+def test_no_coalescing_for_sampling_or_cache_opt_out(kw):
+    model = FakeModel(delay=0.1)
+    gw = _gateway(model)
+
+    async def run():
+        return await asyncio.gather(*(gw.acomplete(MSGS, "m", max_tokens=64, **kw) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(model.bodies) == 3
+    assert not any(r.coalesced for r in results)
+
+
+def test_cache_hit_and_miss():
+    model = FakeModel(delay=0)
+    gw = _gateway(model)
+
+    async def run():
+        first = await gw.acomplete(MSGS, "m", 0.0, 64)
+        # whitespace tofauti → key ile ile (messages zilizosafishwa)
+        again = await gw.acomplete([{"role": "user", "content": "Bei ya viatu ni ngapi?"}], "m", 0.0, 64)
+        other = await gw.acomplete(MSGS, "m", 0.0, 128)   # params tofauti → miss
+        return first, again, other
+
+    first, again, other = asyncio.run(run())
+    assert not first.cached
+    assert again.cached and again.text == first.text
+    assert not other.cached
+    assert len(model.bodies) == 2
+    assert gw.stats["cache_hits"] == 1
+    assert gw.stats["tokens_saved"] == 42
+
+
+def test_budget_rejection_is_raised_and_not_cached():
+    model = FakeModel(delay=0, reject=True)
+    gw = _gateway(model, retries=1)
+
+    with pytest.raises(AIGatewayError) as exc:
+        asyncio.run(gw.acomplete(MSGS, "m", 0.0, 64))
+    assert exc.value.status == 429
+    assert len(model.bodies) == 2            # ombi + retry moja (Retry-After: 0)
+    assert len(gw.cache) == 0
+
+    model.reject = False
+    res = asyncio.run(gw.acomplete(MSGS, "m", 0.0, 64))
+    assert not res.cached
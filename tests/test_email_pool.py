@@ -0,0 +1,83 @@
+# backend/tests/test_email_pool.py
+# -*- coding: utf-8 -*-
+"""utils.email_sender: SMTPPool / send_many dhidi ya server halisi ya SMTP (aiosmtpd) kwenye localhost."""
+from __future__ import annotations
+
+import socket
+from typing import Iterator, List, Set
+
+import pytest
+
+controller = pytest.importorskip("aiosmtpd.controller")
+
+from backend.utils import email_sender
+from backend.utils.email_sender import SMTPPool, TemplateCache
+
+
+class _Sink:
+    """Handler ya aiosmtpd: hukusanya messages na sessions (connection moja = session moja)."""
+
+    def __init__(self) -> None:
+        self.messages: List[dict] = []
+        self.sessions: Set[tuple] = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(tuple(session.peer))  # (host, port) ya client: tofauti kwa kila connection
+        self.messages.append({"to": list(envelope.rcpt_tos), "body": envelope.content.decode("utf-8", "replace")})
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp() -> Iterator[_Sink]:
+    sink = _Sink()
+    sink.port = _free_port()
+    ctl = controller.Controller(sink, hostname="127.0.0.1", port=sink.port)
+    ctl.start()
+    try:
+        yield sink
+    finally:
+        ctl.stop()
+
+
+@pytest.fixture
+def template(monkeypatch) -> None:
+    row = {"version": 1, "subject": "Ripoti ya {{ name }}", "html": "<p>Habari {{ name }}</p>", "text": None}
+    monkeypatch.setattr(email_sender, "templates", TemplateCache(loader=lambda db, name: dict(row)))
+
+
+def _pool(sink: _Sink, **kw) -> SMTPPool:
+    return SMTPPool("127.0.0.1", sink.port, user="", starttls=False, **kw)
+
+
+def test_send_many_delivers_all_and_reuses_connections(smtp, template):
+    pool = _pool(smtp, size=2)
+    recipients = [(f"u{i}@example.com", {"name": f"U{i}"}) for i in range(20)]
+    try:
+        res = email_sender.send_many(None, "campaign_report", recipients, pool=pool)
+    finally:
+        pool.close()
+
+    assert res == {"sent": 20, "failed": 0, "errors": []}
+    assert sorted(m["to"][0] for m in smtp.messages) == sorted(r[0] for r in recipients)
+    assert any("Habari U7" in m["body"] for m in smtp.messages)
+    assert pool.opened <= 2                  # handshake moja kwa connection, si kwa kila email
+    assert len(smtp.sessions) == pool.opened
+
+
+def test_pool_reopens_after_max_per_conn(smtp, template):
+    pool = _pool(smtp, size=1, max_per_conn=3)
+    try:
+        for i in range(7):
+            pool.send("noreply@example.com", f"u{i}@example.com", f"Subject: {i}\r\n\r\nbody {i}")
+    finally:
+        pool.close()
+
+    assert len(smtp.messages) == 7
+    assert pool.opened == 3                  # 3 + 3 + 1
+    assert len(smtp.sessions) == 3
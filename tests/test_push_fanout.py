@@ -0,0 +1,70 @@
+# backend/tests/test_push_fanout.py
+# -*- coding: utf-8 -*-
+"""push_to_followers: followers hai wa host tu ndio hupokea push (dispatcher bandia)."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from starlette.background import BackgroundTask
+
+import backend.models  # noqa: F401  (mappers zote: User)
+from backend.models.fan import Fan, FanStatus
+from backend.models.push_subscription import PushSubscription
+from backend.models.user import User
+from backend.utils import push_notifier
+
+
+class _FakeDispatcher:
+    def __init__(self) -> None:
+        self.calls: List[List[int]] = []
+
+    async def send(self, targets, payload: Dict[str, Any], **_: Any) -> push_notifier.PushResult:
+        self.calls.append([t.id for t in targets])
+        return push_notifier.PushResult(sent=[t.id for t in targets])
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'push.db'}")
+    tables = [User.__table__, Fan.__table__, PushSubscription.__table__]
+    User.metadata.create_all(engine, tables=tables)
+    pw = next((c.name for c in User.__table__.c if c.name in ("password_hash", "hashed_password", "password")), None)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": i, "email": f"u{i}@test.local", **({pw: "x"} if pw else {})} for i in range(1, 6)
+        ])
+        conn.execute(insert(Fan.__table__), [
+            {"user_id": 2, "host_user_id": 1, "status": FanStatus.active},
+            {"user_id": 3, "host_user_id": 1, "status": FanStatus.blocked},
+            {"user_id": 4, "host_user_id": 5, "status": FanStatus.active},
+        ])
+        conn.execute(insert(PushSubscription.__table__), [
+            {"user_id": uid, "endpoint": f"https://push.test/{uid}",
+             "endpoint_hash": hashlib.sha256(f"https://push.test/{uid}".encode()).hexdigest(),
+             "p256dh": "k", "auth": "a"}
+            for uid in (2, 3, 4)
+        ])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_push_to_followers_is_awaited_by_background_tasks():
+    # plain def returning a coroutine is run as sync and never awaited
+    assert BackgroundTask(push_notifier.push_to_followers, 1, {}).is_async
+
+
+def test_push_to_followers_sends_to_active_followers_only(session_factory, monkeypatch):
+    fake = _FakeDispatcher()
+    monkeypatch.setattr(push_notifier, "get_dispatcher", lambda: fake)
+
+    out = asyncio.run(push_notifier.push_to_followers(1, {"title": "Live"}, session_factory=session_factory))
+
+    with session_factory() as db:
+        follower_sub = db.query(PushSubscription.id).filter(PushSubscription.user_id == 2).scalar()
+    assert fake.calls == [[follower_sub]]
+    assert out["sent"] == 1
@@ -0,0 +1,81 @@
+# backend/tests/test_rate_limit.py
+# -*- coding: utf-8 -*-
+"""utils.rate_limit: GCRA (burst + kasi) dhidi ya strict (sliding log), memory na Redis stand-in."""
+from __future__ import annotations
+
+from typing import Iterator, List
+
+import pytest
+
+from backend.tools.bench_rate_limit import LocalRedis
+from backend.utils import rate_limit
+from backend.utils.rate_limit import MemoryStore, RateLimiter, RedisStore
+
+
+class _Clock:
+    def __init__(self, t: float = 1_000_000.0) -> None:
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Iterator[_Clock]:
+    c = _Clock()
+    monkeypatch.setattr(rate_limit.time, "time", c)
+    yield c
+    rate_limit.set_store(None)
+
+
+def _hammer(lim: RateLimiter, clock: _Clock, seconds: int, key: str = "u1") -> List[float]:
+    """Ombi moja kila sekunde; rudisha nyakati zilizoruhusiwa."""
+    start, ok = clock.t, []
+    for i in range(seconds):
+        clock.t = start + i
+        if lim.hit(key).allowed:
+            ok.append(float(i))
+    return ok
+
+
+def _max_per_window(times: List[float], period: float) -> int:
+    return max(sum(1 for u in times if t <= u < t + period) for t in times)
+
+
+def test_gcra_allows_burst_plus_rate_within_one_period(clock):
+    rate_limit.set_store(MemoryStore())
+    ok = _hammer(RateLimiter("gcra", 5, 60.0), clock, 60)
+    assert len(ok) == 9  # burst 5 + 4 zilizojazwa upya ndani ya dakika ileile
+
+
+@pytest.mark.parametrize("store", [MemoryStore, lambda: RedisStore(LocalRedis())])
+@pytest.mark.parametrize("limit", [5, 20])
+def test_strict_never_exceeds_limit_in_any_window(clock, store, limit):
+    rate_limit.set_store(store())
+    ok = _hammer(RateLimiter("strict", limit, 60.0, strict=True), clock, 300)
+    assert _max_per_window(ok, 60.0) == limit
+    assert len(ok) == limit * 5
+
+
+def test_strict_retry_after_points_at_oldest_expiry(clock):
+    rate_limit.set_store(MemoryStore())
+    lim = RateLimiter("strict", 5, 60.0, strict=True)
+    start = clock.t
+    for i in range(5):
+        clock.t = start + i
+        assert lim.hit("u1").allowed
+    clock.t = start + 10
+    d = lim.hit("u1")
+    assert not d.allowed and d.retry_after == pytest.approx(50.0)
+    clock.t = start + 60
+    assert lim.hit("u1").allowed
+
+
+def test_strict_limit_is_shared_across_redis_workers(clock):
+    backend = LocalRedis()
+    lim = RateLimiter("strict", 5, 60.0, strict=True)
+    allowed = 0
+    for i in range(10):
+        rate_limit.set_store(RedisStore(backend))  # "worker" mpya kila ombi, backend moja
+        allowed += lim.hit("u1").allowed
+    assert allowed == 5
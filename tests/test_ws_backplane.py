@@ -0,0 +1,81 @@
+# backend/tests/test_ws_backplane.py
+# -*- coding: utf-8 -*-
+"""utils.ws_backplane: hubs mbili (kama workers wawili) juu ya InProcessBackplane moja."""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import List
+
+from starlette.websockets import WebSocketState
+
+from backend.utils.websocket_manager import WebSocketManager
+from backend.utils.ws_backplane import InProcessBackplane, channel_for
+
+
+class _FakeSocket:
+    def __init__(self) -> None:
+        self.application_state = WebSocketState.CONNECTED
+        self.sent: List[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+    async def send_json(self, message) -> None:
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_broadcast_reaches_sockets_on_other_hub():
+    async def main():
+        bp = InProcessBackplane()
+        a, b = WebSocketManager(bp, outbox_size=0), WebSocketManager(bp, outbox_size=0)
+        wa, wb, other = _FakeSocket(), _FakeSocket(), _FakeSocket()
+        await a.connect(7, wa)
+        await b.connect(7, wb)
+        await b.connect(8, other)
+
+        delivered = await a.broadcast(7, {"type": "gift", "n": 1})
+        await _settle()
+        assert delivered == 1
+        assert wa.sent == [{"type": "gift", "n": 1}]   # hakuna echo ya publish yake yenyewe
+        assert wb.sent == [{"type": "gift", "n": 1}]
+        assert other.sent == []
+
+        await b.broadcast_all({"type": "ping"})
+        await _settle()
+        assert wa.sent[-1] == wb.sent[-1] == other.sent[-1] == {"type": "ping"}
+    asyncio.run(main())
+
+
+def test_last_disconnect_unsubscribes_and_close_is_clean():
+    async def main():
+        bp = InProcessBackplane()
+        a, b = WebSocketManager(bp, outbox_size=0), WebSocketManager(bp, outbox_size=0)
+        wa, wb = _FakeSocket(), _FakeSocket()
+        await a.connect(7, wa)
+        await b.connect(7, wb)
+        await b.disconnect(7, wb)
+        assert channel_for(7) in bp.channels()  # a bado ana socket kwenye 7
+        await a.disconnect(7, wa)
+        assert bp.channels() == []
+        await a.connect(7, wa)
+        await a.broadcast(7, {"n": 2})
+        await _settle()
+        assert wb.sent == []
+
+        await bp.close()
+        assert bp.channels() == []
+        assert await a.broadcast(7, {"n": 3}) == 1     # local delivery bado hufanya kazi
+        assert len(wa.sent) == 2
+    asyncio.run(main())
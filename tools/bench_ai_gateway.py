@@ -0,0 +1,170 @@
+# backend/tools/bench_ai_gateway.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: AI calls moja kwa moja (kila prompt → upstream) dhidi ya
+utils.ai_gateway (cache + single-flight + async retries).
+
+Model ya uongo ya ndani (OpenAI-compatible POST /v1/chat/completions, HTTP/1.1
+keep-alive) hujibu baada ya --latency-ms; kila ombi la --fail-every hurudisha
+429 (Retry-After: 0) ili kupima retry path. Prompts hutoka kwenye seti ya
+--prompts yenye usambazaji wa "hot" (zipf) kama auto-replies za maduka.
+
+Usage:
+  python -m backend.tools.bench_ai_gateway --requests 2000 --concurrency 50
+  python -m backend.tools.bench_ai_gateway --prompts 200 --latency-ms 400 --fail-every 25
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import httpx
+
+from backend.utils.ai_gateway import AIGateway, ResponseCache
+
+
+class _FakeModel:
+    def __init__(self, latency: float, fail_every: int) -> None:
+        self.latency, self.fail_every = latency, fail_every
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def serve(self) -> ThreadingHTTPServer:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):  # kimya
+                pass
+
+            def _send(self, code: int, body: Dict, headers: Dict[str, str] = {}) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with fake._lock:
+                    fake.calls += 1
+                    n = fake.calls
+                if fake.fail_every and n % fake.fail_every == 0:
+                    return self._send(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0"})
+                time.sleep(fake.latency)
+                prompt = req["messages"][-1]["content"]
+                usage = {"prompt_tokens": len(prompt.split()) + 20, "completion_tokens": 60}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                with fake._lock:
+                    fake.tokens += usage["total_tokens"]
+                self._send(200, {
+                    "model": req["model"],
+                    "choices": [{"message": {"role": "assistant", "content": f"Jibu: {prompt[::-1]}"}}],
+                    "usage": usage,
+                })
+
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return srv
+
+
+def _workload(n: int, prompts: int) -> List[List[Dict[str, str]]]:
+    rnd = random.Random(5)
+    weights = [1.0 / (i + 1) for i in range(prompts)]
+    picks = rnd.choices(range(prompts), weights=weights, k=n)
+    return [[
+        {"role": "system", "content": "You are SmartBiz Assistant. Respond in 'sw'."},
+        {"role": "user", "content": f"Bei ya bidhaa namba {p} ni  shilingi ngapi?" + (" " if i % 2 else "")},
+    ] for i, p in enumerate(picks)]
+
+
+def _pct(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    return {"p50": statistics.median(s), "p99": s[min(len(s) - 1, int(len(s) * 0.99))]}
+
+
+async def _direct(url: str, work, concurrency: int) -> List[float]:
+    """Njia ya zamani: kila ombi upstream, retry kwa kulala (hapa async ili kipimo kiwe cha haki)."""
+    sem = asyncio.Semaphore(concurrency)
+    lat: List[float] = []
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def one(msgs):
+            async with sem:
+                t0 = time.perf_counter()
+                for attempt in range(3):
+                    r = await client.post(url, json={"model": "fake", "messages": msgs,
+                                                     "temperature": 0.3, "max_tokens": 256})
+                    if r.status_code == 200:
+                        break
+                    await asyncio.sleep(0.8 * 1.6 ** attempt)
+                lat.append((time.perf_counter() - t0) * 1000)
+        await asyncio.gather(*(one(m) for m in work))
+    return lat
+
+
+async def _gateway(gw: AIGateway, work, concurrency: int, temperature: float) -> List[float]:
+    sem = asyncio.Semaphore(concurrency)
+    lat: List[float] = []
+
+    async def one(msgs):
+        async with sem:
+            t0 = time.perf_counter()
+            await gw.acomplete(msgs, "fake", temperature, 256)
+            lat.append((time.perf_counter() - t0) * 1000)
+    await asyncio.gather(*(one(m) for m in work))
+    return lat
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--prompts", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--fail-every", type=int, default=50)
+    ap.add_argument("--temperature", type=float, default=0.0, help="> 0: cache tu, bila single-flight")
+    args = ap.parse_args()
+
+    work = _workload(args.requests, args.prompts)
+    results = {}
+    for name in ("direct", "gateway"):
+        fake = _FakeModel(args.latency_ms / 1000.0, args.fail_every)
+        srv = fake.serve()
+        base = f"http://127.0.0.1:{srv.server_address[1]}/v1"
+        t0 = time.perf_counter()
+        if name == "direct":
+            lat = asyncio.run(_direct(base + "/chat/completions", work, args.concurrency))
+            stats = {}
+        else:
+            gw = AIGateway(base_url=base, api_key="bench", cache=ResponseCache(ttl=3600, max_entries=10_000))
+            lat = asyncio.run(_gateway(gw, work, args.concurrency, args.temperature))
+            stats = gw.stats
+        wall = time.perf_counter() - t0
+        srv.shutdown()
+        results[name] = (lat, wall, fake.calls, fake.tokens, stats)
+
+    print(f"requests={args.requests} prompts={args.prompts} concurrency={args.concurrency} "
+          f"latency={args.latency_ms:.0f}ms fail_every={args.fail_every}")
+    for name, (lat, wall, calls, tokens, stats) in results.items():
+        p = _pct(lat)
+        print(f"{name:<8} wall={wall:6.2f}s p50={p['p50']:8.1f}ms p99={p['p99']:8.1f}ms "
+              f"upstream_calls={calls:5d} upstream_tokens={tokens:7d}")
+        if stats:
+            print(f"         gateway stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
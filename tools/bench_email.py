@@ -0,0 +1,157 @@
+# backend/tools/bench_email.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: emails/sec — njia ya zamani ya send_email_with_template (jinja2
+Template mpya + connection mpya ya SMTP kwa kila email) dhidi ya
+utils.email_sender (template cache + SMTPPool + send_many).
+
+SMTP stand-in ya ndani (asyncio) hujibu EHLO/MAIL/RCPT/DATA/NOOP/RSET/QUIT;
+--greeting-ms huiga gharama ya connect/TLS/AUTH, --reply-ms huiga RTT ya
+kila amri. Hakuna DB: template hutolewa na loader ya ndani.
+
+Usage:
+  python -m backend.tools.bench_email --emails 500
+  python -m backend.tools.bench_email --emails 2000 --pool 8 --greeting-ms 150
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import smtplib
+import threading
+import time
+from typing import Dict, Tuple
+
+from jinja2 import Template
+
+from backend.utils import email_sender
+from backend.utils.email_sender import SMTPPool, TemplateCache, build_message
+
+SUBJECT = "Ripoti ya {{ report_date }}"
+HTML = (
+    "<html><body><h1>Habari {{ user_name }}</h1><table>"
+    "{% for k, v in rows %}<tr><td>{{ k }}</td><td>{{ v }}</td></tr>{% endfor %}"
+    "</table></body></html>"
+)
+TEXT = "Habari {{ user_name }}, ujumbe {{ messages_sent }}."
+
+
+class _SMTPStub:
+    """SMTP server ndogo: inapokea kila kitu, inahesabu messages."""
+
+    def __init__(self, greeting: float, reply: float) -> None:
+        self.greeting, self.reply = greeting, reply
+        self.received = 0
+        self.connections = 0
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.greeting)
+        writer.write(b"220 stub ESMTP\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line[:4].upper()
+                if self.reply:
+                    await asyncio.sleep(self.reply)
+                if cmd == b"EHLO":
+                    writer.write(b"250-stub\r\n250-PIPELINING\r\n250 8BITMIME\r\n")
+                elif cmd == b"DATA":
+                    writer.write(b"354 go\r\n")
+                    await writer.drain()
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.received += 1
+                    writer.write(b"250 queued\r\n")
+                elif cmd == b"QUIT":
+                    writer.write(b"221 bye\r\n")
+                    break
+                else:  # HELO/MAIL/RCPT/RSET/NOOP
+                    writer.write(b"250 ok\r\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def start(self) -> int:
+        ready = threading.Event()
+        port: Dict[str, int] = {}
+
+        def _run() -> None:
+            loop = asyncio.new_event_loop()
+            srv = loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024))
+            port["p"] = srv.sockets[0].getsockname()[1]
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=_run, daemon=True).start()
+        ready.wait()
+        return port["p"]
+
+
+def _data(i: int) -> Dict[str, object]:
+    return {
+        "user_name": f"user{i}",
+        "report_date": "2026-01-01",
+        "messages_sent": i,
+        "rows": [("messages_sent", i), ("smartcoins_used", i * 2), ("replies", 0)],
+    }
+
+
+def _legacy(port: int, n: int) -> None:
+    """Iga toleo la zamani: Template(html) mpya + SMTP connect/EHLO/QUIT kwa kila email."""
+    for i in range(n):
+        data = _data(i)
+        html = Template(HTML).render(**data)
+        msg = build_message(f"u{i}@example.com", Template(SUBJECT).render(**data), html)
+        with smtplib.SMTP("127.0.0.1", port, timeout=30) as server:
+            server.ehlo()
+            server.sendmail("bench@example.com", f"u{i}@example.com", msg.as_string())
+
+
+def _pooled(port: int, n: int, size: int) -> Tuple[Dict[str, object], SMTPPool, TemplateCache]:
+    cache = TemplateCache(
+        ttl=60,
+        loader=lambda _db, _name: {"version": 1, "subject": SUBJECT, "html": HTML, "text": TEXT},
+    )
+    email_sender.templates = cache
+    pool = SMTPPool("127.0.0.1", port, user="", size=size, starttls=False)
+    res = email_sender.send_many(None, "campaign_report", [(f"u{i}@example.com", _data(i)) for i in range(n)], pool=pool)
+    pool.close()
+    return res, pool, cache
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--emails", type=int, default=500)
+    ap.add_argument("--pool", type=int, default=4)
+    ap.add_argument("--greeting-ms", type=float, default=50.0, help="gharama ya connect/TLS/AUTH")
+    ap.add_argument("--reply-ms", type=float, default=1.0, help="RTT ya kila amri")
+    ap.add_argument("--skip-legacy", action="store_true")
+    args = ap.parse_args()
+
+    stub = _SMTPStub(args.greeting_ms / 1000.0, args.reply_ms / 1000.0)
+    port = stub.start()
+    rows = []
+
+    if not args.skip_legacy:
+        t0 = time.perf_counter()
+        _legacy(port, args.emails)
+        rows.append(("legacy", args.emails, time.perf_counter() - t0, ""))
+
+    before = stub.connections
+    t0 = time.perf_counter()
+    res, pool, cache = _pooled(port, args.emails, args.pool)
+    wall = time.perf_counter() - t0
+    rows.append((f"pool x{args.pool}", res["sent"], wall,
+                 f"failed={res['failed']} connections={stub.connections - before} "
+                 f"compiled={cache.misses} cache_hits={cache.hits}"))
+
+    print(f"emails={args.emails} greeting={args.greeting_ms}ms reply={args.reply_ms}ms received={stub.received}")
+    for name, done, wall, extra in rows:
+        print(f"{name:<8} sent={done:<6} wall={wall:6.2f}s  emails/sec={done / wall:>8,.1f}  {extra}")
+
+
+if __name__ == "__main__":
+    main()
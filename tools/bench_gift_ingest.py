@@ -0,0 +1,172 @@
+# backend/tools/bench_gift_ingest.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: gifts/sec kwenye stream MOJA yenye senders N kwa wakati mmoja.
+
+  legacy  — njia ya zamani ya /gift-fly: SELECT ya gift ya mwisho (combo),
+            kisha INSERT + commit + refresh kwa kila gift (kazi nzima ndani
+            ya threadpool call moja — hali bora kwa njia ya zamani).
+  ingest  — services.gift_ingest: combo ya memory + group commit (INSERT ya
+            rows nyingi, commit moja) + on_commit moja kwa batch.
+
+Kila sender hutuma gifts mfululizo (gift inayofuata baada ya ack) kwa
+--seconds; hupimwa gifts/sec zilizothibitishwa na p50/p99 ya ack.
+
+Usage:
+  python -m backend.tools.bench_gift_ingest --senders 1000 --seconds 10
+  python -m backend.tools.bench_gift_ingest --db-url postgresql://... --senders 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+import backend.models  # noqa: F401  (mappers zote: LiveStream/User)
+from backend.models.gift_fly import GiftFly, normalize_row
+from backend.models.live_stream import LiveStream
+from backend.models.user import User
+from backend.services.gift_ingest import ComboTracker, GiftIngestor
+
+GIFTS = ["Rose", "Lion", "Car", "Star", "Heart"]
+COMBO_WINDOW = 2.0
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _user_rows(n: int) -> List[Dict[str, object]]:
+    t = User.__table__
+    as_uuid = t.c.id.type.python_type is uuid.UUID
+    pw = next((c.name for c in t.c if c.name in ("password_hash", "hashed_password", "password")), None)
+    rows = []
+    for i in range(1, n + 1):
+        r: Dict[str, object] = {"id": uuid.uuid4() if as_uuid else i, "email": f"u{i}@bench.local"}
+        if pw:
+            r[pw] = "x"
+        rows.append(r)
+    return rows
+
+
+def _setup(url: str, senders: int):
+    kw = {"pool_size": 40, "max_overflow": 0}
+    if url.startswith("sqlite"):
+        kw["connect_args"] = {"timeout": 60, "check_same_thread": False}
+    engine = create_engine(url, **kw)
+    tables = [LiveStream.__table__, User.__table__, GiftFly.__table__]
+    GiftFly.metadata.drop_all(engine, tables=tables[::-1])
+    GiftFly.metadata.create_all(engine, tables=tables)
+    with engine.begin() as conn:
+        conn.execute(insert(LiveStream.__table__), [{"id": 1, "title": "bench"}])
+        users = _user_rows(senders)
+        conn.execute(insert(User.__table__), users)
+    return engine, sessionmaker(bind=engine, expire_on_commit=False), [u["id"] for u in users]
+
+
+def _legacy_send(Session, user_id, gift: str) -> None:
+    db = Session()
+    try:
+        prev = (
+            db.query(GiftFly)
+            .filter(GiftFly.stream_id == 1, GiftFly.user_id == user_id)
+            .order_by(GiftFly.created_at.desc())
+            .first()
+        )
+        combo = 1
+        if prev is not None and prev.gift_name == gift:
+            ts = prev.created_at if prev.created_at.tzinfo else prev.created_at.replace(tzinfo=dt.timezone.utc)
+            if (_now() - ts).total_seconds() <= COMBO_WINDOW:
+                combo = int((prev.meta or {}).get("combo", 1)) + 1
+        obj = GiftFly(stream_id=1, user_id=user_id, gift_name=gift, meta={"combo": combo}, created_at=_now())
+        db.add(obj)
+        db.commit()
+        db.refresh(obj)
+    finally:
+        db.close()
+
+
+async def _run(mode: str, Session, users: List, seconds: float, flush_ms: int, max_batch: int) -> Dict[str, float]:
+    lat: List[float] = []
+    errors = 0
+    broadcasts = 0
+    deadline = time.perf_counter() + seconds
+
+    async def _on_commit(batch) -> None:
+        nonlocal broadcasts
+        broadcasts += 1
+
+    ingestor = GiftIngestor(GiftFly, on_commit=_on_commit, combos=ComboTracker(), normalize=normalize_row,
+                            flush_ms=flush_ms, max_batch=max_batch, session_factory=Session)
+
+    async def sender(uid) -> None:
+        nonlocal errors
+        rnd = random.Random(str(uid))
+        while time.perf_counter() < deadline:
+            gift = GIFTS[0] if rnd.random() < 0.6 else rnd.choice(GIFTS)
+            t0 = time.perf_counter()
+            try:
+                if mode == "legacy":
+                    await run_in_threadpool(_legacy_send, Session, uid, gift)
+                else:
+                    now = _now()
+                    await ingestor.submit({
+                        "stream_id": 1, "user_id": uid, "gift_name": gift, "quantity": 1,
+                        "meta": {},
+                        "created_at": now, "updated_at": now,
+                    })
+            except Exception:
+                errors += 1
+                continue
+            lat.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(sender(u) for u in users))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    out = {
+        "gifts": len(lat), "gps": len(lat) / wall, "errors": errors,
+        "p50": statistics.median(lat) if lat else 0.0,
+        "p99": lat[min(len(lat) - 1, int(len(lat) * 0.99))] if lat else 0.0,
+        "broadcast_msgs": broadcasts if mode == "ingest" else len(lat),
+    }
+    if mode == "ingest":
+        out["avg_batch"] = ingestor.snapshot()["avg_batch"]
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default=None, help="default: sqlite file kwenye tempdir")
+    ap.add_argument("--senders", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--flush-ms", type=int, default=5)
+    ap.add_argument("--max-batch", type=int, default=500)
+    ap.add_argument("--modes", default="legacy,ingest")
+    args = ap.parse_args()
+
+    url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'gifts.db')}"
+    print(f"db={url.split('@')[-1]} senders={args.senders} seconds={args.seconds} "
+          f"flush_ms={args.flush_ms} max_batch={args.max_batch}")
+    for mode in args.modes.split(","):
+        engine, Session, users = _setup(url, args.senders)
+        r = asyncio.run(_run(mode, Session, users, args.seconds, args.flush_ms, args.max_batch))
+        engine.dispose()
+        extra = f" avg_batch={r['avg_batch']}" if "avg_batch" in r else ""
+        print(f"{mode:<7} gifts/sec={r['gps']:9.1f} acked={r['gifts']:7d} errors={r['errors']:5d} "
+              f"p50={r['p50']:8.1f}ms p99={r['p99']:8.1f}ms ws_msgs={r['broadcast_msgs']}{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# backend/tools/bench_http_pool.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: messages/sec za adapters za nje bila pooling (client mpya kwa kila
+ujumbe, kama telegram_bot/whatsapp/webhook_sender za zamani) dhidi ya
+utils.http_client (keep-alive pool kwa host).
+
+Stub server ya ndani (HTTP/1.1 keep-alive) hujibu `{"ok": true}` baada ya
+--latency-ms. Bila --certfile/--keyfile hakuna TLS, hivyo tofauti halisi
+dhidi ya api.telegram.org (TCP+TLS handshake ~RTT 2-3) ni kubwa zaidi.
+
+Usage:
+  python -m backend.tools.bench_http_pool --messages 2000 --concurrency 50
+  python -m backend.tools.bench_http_pool --certfile cert.pem --keyfile key.pem
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from backend.utils.http_client import OutboundHTTP
+
+BODY = json.dumps({"ok": True, "result": {"message_id": 1}}).encode()
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # lazima kabla ya listen()
+
+
+def _serve(latency: float, certfile: Optional[str], keyfile: Optional[str]) -> Tuple[_StubServer, str]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers + body kwa writes mbili; bila hii ~40ms delayed-ACK
+
+        def do_POST(self):  # noqa: N802
+            n = int(self.headers.get("Content-Length") or 0)
+            if n:
+                self.rfile.read(n)
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, *a):
+            pass
+
+    srv = _StubServer(("127.0.0.1", 0), Handler)
+    scheme = "http"
+    if certfile:
+        ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ctx.load_cert_chain(certfile, keyfile)
+        srv.socket = ctx.wrap_socket(srv.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"{scheme}://127.0.0.1:{srv.server_address[1]}/bot123/sendMessage"
+
+
+async def _async_unpooled(url: str, n: int, conc: int, verify: bool) -> None:
+    sem = asyncio.Semaphore(conc)
+
+    async def one(i: int):
+        async with sem:
+            async with httpx.AsyncClient(verify=verify) as client:
+                (await client.post(url, json={"chat_id": i, "text": "habari"})).json()
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+
+
+async def _async_pooled(url: str, n: int, conc: int, verify: bool) -> None:
+    http = OutboundHTTP(http2=False, verify=verify)
+    sem = asyncio.Semaphore(conc)
+
+    async def one(i: int):
+        async with sem:
+            (await http.apost(url, json={"chat_id": i, "text": "habari"})).json()
+
+    try:
+        await asyncio.gather(*(one(i) for i in range(n)))
+    finally:
+        await http.aclose()
+
+
+def _sync_unpooled(url: str, n: int, verify: bool) -> None:
+    for i in range(n):
+        httpx.post(url, json={"chat_id": i, "text": "habari"}, verify=verify).json()
+
+
+def _sync_pooled(url: str, n: int, verify: bool) -> None:
+    http = OutboundHTTP(http2=False, verify=verify)
+    try:
+        for i in range(n):
+            http.post(url, json={"chat_id": i, "text": "habari"}).json()
+    finally:
+        asyncio.run(http.aclose())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--sync-messages", type=int, default=500, help="kwa njia ya sync (webhooks/whatsapp)")
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=2.0)
+    ap.add_argument("--certfile", default=None)
+    ap.add_argument("--keyfile", default=None)
+    args = ap.parse_args()
+
+    srv, url = _serve(args.latency_ms / 1000.0, args.certfile, args.keyfile)
+    verify = not args.certfile  # cert ya stub ni self-signed
+
+    rows: List[Tuple[str, int, float]] = []
+    for name, fn in (
+        ("async unpooled", lambda: asyncio.run(_async_unpooled(url, args.messages, args.concurrency, verify))),
+        ("async pooled", lambda: asyncio.run(_async_pooled(url, args.messages, args.concurrency, verify))),
+    ):
+        t0 = time.perf_counter()
+        fn()
+        rows.append((name, args.messages, time.perf_counter() - t0))
+    for name, fn in (
+        ("sync unpooled", lambda: _sync_unpooled(url, args.sync_messages, verify)),
+        ("sync pooled", lambda: _sync_pooled(url, args.sync_messages, verify)),
+    ):
+        t0 = time.perf_counter()
+        fn()
+        rows.append((name, args.sync_messages, time.perf_counter() - t0))
+    srv.shutdown()
+
+    print(f"stub={url} latency={args.latency_ms}ms concurrency={args.concurrency}")
+    base: Dict[str, float] = {}
+    for name, n, wall in rows:
+        rate = n / wall
+        kind = name.split()[0]
+        extra = f"  x{rate / base[kind]:.1f}" if kind in base else ""
+        base.setdefault(kind, rate)
+        print(f"{name:<16} n={n:<6} wall={wall:6.2f}s  msgs/sec={rate:>9,.0f}{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# backend/tools/bench_notification_unread.py
+# -*- coding: utf-8 -*-
+"""
+Load test: polling ya /notifications/unread/count kwa watumiaji --users.
+
+  scan     — fallback ya zamani: pakia hadi 10,000 arifa ambazo hazijasomwa
+             kisha len().
+  count    — SELECT COUNT(*) ... WHERE user_id = ? AND read = false kwa kila poll.
+  counter  — services.notification_counters (cache + row ya notification_counters).
+
+Threads --workers hupiga poll kwa watumiaji wa nasibu kwa --seconds, huku
+writer mmoja (ORM, kama routes) akiunda / kusoma / kufuta arifa kwa
+--writes kwa sekunde. Kwa `counter`: --sockets websockets bandia huunganishwa
+kwenye `unread_counters.hub`; mwishoni hukaguliwa kwamba kila socket ilipokea
+thamani ya mwisho ya DB, na reconcile() haina tofauti.
+
+Usage:
+  python -m backend.tools.bench_notification_unread --users 10000 --per-user 30 --seconds 10
+  python -m backend.tools.bench_notification_unread --db-url postgresql://... --workers 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+import backend.models  # noqa: F401  (mappers zote: User)
+from backend.models.notification import Notification
+from backend.models.notification_counter import NotificationCounter
+from backend.models.user import User
+from backend.services.notification_counters import unread_counters
+from starlette.websockets import WebSocketState
+
+
+class _FakeSocket:
+    """Inatosha kwa WebSocketManager/Outbox: hukumbuka ujumbe wa mwisho."""
+
+    application_state = WebSocketState.CONNECTED
+
+    def __init__(self) -> None:
+        self.last: Optional[Dict[str, Any]] = None
+        self.received = 0
+
+    async def accept(self) -> None:
+        return None
+
+    async def send_text(self, text: str) -> None:
+        msg = json.loads(text)
+        if self.last is None or msg["version"] >= self.last["version"]:
+            self.last = msg
+        self.received += 1
+
+    async def send_json(self, msg: Any) -> None:
+        await self.send_text(json.dumps(msg))
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+def _setup(url: str, users: int, per_user: int, workers: int, unread_ratio: float):
+    kw: Dict[str, Any] = {"pool_size": workers + 4, "max_overflow": 0}
+    if url.startswith("sqlite"):
+        kw["connect_args"] = {"timeout": 60, "check_same_thread": False}
+    engine = create_engine(url, **kw)
+    if url.startswith("sqlite"):
+        # WAL: readers hawazuii writer (kama MVCC ya Postgres); bila hii busy-wait ya sqlite hutawala
+        event.listen(engine, "connect", lambda c, _r: c.execute("PRAGMA journal_mode=WAL"))
+    tables = [User.__table__, Notification.__table__, NotificationCounter.__table__]
+    Notification.metadata.drop_all(engine, tables=tables[::-1])
+    Notification.metadata.create_all(engine, tables=tables)
+    t = User.__table__
+    pw = next((c.name for c in t.c if c.name in ("password_hash", "hashed_password", "password")), None)
+    rnd = random.Random(11)
+    with engine.begin() as conn:
+        conn.execute(insert(t), [{"id": i, "email": f"u{i}@bench.local", **({pw: "x"} if pw else {})}
+                                 for i in range(1, users + 1)])
+        batch: List[Dict[str, Any]] = []
+        for uid in range(1, users + 1):
+            for _ in range(rnd.randint(0, per_user * 2)):
+                batch.append({"user_id": uid, "title": "Habari", "message": "bench",
+                              "read": rnd.random() >= unread_ratio, "retry_count": 0})
+            if len(batch) >= 20_000:
+                conn.execute(insert(Notification.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Notification.__table__), batch)
+    return engine, sessionmaker(bind=engine)
+
+
+def _poller(mode: str) -> Callable[[Any, int], int]:
+    if mode == "scan":
+        return lambda db, uid: len(
+            db.query(Notification).filter(Notification.user_id == uid, Notification.read.is_(False)).limit(10_000).all()
+        )
+    if mode == "count":
+        return lambda db, uid: int(db.execute(
+            select(func.count(Notification.id)).where(Notification.user_id == uid, Notification.read.is_(False))
+        ).scalar() or 0)
+    return unread_counters.get
+
+
+def _writer(Session, users: int, rate: float, stop: threading.Event, done: List[int]) -> None:
+    rnd = random.Random(5)
+    db = Session()
+    try:
+        while not stop.wait(1.0 / rate if rate > 0 else 1.0):
+            if rate <= 0:
+                continue
+            uid = rnd.randint(1, users)
+            op = rnd.random()
+            try:
+                if op < 0.6:
+                    db.add(Notification(user_id=uid, title="Mpya", message="bench"))
+                else:
+                    n = db.query(Notification).filter(
+                        Notification.user_id == uid, Notification.read.is_(False)
+                    ).first()
+                    if n is None:
+                        continue
+                    if op < 0.9:
+                        n.mark_read()
+                    else:
+                        db.delete(n)
+                db.commit()
+                done[0] += 1
+            except Exception:
+                db.rollback()
+    finally:
+        db.close()
+
+
+def _run(mode: str, Session, users: int, workers: int, seconds: float, writes: float,
+         sockets: int) -> Dict[str, Any]:
+    poll = _poller(mode)
+    lat: List[List[float]] = [[] for _ in range(workers)]
+    stop = threading.Event()
+    written = [0]
+
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    fakes: Dict[int, _FakeSocket] = {}
+    if mode == "counter":
+        unread_counters.forget()
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(unread_counters.start(), loop).result()
+        db = Session()
+        try:
+            # kama /notifications/ws: connect + snapshot ya mwanzo
+            for uid in random.Random(3).sample(range(1, users + 1), min(sockets, users)):
+                ws = fakes[uid] = _FakeSocket()
+                asyncio.run_coroutine_threadsafe(unread_counters.hub.connect(uid, ws), loop).result()
+                n, v = unread_counters.snapshot(db, uid)
+                asyncio.run_coroutine_threadsafe(ws.send_json({"type": "notification_unread", "unread": n, "version": v}), loop).result()
+        finally:
+            db.close()
+
+    def worker(i: int) -> None:
+        rnd = random.Random(100 + i)
+        db = Session()
+        try:
+            while not stop.is_set():
+                uid = rnd.randint(1, users)
+                t0 = time.perf_counter()
+                poll(db, uid)
+                db.rollback()   # kama request: transaction fupi, snapshot mpya kila poll
+                lat[i].append((time.perf_counter() - t0) * 1000.0)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    threads.append(threading.Thread(target=_writer, args=(Session, users, writes, stop, written)))
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    flat = sorted(x for w in lat for x in w)
+    out: Dict[str, Any] = {
+        "polls": len(flat), "pps": len(flat) / wall, "writes": written[0],
+        "p50": statistics.median(flat) if flat else 0.0,
+        "p99": flat[min(len(flat) - 1, int(len(flat) * 0.99))] if flat else 0.0,
+    }
+    if mode == "counter" and loop is not None:
+        time.sleep(0.2)   # pushes za mwisho
+        db = Session()
+        try:
+            out["mismatches"] = len(unread_counters.reconcile(db))
+            rows = dict(db.execute(select(NotificationCounter.user_id, NotificationCounter.version)).all())
+            out["push_ok"] = sum(1 for uid, ws in fakes.items() if ws.last and ws.last["version"] == rows.get(uid))
+            out["pushes"] = sum(ws.received for ws in fakes.values())
+        finally:
+            db.close()
+        out["hit_ratio"] = unread_counters.stats["hits"] / max(1, unread_counters.stats["hits"] + unread_counters.stats["misses"])
+        loop.call_soon_threadsafe(loop.stop)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default=None, help="default: sqlite file kwenye tempdir")
+    ap.add_argument("--users", type=int, default=10_000)
+    ap.add_argument("--per-user", type=int, default=30, help="wastani wa arifa kwa mtumiaji")
+    ap.add_argument("--unread-ratio", type=float, default=0.4)
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--writes", type=float, default=50.0, help="ORM writes kwa sekunde wakati wa poll")
+    ap.add_argument("--sockets", type=int, default=500, help="websockets bandia (mode=counter)")
+    ap.add_argument("--modes", default="scan,count,counter")
+    args = ap.parse_args()
+
+    url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'notif.db')}"
+    print(f"db={url.split('@')[-1]} users={args.users} per_user~{args.per_user} workers={args.workers} "
+          f"seconds={args.seconds} writes/s={args.writes}")
+    for mode in args.modes.split(","):
+        engine, Session = _setup(url, args.users, args.per_user, args.workers, args.unread_ratio)
+        r = _run(mode, Session, args.users, args.workers, args.seconds, args.writes, args.sockets)
+        engine.dispose()
+        line = (f"{mode:<8} polls/sec={r['pps']:9.1f} polls={r['polls']:8d} p50={r['p50']:7.2f}ms "
+                f"p99={r['p99']:7.2f}ms writes={r['writes']}")
+        if mode == "counter":
+            line += (f" hit_ratio={r['hit_ratio']:.2f} reconcile_mismatches={r['mismatches']} "
+                     f"push_ok={r['push_ok']}/{args.sockets} pushes={r['pushes']}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
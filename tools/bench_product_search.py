@@ -0,0 +1,150 @@
+# backend/tools/bench_product_search.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: relevance search ya /products/search — njia ya zamani (ILIKE '%q%'
+kwenye name/description + COUNT + pool ya rows 400 zinazopangwa kwa Python)
+dhidi ya services.product_search (Postgres: tsvector/pg_trgm; vinginevyo
+inverted index ya tenant).
+
+Hujaza products N (default 1M) kwa tenants --tenants, kisha hupima p50/p99
+ya queries mchanganyiko (neno moja, maneno mawili, prefix).
+
+Usage:
+  python -m backend.tools.bench_product_search --products 1000000
+  python -m backend.tools.bench_product_search --db-url postgresql://... --products 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, func, insert, or_
+from sqlalchemy.orm import Session, sessionmaker
+
+import backend.models  # noqa: F401  (mappers zote: User/Order/DroneMission)
+from backend.models.product import Product
+from backend.services import product_search
+from backend.services.product_search import SearchParams, search_products
+
+WORDS = (
+    "simu samsung iphone tecno infinix charger cable earphones spika redio tv led friji jiko "
+    "gesi sufuria kikombe sahani kitenge kanga viatu raba shati suruali gauni mkoba saa pete "
+    "mchele unga sukari mafuta chumvi maharage sabuni dawa mswaki mafuta ya nazi asali chai "
+    "kahawa maziwa juisi maji betri solar taa panga jembe mbolea mbegu kuku mayai samaki"
+).split()
+QUERIES = ["simu", "samsung charger", "sola", "kitenge kanga", "mafuta ya nazi", "sab", "viatu raba", "tv led"]
+
+
+def _seed(engine, n: int, tenants: int, chunk: int = 20000) -> None:
+    rnd = random.Random(7)
+    with engine.begin() as conn:
+        for start in range(0, n, chunk):
+            rows = []
+            for i in range(start, min(n, start + chunk)):
+                name = " ".join(rnd.choices(WORDS, k=rnd.randint(2, 4))).title()
+                rows.append({
+                    "owner_id": 1 + i % tenants,
+                    "name": f"{name} {i}",
+                    "slug": f"p-{i}",
+                    "sku": f"SKU{i}",
+                    "description": " ".join(rnd.choices(WORDS, k=rnd.randint(8, 30))),
+                    "currency": "TZS",
+                    "price": rnd.randint(500, 500000),
+                    "stock_on_hand": rnd.randint(0, 50),
+                })
+            conn.execute(insert(Product), rows)
+
+
+def _legacy(db: Session, q: str, owner_id: int, limit: int = 24, offset: int = 0) -> List[Any]:
+    """Nakala ya route ya zamani (ILIKE + count + Python score)."""
+    like = f"%{q}%"
+    qry = db.query(Product).filter(Product.owner_id == owner_id).filter(
+        or_(Product.name.ilike(like), Product.description.ilike(like))
+    )
+    qry.count()
+    pool = min(max(limit * 4, 80), 400)
+    rows = qry.order_by(Product.updated_at.desc()).limit(pool + offset + limit).all()
+    tokens = q.lower().split()
+
+    def score(r: Any) -> float:
+        name, desc = (r.name or "").lower(), (r.description or "").lower()
+        return sum((3.0 if t in name else 0.0) + (1.0 if t in desc else 0.0) for t in tokens)
+
+    return sorted(rows, key=lambda r: (score(r), r.id), reverse=True)[offset: offset + limit]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def _run(Session, fn, requests: int, tenants: int) -> Dict[str, float]:
+    rnd = random.Random(3)
+    lat: List[float] = []
+    for _ in range(requests):
+        db = Session()
+        try:
+            q, owner = rnd.choice(QUERIES), 1 + rnd.randrange(tenants)
+            t0 = time.perf_counter()
+            fn(db, q, owner)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+        finally:
+            db.close()
+    return _percentiles(lat)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default="sqlite://")
+    ap.add_argument("--products", type=int, default=1_000_000)
+    ap.add_argument("--tenants", type=int, default=1)
+    ap.add_argument("--requests", type=int, default=50)
+    args = ap.parse_args()
+
+    engine = create_engine(args.db_url)
+    # products + tables za relationships (selectin) ambazo route hupakia
+    tables = [Product.__table__, *{r.mapper.local_table for r in Product.__mapper__.relationships}]
+    Product.metadata.create_all(engine, tables=tables)
+    product_search.ensure_search_indexes(engine)
+    Session = sessionmaker(bind=engine)
+    t0 = time.perf_counter()
+    _seed(engine, args.products, args.tenants)
+    print(f"seeded {args.products} products in {time.perf_counter() - t0:.1f}s")
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE products")
+
+    before = _run(Session, _legacy, args.requests, args.tenants)
+
+    def _new(db: Session, q: str, owner: int) -> None:
+        search_products(db, SearchParams(q=q, owner_id=owner))
+
+    db = Session()
+    try:
+        t0 = time.perf_counter()
+        backend = product_search.backend_for(db)
+        if backend == "memory":   # jenga indexes kabla ya kupima (kama baada ya ombi la kwanza)
+            for owner in range(1, args.tenants + 1):
+                product_search.registry.get(db, owner)
+        warm_ms = (time.perf_counter() - t0) * 1000.0
+        total = db.query(func.count(Product.id)).scalar()
+    finally:
+        db.close()
+    after = _run(Session, _new, args.requests, args.tenants)
+
+    print(f"products={total} tenants={args.tenants} backend={backend} warm-up={warm_ms:.0f}ms")
+    for name, r in (("ilike+py", before), (backend, after)):
+        print(f"{name:<10} p50={r['p50']:9.2f}ms p99={r['p99']:9.2f}ms mean={r['mean']:9.2f}ms")
+    if after["p50"]:
+        print(f"p50 speedup: {before['p50'] / after['p50']:.1f}x  p99 speedup: {before['p99'] / after['p99']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
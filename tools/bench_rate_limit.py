@@ -0,0 +1,166 @@
+# backend/tools/bench_rate_limit.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ukaguzi wa rate limit + idempotency kwa sekunde.
+
+  legacy  — njia ya zamani ya routes: dict ya orodha za timestamps kwa kila
+            key (`while q and now - q[0] > 60: q.pop(0)`), na `_IDEMP` dict
+            inayofagiliwa KWA UKAMILIFU kwenye kila ombi lenye Idempotency-Key.
+  memory  — utils.rate_limit.MemoryStore: GCRA (thamani moja kwa key) +
+            SET NX yenye TTL buckets.
+  redis   — utils.rate_limit.RedisStore juu ya stand-in ya ndani (LocalRedis,
+            bila server) — gharama ya njia ya Redis bila network; au server
+            halisi kwa --redis-url.
+
+Mzigo: --keys watumiaji, limit --limit/dk; kila ombi = hit ya limiter +
+claim ya idempotency key mpya (kama POST yenye Idempotency-Key). Keys za
+idempotency hujilimbikiza kama kwenye production (TTL dk 10 > muda wa bench),
+hivyo legacy hulipa O(keys zote) kwa kila ombi.
+
+Usage:
+  python -m backend.tools.bench_rate_limit --requests 20000 --keys 2000
+  python -m backend.tools.bench_rate_limit --requests 200000 --idem-every 0   # rate limit pekee
+  python -m backend.tools.bench_rate_limit --redis-url redis://localhost:6379/15
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.utils import rate_limit
+from backend.utils.rate_limit import IdempotencyKeys, MemoryStore, RateLimiter, RedisStore, gcra_step, window_step
+
+
+class LocalRedis:
+    """Stand-in ya Redis (register_script/set/delete) kwa process moja — kwa tests/bench."""
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Any:
+        v = self._data.get(key)
+        return v[0] if v and v[1] > now else None
+
+    def register_script(self, src: str) -> Callable[..., List[Any]]:
+        def gcra(keys: List[str], args: List[Any]) -> List[Any]:
+            now, interval, burst, cost = float(args[0]), float(args[1]), int(args[2]), int(args[3])
+            with self._lock:
+                (ok, remaining, retry, reset), new_tat = gcra_step(self._get(keys[0], now), now, interval, burst, cost)
+                if new_tat is not None:
+                    self._data[keys[0]] = (new_tat, new_tat)
+            return [int(ok), remaining, str(retry), str(reset)]
+
+        def window(keys: List[str], args: List[Any]) -> List[Any]:
+            now, period, limit, cost = float(args[0]), float(args[1]), int(args[2]), int(args[3])
+            with self._lock:
+                (ok, remaining, retry, reset), new_log = window_step(self._get(keys[0], now) or (), now, period, limit, cost)
+                if new_log is not None:
+                    self._data[keys[0]] = (new_log, new_log[-1] + period)
+            return [int(ok), remaining, str(retry), str(reset)]
+        return window if "ZCARD" in src else gcra
+
+    def set(self, key: str, value: Any, nx: bool = False, px: Optional[int] = None) -> Optional[bool]:
+        now = time.time()
+        with self._lock:
+            if nx and self._get(key, now) is not None:
+                return None
+            self._data[key] = (value, now + (px / 1000.0 if px else 1e18))
+            return True
+
+    def delete(self, key: str) -> int:
+        with self._lock:
+            return 1 if self._data.pop(key, None) else 0
+
+
+# ───────────── legacy (nakala ya helpers za zamani za routes) ─────────────
+def _legacy(limit: int, ttl: float):
+    rate: Dict[int, List[float]] = {}
+    idemp: Dict[Tuple[int, str], float] = {}
+
+    def rate_ok(uid: int) -> bool:
+        now = time.time()
+        q = rate.setdefault(uid, [])
+        while q and (now - q[0]) > 60.0:
+            q.pop(0)
+        if len(q) >= limit:
+            return False
+        q.append(now)
+        return True
+
+    def idem_ok(uid: int, key: str) -> bool:
+        now = time.time()
+        stale = [(k_uid, k) for (k_uid, k), ts in idemp.items() if now - ts > ttl]
+        for s in stale:
+            idemp.pop(s, None)
+        token = (uid, key)
+        if token in idemp:
+            return False
+        idemp[token] = now
+        return True
+
+    return rate_ok, idem_ok
+
+
+def _run(mode: str, n: int, keys: int, limit: int, idem_every: int, redis_url: Optional[str]) -> Dict[str, float]:
+    rnd = random.Random(7)
+    uids = [rnd.randrange(keys) for _ in range(n)]
+    if mode == "legacy":
+        rate_ok, idem_ok = _legacy(limit, 600.0)
+    else:
+        if mode == "memory":
+            rate_limit.set_store(MemoryStore())
+        elif redis_url:
+            rate_limit.set_store(RedisStore.from_url(redis_url))
+        else:
+            rate_limit.set_store(RedisStore(LocalRedis()))
+        lim = RateLimiter(f"bench-{time.time_ns()}", limit, 60.0)
+        idem = IdempotencyKeys(f"bench-{time.time_ns()}", 600.0)
+        rate_ok = lim.allow
+        idem_ok = lambda uid, key: idem.claim((uid, key))  # noqa: E731
+
+    allowed = 0
+    t0 = time.perf_counter()
+    for i, uid in enumerate(uids):
+        if rate_ok(uid):
+            allowed += 1
+        if idem_every and i % idem_every == 0:
+            idem_ok(uid, f"k{i}")
+    dt = time.perf_counter() - t0
+    rate_limit.set_store(None)
+    return {"cps": n / dt, "allowed": allowed, "us": dt / n * 1e6}
+
+
+def _shared_check(limit: int) -> bool:
+    """Workers wawili (RedisStore mbili) juu ya backend moja: limit ni ya pamoja, si limit × workers."""
+    backend = LocalRedis()
+    a, b = RedisStore(backend), RedisStore(backend)
+    interval = 60.0 / limit
+    t0 = time.time()
+    ok = sum(1 for i in range(limit * 2) if (a if i % 2 else b).gcra("u1", interval, limit, 1)[0])
+    # + tokens zilizojazwa upya wakati loop ikiendelea
+    return limit <= ok <= limit + 1 + int((time.time() - t0) / interval)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=20_000)
+    ap.add_argument("--keys", type=int, default=5_000, help="idadi ya watumiaji (keys za limiter)")
+    ap.add_argument("--limit", type=int, default=60, help="maombi kwa dakika kwa key")
+    ap.add_argument("--idem-every", type=int, default=1, help="claim ya idempotency kila ombi la N (0 = hakuna)")
+    ap.add_argument("--modes", default="legacy,memory,redis")
+    ap.add_argument("--redis-url", default=None, help="Redis halisi badala ya LocalRedis")
+    args = ap.parse_args()
+
+    print(f"requests={args.requests} keys={args.keys} limit={args.limit}/min idem_every={args.idem_every}")
+    for mode in args.modes.split(","):
+        r = _run(mode, args.requests, args.keys, args.limit, args.idem_every, args.redis_url)
+        print(f"{mode:<7} checks/sec={r['cps']:11.0f}  {r['us']:8.2f} us/check  allowed={r['allowed']}")
+    print(f"shared limit across workers: {'ok' if _shared_check(args.limit) else 'FAILED'}")
+
+
+if __name__ == "__main__":
+    main()
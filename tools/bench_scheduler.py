@@ -0,0 +1,182 @@
+# backend/tools/bench_scheduler.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: throughput ya scheduler (tasks.scheduler.Dispatcher) dhidi ya
+njia ya zamani (batch 100, concurrency 1, retry kwa sleep ndani ya loop,
+status moja kwa moja kwa kila ujumbe) kwa senders bandia.
+
+Senders bandia:
+  telegram  ~40ms
+  whatsapp  ~120ms
+  sms       ~600ms, 5% hushindwa (provider mzito)
+
+Hutumia DB ya benchmark (default: SQLite file ya muda) yenye table ya
+`scheduled_messages` pekee. Kwa Postgres (SKIP LOCKED halisi) tumia --db-url
+na --workers >1 kuiga instances kadhaa zinazoshiriki foleni.
+
+Usage:
+  python -m backend.tools.bench_scheduler --messages 3000
+  python -m backend.tools.bench_scheduler --db-url postgresql://... --messages 20000 --workers 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import os
+import random
+import tempfile
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+import backend.models  # noqa: F401  (registers all mappers, incl. users for the FK)
+from backend.crud import scheduler_crud as queue
+from backend.models.scheduled_message import ScheduledMessage, SchedPlatform, SchedStatus
+from backend.tasks.scheduler import Dispatcher
+
+LATENCY = {"telegram": 0.04, "whatsapp": 0.12, "sms": 0.6}
+FAIL_RATE = {"telegram": 0.0, "whatsapp": 0.0, "sms": 0.05}
+
+
+def _fake_sender(platform: str, rnd: random.Random):
+    async def _send(to: str, text: str) -> None:
+        await asyncio.sleep(LATENCY[platform] * rnd.uniform(0.7, 1.3))
+        if rnd.random() < FAIL_RATE[platform]:
+            raise RuntimeError(f"{platform} provider 503")
+    return _send
+
+
+def _seed(Session, n: int) -> None:
+    rnd = random.Random(5)
+    past = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=1)
+    platforms = [SchedPlatform.telegram] * 6 + [SchedPlatform.whatsapp] * 3 + [SchedPlatform.sms]
+    with Session() as db:
+        db.execute(delete(ScheduledMessage))
+        db.bulk_insert_mappings(
+            ScheduledMessage,
+            [
+                {
+                    "user_id": 1,
+                    "recipient": f"+2557{i:08d}",
+                    "content": f"habari {i}",
+                    "platform": rnd.choice(platforms),
+                    "status": SchedStatus.queued,
+                    "scheduled_time": past,
+                    "sent": False,
+                    "retry_count": 0,
+                    "max_retries": 3,
+                }
+                for i in range(n)
+            ],
+        )
+        db.commit()
+
+
+def _done(Session) -> int:
+    with Session() as db:
+        return int(db.execute(
+            select(func.count()).where(ScheduledMessage.status.in_((SchedStatus.sent, SchedStatus.failed)))
+        ).scalar() or 0)
+
+
+async def _legacy(Session, senders: Dict[str, object], n: int, deadline: float) -> None:
+    """Iga `_tick_once` ya zamani: 100 kwa tick, moja baada ya nyingine, sleep za retry."""
+    while time.perf_counter() < deadline:
+        with Session() as db:
+            due = queue.claim_due_messages(db, limit=100, lease_seconds=3600)
+        if not due:
+            if _done(Session) >= n:
+                return
+            await asyncio.sleep(0.05)
+            continue
+        for m in due:
+            delay, ok = 0.8, False
+            for _attempt in range(3):
+                try:
+                    await senders[m["platform"]](m["recipient"], m["message"])
+                    ok = True
+                    break
+                except Exception:
+                    await asyncio.sleep(delay)
+                    delay *= 1.6
+            with Session() as db:
+                if ok:
+                    queue.mark_message_sent(db, m["id"])
+                else:
+                    queue.record_failures_bulk(db, [{**m, "error": "exhausted", "permanent": True}])
+            if time.perf_counter() >= deadline:
+                return
+
+
+async def _new(Session, senders, n: int, deadline: float, workers: int, concurrency: int) -> Dict[str, int]:
+    ds = [
+        Dispatcher(
+            session_factory=Session,
+            senders=senders,
+            default_concurrency=concurrency,
+            platform_concurrency={"sms": max(1, concurrency // 4)},
+            poll_interval=0.05,
+            flush_interval=0.2,
+            retry_base_seconds=1,
+            lease_seconds=60,
+            send_timeout=5,
+        )
+        for _ in range(workers)
+    ]
+    tasks = [asyncio.create_task(d.run()) for d in ds]
+    while time.perf_counter() < deadline and _done(Session) < n:
+        await asyncio.sleep(0.2)
+    for d in ds:
+        d.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    total: Dict[str, int] = {}
+    for d in ds:
+        for k, v in d.stats.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default=None)
+    ap.add_argument("--messages", type=int, default=3000)
+    ap.add_argument("--workers", type=int, default=1, help="dispatchers zinazoshiriki foleni")
+    ap.add_argument("--concurrency", type=int, default=32, help="sends kwa platform (sms hupata 1/4)")
+    ap.add_argument("--seconds", type=float, default=60.0, help="kikomo cha muda kwa kila njia")
+    ap.add_argument("--skip-legacy", action="store_true")
+    args = ap.parse_args()
+
+    url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_sched.db')}"
+    engine = create_engine(url, pool_size=20) if not url.startswith("sqlite") else create_engine(url)
+    ScheduledMessage.metadata.create_all(engine, tables=[ScheduledMessage.__table__])
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    rnd = random.Random(9)
+    senders = {p: _fake_sender(p, rnd) for p in LATENCY}
+    n = args.messages
+
+    rows = []
+    if not args.skip_legacy:
+        _seed(Session, n)
+        t0 = time.perf_counter()
+        asyncio.run(_legacy(Session, senders, n, t0 + args.seconds))
+        wall = time.perf_counter() - t0
+        rows.append(("legacy", _done(Session), wall, {}))
+
+    _seed(Session, n)
+    t0 = time.perf_counter()
+    stats = asyncio.run(_new(Session, senders, n, t0 + args.seconds, args.workers, args.concurrency))
+    wall = time.perf_counter() - t0
+    rows.append((f"dispatcher x{args.workers}", _done(Session), wall, stats))
+
+    print(f"messages={n} db={engine.dialect.name} limit={args.seconds:.0f}s")
+    for name, done, wall, st in rows:
+        extra = " ".join(f"{k}={v}" for k, v in sorted(st.items()))
+        print(f"{name:<15} done={done:<6} wall={wall:6.1f}s  msgs/min={done / wall * 60:>10,.0f}  {extra}")
+
+
+if __name__ == "__main__":
+    main()
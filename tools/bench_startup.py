@@ -0,0 +1,125 @@
+# backend/tools/bench_startup.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cold start ya backend.main (import + lifespan hadi "ready").
+
+Kila run ni process mpya (cold, kama Render):
+  eager — STARTUP_LAZY=0: models zote + routers zote kwenye boot (njia ya awali)
+  lazy  — STARTUP_LAZY=1 + manifest: models za mappers tu, routers za hiari
+          hupakiwa kwenye request ya kwanza (STARTUP_BACKGROUND_ROUTERS=0 hapa;
+          production huzipakia nyuma baada ya ready)
+
+Process ya mtoto hupima: muda wa `import backend.main`, muda hadi lifespan
+imemaliza (TestClient), RSS baada ya boot, idadi ya sys.modules, na muda wa
+hit ya kwanza kwenye router iliyochelewa (lazy). Manifest hutengenezwa kwenye
+tempdir kabla ya runs (au --manifest).
+
+Usage:
+  python -m backend.tools.bench_startup --runs 5
+  python -m backend.tools.bench_startup --modes lazy --manifest backend/startup_manifest.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+def _child() -> None:
+    t0 = time.perf_counter()
+    import backend.main as main  # noqa: WPS433
+    t_import = time.perf_counter()
+    from starlette.testclient import TestClient
+    from backend.utils.startup import rss_mb
+
+    out: Dict[str, Any] = {"import_ms": (t_import - t0) * 1000.0}
+    with TestClient(main.app) as client:
+        t_ready = time.perf_counter()
+        out["ready_ms"] = (t_ready - t0) * 1000.0
+        out["rss_mb"] = rss_mb()
+        out["modules"] = len(sys.modules)
+        boot = main.app.state.startup
+        snap = boot.snapshot(top=0)  # /__startup ni ya admin tu
+        out["models"] = snap["models"]["loaded"]
+        routers = snap["routers"]
+        out["deferred"] = len(routers.get("pending") or ())
+        # hit ya kwanza kwenye router iliyochelewa (path isiyo na params)
+        for fq in routers.get("pending") or ():
+            paths = [p for p in boot.routers.routers[fq].get("paths") or () if "{" not in p]
+            if paths:
+                t = time.perf_counter()
+                client.get(paths[0])
+                out["first_hit_ms"] = (time.perf_counter() - t) * 1000.0
+                out["first_hit"] = f"{fq} GET {paths[0]}"
+                break
+    print("BENCH " + json.dumps(out))
+
+
+def _spawn(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-m", "backend.tools.bench_startup", *args],
+                          env=env, capture_output=True, text=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--modes", default="eager,lazy")
+    ap.add_argument("--manifest", default=None, help="default: tengeneza mpya kwenye tempdir")
+    ap.add_argument("--db-url", default=None, help="default: sqlite file kwenye tempdir")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child()
+        return
+
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", args.db_url or f"sqlite:///{os.path.join(tmp, 'startup.db')}")
+    env.setdefault("AUTO_CREATE_TABLES", "0")   # create_all inahitaji models zote
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("STARTUP_BACKGROUND_ROUTERS", "0")  # pima hit ya kwanza (middleware), si warm ya nyuma
+
+    manifest = args.manifest
+    if manifest is None:
+        manifest = os.path.join(tmp, "startup_manifest.json")
+        t = time.perf_counter()
+        r = subprocess.run([sys.executable, "-m", "backend.tools.build_startup_manifest", "--out", manifest],
+                           env=env, capture_output=True, text=True)
+        if r.returncode != 0:
+            sys.exit(f"manifest build failed:\n{r.stderr[-2000:]}")
+        print(f"manifest: {r.stdout.splitlines()[0] if r.stdout else manifest} "
+              f"[build {(time.perf_counter() - t):.1f}s]")
+
+    for mode in args.modes.split(","):
+        menv = dict(env, STARTUP_LAZY="1" if mode == "lazy" else "0", STARTUP_MANIFEST=manifest)
+        rows: List[Dict[str, Any]] = []
+        wall: List[float] = []
+        for _ in range(args.runs):
+            t = time.perf_counter()
+            r = _spawn(["--child"], menv)
+            wall.append((time.perf_counter() - t) * 1000.0)
+            line = next((x for x in r.stdout.splitlines() if x.startswith("BENCH ")), None)
+            if r.returncode != 0 or line is None:
+                sys.exit(f"{mode}: child failed:\n{r.stderr[-2000:]}")
+            rows.append(json.loads(line[6:]))
+
+        def med(k: str) -> float:
+            vals = [x[k] for x in rows if x.get(k) is not None]
+            return statistics.median(vals) if vals else 0.0
+
+        line = (f"{mode:<6} wall={statistics.median(wall):7.0f}ms import={med('import_ms'):7.0f}ms "
+                f"ready={med('ready_ms'):7.0f}ms rss={med('rss_mb'):6.1f}MB modules={med('modules'):5.0f} "
+                f"models={med('models'):4.0f} deferred_routers={med('deferred'):3.0f}")
+        if mode == "lazy" and any("first_hit_ms" in x for x in rows):
+            line += f" first_hit={med('first_hit_ms'):6.1f}ms ({rows[0].get('first_hit')})"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
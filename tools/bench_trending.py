@@ -0,0 +1,125 @@
+# backend/tools/bench_trending.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: `/explore/trending` kwa SQL + scoring kwa kila ombi dhidi ya
+index iliyopangwa mapema (services.trending_index).
+
+Hujaza DB ya benchmark (default: SQLite ya memory) na live streams N, kisha
+huita route moja kwa moja kwa offsets/algos mchanganyiko na kupima p50/p99.
+
+Usage:
+  python -m backend.tools.bench_trending --streams 10000 --requests 500
+  python -m backend.tools.bench_trending --db-url postgresql://... --streams 10000
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import statistics
+import time
+from typing import Dict, List
+
+from fastapi import Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.live_stream import LiveStream
+from backend.routes.explore import get_trending_streams
+from backend.services.trending_index import trending_index
+
+
+def _seed(Session, n: int) -> None:
+    rnd = random.Random(11)
+    now = dt.datetime.now(dt.timezone.utc)
+    db = Session()
+    try:
+        db.bulk_insert_mappings(
+            LiveStream,
+            [
+                {
+                    "title": f"stream {i}",
+                    "viewers_count": int(rnd.paretovariate(1.2) * 5),
+                    "likes_count": rnd.randint(0, 10000),
+                    "started_at": now - dt.timedelta(minutes=rnd.randint(1, 600)),
+                    "is_featured": rnd.random() < 0.05,
+                }
+                for i in range(n)
+            ],
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def _run(Session, requests: int) -> Dict[str, float]:
+    rnd = random.Random(3)
+    lat: List[float] = []
+    for _ in range(requests):
+        db = Session()
+        try:
+            t0 = time.perf_counter()
+            get_trending_streams(
+                Response(),
+                db=db,
+                language=None,
+                category=None,
+                country=None,
+                min_viewers=1,
+                since=None,
+                algo=rnd.choice(("hybrid", "hybrid", "hybrid", "viewers", "recent")),
+                pool=400,
+                limit=20,
+                offset=rnd.choice((0, 0, 0, 20, 40, 100)),
+                if_none_match=None,
+            )
+            lat.append((time.perf_counter() - t0) * 1000.0)
+        finally:
+            db.close()
+    return _percentiles(lat)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default="sqlite://")
+    ap.add_argument("--streams", type=int, default=10000)
+    ap.add_argument("--requests", type=int, default=500)
+    args = ap.parse_args()
+
+    engine = create_engine(args.db_url)
+    LiveStream.metadata.create_all(engine, tables=[LiveStream.__table__])
+    Session = sessionmaker(bind=engine)
+    _seed(Session, args.streams)
+
+    # before: hakuna snapshot → route hutumia SQL + scoring
+    trending_index._snap = None
+    before = _run(Session, args.requests)
+
+    db = Session()
+    try:
+        t0 = time.perf_counter()
+        n = trending_index.refresh(db)
+        refresh_ms = (time.perf_counter() - t0) * 1000.0
+    finally:
+        db.close()
+    after = _run(Session, args.requests)
+
+    print(f"streams={n} requests={args.requests} index refresh={refresh_ms:.0f}ms "
+          f"(build {trending_index.last_build_ms:.0f}ms)")
+    for name, r in (("sql+score", before), ("index", after)):
+        print(f"{name:<10} p50={r['p50']:8.2f}ms p99={r['p99']:8.2f}ms mean={r['mean']:8.2f}ms")
+    if after["p50"]:
+        print(f"p50 speedup: {before['p50'] / after['p50']:.1f}x  p99 speedup: {before['p99'] / after['p99']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
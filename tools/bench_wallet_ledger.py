@@ -0,0 +1,172 @@
+# backend/tools/bench_wallet_ledger.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: credits za wakati mmoja kwa wallet MOJA (host maarufu).
+
+  legacy  — njia ya zamani ya /wallets/me/deposit: SELECT ... FOR UPDATE ya
+            wallet, lookup ya idempotency kwenye ledger, UPDATE ya balance,
+            INSERT ya ledger row, commit — kila credit hushika lock ya row.
+  ledger  — services.wallet_ledger.credit: INSERT moja ya ledger (bila lock)
+            + compaction inayoendeshwa na thread nyingine kila --compact-ms.
+
+Kila worker (thread, kama sync route kwenye threadpool) hutuma credits
+mfululizo kwa --seconds. Mwishoni: compaction ya mwisho, reconcile, na
+ukaguzi kwamba salio = jumla ya credits zilizothibitishwa.
+
+Usage:
+  python -m backend.tools.bench_wallet_ledger --workers 32 --seconds 10
+  python -m backend.tools.bench_wallet_ledger --db-url postgresql://... --workers 64
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from decimal import Decimal
+from typing import Dict, List
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+import backend.models  # noqa: F401  (mappers zote: User)
+from backend.models.coin_wallet import CoinWallet
+from backend.models.coin_wallet_txn import CoinWalletTxn
+from backend.models.user import User
+from backend.services import wallet_ledger
+
+AMOUNT = Decimal("1.00")
+
+
+def _setup(url: str, workers: int):
+    kw = {"pool_size": workers + 4, "max_overflow": 0}
+    if url.startswith("sqlite"):
+        kw["connect_args"] = {"timeout": 60, "check_same_thread": False}
+    engine = create_engine(url, **kw)
+    tables = [User.__table__, CoinWallet.__table__, CoinWalletTxn.__table__]
+    CoinWallet.metadata.drop_all(engine, tables=tables[::-1])
+    CoinWallet.metadata.create_all(engine, tables=tables)
+    t = User.__table__
+    uid = uuid.uuid4() if t.c.id.type.python_type is uuid.UUID else 1
+    user = {"id": uid, "email": "host@bench.local"}
+    pw = next((c.name for c in t.c if c.name in ("password_hash", "hashed_password", "password")), None)
+    if pw:
+        user[pw] = "x"
+    with engine.begin() as conn:
+        conn.execute(insert(t), [user])
+        wid = conn.execute(
+            insert(CoinWallet.__table__).values(user_id=uid, balance=0, currency="TZS").returning(CoinWallet.__table__.c.id)
+        ).scalar_one()
+    return engine, sessionmaker(bind=engine), wid
+
+
+def _legacy_credit(db, wallet_id: int, key: str) -> None:
+    w = db.execute(select(CoinWallet).where(CoinWallet.id == wallet_id).with_for_update()).scalar_one()
+    dup = db.execute(
+        select(CoinWalletTxn.id).where(CoinWalletTxn.wallet_id == wallet_id, CoinWalletTxn.idempotency_key == key)
+    ).first()
+    if dup:
+        db.rollback()
+        return
+    w.balance = Decimal(w.balance) + AMOUNT
+    db.flush()
+    db.add(CoinWalletTxn(
+        wallet_id=wallet_id, type="deposit", amount=AMOUNT, delta=AMOUNT, balance_after=w.balance,
+        folded=True, idempotency_key=key,
+    ))
+    db.commit()
+
+
+def _run(mode: str, Session, wallet_id: int, workers: int, seconds: float, compact_ms: int) -> Dict[str, object]:
+    lat: List[List[float]] = [[] for _ in range(workers)]
+    errors = [0] * workers
+    stop = threading.Event()
+    compactions = [0]
+
+    def worker(i: int) -> None:
+        db = Session()
+        n = 0
+        try:
+            while not stop.is_set():
+                key = f"{mode}-{i}-{n}"
+                n += 1
+                t0 = time.perf_counter()
+                try:
+                    if mode == "legacy":
+                        _legacy_credit(db, wallet_id, key)
+                    else:
+                        wallet_ledger.credit(db, wallet_id, AMOUNT, idempotency_key=key)
+                except Exception:
+                    db.rollback()
+                    errors[i] += 1
+                    continue
+                lat[i].append((time.perf_counter() - t0) * 1000.0)
+        finally:
+            db.close()
+
+    def compactor() -> None:
+        db = Session()
+        try:
+            while not stop.wait(compact_ms / 1000.0):
+                try:
+                    wallet_ledger.compact_pending(db)
+                    compactions[0] += 1
+                except Exception:
+                    db.rollback()
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    if mode == "ledger":
+        threads.append(threading.Thread(target=compactor))
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    db = Session()
+    try:
+        wallet_ledger.compact(db, wallet_id)
+        mismatches = wallet_ledger.reconcile(db)
+        balance = Decimal(db.execute(select(CoinWallet.balance).where(CoinWallet.id == wallet_id)).scalar_one())
+    finally:
+        db.close()
+    flat = sorted(x for w in lat for x in w)
+    return {
+        "credits": len(flat), "cps": len(flat) / wall, "errors": sum(errors),
+        "p50": statistics.median(flat) if flat else 0.0,
+        "p99": flat[min(len(flat) - 1, int(len(flat) * 0.99))] if flat else 0.0,
+        "balance_ok": balance == AMOUNT * len(flat) and not mismatches,
+        "compactions": compactions[0],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default=None, help="default: sqlite file kwenye tempdir")
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--compact-ms", type=int, default=wallet_ledger.COMPACT_INTERVAL_MS)
+    ap.add_argument("--modes", default="legacy,ledger")
+    args = ap.parse_args()
+
+    url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'wallet.db')}"
+    print(f"db={url.split('@')[-1]} workers={args.workers} seconds={args.seconds} compact_ms={args.compact_ms}")
+    for mode in args.modes.split(","):
+        engine, Session, wallet_id = _setup(url, args.workers)
+        r = _run(mode, Session, wallet_id, args.workers, args.seconds, args.compact_ms)
+        engine.dispose()
+        print(f"{mode:<7} credits/sec={r['cps']:8.1f} acked={r['credits']:7d} errors={r['errors']:5d} "
+              f"p50={r['p50']:7.1f}ms p99={r['p99']:7.1f}ms balance_ok={r['balance_ok']} "
+              f"compactions={r['compactions']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# backend/tools/bench_webhooks.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: deliveries/min za webhooks — njia ya zamani (send_webhook ya
+sync: requests kwa kila tukio, sleep(1) kati ya retries, log moja kwa moja)
+dhidi ya services.webhook_engine (foleni ya kudumu, concurrency kwa endpoint,
+circuit breaker, writes za makundi).
+
+Receiver ya ndani (stub) yenye endpoints --endpoints; endpoint moja kati ya
+kumi hurudisha 503 kila mara (kuonyesha breaker: haiburuzi nyingine).
+
+Hutumia DB ya benchmark (default: SQLite file ya muda).
+
+Usage:
+  python -m backend.tools.bench_webhooks --events 5000
+  python -m backend.tools.bench_webhooks --db-url postgresql://... --events 20000 --workers 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+import httpx
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+import backend.models  # noqa: F401  (registers all mappers, incl. users for the FK)
+from backend.crud import webhook_queue_crud as queue
+from backend.models.webhook import WebhookEndpoint
+from backend.models.webhook_delivery_log import WebhookDeliveryLog
+from backend.models.webhook_event import WebhookEvent
+from backend.services.webhook_engine import WebhookEngine, sign
+
+OK_BODY = b'{"received":true}'
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _serve(latency: float) -> Tuple[_StubServer, str]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):  # noqa: N802
+            n = int(self.headers.get("Content-Length") or 0)
+            if n:
+                self.rfile.read(n)
+            time.sleep(latency)
+            code = 503 if self.path.startswith("/down") else 200
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(OK_BODY)))
+            self.end_headers()
+            self.wfile.write(OK_BODY)
+
+        def log_message(self, *a):
+            pass
+
+    srv = _StubServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def _seed(Session, base: str, endpoints: int, events: int) -> List[int]:
+    with Session() as db:
+        db.execute(delete(WebhookEvent))
+        db.execute(delete(WebhookDeliveryLog))
+        db.execute(delete(WebhookEndpoint))
+        db.execute(insert(WebhookEndpoint), [
+            {
+                "user_id": 1,
+                "url": f"{base}/{'down' if i % 10 == 9 else 'up'}/{i}",
+                "secret": f"s{i}",
+                "is_active": True,
+                "max_retries": 3,
+            }
+            for i in range(endpoints)
+        ])
+        db.commit()
+        ids = [r[0] for r in db.execute(select(WebhookEndpoint.id).order_by(WebhookEndpoint.id))]
+        for i in range(events):
+            queue.enqueue_event(db, user_id=1, event_type="order.paid", payload={"order_id": i},
+                                endpoint_ids=[ids[i % len(ids)]], commit=False)
+        db.commit()
+    return ids
+
+
+def _finished(Session) -> int:
+    """Events zilizomaliza jaribio la kwanza (delivered/failed/retry iliyopangwa)."""
+    with Session() as db:
+        return int(db.execute(select(func.count()).where(WebhookEvent.attempt >= 1)).scalar() or 0)
+
+
+def _settled(Session, open_endpoints: List[int]) -> int:
+    """Zilizojaribiwa + zinazosubiri breaker iliyo wazi (hazitaguswa hadi cooldown)."""
+    with Session() as db:
+        parked = 0
+        if open_endpoints:
+            parked = db.execute(select(func.count()).where(
+                WebhookEvent.attempt == 0, WebhookEvent.endpoint_id.in_(open_endpoints)
+            )).scalar() or 0
+    return _finished(Session) + int(parked)
+
+
+def _legacy(Session, n: int, deadline: float) -> int:
+    """Iga send_webhook ya zamani: POST mpya kwa kila tukio, sleep(1) kati ya retries, log kwa commit moja moja."""
+    done = 0
+    with Session() as db:
+        rows = db.execute(
+            select(WebhookEvent.id, WebhookEvent.payload, WebhookEndpoint.url, WebhookEndpoint.secret, WebhookEndpoint.user_id)
+            .join(WebhookEndpoint, WebhookEndpoint.id == WebhookEvent.endpoint_id)
+            .order_by(WebhookEvent.id)
+        ).all()
+        for r in rows:
+            headers = {"Content-Type": "application/json", "X-Signature": sign(r.secret, r.payload.encode()) or ""}
+            code, attempt = 0, 0
+            for attempt in range(1, 4):
+                try:
+                    code = httpx.post(r.url, content=r.payload, headers=headers, timeout=10).status_code
+                    if 200 <= code < 300:
+                        break
+                except Exception:
+                    code = 0
+                if attempt < 3:
+                    time.sleep(1)
+            db.add(WebhookDeliveryLog(user_id=r.user_id, target_url=r.url, event_type="order.paid",
+                                      payload=r.payload, response_code=code, success=200 <= code < 300,
+                                      attempt=attempt))
+            db.execute(WebhookEvent.__table__.update().where(WebhookEvent.id == r.id).values(attempt=attempt))
+            db.commit()
+            done += 1
+            if time.perf_counter() >= deadline:
+                break
+    return done
+
+
+async def _engine(Session, n: int, deadline: float, workers: int, conc: int) -> Dict[str, int]:
+    engines = [
+        WebhookEngine(
+            session_factory=Session,
+            endpoint_concurrency=conc,
+            poll_interval=0.05,
+            flush_interval=0.2,
+            breaker_threshold=5,
+            breaker_cooldown=30,
+        )
+        for _ in range(workers)
+    ]
+    tasks = [asyncio.create_task(e.run()) for e in engines]
+    while time.perf_counter() < deadline:
+        open_eps = sorted({e for eng in engines for e in eng.open_endpoints()})
+        if _settled(Session, open_eps) >= n:
+            break
+        await asyncio.sleep(0.2)
+    for e in engines:
+        e.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    total: Dict[str, int] = {}
+    for e in engines:
+        for k, v in e.stats.items():
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-url", default=None)
+    ap.add_argument("--events", type=int, default=5000)
+    ap.add_argument("--endpoints", type=int, default=20)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=8, help="sends kwa endpoint")
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--seconds", type=float, default=30.0, help="kikomo cha muda kwa kila njia")
+    ap.add_argument("--skip-legacy", action="store_true")
+    args = ap.parse_args()
+
+    url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_webhooks.db')}"
+    engine = create_engine(url, pool_size=20) if not url.startswith("sqlite") else create_engine(url)
+    WebhookEndpoint.metadata.create_all(
+        engine, tables=[WebhookEndpoint.__table__, WebhookEvent.__table__, WebhookDeliveryLog.__table__]
+    )
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    srv, base = _serve(args.latency_ms / 1000.0)
+
+    rows = []
+    if not args.skip_legacy:
+        _seed(Session, base, args.endpoints, args.events)
+        t0 = time.perf_counter()
+        done = _legacy(Session, args.events, t0 + args.seconds)
+        rows.append(("legacy sync", done, time.perf_counter() - t0, {}))
+
+    _seed(Session, base, args.endpoints, args.events)
+    t0 = time.perf_counter()
+    stats = asyncio.run(_engine(Session, args.events, t0 + args.seconds, args.workers, args.concurrency))
+    wall = time.perf_counter() - t0
+    rows.append((f"engine x{args.workers}", _finished(Session), wall, stats))
+    with Session() as db:
+        by_status = dict(db.execute(select(WebhookEvent.status, func.count()).group_by(WebhookEvent.status)).all())
+        n_logs = db.execute(select(func.count()).select_from(WebhookDeliveryLog)).scalar()
+    srv.shutdown()
+
+    print(f"events={args.events} endpoints={args.endpoints} (10% down) latency={args.latency_ms}ms "
+          f"db={engine.dialect.name} limit={args.seconds:.0f}s")
+    for name, done, wall, st in rows:
+        extra = " ".join(f"{k}={v}" for k, v in sorted(st.items()))
+        print(f"{name:<12} done={done:<6} wall={wall:6.1f}s  deliveries/min={done / wall * 60:>10,.0f}  {extra}")
+    print("engine queue:", json.dumps({getattr(k, "value", k): v for k, v in by_status.items()}), f"logs={n_logs}")
+
+
+if __name__ == "__main__":
+    main()
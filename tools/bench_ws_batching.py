@@ -0,0 +1,110 @@
+# backend/tools/bench_ws_batching.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: frame moja kwa event dhidi ya batching (utils.ws_batcher).
+
+Inaiga stream "viral": events nyingi kwa sekunde (likes, viewer counts,
+joins/leaves, gifts, chat) kwenye chumba chenye sockets bandia. Inapima
+frames zilizotumwa kwa sekunde na CPU (process_time) iliyotumika.
+
+Usage:
+  python -m backend.tools.bench_ws_batching --sockets 1000 --rate 2000 --seconds 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+
+from starlette.websockets import WebSocketState
+
+from backend.websocket.live_ws_manager import LiveRoomManager
+
+
+class CountingSocket:
+    application_state = WebSocketState.CONNECTED
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.bytes = 0
+
+    async def accept(self) -> None:
+        return None
+
+    async def send_text(self, text: str) -> None:
+        self.frames += 1
+        self.bytes += len(text)
+
+
+def _event(rnd: random.Random, i: int) -> dict:
+    r = rnd.random()
+    if r < 0.55:
+        return {"event": "like", "user_id": rnd.randint(1, 5000), "count": 1}
+    if r < 0.75:
+        return {"event": "viewer_count", "count": 10000 + i}
+    if r < 0.90:
+        return {"event": rnd.choice(("user_joined", "user_left")), "user_id": rnd.randint(1, 5000)}
+    if r < 0.97:
+        return {"event": "chat_message", "user_id": rnd.randint(1, 5000), "message": "🔥🔥"}
+    return {"event": "gift", "user_id": rnd.randint(1, 5000), "gift": "Simba", "value": 500}
+
+
+async def _run(batch: bool, sockets: int, rate: int, seconds: float) -> dict:
+    mgr = LiveRoomManager()
+    socks = [CountingSocket() for _ in range(sockets)]
+    for ws in socks:
+        await mgr.connect(1, ws, batch=batch)
+
+    rnd = random.Random(7)
+    step = 0.01  # tuma events kwa vifurushi vya 10ms
+    per_step = max(1, int(rate * step))
+    total_steps = int(seconds / step)
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    sent = 0
+    for s in range(total_steps):
+        for _ in range(per_step):
+            await mgr.broadcast(1, _event(rnd, sent))
+            sent += 1
+        await asyncio.sleep(step)
+    await asyncio.sleep(mgr.batcher.tick * 2)  # acha tick ya mwisho itoke
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    await mgr.batcher.close()
+
+    frames = sum(ws.frames for ws in socks)
+    return {
+        "mode": "batched" if batch else "per-event",
+        "events": sent,
+        "frames_per_sec": frames / wall,
+        "frames_per_socket_sec": frames / wall / sockets,
+        "mbytes": sum(ws.bytes for ws in socks) / 1e6,
+        "cpu_s": cpu,
+    }
+
+
+async def main_async(sockets: int, rate: int, seconds: float) -> None:
+    rows = [await _run(False, sockets, rate, seconds), await _run(True, sockets, rate, seconds)]
+    print(f"sockets={sockets} rate={rate}/s seconds={seconds}")
+    for r in rows:
+        print(
+            f"{r['mode']:<10} events={r['events']:<7} frames/s={r['frames_per_sec']:>12,.0f} "
+            f"per-socket/s={r['frames_per_socket_sec']:>7.1f} MB={r['mbytes']:>8.1f} cpu={r['cpu_s']:.2f}s"
+        )
+    base, new = rows
+    if base["cpu_s"]:
+        print(f"CPU saved: {100.0 * (1 - new['cpu_s'] / base['cpu_s']):.1f}%")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sockets", type=int, default=1000)
+    ap.add_argument("--rate", type=int, default=2000, help="events kwa sekunde")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    args = ap.parse_args()
+    asyncio.run(main_async(args.sockets, args.rate, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# backend/tools/bench_ws_broadcast.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark: broadcast ya websocket — sequential (json.dumps kwa kila socket)
+dhidi ya utils.ws_broadcast.fan_out (encode-once, concurrent, timeouts).
+
+Sockets ni bandia: kila send hulala muda mdogo wa nasibu (mtandao wa simu),
+na sehemu ndogo ni "slow" (hulala zaidi ya timeout).
+
+Usage:
+  python -m backend.tools.bench_ws_broadcast --rooms 100,1000,10000 --rounds 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import List
+
+from starlette.websockets import WebSocketState
+
+from backend.utils.ws_broadcast import fan_out
+
+GIFT_EVENT = {
+    "type": "gift",
+    "stream_id": 42,
+    "sender": {"id": 7, "name": "Neema", "avatar": "https://cdn.example/a/7.png"},
+    "gift": {"name": "Simba", "value": 500, "combo": 12, "animation": "roar"},
+    "leaderboard": [{"user_id": i, "total": 1000 - i} for i in range(10)],
+}
+
+
+class FakeSocket:
+    application_state = WebSocketState.CONNECTED
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    async def send_text(self, _text: str) -> None:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    async def send_json(self, message) -> None:
+        json.dumps(message, ensure_ascii=False)
+        await self.send_text("")
+
+
+def _room(n: int, slow_ratio: float, slow_delay: float) -> List[FakeSocket]:
+    rnd = random.Random(n)
+    out = []
+    for _ in range(n):
+        if rnd.random() < slow_ratio:
+            out.append(FakeSocket(slow_delay))
+        else:
+            out.append(FakeSocket(rnd.choice((0, 0, 0, 0.0005, 0.001))))
+    return out
+
+
+async def _sequential(sockets: List[FakeSocket], timeout: float) -> None:
+    for ws in sockets:
+        try:
+            await asyncio.wait_for(ws.send_json(GIFT_EVENT), timeout)
+        except Exception:
+            pass
+
+
+def _pct(xs: List[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+async def main_async(sizes: List[int], rounds: int, slow_ratio: float, timeout: float, parallel: int) -> None:
+    print(f"{'room':>6} {'mode':<11} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}  delivered/dropped/slow")
+    for n in sizes:
+        sockets = _room(n, slow_ratio, timeout * 2)
+        seq_rounds = max(1, rounds // 10) if n >= 10000 else rounds
+        for mode in ("sequential", "fan_out"):
+            lat: List[float] = []
+            last = None
+            for _ in range(seq_rounds if mode == "sequential" else rounds):
+                t0 = time.perf_counter()
+                if mode == "sequential":
+                    await _sequential(sockets, timeout)
+                else:
+                    last = await fan_out(sockets, GIFT_EVENT, max_parallel=parallel, send_timeout=timeout)
+                lat.append((time.perf_counter() - t0) * 1000.0)
+            counts = (
+                f"{last.delivered}/{last.dropped}/{last.slow}" if last else "-"
+            )
+            print(
+                f"{n:>6} {mode:<11} {statistics.median(lat):>9.1f} "
+                f"{_pct(lat, 0.90):>9.1f} {_pct(lat, 0.99):>9.1f}  {counts}"
+            )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rooms", default="100,1000,10000")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--slow-ratio", type=float, default=0.002, help="sehemu ya sockets zilizo polepole")
+    ap.add_argument("--timeout", type=float, default=0.05, help="send timeout (sekunde)")
+    ap.add_argument("--parallel", type=int, default=256)
+    args = ap.parse_args()
+    sizes = [int(x) for x in args.rooms.split(",") if x.strip()]
+    asyncio.run(main_async(sizes, args.rounds, args.slow_ratio, args.timeout, args.parallel))
+
+
+if __name__ == "__main__":
+    main()
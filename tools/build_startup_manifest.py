@@ -0,0 +1,43 @@
+# backend/tools/build_startup_manifest.py
+# -*- coding: utf-8 -*-
+"""
+Tengeneza startup manifest (utils/startup.py) wakati wa build: paths za
+routes za kila backend.routes.* na dependencies za mappers za models.
+
+Usage (render.yaml buildCommand, baada ya pip install):
+  python -m backend.tools.build_startup_manifest
+  python -m backend.tools.build_startup_manifest --out /tmp/manifest.json
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from backend.utils import startup
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", default=None, help=f"default: {startup.manifest_path()}")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    t0 = time.perf_counter()
+    out = Path(args.out) if args.out else startup.manifest_path()
+    data = startup.build_manifest(out)
+    routers = data["routers"].values()
+    print(
+        f"{out}: models={len(data['models'])} routers={sum(1 for r in routers if r.get('router'))} "
+        f"paths={sum(len(r.get('paths') or ()) for r in routers)} "
+        f"eager={sum(1 for r in routers if r.get('eager'))} "
+        f"errors={sum(1 for r in routers if 'error' in r)} ({(time.perf_counter() - t0) * 1000.0:.0f} ms)"
+    )
+    for fq, r in data["routers"].items():
+        if "error" in r:
+            print(f"  import error {fq}: {r['error']}  (itapakiwa eager)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import os
-import time
 from typing import List, Dict, Any, Optional
 
 from backend.config import settings
@@ -46,41 +45,50 @@ def chat_complete(
     max_tokens: int = 256,
     timeout: Optional[int] = None,
     retries: int = 2,
+    cache: bool = True,
 ) -> str:
     """
-    Lightweight wrapper yenye retries fupi (mobile-first).
+    Lightweight wrapper (mobile-first) — hupitia utils.ai_gateway: cache ya
+    majibu, single-flight kwa maombi yanayofanana, retries zenye backoff.
     """
-    client = get_openai_client()
-    model = model or settings.OPENAI_MODEL
-    timeout = timeout or int(getattr(settings, "OPENAI_REQUEST_TIMEOUT", 25))
+    from backend.utils.ai_gateway import AINotConfigured, get_gateway
 
-    last_err: Optional[Exception] = None
-    delay = 0.8
-    for attempt in range(retries + 1):
-        try:
-            if _NEW_SDK and OpenAI is not None:
-                resp = client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    timeout=timeout,
-                )
-                return resp.choices[0].message.content or ""
-            else:
-                # SDK ya zamani
-                resp = client.ChatCompletion.create(  # type: ignore
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    request_timeout=timeout,
-                )
-                return resp["choices"][0]["message"]["content"]  # type: ignore[index]
-        except Exception as e:
-            last_err = e
-            time.sleep(delay)
-            delay *= 1.6
+    try:
+        return get_gateway().complete(
+            messages,
+            model or settings.OPENAI_MODEL,
+            temperature,
+            max_tokens,
+            cache=cache,
+            timeout=timeout or int(getattr(settings, "OPENAI_REQUEST_TIMEOUT", 25)),
+            retries=retries,
+        ).text
+    except AINotConfigured as e:
+        raise MissingAPIKey(str(e)) from e
 
-    assert last_err is not None
-    raise last_err
+
+async def achat_complete(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 0.3,
+    max_tokens: int = 256,
+    timeout: Optional[int] = None,
+    retries: int = 2,
+    cache: bool = True,
+) -> str:
+    """Toleo la async la chat_complete (retries kwa asyncio.sleep, loop haizuiwi)."""
+    from backend.utils.ai_gateway import AINotConfigured, get_gateway
+
+    try:
+        res = await get_gateway().acomplete(
+            messages,
+            model or settings.OPENAI_MODEL,
+            temperature,
+            max_tokens,
+            cache=cache,
+            timeout=timeout or int(getattr(settings, "OPENAI_REQUEST_TIMEOUT", 25)),
+            retries=retries,
+        )
+        return res.text
+    except AINotConfigured as e:
+        raise MissingAPIKey(str(e)) from e
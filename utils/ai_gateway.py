@@ -0,0 +1,421 @@
+# backend/utils/ai_gateway.py
+# -*- coding: utf-8 -*-
+"""
+AI gateway: njia moja ya chat completions (OpenAI-compatible) kwa routes/utils.
+
+- Cache ya majibu (content-addressed): key = sha256 ya messages zilizosafishwa
+  (role + whitespace) + model + temperature + max_tokens. TTL + LRU.
+- Single-flight: maombi yanayofanana yanayokuja wakati mmoja hutuma ombi moja
+  upstream; wengine wanasubiri jibu lile lile (async: Future kwa loop; sync:
+  Event kwa threads). Ni kwa temperature == 0 tu na cache=True — ombi
+  lenye cache=False au sampling (temperature > 0) hupata jibu lake mwenyewe.
+- Retries: async hutumia asyncio.sleep (loop haizuiwi); backoff + jitter,
+  Retry-After huheshimiwa. 408/409/429/5xx na timeouts/connection errors tu.
+- HTTP hupitia utils.http_client (keep-alive pool ya host ya API).
+
+`acomplete(...)` kwa async routes, `complete(...)` kwa code ya sync
+(utils.ai.chat_complete). Streaming (SSE) haipiti hapa.
+
+ENV:
+  AI_GATEWAY_BASE_URL           (default: OPENAI_BASE_URL au https://api.openai.com/v1)
+  AI_CACHE_TTL_SEC=3600         0 = cache imezimwa
+  AI_CACHE_MAX_ENTRIES=5000
+  AI_CACHE_MAX_TEMPERATURE=1.0  majibu ya temperature juu ya hii hayawekwi cache
+  AI_RETRIES=2
+  AI_RETRY_BASE_MS=500
+  AI_RETRY_MAX_MS=8000
+  AI_REQUEST_TIMEOUT=25         sekunde
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+log = logging.getLogger("smartbiz.ai_gateway")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(k: str, default: float) -> float:
+    try:
+        return float(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+CACHE_TTL_SEC = max(0, _env_int("AI_CACHE_TTL_SEC", 3600))
+CACHE_MAX_ENTRIES = max(1, _env_int("AI_CACHE_MAX_ENTRIES", 5000))
+CACHE_MAX_TEMPERATURE = _env_float("AI_CACHE_MAX_TEMPERATURE", 1.0)
+RETRIES = max(0, _env_int("AI_RETRIES", 2))
+RETRY_BASE_MS = max(1, _env_int("AI_RETRY_BASE_MS", 500))
+RETRY_MAX_MS = max(RETRY_BASE_MS, _env_int("AI_RETRY_MAX_MS", 8000))
+REQUEST_TIMEOUT = _env_float("AI_REQUEST_TIMEOUT", 25.0)
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AIGatewayError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRY_STATUSES
+
+
+class AINotConfigured(AIGatewayError):
+    pass
+
+
+@dataclass
+class AIResult:
+    text: str
+    usage: Optional[Dict[str, Any]] = None
+    model: str = ""
+    cached: bool = False
+    coalesced: bool = False
+
+
+# ───────────────────────────── Key + cache ─────────────────────────────
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    out = []
+    for m in messages:
+        content = m.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        out.append((str(m.get("role", "user")).strip().lower(), " ".join(content.split())))
+    return out
+
+
+def cache_key(messages: List[Dict[str, Any]], model: str, temperature: float, max_tokens: int) -> str:
+    body = json.dumps(
+        [normalize_messages(messages), model, round(float(temperature), 3), int(max_tokens)],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU yenye TTL; thread-safe (hutumika na async na sync paths)."""
+
+    def __init__(self, ttl: int = CACHE_TTL_SEC, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, AIResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[AIResult]:
+        if not self.ttl:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def put(self, key: str, value: AIResult) -> None:
+        if not self.ttl:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ───────────────────────────── Gateway ─────────────────────────────
+@dataclass
+class _Flight:
+    event: threading.Event = field(default_factory=threading.Event)
+    result: Optional[AIResult] = None
+    error: Optional[BaseException] = None
+
+
+class AIGateway:
+    def __init__(
+        self,
+        *,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        retries: int = RETRIES,
+        timeout: float = REQUEST_TIMEOUT,
+        http: Any = None,
+    ) -> None:
+        self._base_url = base_url
+        self._api_key = api_key
+        self.cache = cache or ResponseCache()
+        self.retries = retries
+        self.timeout = timeout
+        self.http = http
+        self._async_flights: Dict[Tuple[int, str], "asyncio.Future[AIResult]"] = {}
+        self._sync_flights: Dict[str, _Flight] = {}
+        self._sync_lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "requests": 0, "cache_hits": 0, "coalesced": 0, "upstream_calls": 0,
+            "upstream_errors": 0, "retries": 0, "tokens_saved": 0,
+        }
+
+    # — config —
+    def _settings(self, name: str) -> Optional[str]:
+        try:
+            from backend.config import settings
+            return getattr(settings, name, None)
+        except Exception:
+            return None
+
+    @property
+    def base_url(self) -> str:
+        url = (self._base_url or os.getenv("AI_GATEWAY_BASE_URL") or self._settings("OPENAI_BASE_URL")
+               or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1")
+        return url.rstrip("/")
+
+    @property
+    def api_key(self) -> str:
+        key = self._api_key or self._settings("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY") or ""
+        if not key.strip():
+            raise AINotConfigured("OPENAI_API_KEY is not set", status=503)
+        return key.strip()
+
+    def _http(self):
+        if self.http is None:
+            from backend.utils.http_client import get_http
+            self.http = get_http()
+        return self.http
+
+    def _request(self, messages, model, temperature, max_tokens) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        url = f"{self.base_url}/chat/completions"
+        body = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        return url, body, {"Authorization": f"Bearer {self.api_key}"}
+
+    def _parse(self, r: httpx.Response, model: str) -> AIResult:
+        if r.status_code >= 400:
+            ra = r.headers.get("Retry-After")
+            try:
+                retry_after = float(ra) if ra is not None else None
+            except ValueError:
+                retry_after = None
+            raise AIGatewayError(f"upstream {r.status_code}: {r.text[:200]}", status=r.status_code,
+                                 retry_after=retry_after)
+        data = r.json()
+        try:
+            text = data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError) as e:
+            raise AIGatewayError(f"bad upstream payload: {e}", status=502) from e
+        return AIResult(text=text, usage=data.get("usage"), model=data.get("model") or model)
+
+    def _delay(self, attempt: int, err: AIGatewayError) -> float:
+        if err.retry_after is not None:
+            return min(err.retry_after, RETRY_MAX_MS / 1000.0)
+        cap = min(RETRY_MAX_MS, RETRY_BASE_MS * (2 ** attempt)) / 1000.0
+        return random.uniform(cap / 2, cap)
+
+    @staticmethod
+    def _wrap(e: Exception) -> AIGatewayError:
+        if isinstance(e, AIGatewayError):
+            return e
+        if isinstance(e, (httpx.TimeoutException, httpx.TransportError)):
+            return AIGatewayError(f"{type(e).__name__}: {e}", status=None)
+        return AIGatewayError(f"{type(e).__name__}: {e}", status=500)
+
+    def _cacheable(self, temperature: float, use_cache: bool) -> bool:
+        return use_cache and self.cache.ttl > 0 and temperature <= CACHE_MAX_TEMPERATURE
+
+    @staticmethod
+    def _coalescable(temperature: float, use_cache: bool) -> bool:
+        return use_cache and float(temperature) == 0.0
+
+    def _store(self, key: Optional[str], res: AIResult) -> None:
+        if key is not None and res.text:
+            self.cache.put(key, res)
+
+    def _hit(self, res: AIResult) -> AIResult:
+        self.stats["cache_hits"] += 1
+        self.stats["tokens_saved"] += int((res.usage or {}).get("total_tokens") or 0)
+        return AIResult(res.text, res.usage, res.model, cached=True)
+
+    # — async —
+    async def _acall(self, messages, model, temperature, max_tokens, timeout, retries) -> AIResult:
+        url, body, headers = self._request(messages, model, temperature, max_tokens)
+        attempt = 0
+        while True:
+            self.stats["upstream_calls"] += 1
+            try:
+                r = await self._http().apost(url, json=body, headers=headers, timeout=timeout or self.timeout)
+                return self._parse(r, model)
+            except Exception as e:
+                err = self._wrap(e)
+                self.stats["upstream_errors"] += 1
+                if not err.retryable or attempt >= retries:
+                    raise err from e
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._delay(attempt, err))
+                attempt += 1
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, Any]],
+        model: str,
+        temperature: float = 0.3,
+        max_tokens: int = 256,
+        *,
+        cache: bool = True,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> AIResult:
+        self.stats["requests"] += 1
+        key = cache_key(messages, model, temperature, max_tokens)
+        cacheable = self._cacheable(temperature, cache)
+        if cacheable:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return self._hit(hit)
+        if not self._coalescable(temperature, cache):
+            res = await self._acall(messages, model, temperature, max_tokens, timeout,
+                                    self.retries if retries is None else retries)
+            if cacheable:
+                self._store(key, res)
+            return res
+        loop = asyncio.get_running_loop()
+        fkey = (id(loop), key)
+        fut = self._async_flights.get(fkey)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            try:
+                res = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise            # ombi hili lenyewe limesitishwa
+                # leader alisitishwa (client alikata) → jaribu tena kama ombi jipya
+                return await self.acomplete(messages, model, temperature, max_tokens,
+                                            cache=cache, timeout=timeout, retries=retries)
+            return AIResult(res.text, res.usage, res.model, coalesced=True)
+        fut = loop.create_future()
+        self._async_flights[fkey] = fut
+        try:
+            res = await self._acall(messages, model, temperature, max_tokens, timeout,
+                                    self.retries if retries is None else retries)
+            if cacheable:
+                self._store(key, res)
+            fut.set_result(res)
+            return res
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # waiters hawapo → usionye "exception never retrieved"
+            raise
+        finally:
+            self._async_flights.pop(fkey, None)
+
+    # — sync —
+    def _call(self, messages, model, temperature, max_tokens, timeout, retries) -> AIResult:
+        url, body, headers = self._request(messages, model, temperature, max_tokens)
+        attempt = 0
+        while True:
+            self.stats["upstream_calls"] += 1
+            try:
+                r = self._http().post(url, json=body, headers=headers, timeout=timeout or self.timeout)
+                return self._parse(r, model)
+            except Exception as e:
+                err = self._wrap(e)
+                self.stats["upstream_errors"] += 1
+                if not err.retryable or attempt >= retries:
+                    raise err from e
+                self.stats["retries"] += 1
+                time.sleep(self._delay(attempt, err))
+                attempt += 1
+
+    def complete(
+        self,
+        messages: List[Dict[str, Any]],
+        model: str,
+        temperature: float = 0.3,
+        max_tokens: int = 256,
+        *,
+        cache: bool = True,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+    ) -> AIResult:
+        self.stats["requests"] += 1
+        key = cache_key(messages, model, temperature, max_tokens)
+        cacheable = self._cacheable(temperature, cache)
+        if cacheable:
+            hit = self.cache.get(key)
+            if hit is not None:
+                return self._hit(hit)
+        if not self._coalescable(temperature, cache):
+            res = self._call(messages, model, temperature, max_tokens, timeout,
+                             self.retries if retries is None else retries)
+            if cacheable:
+                self._store(key, res)
+            return res
+        with self._sync_lock:
+            flight = self._sync_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._sync_flights[key] = _Flight()
+        if not leader:
+            self.stats["coalesced"] += 1
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            res = flight.result
+            return AIResult(res.text, res.usage, res.model, coalesced=True)
+        try:
+            flight.result = self._call(messages, model, temperature, max_tokens, timeout,
+                                       self.retries if retries is None else retries)
+            if cacheable:
+                self._store(key, flight.result)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._sync_lock:
+                self._sync_flights.pop(key, None)
+            flight.event.set()
+
+
+_gateway: Optional[AIGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> AIGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = AIGateway()
+    return _gateway
@@ -1,39 +1,492 @@
+# backend/utils/email_sender.py
+# -*- coding: utf-8 -*-
+"""
+Email subsystem: template cache + SMTP connection pool + bulk/async sending.
+
+- Templates: (name → version) hutafutwa DB mara moja kwa TTL; template
+  iliyo-compile (jinja2) huhifadhiwa kwa ufunguo (name, version), hivyo
+  version mpya ikichapishwa cache hujisasisha bila restart.
+- SMTP: pool ya connections zinazodumu (EHLO/STARTTLS/LOGIN mara moja kwa
+  connection); connection hukaguliwa kwa NOOP ikiwa imekaa muda mrefu na
+  hufunguliwa upya baada ya EMAIL_SMTP_MAX_PER_CONN messages.
+- `send_many`: render + send kwa connections zote za pool kwa pamoja.
+- `EmailWorker`: foleni ya async (enqueue_email / enqueue_many) ili mail ya
+  reports/campaigns itoke kwenye request path; huanzishwa na lifespan.
+
+ENV:
+  SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASS / SENDER_NAME
+  SMTP_STARTTLS=1                 (STARTTLS ikiwa server inaitangaza)
+  EMAIL_SMTP_POOL_SIZE=4
+  EMAIL_SMTP_MAX_PER_CONN=100     (providers wengi hukata baada ya ~100)
+  EMAIL_SMTP_IDLE_CHECK=30        sekunde kabla ya NOOP kwenye connection iliyokaa
+  EMAIL_SMTP_TIMEOUT=30
+  EMAIL_TEMPLATE_TTL=60           sekunde za lookup ya version ya sasa
+  EMAIL_WORKER_QUEUE=10000
+  EMAIL_SUBMIT_TIMEOUT=5          sekunde ambazo submit() kutoka thread husubiri loop
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
 import os
+import queue as _queue
 import smtplib
-from email.mime.text import MIMEText
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Template
-from backend.crud.email_crud import get_template_by_name
+from email.mime.text import MIMEText
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from jinja2 import Environment, Template
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+log = logging.getLogger("smartbiz.email")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASS = os.getenv("SMTP_PASS", "")
 SENDER_NAME = os.getenv("SENDER_NAME", "SmartBiz Notifications")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1").strip().lower() in {"1", "true", "yes", "on"}
+
+POOL_SIZE = max(1, _env_int("EMAIL_SMTP_POOL_SIZE", 4))
+MAX_PER_CONN = max(1, _env_int("EMAIL_SMTP_MAX_PER_CONN", 100))
+IDLE_CHECK = max(0, _env_int("EMAIL_SMTP_IDLE_CHECK", 30))
+SMTP_TIMEOUT = max(1, _env_int("EMAIL_SMTP_TIMEOUT", 30))
+TEMPLATE_TTL = max(0, _env_int("EMAIL_TEMPLATE_TTL", 60))
+WORKER_QUEUE = max(1, _env_int("EMAIL_WORKER_QUEUE", 10000))
+SUBMIT_TIMEOUT = max(1, _env_int("EMAIL_SUBMIT_TIMEOUT", 5))
+
+
+# ───────────────────────────── Templates ─────────────────────────────
+@dataclass(frozen=True)
+class CompiledTemplate:
+    name: str
+    version: int
+    subject: Template
+    html: Template
+    text: Optional[Template]
+
+    def render(self, data: Dict[str, Any]) -> Tuple[str, str, Optional[str]]:
+        return (
+            self.subject.render(**data),
+            self.html.render(**data),
+            self.text.render(**data) if self.text is not None else None,
+        )
+
+
+def _load_template_row(db: Session, name: str) -> Optional[Dict[str, Any]]:
+    """
+    Version ya sasa ya template hai: current_version, au version ya juu kabisa
+    iliyo `published`. Drafts/archived hazitumwi kamwe → None.
+    """
+    from backend.models.email_template import EmailTemplate, EmailTemplateVersion, VersionState
+
+    base = (
+        select(EmailTemplateVersion.version, EmailTemplateVersion.subject,
+               EmailTemplateVersion.html_content, EmailTemplateVersion.text_content)
+        .join(EmailTemplate, EmailTemplate.id == EmailTemplateVersion.template_id)
+        .where(EmailTemplate.name == name, EmailTemplate.is_active.is_(True))
+    )
+    row = db.execute(
+        base.where(EmailTemplateVersion.id == EmailTemplate.current_version_id).limit(1)
+    ).first() or db.execute(
+        base.where(EmailTemplateVersion.state == VersionState.published)
+        .order_by(EmailTemplateVersion.version.desc()).limit(1)
+    ).first()
+    if row is None:
+        return None
+    return {"version": int(row.version), "subject": row.subject, "html": row.html_content, "text": row.text_content}
+
+
+class TemplateCache:
+    """name → (version, expires) kwa TTL; (name, version) → CompiledTemplate (LRU)."""
+
+    def __init__(self, ttl: float = TEMPLATE_TTL, max_compiled: int = 256,
+                 loader: Callable[[Session, str], Optional[Dict[str, Any]]] = _load_template_row) -> None:
+        self.ttl = ttl
+        self.max_compiled = max_compiled
+        self.loader = loader
+        self.env = Environment()
+        self._current: Dict[str, Tuple[int, float]] = {}
+        self._compiled: "OrderedDict[Tuple[str, int], CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, name: str) -> CompiledTemplate:
+        now = time.monotonic()
+        with self._lock:
+            cur = self._current.get(name)
+            if cur is not None and cur[1] > now:
+                ct = self._compiled.get((name, cur[0]))
+                if ct is not None:
+                    self._compiled.move_to_end((name, cur[0]))
+                    self.hits += 1
+                    return ct
+        row = self.loader(db, name)
+        if row is None:
+            raise LookupError(f"Email template '{name}' not found")
+        key = (name, row["version"])
+        with self._lock:
+            self._current[name] = (row["version"], now + self.ttl)
+            ct = self._compiled.get(key)
+            if ct is None:
+                self.misses += 1
+                ct = CompiledTemplate(
+                    name=name,
+                    version=row["version"],
+                    subject=self.env.from_string(row["subject"] or ""),
+                    html=self.env.from_string(row["html"] or ""),
+                    text=self.env.from_string(row["text"]) if row.get("text") else None,
+                )
+                self._compiled[key] = ct
+                while len(self._compiled) > self.max_compiled:
+                    self._compiled.popitem(last=False)
+            else:
+                self.hits += 1
+            self._compiled.move_to_end(key)
+            return ct
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._current.clear()
+                self._compiled.clear()
+            else:
+                self._current.pop(name, None)
+                for k in [k for k in self._compiled if k[0] == name]:
+                    del self._compiled[k]
+
+
+templates = TemplateCache()
+
+
+def build_message(to_email: str, subject: str, html: str, text: Optional[str] = None,
+                  sender: Optional[str] = None) -> MIMEMultipart:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = f"{SENDER_NAME} <{sender or SMTP_USER}>"
+    msg["To"] = to_email
+    if text:
+        msg.attach(MIMEText(text, "plain"))
+    msg.attach(MIMEText(html, "html"))
+    return msg
+
+
+# ───────────────────────────── SMTP pool ─────────────────────────────
+class _PooledConn:
+    __slots__ = ("smtp", "sent", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP) -> None:
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """
+    Pool ya connections za SMTP zinazotumika tena (thread-safe). Handshake
+    (connect + EHLO + STARTTLS + AUTH) hulipwa mara moja kwa connection, si
+    kwa kila email.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: str = SMTP_USER,
+        password: str = SMTP_PASS,
+        *,
+        size: int = POOL_SIZE,
+        max_per_conn: int = MAX_PER_CONN,
+        idle_check: float = IDLE_CHECK,
+        timeout: float = SMTP_TIMEOUT,
+        starttls: bool = SMTP_STARTTLS,
+    ) -> None:
+        self.host, self.port, self.user, self.password = host, port, user, password
+        self.size = max(1, size)
+        self.max_per_conn = max_per_conn
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self.starttls = starttls
+        self._idle: "_queue.LifoQueue[_PooledConn]" = _queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.opened = 0
+
+    def _open(self) -> _PooledConn:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.starttls and smtp.has_extn("starttls"):
+            smtp.starttls()
+            smtp.ehlo()
+        if self.user:
+            smtp.login(self.user, self.password)
+        self.opened += 1
+        return _PooledConn(smtp)
 
+    @staticmethod
+    def _close(c: _PooledConn) -> None:
+        try:
+            c.smtp.quit()
+        except Exception:
+            try:
+                c.smtp.close()
+            except Exception:
+                pass
+
+    def _healthy(self, c: _PooledConn) -> bool:
+        if c.sent >= self.max_per_conn:
+            return False
+        if self.idle_check and time.monotonic() - c.last_used > self.idle_check:
+            try:
+                return c.smtp.noop()[0] == 250
+            except Exception:
+                return False
+        return True
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConn]:
+        self._slots.acquire()
+        c: Optional[_PooledConn] = None
+        try:
+            while c is None:
+                try:
+                    cand = self._idle.get_nowait()
+                except _queue.Empty:
+                    c = self._open()
+                    break
+                if self._healthy(cand):
+                    c = cand
+                else:
+                    self._close(cand)
+            try:
+                yield c
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._close(c)
+                c = None
+                raise
+            if c is not None:
+                c.last_used = time.monotonic()
+                self._idle.put(c)
+        finally:
+            self._slots.release()
+
+    def send(self, from_addr: str, to_addrs: Sequence[str] | str, message: str) -> None:
+        """Tuma kwa connection ya pool; connection iliyokatika hujaribiwa upya mara moja."""
+        for attempt in (1, 2):
+            try:
+                with self.connection() as c:
+                    c.smtp.sendmail(from_addr, to_addrs, message)
+                    c.sent += 1
+                return
+            except (smtplib.SMTPServerDisconnected, OSError):
+                if attempt == 2:
+                    raise
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except _queue.Empty:
+                return
+
+
+_pool: Optional[SMTPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SMTPPool()
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+# ───────────────────────────── Sending ─────────────────────────────
 def send_email_with_template(
     db: Session,
     to_email: str,
     template_name: str,
-    data: dict
+    data: dict,
+    *,
+    pool: Optional[SMTPPool] = None,
 ):
-    template = get_template_by_name(db, template_name)
-    if not template:
+    try:
+        ct = templates.get(db, template_name)
+    except LookupError:
         raise Exception(f"Email template '{template_name}' not found")
+    subject, html, text = ct.render(data)
+    msg = build_message(to_email, subject, html, text)
+    (pool or get_pool()).send(SMTP_USER, to_email, msg.as_string())
 
-    # Render HTML content
-    jinja_template = Template(template.html_content)
-    rendered_html = jinja_template.render(**data)
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = template.subject
-    msg["From"] = f"{SENDER_NAME} <{SMTP_USER}>"
-    msg["To"] = to_email
+def send_many(
+    db: Session,
+    template_name: str,
+    recipients: Iterable[Tuple[str, Dict[str, Any]]],
+    *,
+    pool: Optional[SMTPPool] = None,
+) -> Dict[str, Any]:
+    """
+    Tuma template moja kwa wapokeaji wengi: template hu-compile mara moja,
+    kila connection ya pool hutuma sehemu yake kwa pamoja. Kosa la mpokeaji
+    mmoja halisimamishi wengine.
+    """
+    pool = pool or get_pool()
+    ct = templates.get(db, template_name)
+    items = list(recipients)
+    if not items:
+        return {"sent": 0, "failed": 0, "errors": []}
+
+    errors: List[Tuple[str, str]] = []
+    lock = threading.Lock()
+
+    def _send(item: Tuple[str, Dict[str, Any]]) -> bool:
+        to_email, data = item
+        try:
+            subject, html, text = ct.render(data or {})
+            pool.send(SMTP_USER, to_email, build_message(to_email, subject, html, text).as_string())
+            return True
+        except Exception as e:
+            with lock:
+                errors.append((to_email, f"{type(e).__name__}: {e}"))
+            return False
+
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(items)), thread_name_prefix="smtp") as ex:
+        sent = sum(1 for ok in ex.map(_send, items) if ok)
+    if errors:
+        log.warning("send_many(%s): %s/%s failed (first: %s)", template_name, len(errors), len(items), errors[0])
+    return {"sent": sent, "failed": len(errors), "errors": errors[:50]}
+
+
+# ───────────────────────────── Async worker ─────────────────────────────
+@dataclass
+class EmailJob:
+    template_name: str
+    recipients: List[Tuple[str, Dict[str, Any]]]
+
+
+class EmailWorker:
+    """Foleni ya async: request path huweka job na kurudi; worker hutuma kwa send_many kwenye thread."""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None, maxsize: int = WORKER_QUEUE) -> None:
+        self.session_factory = session_factory
+        self.maxsize = maxsize
+        self._q: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.running = False
+        self.stats: Dict[str, int] = {"jobs": 0, "sent": 0, "failed": 0, "dropped": 0}
+
+    def _queue(self) -> asyncio.Queue:
+        if self._q is None:
+            self._q = asyncio.Queue(self.maxsize)
+        return self._q
+
+    def _put(self, job: EmailJob) -> bool:
+        try:
+            self._queue().put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.stats["dropped"] += len(job.recipients)
+            log.warning("email queue full; dropped %s recipients of %s", len(job.recipients), job.template_name)
+            return False
+
+    def submit(self, template_name: str, recipients: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+        """
+        Weka job. Ndani ya loop ya worker ni non-blocking; kutoka thread
+        nyingine (mf. route za sync kwenye threadpool) husubiri loop iweke job
+        (hadi SUBMIT_TIMEOUT) ili False irudi kweli foleni ikiwa imejaa.
+        """
+        job = EmailJob(template_name, list(recipients))
+        if not job.recipients:
+            return True
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not loop:
+                fut = asyncio.run_coroutine_threadsafe(self._aput(job), loop)
+                try:
+                    return fut.result(timeout=SUBMIT_TIMEOUT)
+                except Exception:
+                    if fut.cancel():
+                        log.warning("email submit timed out; %s not queued", job.template_name)
+                        return False
+                    return bool(fut.result())
+        return self._put(job)
+
+    async def _aput(self, job: EmailJob) -> bool:
+        return self._put(job)
+
+    def _run_job(self, job: EmailJob) -> Dict[str, Any]:
+        factory = self.session_factory
+        if factory is None:
+            from backend.db import SessionLocal as factory  # type: ignore
+        db = factory()
+        try:
+            return send_many(db, job.template_name, job.recipients)
+        finally:
+            db.close()
+
+    async def run(self) -> None:
+        q = self._queue()
+        self._loop = asyncio.get_running_loop()
+        self.running = True
+        log.info("Email worker started (pool=%s)", get_pool().size)
+        try:
+            while True:
+                job = await q.get()
+                try:
+                    res = await asyncio.to_thread(self._run_job, job)
+                    self.stats["sent"] += res["sent"]
+                    self.stats["failed"] += res["failed"]
+                except Exception as e:
+                    self.stats["failed"] += len(job.recipients)
+                    log.warning("email job %s failed: %s", job.template_name, e)
+                finally:
+                    self.stats["jobs"] += 1
+                    q.task_done()
+        finally:
+            self.running = False
+            self._loop = None
+            await asyncio.to_thread(close_pool)
+
+    async def join(self) -> None:
+        await self._queue().join()
+
+
+worker = EmailWorker()
+
+
+def enqueue_many(template_name: str, recipients: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+    """Weka mail nyingi kwenye foleni ya worker (non-blocking)."""
+    return worker.submit(template_name, recipients)
 
-    msg.attach(MIMEText(rendered_html, "html"))
 
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASS)
-        server.sendmail(SMTP_USER, to_email, msg.as_string())
+def enqueue_email(to_email: str, template_name: str, data: Dict[str, Any]) -> bool:
+    return worker.submit(template_name, [(to_email, data)])
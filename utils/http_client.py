@@ -0,0 +1,185 @@
+# backend/utils/http_client.py
+# -*- coding: utf-8 -*-
+"""
+HTTP ya nje (outbound) ya pamoja kwa adapters za messaging/webhooks.
+
+Kila host (scheme://host:port) ina client yake ya httpx yenye keep-alive pool,
+hivyo ujumbe unaofuata kwa api.telegram.org / graph.facebook.com hutumia
+connection iliyopo badala ya kulipa TCP+TLS kila mara. HTTP/2 huwashwa pale
+`h2` ipo (multiplexing kwenye connection moja).
+
+- `get_async_client(url)` / `get_sync_client(url)` : client ya host hiyo
+- `apost(url, ...)` / `post(url, ...)`            : njia fupi
+- `close_http_clients()`                           : huitwa na lifespan (main.py)
+
+Async clients hufungwa kwenye event loop iliyoziunda; loop ikibadilika
+(mf. tests / scripts za asyncio.run) client mpya huundwa.
+
+ENV:
+  OUTBOUND_HTTP_TIMEOUT            (default 10)   sekunde (read/write/pool)
+  OUTBOUND_HTTP_CONNECT_TIMEOUT    (default 5)
+  OUTBOUND_HTTP_MAX_CONNECTIONS    (default 100)  kwa host
+  OUTBOUND_HTTP_MAX_KEEPALIVE      (default 20)   kwa host
+  OUTBOUND_HTTP_KEEPALIVE_EXPIRY   (default 30)   sekunde
+  OUTBOUND_HTTP2=1|0               (default 1; hutumika tu kama `h2` imesakinishwa)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from contextlib import suppress
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+log = logging.getLogger("smartbiz.http_client")
+
+
+def _env_float(k: str, default: float) -> float:
+    try:
+        return float(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+TIMEOUT = httpx.Timeout(
+    _env_float("OUTBOUND_HTTP_TIMEOUT", 10.0),
+    connect=_env_float("OUTBOUND_HTTP_CONNECT_TIMEOUT", 5.0),
+)
+LIMITS = httpx.Limits(
+    max_connections=_env_int("OUTBOUND_HTTP_MAX_CONNECTIONS", 100),
+    max_keepalive_connections=_env_int("OUTBOUND_HTTP_MAX_KEEPALIVE", 20),
+    keepalive_expiry=_env_float("OUTBOUND_HTTP_KEEPALIVE_EXPIRY", 30.0),
+)
+HTTP2 = os.getenv("OUTBOUND_HTTP2", "1").strip().lower() in {"1", "true", "yes", "on"} and _h2_available()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class OutboundHTTP:
+    """Registry ya clients kwa host; thread-safe kwa sync, loop-aware kwa async."""
+
+    def __init__(
+        self,
+        *,
+        timeout: httpx.Timeout = TIMEOUT,
+        limits: httpx.Limits = LIMITS,
+        http2: bool = HTTP2,
+        **client_kw: Any,
+    ) -> None:
+        self.timeout = timeout
+        self.limits = limits
+        self.http2 = http2
+        self.client_kw = client_kw  # mf. verify=/proxy= kwa clients zote
+        self._async: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        self._sync: Dict[str, httpx.Client] = {}
+        self._lock = threading.Lock()
+
+    # ---------- async ----------
+    def get_async_client(self, url: str) -> httpx.AsyncClient:
+        key = _origin(url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async.get(key)
+            if entry is not None and entry[0] is loop and not entry[1].is_closed:
+                return entry[1]
+            client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, http2=self.http2, **self.client_kw
+            )
+            self._async[key] = (loop, client)
+        if entry is not None and entry[0] is not loop:
+            log.debug("outbound client for %s recreated (event loop changed)", key)
+        return client
+
+    async def arequest(self, method: str, url: str, **kw: Any) -> httpx.Response:
+        return await self.get_async_client(url).request(method, url, **kw)
+
+    async def apost(self, url: str, **kw: Any) -> httpx.Response:
+        return await self.arequest("POST", url, **kw)
+
+    # ---------- sync ----------
+    def get_sync_client(self, url: str) -> httpx.Client:
+        key = _origin(url)
+        with self._lock:
+            client = self._sync.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(
+                    timeout=self.timeout, limits=self.limits, http2=self.http2, **self.client_kw
+                )
+                self._sync[key] = client
+            return client
+
+    def request(self, method: str, url: str, **kw: Any) -> httpx.Response:
+        return self.get_sync_client(url).request(method, url, **kw)
+
+    def post(self, url: str, **kw: Any) -> httpx.Response:
+        return self.request("POST", url, **kw)
+
+    # ---------- lifecycle ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"async_hosts": sorted(self._async), "sync_hosts": sorted(self._sync), "http2": self.http2}
+
+    async def aclose(self) -> None:
+        with self._lock:
+            async_clients = [c for _, c in self._async.values()]
+            sync_clients = list(self._sync.values())
+            self._async.clear()
+            self._sync.clear()
+        for c in async_clients:
+            with suppress(Exception):
+                await c.aclose()
+        for c in sync_clients:
+            with suppress(Exception):
+                c.close()
+
+
+_default: Optional[OutboundHTTP] = None
+_default_lock = threading.Lock()
+
+
+def get_http() -> OutboundHTTP:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = OutboundHTTP()
+                log.info("Outbound HTTP pools ready (http2=%s, max_conn/host=%s)",
+                         _default.http2, _default.limits.max_connections)
+    return _default
+
+
+async def apost(url: str, **kw: Any) -> httpx.Response:
+    return await get_http().apost(url, **kw)
+
+
+def post(url: str, **kw: Any) -> httpx.Response:
+    return get_http().post(url, **kw)
+
+
+async def close_http_clients() -> None:
+    global _default
+    http, _default = _default, None
+    if http is not None:
+        await http.aclose()
@@ -0,0 +1,200 @@
+# backend/utils/lease_worker.py
+# -*- coding: utf-8 -*-
+"""
+Mifupa ya pamoja ya workers wa foleni za DB zenye lease:
+claim (`FOR UPDATE SKIP LOCKED`) → kazi kwa tasks → matokeo huandikwa kwa makundi.
+
+Inatumiwa na tasks.scheduler.Dispatcher (scheduled_messages) na
+services.webhook_engine.WebhookEngine (webhook_events). Base hushughulikia
+capacity (max_inflight), tasks, flusher (kila flush_interval au buffer ikifika
+batch), poll yenye jitter, na shutdown: flusher husimamishwa, tasks
+hukatishwa, matokeo yaliyobaki huandikwa na leases zilizobaki hurudishwa.
+
+Subclass huandika hooks:
+  _claim_sync(limit, exclude)   rows zilizofika muda, kwa lease (thread)
+  _excluded()                   makundi yasiyochukuliwa sasa (caps / breakers)
+  _group(item)                  kundi la item (platform / endpoint) kwa inflight
+  _handle(item)                 kazi yenyewe; huweka matokeo kwenye buffers
+  _pending() / _take() / _restore(snap)
+                                buffers za matokeo (idadi, chukua, rudisha)
+  _flush_sync(snap)             andika snapshot (thread); rudisha counters
+  _settled(snap)                ids ambazo leases zake zimemalizika
+  _release_sync(ids)            rudisha leases ambazo hazijamalizika
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from contextlib import suppress
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+from sqlalchemy.orm import Session
+
+log = logging.getLogger("smartbiz.lease_worker")
+
+
+class LeaseWorker:
+    """Claim → handle (tasks) → buffered bulk writes; msingi wa Dispatcher na WebhookEngine."""
+
+    name = "Lease worker"
+    log = log
+
+    def __init__(
+        self,
+        *,
+        session_factory: Callable[[], Session],
+        batch: int,
+        max_inflight: int,
+        lease_seconds: int,
+        poll_interval: float,
+        flush_interval: float,
+    ) -> None:
+        self.session_factory = session_factory
+        self.batch = batch
+        self.max_inflight = max_inflight
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+
+        self._inflight: Dict[Any, int] = defaultdict(int)
+        self._claimed: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        self.running = False
+        self.stats: Dict[str, int] = defaultdict(int)
+
+    # ----- hooks -----
+    def _claim_sync(self, limit: int, exclude: List[Any]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _excluded(self) -> List[Any]:
+        return []
+
+    def _group(self, item: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    async def _handle(self, item: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _pending(self) -> int:
+        raise NotImplementedError
+
+    def _take(self) -> Any:
+        raise NotImplementedError
+
+    def _restore(self, snap: Any) -> None:
+        raise NotImplementedError
+
+    def _flush_sync(self, snap: Any) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def _settled(self, snap: Any) -> Iterable[int]:
+        raise NotImplementedError
+
+    def _release_sync(self, ids: List[int]) -> int:
+        raise NotImplementedError
+
+    def _describe(self) -> str:
+        return f"batch={self.batch} inflight={self.max_inflight}"
+
+    # ----- claim -----
+    async def claim_and_dispatch(self) -> int:
+        free = self.max_inflight - len(self._claimed)
+        if free <= 0:
+            return 0
+        items = await asyncio.to_thread(self._claim_sync, min(free, self.batch), self._excluded())
+        for item in items:
+            self._claimed.add(item["id"])
+            self._inflight[self._group(item)] += 1
+            t = asyncio.create_task(self._run_item(item))
+            self._tasks.add(t)
+            t.add_done_callback(self._tasks.discard)
+        self.stats["claimed"] += len(items)
+        return len(items)
+
+    async def _run_item(self, item: Dict[str, Any]) -> None:
+        try:
+            await self._handle(item)
+        finally:
+            self._inflight[self._group(item)] -= 1
+            if self._pending() >= self.batch:
+                self._wake.set()
+
+    # ----- bulk writes -----
+    async def flush(self) -> None:
+        n = self._pending()
+        if not n:
+            return
+        snap = self._take()
+        try:
+            res = await asyncio.to_thread(self._flush_sync, snap)
+        except Exception as e:
+            self.log.warning("%s flush failed (%s); requeueing %s results", self.name, e, n)
+            self._restore(snap)
+            return
+        self._claimed.difference_update(self._settled(snap))
+        for k, v in res.items():
+            self.stats[k] += v
+
+    async def _flusher(self) -> None:
+        while not self._stop.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            self._wake.clear()
+            await self.flush()
+
+    # ----- lifecycle -----
+    async def run(self) -> None:
+        self.running = True
+        self.log.info("%s started (%s).", self.name, self._describe())
+        flusher = asyncio.create_task(self._flusher())
+        try:
+            while not self._stop.is_set():
+                try:
+                    got = await self.claim_and_dispatch()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:  # pragma: no cover
+                    # Never crash the loop on a single failure
+                    self.log.exception("%s claim error: %s", self.name, e)
+                    got = 0
+                if got:
+                    await asyncio.sleep(0)
+                    continue
+                # idle (au capacity imejaa): subiri kidogo, jitter dhidi ya thundering herd
+                delay = self.poll_interval if len(self._claimed) < self.max_inflight else self.flush_interval
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stop.wait(), delay + random.uniform(0.0, delay * 0.25))
+        finally:
+            self._stop.set()
+            await self._shutdown(flusher)
+            self.running = False
+            self.log.info("%s stopped.", self.name)
+
+    async def _shutdown(self, flusher: asyncio.Task) -> None:
+        flusher.cancel()
+        with suppress(BaseException):
+            await flusher
+        for t in list(self._tasks):
+            t.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        with suppress(Exception):
+            await self.flush()
+        pending = list(self._claimed)
+        if pending:
+            with suppress(Exception):
+                await asyncio.to_thread(self._release_sync, pending)
+            self._claimed.clear()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def drain(self) -> None:
+        """Subiri kazi zote zilizoanzishwa, kisha andika matokeo."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await self.flush()
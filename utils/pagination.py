@@ -0,0 +1,194 @@
+# backend/utils/pagination.py
+# -*- coding: utf-8 -*-
+"""
+Keyset (cursor) pagination ya pamoja kwa CRUDBase na list routes.
+
+Badala ya `OFFSET n` (DB husoma na kutupa rows n kila ukurasa), ukurasa
+unaofuata huanzia baada ya (sort_key, id) ya row ya mwisho:
+
+    WHERE (col < :v) OR (col = :v AND id < :id)   -- desc
+    ORDER BY col DESC, id DESC LIMIT :limit + 1
+
+Ukurasa wa N una gharama sawa na wa kwanza, na memory haiongezeki.
+
+Cursor ni opaque (base64url ya JSON): sort spec + thamani za row ya mwisho.
+Cursor iliyotengenezwa kwa sort tofauti hukataliwa (400).
+
+Totals ni hiari: "exact" (COUNT), "estimate" (Postgres EXPLAIN rows; hurudi
+COUNT kwenye DB nyingine) au "none".
+"""
+from __future__ import annotations
+
+import base64
+import datetime as dt
+import json
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Generic, List, Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.orm import Query, Session
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TOTAL_MODE_PATTERN = "^(exact|estimate|none)$"
+
+
+# ---------- cursor encoding ----------
+def _enc_value(v: Any) -> Any:
+    if isinstance(v, dt.datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, dt.date):
+        return {"d": v.isoformat()}
+    if isinstance(v, Decimal):
+        return {"dec": str(v)}
+    if hasattr(v, "value") and not isinstance(v, (int, float, str, bool)):  # Enum
+        return v.value
+    return v
+
+
+def _dec_value(v: Any) -> Any:
+    if isinstance(v, dict):
+        if "dt" in v:
+            return dt.datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return dt.date.fromisoformat(v["d"])
+        if "dec" in v:
+            return Decimal(v["dec"])
+    return v
+
+
+def encode_cursor(spec: str, values: Sequence[Any]) -> str:
+    raw = json.dumps({"s": spec, "k": [_enc_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, spec: str) -> List[Any]:
+    """Rudisha thamani za cursor; HTTP 400 ikiwa si halali au ni ya sort nyingine."""
+    try:
+        pad = "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(token + pad))
+        if data.get("s") != spec:
+            raise ValueError("cursor/sort mismatch")
+        return [_dec_value(v) for v in data["k"]]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid or expired cursor")
+
+
+# ---------- keyset ----------
+@dataclass
+class KeysetPage(Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    total: Optional[int] = None
+
+
+def sort_spec(*cols: Any, desc: bool = True) -> str:
+    names = ",".join(str(getattr(c, "key", c)) for c in cols)
+    return f"{names}:{'desc' if desc else 'asc'}"
+
+
+def _after(cols: Sequence[Any], values: Sequence[Any], desc: bool):
+    """(c1, c2, ...) > / < (v1, v2, ...) kwa OR/AND (portable, hutumia index ya composite)."""
+    clauses = []
+    for i, col in enumerate(cols):
+        eqs = [cols[j] == values[j] for j in range(i)]
+        cmp = col < values[i] if desc else col > values[i]
+        clauses.append(and_(*eqs, cmp) if eqs else cmp)
+    return or_(*clauses)
+
+
+def apply_keyset(q: Any, cols: Sequence[Any], *, desc: bool = True, cursor: Optional[str] = None):
+    """Weka WHERE ya cursor + ORDER BY kwenye Query au Select. `cols` mwisho wake uwe id (unique)."""
+    if cursor:
+        values = decode_cursor(cursor, sort_spec(*cols, desc=desc))
+        if len(values) != len(cols):
+            raise HTTPException(status_code=400, detail="Invalid or expired cursor")
+        q = q.filter(_after(cols, values, desc))
+    return q.order_by(*[c.desc() if desc else c.asc() for c in cols])
+
+
+def _row_values(row: Any, cols: Sequence[Any]) -> List[Any]:
+    return [getattr(row, getattr(c, "key", str(c))) for c in cols]
+
+
+def paginate(
+    db: Session,
+    q: Any,
+    cols: Sequence[Any],
+    *,
+    limit: int,
+    desc: bool = True,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    total: str = "none",
+) -> KeysetPage:
+    """
+    Chukua ukurasa mmoja. `cursor` ikiwepo, `offset` hupuuzwa (offset ni kwa
+    clients wa zamani tu). Huvuta limit+1 ili kujua kama kuna ukurasa unaofuata.
+    """
+    total_n = count_total(db, q, total) if total != "none" else None
+    q = apply_keyset(q, cols, desc=desc, cursor=cursor)
+    if offset and not cursor:
+        q = q.offset(offset)
+    q = q.limit(limit + 1)
+    if isinstance(q, Query):
+        rows = q.all()
+    else:
+        rows = list(db.execute(q).unique().scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    nxt = encode_cursor(sort_spec(*cols, desc=desc), _row_values(rows[-1], cols)) if has_more and rows else None
+    return KeysetPage(items=rows, next_cursor=nxt, has_more=has_more, total=total_n)
+
+
+# ---------- totals ----------
+def _as_select(q: Any):
+    return q.statement if isinstance(q, Query) else q
+
+
+def estimate_count(db: Session, q: Any) -> int:
+    """Makadirio ya rows kutoka planner ya Postgres; DB nyingine → COUNT halisi."""
+    stmt = _as_select(q)
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        try:
+            sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+            with db.begin_nested():  # savepoint: kosa la EXPLAIN lisiharibu transaction
+                plan = db.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except Exception as e:
+            log.debug("estimate_count fell back to COUNT: %s", e)
+    return exact_count(db, q)
+
+
+def exact_count(db: Session, q: Any) -> int:
+    stmt = _as_select(q).order_by(None)
+    return int(db.execute(select(func.count()).select_from(stmt.subquery())).scalar() or 0)
+
+
+def count_total(db: Session, q: Any, mode: str = "exact") -> Optional[int]:
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        return estimate_count(db, q)
+    return exact_count(db, q)
+
+
+def set_page_headers(
+    response: Response, page: KeysetPage, *, limit: int, offset: int = 0
+) -> None:
+    """Headers za paging zinazotumika kwenye routes (X-Total-Count/X-Limit/X-Offset/X-Next-Cursor)."""
+    if page.total is not None:
+        response.headers["X-Total-Count"] = str(page.total)
+    response.headers["X-Limit"] = str(limit)
+    response.headers["X-Offset"] = str(offset)
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
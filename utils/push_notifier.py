@@ -1,30 +1,424 @@
-from pywebpush import webpush, WebPushException
-from backend.models.push_subscription import PushSubscription
+# backend/utils/push_notifier.py
+# -*- coding: utf-8 -*-
+"""
+Web-push fan-out: dispatcher ya makundi kwa PushSubscription nyingi.
+
+- VAPID: key hupakiwa mara moja; JWT husainiwa mara moja kwa kila
+  push-service origin (aud) na hutumika tena hadi karibu na `exp`.
+- Subscriptions hupangwa kwa origin (fcm.googleapis.com, mozilla, apple...);
+  kila origin ina kikomo chake cha concurrency na hutumia keep-alive pool ya
+  utils.http_client (client moja kwa origin).
+- Encryption (ECDH + AES-GCM kwa kila subscription) hufanyika kwenye thread
+  pool ili loop isizuiwe.
+- Matokeo huandikwa kwa makundi: success/failure kwa UPDATE chache, na
+  subscriptions zilizorudisha 404/410 hufutwa kwa DELETE moja.
+- `push_to_audience(audience, payload)` husoma subscriptions kwa keyset chunks
+  (audience = select ya user ids, mf. followers wa host) — 100k followers ni
+  chunks ~100, si query/row moja moja.
+
+ENV:
+  VAPID_PUBLIC_KEY / VAPID_PRIVATE_KEY (PEM/base64url au path ya faili)
+  VAPID_SUBJECT=mailto:admin@smartbiz.com
+  VAPID_JWT_TTL=43200              sekunde (spec: <= 24h)
+  PUSH_ORIGIN_CONCURRENCY=100      requests kwa wakati mmoja kwa push service
+  PUSH_ENCRYPT_WORKERS=4
+  PUSH_BATCH_SIZE=1000             subscriptions kwa chunk
+  PUSH_DEFAULT_TTL=86400
+"""
+from __future__ import annotations
+
+import asyncio
 import json
+import logging
 import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from sqlalchemy import Select, delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.push_subscription import PushSubscription
+
+log = logging.getLogger("smartbiz.push")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, str(default)))
+    except Exception:
+        return default
+
 
-# ⚠️ Replace with your actual VAPID keys (you can generate them later)
 VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "your-public-key")
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "your-private-key")
 VAPID_CLAIMS = {
-    "sub": "mailto:admin@smartbiz.com"
+    "sub": os.getenv("VAPID_SUBJECT", "mailto:admin@smartbiz.com")
 }
+VAPID_JWT_TTL = min(24 * 3600, max(300, _env_int("VAPID_JWT_TTL", 12 * 3600)))
+ORIGIN_CONCURRENCY = max(1, _env_int("PUSH_ORIGIN_CONCURRENCY", 100))
+ENCRYPT_WORKERS = max(1, _env_int("PUSH_ENCRYPT_WORKERS", 4))
+BATCH_SIZE = max(1, _env_int("PUSH_BATCH_SIZE", 1000))
+DEFAULT_TTL = max(0, _env_int("PUSH_DEFAULT_TTL", 86400))
 
-def send_push_notification(subscription: PushSubscription, message: str):
+GONE_CODES = {404, 410}
+RETRY_CODES = {429, 500, 502, 503, 504}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def origin_of(endpoint: str) -> str:
+    parts = urlsplit(endpoint or "")
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+# ───────────────────────────── VAPID ─────────────────────────────
+class VapidSigner:
+    """JWT moja kwa kila audience (origin), hutumika tena hadi `exp - margin`."""
+
+    def __init__(self, private_key: str = VAPID_PRIVATE_KEY, claims: Optional[Dict[str, Any]] = None,
+                 ttl: int = VAPID_JWT_TTL) -> None:
+        self.private_key = private_key
+        self.claims = dict(claims or VAPID_CLAIMS)
+        self.ttl = ttl
+        self.margin = max(60, ttl // 10)
+        self._vapid = None
+        self._tokens: Dict[str, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+        self.signed = 0
+
+    def _key(self):
+        if self._vapid is None:
+            from py_vapid import Vapid02  # dependency ya pywebpush
+
+            if os.path.isfile(self.private_key):
+                self._vapid = Vapid02.from_file(private_key_file=self.private_key)
+            elif "-----BEGIN" in self.private_key:
+                self._vapid = Vapid02.from_pem(self.private_key.encode())
+            else:
+                self._vapid = Vapid02.from_string(private_key=self.private_key)
+        return self._vapid
+
+    def token(self, audience: str) -> Tuple[str, str]:
+        """(jwt, public_key_b64url) kwa audience hii."""
+        now = time.time()
+        with self._lock:
+            cached = self._tokens.get(audience)
+            if cached is not None and cached[2] - self.margin > now:
+                return cached[0], cached[1]
+            exp = int(now) + self.ttl
+            auth = self._key().sign({**self.claims, "aud": audience, "exp": exp})["Authorization"]
+            parts = dict(p.split("=", 1) for p in auth.split(" ", 1)[1].split(","))
+            jwt, pub = parts["t"], parts["k"]
+            self._tokens[audience] = (jwt, pub, float(exp))
+            self.signed += 1
+            return jwt, pub
+
+    def headers(self, audience: str, encoding: str) -> Dict[str, str]:
+        jwt, pub = self.token(audience)
+        if encoding == "aesgcm":
+            return {"Authorization": f"WebPush {jwt}", "Crypto-Key": f"p256ecdsa={pub}"}
+        return {"Authorization": f"vapid t={jwt},k={pub}"}
+
+
+# ───────────────────────────── Dispatcher ─────────────────────────────
+@dataclass
+class PushTarget:
+    id: int
+    endpoint: str
+    p256dh: str
+    auth: str
+    encoding: str = "aes128gcm"
+    ttl: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row: Any) -> "PushTarget":
+        enc = getattr(getattr(row, "encoding", None), "value", getattr(row, "encoding", None))
+        return cls(
+            id=row.id,
+            endpoint=row.endpoint,
+            p256dh=row.p256dh,
+            auth=row.auth,
+            encoding=enc if enc in ("aesgcm", "aes128gcm") else "aes128gcm",
+            ttl=getattr(row, "ttl_seconds", None),
+        )
+
+
+@dataclass
+class PushResult:
+    sent: List[int] = field(default_factory=list)
+    gone: List[int] = field(default_factory=list)
+    retry: List[Tuple[int, str, int]] = field(default_factory=list)   # (id, code, delay)
+    failed: List[Tuple[int, str]] = field(default_factory=list)       # (id, code)
+
+    def merge(self, other: "PushResult") -> None:
+        self.sent += other.sent
+        self.gone += other.gone
+        self.retry += other.retry
+        self.failed += other.failed
+
+    def summary(self) -> Dict[str, int]:
+        return {"sent": len(self.sent), "pruned": len(self.gone), "retry": len(self.retry), "failed": len(self.failed)}
+
+
+def _encrypt(target: PushTarget, data: bytes) -> Tuple[bytes, Dict[str, str]]:
+    from pywebpush import WebPusher
+
+    enc = WebPusher({"endpoint": target.endpoint, "keys": {"p256dh": target.p256dh, "auth": target.auth}}).encode(
+        data, target.encoding
+    )
+    headers = {"Content-Encoding": target.encoding}
+    if "crypto_key" in enc:
+        headers["Crypto-Key"] = "dh=" + enc["crypto_key"].decode()
+    if "salt" in enc:
+        headers["Encryption"] = "salt=" + enc["salt"].decode()
+    return enc["body"], headers
+
+
+def _retry_after(value: Optional[str], default: int = 60) -> int:
     try:
-        webpush(
-            subscription_info={
-                "endpoint": subscription.endpoint,
-                "keys": {
-                    "p256dh": subscription.p256dh,
-                    "auth": subscription.auth
-                }
-            },
-            data=json.dumps({"title": "SmartBiz Notification", "body": message}),
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims=VAPID_CLAIMS
+        return max(1, min(3600, int(value or default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class PushDispatcher:
+    def __init__(
+        self,
+        signer: Optional[VapidSigner] = None,
+        *,
+        origin_concurrency: int = ORIGIN_CONCURRENCY,
+        encrypt_workers: int = ENCRYPT_WORKERS,
+        http: Any = None,
+    ) -> None:
+        self.signer = signer or VapidSigner()
+        self.origin_concurrency = origin_concurrency
+        self.http = http
+        self._pool = ThreadPoolExecutor(max_workers=encrypt_workers, thread_name_prefix="push-enc")
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _http(self):
+        if self.http is None:
+            from backend.utils.http_client import get_http
+            self.http = get_http()
+        return self.http
+
+    def _sem(self, origin: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:  # semaphores hufungwa kwenye loop moja
+            self._sems, self._loop = {}, loop
+        sem = self._sems.get(origin)
+        if sem is None:
+            sem = self._sems[origin] = asyncio.Semaphore(self.origin_concurrency)
+        return sem
+
+    async def _send_one(self, origin: str, t: PushTarget, data: bytes, ttl: int,
+                        urgency: Optional[str], topic: Optional[str], res: PushResult) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._sem(origin):
+            try:
+                body, headers = await loop.run_in_executor(self._pool, _encrypt, t, data)
+                vapid = self.signer.headers(origin, t.encoding)
+                if "Crypto-Key" in vapid and "Crypto-Key" in headers:
+                    headers["Crypto-Key"] += ";" + vapid.pop("Crypto-Key")
+                headers.update(vapid)
+                headers["TTL"] = str(t.ttl if t.ttl is not None else ttl)
+                if urgency:
+                    headers["Urgency"] = urgency
+                if topic:
+                    headers["Topic"] = topic
+                r = await self._http().apost(t.endpoint, content=body, headers=headers)
+            except Exception as e:
+                res.retry.append((t.id, type(e).__name__[:80], 60))
+                return
+        code = r.status_code
+        if code in (200, 201, 202):
+            res.sent.append(t.id)
+        elif code in GONE_CODES:
+            res.gone.append(t.id)
+        elif code in RETRY_CODES:
+            res.retry.append((t.id, str(code), _retry_after(r.headers.get("Retry-After"))))
+        else:
+            res.failed.append((t.id, str(code)))
+
+    async def send(
+        self,
+        targets: Iterable[PushTarget],
+        payload: Dict[str, Any] | str | bytes,
+        *,
+        ttl: int = DEFAULT_TTL,
+        urgency: Optional[str] = None,
+        topic: Optional[str] = None,
+    ) -> PushResult:
+        """Tuma payload moja kwa targets zote (kwa makundi ya origin, concurrently)."""
+        data = payload if isinstance(payload, bytes) else (
+            payload.encode() if isinstance(payload, str) else json.dumps(payload, separators=(",", ":")).encode()
         )
-        return True
-    except WebPushException as ex:
-        print(f"❌ Push failed for {subscription.endpoint}: {repr(ex)}")
+        by_origin: Dict[str, List[PushTarget]] = defaultdict(list)
+        for t in targets:
+            by_origin[origin_of(t.endpoint)].append(t)
+        res = PushResult()
+        await asyncio.gather(*(
+            self._send_one(origin, t, data, ttl, urgency, topic, res)
+            for origin, group in by_origin.items()
+            for t in group
+        ))
+        return res
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+_dispatcher: Optional[PushDispatcher] = None
+
+
+def get_dispatcher() -> PushDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = PushDispatcher()
+    return _dispatcher
+
+
+# ───────────────────────────── DB (bulk) ─────────────────────────────
+def apply_results(db: Session, res: PushResult, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Andika matokeo kwa UPDATE/DELETE za makundi; 404/410 hufutwa."""
+    now = now or _utcnow()
+    P = PushSubscription
+    try:
+        if res.sent:
+            db.execute(
+                update(P).where(P.id.in_(res.sent)).values(
+                    last_push_at=now, last_success_at=now, failure_count=0, attempt_count=0,
+                    last_error_code=None, last_error_msg=None, next_attempt_at=None,
+                    sent_count_24h=P.sent_count_24h + 1,
+                ).execution_options(synchronize_session=False)
+            )
+        if res.gone:
+            db.execute(delete(P).where(P.id.in_(res.gone)).execution_options(synchronize_session=False))
+        grouped: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+        for sid, code, delay in res.retry:
+            grouped[(code, delay)].append(sid)
+        for sid, code in res.failed:
+            grouped[(code, 0)].append(sid)
+        for (code, delay), ids in grouped.items():
+            db.execute(
+                update(P).where(P.id.in_(ids)).values(
+                    failure_count=P.failure_count + 1, attempt_count=P.attempt_count + 1,
+                    last_attempt_at=now, last_error_code=code,
+                    next_attempt_at=(now + timedelta(seconds=delay)) if delay else None,
+                ).execution_options(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return res.summary()
+
+
+def _sendable(now: datetime, respect_backoff: bool):
+    P = PushSubscription
+    clauses = [P.is_valid.is_(True), P.is_revoked.is_(False),
+               or_(P.expiration_time.is_(None), P.expiration_time > now)]
+    if respect_backoff:
+        clauses.append(or_(P.next_attempt_at.is_(None), P.next_attempt_at <= now))
+    return clauses
+
+
+def _target_columns():
+    P = PushSubscription
+    return (P.id, P.endpoint, P.p256dh, P.auth, P.encoding, P.ttl_seconds)
+
+
+async def push_to_audience(
+    audience: Select | Sequence[int],
+    payload: Dict[str, Any],
+    *,
+    session_factory: Optional[Callable[[], Session]] = None,
+    batch_size: int = BATCH_SIZE,
+    ttl: int = DEFAULT_TTL,
+    urgency: Optional[str] = None,
+    topic: Optional[str] = None,
+    respect_backoff: bool = True,
+) -> Dict[str, int]:
+    """
+    Tuma kwa subscriptions zote za `audience` (select ya user ids au orodha ya
+    ids). Subscriptions husomwa kwa keyset (id > last) — chunk inayofuata
+    husomwa wakati chunk iliyotangulia inatumwa.
+    """
+    if session_factory is None:
+        from backend.db import SessionLocal as session_factory  # type: ignore
+    P = PushSubscription
+    now = _utcnow()
+    if isinstance(audience, Select):
+        who = [P.user_id.in_(audience.scalar_subquery())]
+    else:
+        who = [P.user_id.in_(list(audience))] if audience else None
+    if who is None:
+        return PushResult().summary()
+
+    def _chunk(after: int) -> List[PushTarget]:
+        with session_factory() as db:
+            rows = db.execute(
+                select(*_target_columns())
+                .where(*who, *_sendable(now, respect_backoff), P.id > after)
+                .order_by(P.id)
+                .limit(batch_size)
+            ).all()
+        return [PushTarget.from_row(r) for r in rows]
+
+    def _apply(res: PushResult) -> None:
+        with session_factory() as db:
+            apply_results(db, res)
+
+    disp = get_dispatcher()
+    total = PushResult()
+    chunk = await asyncio.to_thread(_chunk, 0)
+    while chunk:
+        nxt = asyncio.create_task(asyncio.to_thread(_chunk, chunk[-1].id)) if len(chunk) == batch_size else None
+        res = await disp.send(chunk, payload, ttl=ttl, urgency=urgency, topic=topic)
+        await asyncio.to_thread(_apply, res)
+        total.merge(res)
+        chunk = await nxt if nxt is not None else []
+    out = total.summary()
+    log.info("push fan-out done: %s", out)
+    return out
+
+
+def followers_of(host_id: Any) -> Select:
+    """Select ya user ids za followers hai wa host (`fans`: user_id → host_user_id)."""
+    from backend.models.fan import Fan, FanStatus
+
+    return select(Fan.user_id).where(Fan.host_user_id == host_id, Fan.status == FanStatus.active)
+
+
+async def push_to_followers(host_id: Any, payload: Dict[str, Any], **kw: Any) -> Dict[str, int]:
+    """Mf. live imeanza → followers wote hai wa host (blocked/muted huachwa)."""
+    return await push_to_audience(followers_of(host_id), payload, **kw)
+
+
+# ───────────────────────────── Single (compat) ─────────────────────────────
+async def send_push_async(db: Session, subscription: PushSubscription, payload: Dict[str, Any]) -> bool:
+    res = await get_dispatcher().send([PushTarget.from_row(subscription)], payload)
+    await asyncio.to_thread(apply_results, db, res)
+    return bool(res.sent)
+
+
+def send_push_notification(subscription: PushSubscription, message: str):
+    """Toleo la zamani (sync, subscription moja); sasa hutumia VAPID/JWT cache na pool ya HTTP."""
+    payload = {"title": "SmartBiz Notification", "body": message}
+    try:
+        res = asyncio.run(get_dispatcher().send([PushTarget.from_row(subscription)], payload))
+    except RuntimeError:
+        log.warning("send_push_notification called inside an event loop; use send_push_async")
         return False
+    if not res.sent:
+        log.warning("Push failed for %s: %s", subscription.endpoint, res.summary())
+    return bool(res.sent)
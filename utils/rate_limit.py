@@ -0,0 +1,398 @@
+# backend/utils/rate_limit.py
+# -*- coding: utf-8 -*-
+"""
+Rate limiting (GCRA) + idempotency keys za pamoja kwa routes zote.
+
+- `RateLimiter(name, limit, period)`: GCRA — kwa kila key huhifadhiwa thamani
+  MOJA (TAT, "theoretical arrival time"), hivyo ukaguzi ni O(1) bila orodha
+  ya timestamps. Huruhusu `burst` (default = limit) kwa mkupuo, kisha
+  limit/period kwa kasi ya kudumu. Angalia: dirisha lolote la `period`
+  linaweza kupata hadi burst + limit - 1 (5/min → 9 ndani ya sekunde 60).
+- `RateLimiter(..., strict=True)`: sliding log — timestamps zisizozidi `limit`
+  kwa key, hivyo dirisha lolote la `period` hupata `limit` tu. Kwa limits za
+  usalama (login, withdraw) ambapo kikomo ni ahadi, si makadirio.
+- `IdempotencyKeys(name, ttl)`: `claim(key)` = SET NX yenye TTL; `release(key)`
+  baada ya kushindwa ili retry ipite.
+
+Stores:
+  - MemoryStore : ndani ya process; expiry kwa TTL buckets (time wheel —
+                  hakuna full scan), na kikomo cha keys (LRU) kwa memory.
+  - RedisStore  : limits hushikiliwa na workers wote (Lua scripts za GCRA na
+                  sliding log (ZSET) + SET NX PX). Client yoyote yenye API ya redis-py
+                  (`register_script`, `set`, `delete`) — redis.Redis au
+                  stand-in ya tests. Redis ikishindwa, MemoryStore ya process
+                  hutumika (limits za worker mmoja) hadi iungane tena.
+
+Calls ni sync (sub-ms kwa memory); routes za async zenye RedisStore
+zitumie `ahit` / `aclaim` (thread) ili zisizuie event loop.
+
+ENV:
+  RATE_LIMIT_BACKEND=memory|redis   (default: memory)
+  RATE_LIMIT_REDIS_URL              (fallback: REDIS_URL)
+  RATE_LIMIT_PREFIX=smartbiz:rl
+  RATE_LIMIT_MAX_KEYS=200000        kikomo cha keys kwa MemoryStore
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Protocol, Tuple
+
+log = logging.getLogger("smartbiz.rate_limit")
+
+
+def _env_int(k: str, default: int) -> int:
+    try:
+        return int(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+PREFIX = os.getenv("RATE_LIMIT_PREFIX", "smartbiz:rl").strip() or "smartbiz:rl"
+MAX_KEYS = max(1, _env_int("RATE_LIMIT_MAX_KEYS", 200_000))
+
+# (allowed, remaining, retry_after, reset_after)
+GcraResult = Tuple[bool, int, float, float]
+
+
+def gcra_step(tat: Optional[float], now: float, interval: float, burst: int, cost: int) -> Tuple[GcraResult, Optional[float]]:
+    """Hatua moja ya GCRA → (matokeo, TAT mpya au None kama imekataliwa)."""
+    # hesabu kwa offset kutoka `now` (si epoch) ili float isipoteze usahihi
+    ahead = 0.0 if tat is None or tat < now else tat - now
+    diff = ahead + interval * cost
+    cap = interval * burst
+    if diff > cap:
+        return (False, 0, diff - cap, ahead), None
+    return (True, int((cap - diff) / interval + 1e-9), 0.0, diff), now + diff
+
+
+def window_step(log_: Tuple[float, ...], now: float, period: float, limit: int, cost: int) -> Tuple[GcraResult, Optional[Tuple[float, ...]]]:
+    """Hatua moja ya sliding log → (matokeo, log mpya au None kama imekataliwa)."""
+    live = tuple(t for t in log_ if t > now - period)
+    if len(live) + cost > limit:
+        # ombi lijalo baada ya timestamps za zamani za kutosha kuisha
+        idx = min(len(live) - 1, max(0, len(live) + cost - limit - 1))
+        retry = live[idx] + period - now if live else period
+        return (False, max(0, limit - len(live)), retry, live[-1] + period - now if live else 0.0), None
+    new = live + (now,) * cost
+    return (True, limit - len(new), 0.0, new[-1] + period - now), new
+
+
+class Store(Protocol):
+    remote: bool
+
+    def gcra(self, key: str, interval: float, burst: int, cost: int) -> GcraResult: ...
+    def window(self, key: str, period: float, limit: int, cost: int) -> GcraResult: ...
+    def set_nx(self, key: str, ttl: float) -> bool: ...
+    def delete(self, key: str) -> None: ...
+
+
+# ───────────────────────────── In-process ─────────────────────────────
+class MemoryStore:
+    """
+    key → (thamani, expires_at, bucket). Expiry: time wheel ya buckets za
+    `resolution` sekunde; kila operesheni hufagia buckets zilizopita tu.
+    Kila key ina nafasi MOJA kwenye wheel (`bucket`); ikikutwa bado hai
+    (TAT imesogea mbele) hupangwa upya kwenye bucket ya expiry yake mpya.
+    Keys zikizidi `max_keys`, za zamani zaidi (LRU) huondolewa.
+    """
+    remote = False
+
+    def __init__(self, max_keys: int = MAX_KEYS, resolution: float = 1.0) -> None:
+        self.max_keys = max_keys
+        self.res = resolution
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._wheel: Dict[int, List[str]] = {}
+        self._swept = int(time.time() // resolution)
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _sweep(self, now: float) -> None:
+        b = int(now // self.res)
+        if b <= self._swept:
+            return
+        if b - self._swept > len(self._wheel):
+            idxs: Any = sorted(i for i in self._wheel if i <= b)
+        else:
+            idxs = range(self._swept + 1, b + 1)
+        for i in idxs:
+            for k in self._wheel.pop(i, ()):
+                v = self._data.get(k)
+                if v is None or v[2] != i:
+                    continue  # imefutwa / imepangwa kwingine
+                if v[1] <= now:
+                    del self._data[k]
+                else:
+                    nb = int(v[1] // self.res) + 1
+                    self._data[k] = (v[0], v[1], nb)
+                    self._wheel.setdefault(nb, []).append(k)
+        self._swept = b
+
+    def _get(self, key: str, now: float) -> Any:
+        v = self._data.get(key)
+        if v is None or v[1] <= now:
+            return None
+        return v[0]
+
+    def _put(self, key: str, value: Any, expires: float) -> None:
+        old = self._data.get(key)
+        if old is not None and old[2] > self._swept:
+            bucket = old[2]
+        else:
+            bucket = int(expires // self.res) + 1
+            self._wheel.setdefault(bucket, []).append(key)
+        self._data[key] = (value, expires, bucket)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def gcra(self, key: str, interval: float, burst: int, cost: int) -> GcraResult:
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            res, new_tat = gcra_step(self._get(key, now), now, interval, burst, cost)
+            if new_tat is not None:
+                self._put(key, new_tat, new_tat)
+            return res
+
+    def window(self, key: str, period: float, limit: int, cost: int) -> GcraResult:
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            res, new_log = window_step(self._get(key, now) or (), now, period, limit, cost)
+            if new_log is not None:
+                self._put(key, new_log, new_log[-1] + period)
+            return res
+
+    def set_nx(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            if self._get(key, now) is not None:
+                return False
+            self._put(key, 1, now + ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ───────────────────────────── Redis protocol ─────────────────────────────
+_GCRA_LUA = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local ahead = tonumber(redis.call('GET', KEYS[1]) or ARGV[1]) - now
+if ahead < 0 then ahead = 0 end
+local diff = ahead + interval * cost
+local cap = interval * burst
+if diff > cap then
+  return {0, 0, tostring(diff - cap), tostring(ahead)}
+end
+redis.call('SET', KEYS[1], string.format('%.6f', now + diff), 'PX', math.ceil(diff * 1000))
+return {1, math.floor((cap - diff) / interval + 1e-9), '0', tostring(diff)}
+"""
+
+_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - period)
+local n = redis.call('ZCARD', KEYS[1])
+if n + cost > limit then
+  local idx = math.max(0, math.min(n - 1, n + cost - limit - 1))
+  local at = redis.call('ZRANGE', KEYS[1], idx, idx, 'WITHSCORES')
+  local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+  local retry, reset = period, 0
+  if at[2] then retry = tonumber(at[2]) + period - now end
+  if last[2] then reset = tonumber(last[2]) + period - now end
+  return {0, math.max(0, limit - n), tostring(retry), tostring(reset)}
+end
+for i = 1, cost do
+  redis.call('ZADD', KEYS[1], now, ARGV[5] .. ':' .. i)
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil(period * 1000))
+return {1, limit - n - cost, '0', tostring(period)}
+"""
+
+
+class RedisStore:
+    """GCRA/NX kwenye Redis; hitilafu yoyote → MemoryStore ya process (fail-open kwa limits za ndani)."""
+    remote = True
+
+    def __init__(self, client: Any, *, fallback: Optional[MemoryStore] = None) -> None:
+        self._client = client
+        self._gcra = client.register_script(_GCRA_LUA)
+        self._window = client.register_script(_WINDOW_LUA)
+        self._seq = 0
+        self._fallback = fallback or MemoryStore()
+        self._warned = 0.0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStore":
+        import redis  # optional dependency
+        return cls(redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25))
+
+    def _failed(self, e: Exception) -> None:
+        self.errors += 1
+        now = time.monotonic()
+        if now - self._warned > 30.0:
+            self._warned = now
+            log.warning("rate limit redis unavailable (%s); using in-process limits", e)
+
+    def gcra(self, key: str, interval: float, burst: int, cost: int) -> GcraResult:
+        try:
+            ok, remaining, retry, reset = self._gcra(keys=[key], args=[repr(time.time()), repr(interval), burst, cost])
+            return bool(int(ok)), int(remaining), float(retry), float(reset)
+        except Exception as e:
+            self._failed(e)
+            return self._fallback.gcra(key, interval, burst, cost)
+
+    def window(self, key: str, period: float, limit: int, cost: int) -> GcraResult:
+        now = time.time()
+        self._seq += 1
+        member = f"{now!r}:{os.getpid()}:{threading.get_ident()}:{self._seq}"
+        try:
+            ok, remaining, retry, reset = self._window(keys=[key], args=[repr(now), repr(period), limit, cost, member])
+            return bool(int(ok)), int(remaining), float(retry), float(reset)
+        except Exception as e:
+            self._failed(e)
+            return self._fallback.window(key, period, limit, cost)
+
+    def set_nx(self, key: str, ttl: float) -> bool:
+        try:
+            return bool(self._client.set(key, b"1", nx=True, px=max(1, int(ttl * 1000))))
+        except Exception as e:
+            self._failed(e)
+            return self._fallback.set_nx(key, ttl)
+
+    def delete(self, key: str) -> None:
+        try:
+            self._client.delete(key)
+        except Exception as e:
+            self._failed(e)
+        self._fallback.delete(key)
+
+
+# ───────────────────────────── Factory ─────────────────────────────
+_default: Optional[Store] = None
+_default_lock = threading.Lock()
+
+
+def get_store() -> Store:
+    """Store ya pamoja ya process (huchaguliwa kwa RATE_LIMIT_BACKEND)."""
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            kind = (os.getenv("RATE_LIMIT_BACKEND", "memory") or "memory").strip().lower()
+            if kind == "redis":
+                url = os.getenv("RATE_LIMIT_REDIS_URL") or os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+                try:
+                    _default = RedisStore.from_url(url)
+                    log.info("Rate limit store: redis")
+                except Exception as e:
+                    log.warning("Redis rate limit store unavailable (%s); using in-process", e)
+                    _default = MemoryStore()
+            else:
+                _default = MemoryStore()
+    return _default
+
+
+def set_store(store: Optional[Store]) -> None:
+    """Badilisha store ya default (tests / custom wiring)."""
+    global _default
+    _default = store
+
+
+def _flat(key: Any) -> str:
+    return ":".join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+def _key(kind: str, name: str, key: Any) -> str:
+    return f"{PREFIX}:{kind}:{name}:{_flat(key)}"
+
+
+# ───────────────────────────── Public API ─────────────────────────────
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float   # sekunde hadi ombi lijalo liruhusiwe (0 kama allowed)
+    reset_after: float   # sekunde hadi bucket ijae kabisa
+
+
+class RateLimiter:
+    """
+    `limit` maombi kwa `period` sekunde kwa kila key.
+
+    Default ni GCRA (burst + kasi ya kudumu); `strict=True` = sliding log,
+    yaani kamwe zaidi ya `limit` ndani ya dirisha lolote la `period`.
+    """
+
+    def __init__(
+        self, name: str, limit: int, period: float = 60.0, *, burst: Optional[int] = None, strict: bool = False
+    ) -> None:
+        if strict and burst is not None:
+            raise ValueError("burst haitumiki na strict=True")
+        self.name = name
+        self.limit = int(limit)
+        self.period = float(period)
+        self.strict = strict
+        self.burst = int(burst) if burst is not None else max(1, self.limit)
+        self.interval = self.period / self.limit if self.limit > 0 else math.inf
+        self.stats: Dict[str, int] = {"allowed": 0, "limited": 0}
+
+    def _check(self, key: Any, cost: int) -> GcraResult:
+        if self.limit <= 0:
+            res: GcraResult = (False, 0, self.period, self.period)
+        elif self.strict:
+            res = get_store().window(f"{PREFIX}:sw:{self.name}:{_flat(key)}", self.period, self.limit, cost)
+        else:
+            res = get_store().gcra(f"{PREFIX}:rl:{self.name}:{_flat(key)}", self.interval, self.burst, cost)
+        self.stats["allowed" if res[0] else "limited"] += 1
+        return res
+
+    def hit(self, key: Any, cost: int = 1) -> Decision:
+        return Decision(*self._check(key, cost))
+
+    async def ahit(self, key: Any, cost: int = 1) -> Decision:
+        if get_store().remote:
+            return await asyncio.to_thread(self.hit, key, cost)
+        return self.hit(key, cost)
+
+    def allow(self, key: Any) -> bool:
+        return self._check(key, 1)[0]
+
+
+class IdempotencyKeys:
+    """Keys zilizotumika ndani ya `ttl` sekunde (kwa namespace `name`)."""
+
+    def __init__(self, name: str, ttl: float = 600.0) -> None:
+        self.name = name
+        self.ttl = float(ttl)
+
+    def claim(self, key: Any) -> bool:
+        """True kama key ni mpya (na sasa imeshikwa); False kama ni marudio."""
+        return get_store().set_nx(_key("idem", self.name, key), self.ttl)
+
+    async def aclaim(self, key: Any) -> bool:
+        if get_store().remote:
+            return await asyncio.to_thread(self.claim, key)
+        return self.claim(key)
+
+    def release(self, key: Any) -> None:
+        get_store().delete(_key("idem", self.name, key))
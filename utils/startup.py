@@ -0,0 +1,576 @@
+# backend/utils/startup.py
+# -*- coding: utf-8 -*-
+"""
+Startup ya haraka (cold start ya Render): profile ya imports, models
+zinazohitajika na mappers tu, na routers zinazopakiwa kwenye hit ya kwanza.
+
+- `timeline`: phases za boot (offset + muda, ms) na import-time profile kwa
+  kila module iliyopakiwa kupitia `timed_import` (ms za jumla, pamoja na
+  modules mpya ilizovuta). Huonyeshwa na `GET /__startup` ya main (admin tu).
+- Manifest (`startup_manifest.json`, hutengenezwa wakati wa build na
+  `python -m backend.tools.build_startup_manifest`):
+    routers: kwa kila backend.routes.* → sha1 ya file, paths za routes zake,
+             na `eager` kama router ina startup/shutdown handlers.
+    models : kwa kila backend.models.* → sha1 na modules ambazo mappers zake
+             huzitaja (relationship("X"), secondary, ForeignKey("t.c"),
+             imports za models nyingine). Ni AST tu — hakuna import.
+- Models: manifest ikiwa fresh, `Startup` huweka MODELS_AUTOLOAD=0 ili
+  import ya package `backend.models` isipakie models zote; lifespan hupakia
+  closure ya dependencies za models ambazo tayari zimepakiwa (routers za
+  eager) + `CRITICAL_MODELS`. Listener ya `before_configured` hupakia closure
+  hiyo tena kila mapper mpya inapoongezwa (router iliyochelewa), hivyo
+  relationship("X") haikosi target. Package ikiwa tayari imepakia zote
+  (import ya mapema, MODELS_AUTOLOAD=1 ya wazi), mode ni "all".
+- Routers: module ambayo manifest yake ni fresh (sha1 inalingana) haipakiwi
+  kwenye boot. Baada ya ready, `load_pending` huzipakia nyuma (moja kwa kila
+  tick ya loop); `LazyRouterMiddleware` hushughulikia race tu — request
+  inayolingana na paths za router ambayo bado haijapakiwa (au /openapi.json,
+  /docs, /_routes — hupakia zote). Routes huwekwa mahali ambapo autoscan
+  ingeziweka.
+
+Manifest ikikosekana au ikiwa ya zamani, tabia ni ile ile ya awali: models
+zote na routers zote kwenye boot (module moja ikiwa stale → hiyo tu eager).
+Modules za backend.routes zisizo na `router` hazipakiwi kabisa.
+
+ENV:
+  STARTUP_LAZY=1                    zima (0) kurudi kwenye eager kamili
+  STARTUP_MANIFEST=<path>           default: backend/startup_manifest.json
+  STARTUP_EAGER_ROUTERS=a,b         routers za kupakia kwenye boot daima
+  STARTUP_BACKGROUND_ROUTERS=1      (main) pakia routers zilizochelewa baada ya ready
+  MODELS_AUTOLOAD                   huwekwa 0 na `Startup` (manifest fresh) isipowekwa tayari
+"""
+from __future__ import annotations
+
+import ast
+import asyncio
+import hashlib
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+log = logging.getLogger("smartbiz.startup")
+
+T0 = time.perf_counter()
+
+_BACKEND = Path(__file__).resolve().parent.parent
+MODELS_PKG = "backend.models"
+ROUTES_PKG = "backend.routes"
+CRITICAL_MODELS: Tuple[str, ...] = (
+    "backend.models.user",
+    "backend.models.live_stream",
+    "backend.models.gift_movement",
+    "backend.models.gift_transaction",
+)
+# hupakia routers zote zilizochelewa kabla ya kujibu
+LOAD_ALL_PATHS = frozenset({"/openapi.json", "/docs", "/docs/oauth2-redirect", "/_routes"})
+MANIFEST_VERSION = 1
+
+
+def _env_bool(k: str, default: bool) -> bool:
+    v = os.getenv(k)
+    return default if v is None else v.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_list(k: str) -> List[str]:
+    return [x.strip() for x in (os.getenv(k) or "").split(",") if x.strip()]
+
+
+def _ms(t: float) -> float:
+    return round((t - T0) * 1000.0, 1)
+
+
+def rss_mb() -> Optional[float]:
+    """RSS ya sasa (Linux: /proc/self/statm); vinginevyo peak RSS."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1048576.0, 1)
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1048576.0 if sys.platform == "darwin" else 1024.0), 1)
+    except Exception:
+        return None
+
+
+def module_file(fq: str) -> Optional[Path]:
+    """backend.x.y → <backend>/x/y.py (au x/y/__init__.py)."""
+    parts = fq.split(".")[1:]
+    if not parts:
+        return None
+    base = _BACKEND.joinpath(*parts)
+    for p in (base.with_suffix(".py"), base / "__init__.py"):
+        if p.is_file():
+            return p
+    return None
+
+
+def file_sha1(path: Optional[Path]) -> Optional[str]:
+    if path is None:
+        return None
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+# ───────────────────────────── Timeline ─────────────────────────────
+class StartupTimeline:
+    def __init__(self) -> None:
+        self.phases: List[Dict[str, Any]] = []
+        self.imports: Dict[str, Dict[str, Any]] = {}
+        self.ready_ms: Optional[float] = None
+        self.ready_rss_mb: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        n = len(sys.modules)
+        try:
+            yield
+        finally:
+            self.phases.append({
+                "name": name, "at_ms": _ms(t),
+                "ms": round((time.perf_counter() - t) * 1000.0, 1),
+                "new_modules": len(sys.modules) - n,
+            })
+
+    def timed_import(self, fq: str, kind: str = "module") -> Any:
+        """importlib.import_module + rekodi (ms za jumla, modules mpya)."""
+        if fq in sys.modules:
+            return sys.modules[fq]
+        t = time.perf_counter()
+        n = len(sys.modules)
+        try:
+            return importlib.import_module(fq)
+        finally:
+            self.imports[fq] = {
+                "kind": kind, "at_ms": _ms(t),
+                "ms": round((time.perf_counter() - t) * 1000.0, 2),
+                "new_modules": len(sys.modules) - n,
+            }
+
+    def mark_ready(self) -> None:
+        self.ready_ms = _ms(time.perf_counter())
+        self.ready_rss_mb = rss_mb()
+
+    def snapshot(self, top: int = 50) -> Dict[str, Any]:
+        slow = sorted(self.imports.items(), key=lambda kv: kv[1]["ms"], reverse=True)[:max(0, top)]
+        return {
+            "ready_ms": self.ready_ms,
+            "ready_rss_mb": self.ready_rss_mb,
+            "rss_mb": rss_mb(),
+            "sys_modules": len(sys.modules),
+            "phases": list(self.phases),
+            "imports_total": len(self.imports),
+            "imports_ms": round(sum(v["ms"] for v in self.imports.values() if v["kind"] != "lazy-router"), 1),
+            "slowest_imports": [{"module": k, **v} for k, v in slow],
+        }
+
+
+timeline = StartupTimeline()
+
+
+# ───────────────────────────── Manifest ─────────────────────────────
+def manifest_path() -> Path:
+    return Path(os.getenv("STARTUP_MANIFEST") or (_BACKEND / "startup_manifest.json"))
+
+
+def _hidden(fq: str) -> bool:
+    base = fq.rsplit(".", 1)[-1]
+    return base.startswith("_") or any(t in fq for t in (".__disabled__", ".disabled", ".bak", ".backup"))
+
+
+def _pkg_modules(pkg: str) -> List[str]:
+    d = _BACKEND / pkg.split(".", 1)[1]
+    out = []
+    for p in sorted(d.glob("*.py")):
+        fq = f"{pkg}.{p.stem}"
+        if not _hidden(fq):
+            out.append(fq)
+    return out
+
+
+def _name(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return ""
+
+
+def _str_arg(call: ast.Call, i: int = 0, kw: Optional[str] = None) -> Optional[str]:
+    if kw is not None:
+        for k in call.keywords:
+            if k.arg == kw and isinstance(k.value, ast.Constant) and isinstance(k.value.value, str):
+                return k.value.value
+        return None
+    if len(call.args) > i and isinstance(call.args[i], ast.Constant) and isinstance(call.args[i].value, str):
+        return call.args[i].value
+    return None
+
+
+def scan_model_deps(modules: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """AST ya backend.models.* → {module: {"sha1", "deps": [modules zinazotajwa na mappers]}}."""
+    mods = list(modules) if modules is not None else _pkg_modules(MODELS_PKG)
+    classes: Dict[str, str] = {}
+    tables: Dict[str, str] = {}
+    refs: Dict[str, Tuple[Set[str], Set[str], Set[str]]] = {}
+    out: Dict[str, Dict[str, Any]] = {}
+    for fq in mods:
+        path = module_file(fq)
+        out[fq] = {"sha1": file_sha1(path), "deps": []}
+        try:
+            tree = ast.parse(path.read_bytes()) if path else None
+        except SyntaxError:
+            tree = None
+        if tree is None:
+            continue
+        cls_refs: Set[str] = set()
+        tbl_refs: Set[str] = set()
+        mod_refs: Set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef):
+                classes.setdefault(node.name, fq)
+                for st in node.body:
+                    if (isinstance(st, (ast.Assign, ast.AnnAssign)) and isinstance(st.value, ast.Constant)
+                            and isinstance(st.value.value, str)
+                            and any(_name(t) == "__tablename__" for t in (st.targets if isinstance(st, ast.Assign) else [st.target]))):
+                        tables.setdefault(st.value.value, fq)
+            elif isinstance(node, ast.Call):
+                fn = _name(node.func)
+                if fn in ("relationship", "backref"):
+                    target = _str_arg(node)
+                    if target and fn == "relationship":
+                        cls_refs.add(target.rsplit(".", 1)[-1])
+                    sec = _str_arg(node, kw="secondary")
+                    if sec:
+                        tbl_refs.add(sec)
+                elif fn == "ForeignKey":
+                    target = _str_arg(node)
+                    if target and "." in target:
+                        tbl_refs.add(target.rsplit(".", 1)[0].rsplit(".", 1)[-1])
+            elif isinstance(node, ast.ImportFrom):
+                m = node.module or ""
+                if node.level == 1 and m:
+                    mod_refs.add(f"{MODELS_PKG}.{m.split('.')[0]}")
+                elif node.level == 1 or m in (MODELS_PKG, "models"):
+                    mod_refs.update(f"{MODELS_PKG}.{a.name}" for a in node.names)
+                elif m.startswith(MODELS_PKG + ".") or m.startswith("models."):
+                    mod_refs.add(f"{MODELS_PKG}.{m.split('.')[-1]}")
+        refs[fq] = (cls_refs, tbl_refs, mod_refs)
+
+    known = set(out)
+    for fq, (cls_refs, tbl_refs, mod_refs) in refs.items():
+        deps = {classes[c] for c in cls_refs if c in classes}
+        deps |= {tables[t] for t in tbl_refs if t in tables}
+        deps |= {m for m in mod_refs if m in known}
+        deps.discard(fq)
+        out[fq]["deps"] = sorted(deps)
+    return out
+
+
+def scan_routers(modules: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Import kila backend.routes.* (build time) → paths za routes zake."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for fq in (modules if modules is not None else _pkg_modules(ROUTES_PKG)):
+        entry: Dict[str, Any] = {"sha1": file_sha1(module_file(fq))}
+        try:
+            mod = importlib.import_module(fq)
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            out[fq] = entry
+            continue
+        router = getattr(mod, "router", None)
+        if router is None:
+            entry["router"] = False
+            out[fq] = entry
+            continue
+        entry["router"] = True
+        entry["eager"] = bool(getattr(router, "on_startup", None) or getattr(router, "on_shutdown", None))
+        paths = []
+        for r in getattr(router, "routes", []):
+            p = getattr(r, "path", None)
+            if p:
+                paths.append(p)
+        entry["paths"] = sorted(set(paths))
+        out[fq] = entry
+    return out
+
+
+def build_manifest(path: Optional[Path] = None) -> Dict[str, Any]:
+    data = {
+        "version": MANIFEST_VERSION,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "models": scan_model_deps(),
+        "routers": scan_routers(),
+    }
+    target = path or manifest_path()
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+    tmp.replace(target)
+    return data
+
+
+def load_manifest() -> Optional[Dict[str, Any]]:
+    p = manifest_path()
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        log.info("startup manifest not found (%s); eager startup", p)
+        return None
+    except Exception as e:
+        log.warning("startup manifest unreadable (%s): %s; eager startup", p, e)
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        log.warning("startup manifest version %s != %s; eager startup", data.get("version"), MANIFEST_VERSION)
+        return None
+    return data
+
+
+# ───────────────────────────── Models ─────────────────────────────
+class ModelGraph:
+    """deps za mappers kutoka manifest; `fresh` = files za models hazijabadilika."""
+
+    def __init__(self, manifest: Optional[Dict[str, Any]]) -> None:
+        models = (manifest or {}).get("models") or {}
+        self.deps: Dict[str, List[str]] = {k: list(v.get("deps") or ()) for k, v in models.items()}
+        self.fresh = bool(models) and self._check(models)
+        self.mode = "closure" if self.fresh else "all"
+        self.eager: List[str] = []
+        self._hooked = False
+
+    @staticmethod
+    def _check(models: Dict[str, Any]) -> bool:
+        current = _pkg_modules(MODELS_PKG)
+        if set(current) != set(models):
+            log.info("startup manifest: model set changed; loading all models")
+            return False
+        for fq in current:
+            if file_sha1(module_file(fq)) != models[fq].get("sha1"):
+                log.info("startup manifest: %s changed; loading all models", fq)
+                return False
+        return True
+
+    @property
+    def lazy(self) -> bool:
+        """Closure mode inawezekana: manifest fresh na package haijapakia models zote."""
+        return self.fresh and not getattr(sys.modules.get(MODELS_PKG), "_LOADED_ONCE", False)
+
+    def closure(self, roots: Iterable[str]) -> List[str]:
+        seen: Set[str] = set()
+        stack = [r for r in roots if r in self.deps]
+        while stack:
+            m = stack.pop()
+            if m in seen:
+                continue
+            seen.add(m)
+            stack.extend(d for d in self.deps.get(m, ()) if d not in seen)
+        return sorted(seen, key=lambda s: (s != "backend.models.user", s))
+
+    @staticmethod
+    def loaded() -> List[str]:
+        return sorted(m for m in list(sys.modules) if m.startswith(MODELS_PKG + ".") and not _hidden(m))
+
+    def import_required(self, extra: Iterable[str] = ()) -> List[str]:
+        """Pakia closure ya models zilizopo + `extra`; rudisha zilizopakiwa sasa."""
+        done: List[str] = []
+        for fq in self.closure([*self.loaded(), *extra]):
+            if fq in sys.modules:
+                continue
+            try:
+                timeline.timed_import(fq, "model")
+                done.append(fq)
+            except Exception as e:
+                log.error("Model import failed: %s → %s", fq, e)
+        return done
+
+    def install_hook(self) -> None:
+        """Kila mapper mpya (router iliyochelewa) → pakia targets zake kabla ya configure."""
+        from sqlalchemy import event
+        from sqlalchemy.orm import Mapper
+
+        def _before_configured() -> None:
+            added = self.import_required()
+            if added:
+                log.info("mapper deps loaded on demand: %s", added)
+
+        if not self._hooked:
+            event.listen(Mapper, "before_configured", _before_configured)
+            self._hooked = True
+
+
+# ───────────────────────────── Routers ─────────────────────────────
+def _first_segment(path: str) -> str:
+    seg = path.lstrip("/").split("/", 1)[0]
+    return "*" if "{" in seg else seg
+
+
+class LazyRouters:
+    """
+    Routers ambazo hazijapakiwa + index ya paths zao (kwa segment ya kwanza),
+    ili ukaguzi wa kila request uwe dict lookup + regex chache tu.
+    """
+
+    def __init__(self, app: Any, manifest: Optional[Dict[str, Any]], enabled: bool = True) -> None:
+        self.app = app
+        self.routers: Dict[str, Any] = (manifest or {}).get("routers") or {}
+        self.enabled = enabled and bool(self.routers)
+        self.eager_names = set(_env_list("STARTUP_EAGER_ROUTERS"))
+        self.pending: Dict[str, List[Pattern[str]]] = {}
+        self._by_seg: Dict[str, Set[str]] = {}
+        self._order: Dict[str, int] = {}
+        self._rank: Dict[int, float] = {}
+        self.loaded: Dict[str, float] = {}
+        self.failed: Dict[str, str] = {}
+        self.skipped: List[str] = []
+        self.stale: List[str] = []
+
+    # ----- boot -----
+    def begin(self) -> None:
+        """Routes zilizopo kabla ya autoscan hubaki mbele ya routes zilizochelewa."""
+        for r in self.app.router.routes:
+            self._rank[id(r)] = -1
+
+    def track(self, order: int, routes: Iterable[Any]) -> None:
+        for r in routes:
+            self._rank[id(r)] = order
+
+    def defer(self, fq: str, order: int) -> bool:
+        """True kama `fq` haitapakiwa sasa (imechelewa au haina router)."""
+        if not self.enabled:
+            return False
+        entry = self.routers.get(fq)
+        short = fq.rsplit(".", 1)[-1]
+        if entry is None or "error" in entry or fq in self.eager_names or short in self.eager_names:
+            return False
+        if entry.get("sha1") != file_sha1(module_file(fq)):
+            self.stale.append(fq)
+            return False
+        if not entry.get("router"):
+            self.skipped.append(fq)
+            return True
+        if entry.get("eager"):
+            return False
+        try:
+            from starlette.routing import compile_path
+            pats = [compile_path(p)[0] for p in entry.get("paths") or ()]
+        except Exception:
+            return False
+        self.pending[fq] = pats
+        self._order[fq] = order
+        for p in entry.get("paths") or ():
+            self._by_seg.setdefault(_first_segment(p), set()).add(fq)
+        return True
+
+    # ----- runtime -----
+    def _matches(self, path: str) -> List[str]:
+        alt = path[:-1] if path.endswith("/") and len(path) > 1 else path + "/"
+        cands = self._by_seg.get(_first_segment(path), set()) | self._by_seg.get("*", set())
+        return sorted(
+            (fq for fq in cands if fq in self.pending
+             and any(p.match(path) or p.match(alt) for p in self.pending[fq])),
+            key=self._order.__getitem__,
+        )
+
+    def ensure(self, path: str) -> None:
+        todo = list(self.pending) if path in LOAD_ALL_PATHS else self._matches(path)
+        for fq in todo:
+            self.load(fq)
+
+    def load_all(self) -> None:
+        for fq in list(self.pending):
+            self.load(fq)
+
+    async def load_pending(self, pause: float = 0.0) -> None:
+        """Baada ya ready: pakia routers zilizobaki kwa mpangilio, moja kwa kila tick."""
+        while self.pending:
+            fq = min(self.pending, key=self._order.__getitem__)
+            self.load(fq)
+            await asyncio.sleep(pause)
+        log.info("deferred routers loaded in background (%d)", len(self.loaded))
+
+    def load(self, fq: str) -> bool:
+        if self.pending.pop(fq, None) is None:
+            return fq in self.loaded
+        t = time.perf_counter()
+        try:
+            mod = timeline.timed_import(fq, "lazy-router")
+            router = getattr(mod, "router")
+        except Exception as e:
+            self.failed[fq] = f"{type(e).__name__}: {e}"
+            log.error("Failed lazy include %s: %s", fq, e)
+            return False
+        routes = self.app.router.routes
+        n = len(routes)
+        self.app.include_router(router)
+        new = routes[n:]
+        del routes[n:]
+        # mahali ambapo autoscan (eager) ingeweka routes hizi
+        order = self._order[fq]
+        at = next((i for i, r in enumerate(routes) if self._rank.get(id(r), float("inf")) > order), len(routes))
+        routes[at:at] = new
+        self.track(order, new)
+        self.app.openapi_schema = None
+        self.loaded[fq] = round((time.perf_counter() - t) * 1000.0, 1)
+        logging.getLogger("smartbiz.routes").info("Lazy-included %s.router (%.1f ms)", fq, self.loaded[fq])
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": sorted(self.pending),
+            "loaded_on_demand_ms": dict(self.loaded),
+            "failed": dict(self.failed),
+            "stale": list(self.stale),
+            "skipped_no_router": list(self.skipped),
+        }
+
+
+class LazyRouterMiddleware:
+    """ASGI: pakia routers zilizochelewa zinazolingana na path kabla ya routing."""
+
+    def __init__(self, app: Any, routers: LazyRouters) -> None:
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if self.routers.pending and scope["type"] in ("http", "websocket"):
+            self.routers.ensure(scope.get("path") or "/")
+        await self.app(scope, receive, send)
+
+
+# ───────────────────────────── Wiring ─────────────────────────────
+class Startup:
+    def __init__(self) -> None:
+        self.enabled = _env_bool("STARTUP_LAZY", True)
+        with timeline.phase("manifest"):
+            self.manifest = load_manifest() if self.enabled else None
+            self.models = ModelGraph(self.manifest)
+        if self.models.fresh:
+            os.environ.setdefault("MODELS_AUTOLOAD", "0")
+        self.routers: Optional[LazyRouters] = None
+
+    def lazy_routers(self, app: Any) -> LazyRouters:
+        self.routers = LazyRouters(app, self.manifest, enabled=self.enabled)
+        return self.routers
+
+    def snapshot(self, top: int = 50) -> Dict[str, Any]:
+        out = timeline.snapshot(top=top)
+        out["manifest"] = {
+            "path": str(manifest_path()),
+            "loaded": self.manifest is not None,
+            "generated_at": (self.manifest or {}).get("generated_at"),
+        }
+        out["models"] = {"mode": self.models.mode, "eager": list(self.models.eager),
+                         "loaded": len(self.models.loaded()), "known": len(self.models.deps)}
+        out["routers"] = self.routers.snapshot() if self.routers else {"enabled": False}
+        return out
@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from backend.db import get_db
 from backend.models.message import MessageLog
 import os
-import httpx
+from typing import Any
+
+from backend.utils.http_client import apost
 
 router = APIRouter()  # Declare router
 
@@ -12,16 +14,17 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 BASE_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}"
 
 # ==================== HELPER: Send Message ====================
-async def send_telegram_message(chat_id: str, message: str) -> dict:
+# Connection ya api.telegram.org hutumika tena (utils.http_client keep-alive pool)
+async def send_telegram_message(chat_id: str, message: str, parse_mode: str = "Markdown", **extra: Any) -> dict:
     url = f"{BASE_URL}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": message,
-        "parse_mode": "Markdown"
+        "parse_mode": parse_mode,
+        **extra,
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload)
-        return response.json()
+    response = await apost(url, json=payload)
+    return response.json()
 
 # (Optional) HELPER: Send Message with Buttons
 async def send_message_with_buttons(chat_id: str, message: str, buttons: list) -> dict:
@@ -33,9 +36,8 @@ async def send_message_with_buttons(chat_id: str, message: str, buttons: list) -
             "inline_keyboard": buttons
         }
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload)
-        return response.json()
+    response = await apost(url, json=payload)
+    return response.json()
 
 # ==================== TELEGRAM WEBHOOK ====================
 @router.post("/telegram/webhook", summary="ðŸŽ¯ Telegram Bot Webhook")
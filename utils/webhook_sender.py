@@ -1,58 +1,37 @@
-import requests
-import hmac
-import hashlib
+import json
+from typing import Optional
+
 from sqlalchemy.orm import Session
-from backend.crud import webhook_crud
+from backend.crud import webhook_queue_crud
+
 
 def send_webhook(
     db: Session,
     endpoint,
     payload: dict,
-    max_retries: int = 3
-):
-    import json, time
-
+    max_retries: Optional[int] = None,
+    event_type: str = "generic",
+    correlation_id: Optional[str] = None,
+) -> bool:
+    """
+    Weka webhook kwenye foleni ya kudumu (`webhook_events`) na urudi mara moja.
+
+    Utoaji halisi (HTTP, signature, retries/backoff, circuit breaker,
+    WebhookDeliveryLog) hufanywa na services.webhook_engine kwenye background.
+    Hurudisha True ikiwa tukio limepangwa.
+
+    Endpoint imetajwa moja kwa moja, hivyo `subscribed_events` yake haichuji
+    (send_webhook ya zamani ilituma kila mara).
+    """
     payload_str = json.dumps(payload)
-    headers = {
-        "Content-Type": "application/json"
-    }
-
-    # Optional: sign payload with secret
-    if endpoint.secret:
-        signature = hmac.new(
-            key=endpoint.secret.encode("utf-8"),
-            msg=payload_str.encode("utf-8"),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-        headers["X-Signature"] = signature
-
-    success = False
-    response_code = None
-    error_message = None
-
-    for attempt in range(1, max_retries + 1):
-        try:
-            res = requests.post(endpoint.url, data=payload_str, headers=headers, timeout=10)
-            response_code = res.status_code
-            if res.status_code >= 200 and res.status_code < 300:
-                success = True
-                break
-            else:
-                error_message = f"Non-200 status: {res.status_code}"
-        except Exception as e:
-            error_message = str(e)
-
-        time.sleep(1)  # Optional delay between retries
-
-    # Log result
-    webhook_crud.log_delivery(
-        db=db,
-        endpoint_id=endpoint.id,
+    n = webhook_queue_crud.enqueue_event(
+        db,
+        user_id=endpoint.user_id,
+        event_type=event_type,
         payload=payload_str,
-        response_code=response_code or 0,
-        success=success,
-        error_message=error_message,
-        attempts=attempt
+        endpoint_ids=[endpoint.id],
+        correlation_id=correlation_id,
+        max_retries=max_retries,
+        subscribed_only=False,
     )
-
-    return success
+    return bool(n)
@@ -3,26 +3,57 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+import uuid
 from typing import Dict, Set, Iterable, Optional, Any
 
 from fastapi import WebSocket
 from starlette.websockets import WebSocketState
 
+from backend.utils.ws_backplane import Backplane, Handler, channel_for, get_backplane
+from backend.utils.ws_broadcast import BroadcastReport, encode_message, fan_out
+from backend.utils.ws_outbox import OUTBOX_SIZE, Outbox, coalesce_key, outbox_metrics
+
+log = logging.getLogger("smartbiz.ws")
+
+_ALL_CHANNEL_KEY = "*all"
+
+
 class WebSocketManager:
     """
     Lightweight, concurrency-safe WS hub keyed by stream_id (int).
 
     Features:
     - connect/disconnect with lock
-    - safe broadcast with auto-cleanup of dead sockets
+    - safe broadcast with auto-cleanup of dead sockets (encode-once, bounded
+      concurrent fan-out with per-socket send timeouts; see utils.ws_broadcast)
     - send_personal, broadcast, broadcast_many, broadcast_all
     - count helpers, close_stream
     - optional heartbeat ping()
+    - cluster-wide fan-out through a pub/sub backplane (see utils.ws_backplane):
+      a stream channel is subscribed when its first local socket connects and
+      dropped when the last one leaves
+    - per-socket bounded outbound queue + writer task (see utils.ws_outbox), so
+      a broadcast only enqueues and slow consumers are coalesced/dropped/evicted
+      by policy instead of stalling the room
     """
 
-    def __init__(self) -> None:
+    def __init__(self, backplane: Optional[Backplane] = None, *, outbox_size: Optional[int] = None) -> None:
         self._active: Dict[int, Set[WebSocket]] = {}
         self._lock = asyncio.Lock()
+        self._backplane = backplane
+        self._node = uuid.uuid4().hex  # skip echoes of our own publishes
+        self._subs: Dict[Any, Handler] = {}
+        self.last_report: BroadcastReport = BroadcastReport()
+        self._outbox_size = OUTBOX_SIZE if outbox_size is None else max(0, outbox_size)
+        self._outboxes: Dict[WebSocket, Outbox] = {}
+        self.evicted = 0
+
+    @property
+    def backplane(self) -> Backplane:
+        if self._backplane is None:
+            self._backplane = get_backplane()
+        return self._backplane
 
     # --------------------------
     # Internal helpers
@@ -32,6 +63,9 @@ class WebSocketManager:
 
     async def _safe_send_json(self, ws: WebSocket, message: Any) -> bool:
         """Send JSON; return False if socket is closed/broken."""
+        ob = self._outboxes.get(ws)
+        if ob is not None:
+            return ob.offer(encode_message(message), coalesce_key(message))
         try:
             if ws.application_state == WebSocketState.CONNECTED:
                 await ws.send_json(message)
@@ -47,8 +81,110 @@ class WebSocketManager:
             return
         for ws in dead:
             s.discard(ws)
+            self._close_outbox_nolock(ws)
         if not s:
             self._active.pop(stream_id, None)
+            await self._unsubscribe_nolock(stream_id)
+
+    def _close_outbox_nolock(self, ws: WebSocket) -> None:
+        ob = self._outboxes.pop(ws, None)
+        if ob is not None:
+            ob.close()
+
+    async def _on_evict(self, ws: WebSocket) -> None:
+        """Outbox gave up on a slow/broken consumer: drop it from every stream."""
+        async with self._lock:
+            self.evicted += 1
+            for sid in [k for k, v in self._active.items() if ws in v]:
+                await self._remove_dead_nolock(sid, (ws,))
+
+    async def _deliver_local(
+        self,
+        stream_id: int,
+        message: Any,
+        *,
+        encoded: Optional[str] = None,
+        key: Optional[str] = None,
+    ) -> BroadcastReport:
+        """Send to sockets attached to THIS worker only (encode-once)."""
+        async with self._lock:
+            sockets = set(self._active.get(stream_id, set()))
+            boxes = [self._outboxes.get(ws) for ws in sockets] if self._outbox_size else []
+        if not sockets:
+            return BroadcastReport()
+
+        if encoded is None:
+            encoded = encode_message(message)
+            key = coalesce_key(message)
+
+        if self._outbox_size:
+            # O(enqueue) per socket; writer tasks do the actual sends
+            report = BroadcastReport(recipients=len(sockets))
+            for ws, ob in zip(sockets, boxes):
+                if ob is not None and ob.offer(encoded, key):
+                    report.delivered += 1
+                else:
+                    report.dropped += 1
+                    if ob is None or ob.closed:
+                        report.dead.add(ws)
+        else:
+            report = await fan_out(sockets, message, encoded=encoded)
+        if report.dead:
+            async with self._lock:
+                await self._remove_dead_nolock(stream_id, report.dead)
+        if report.slow or report.dropped:
+            log.info("ws broadcast stream=%s %s", stream_id, report.as_dict())
+        self.last_report = report
+        return report
+
+    # --------------------------
+    # Backplane glue
+    # --------------------------
+    def _make_handler(self, stream_id: Any) -> Handler:
+        async def _on_remote(data: bytes) -> None:
+            # frame: b"<node>\n<coalesce key>\n<encoded json>" — payload is relayed as-is
+            node, sep, rest = data.partition(b"\n")
+            if not sep or node.decode("ascii", "replace") == self._node:
+                return
+            raw_key, _, body = rest.partition(b"\n")
+            key = raw_key.decode("utf-8") or None
+            text = body.decode("utf-8")
+            if stream_id == _ALL_CHANNEL_KEY:
+                async with self._lock:
+                    stream_ids = list(self._active.keys())
+                for sid in stream_ids:
+                    await self._deliver_local(sid, None, encoded=text, key=key)
+            else:
+                await self._deliver_local(stream_id, None, encoded=text, key=key)
+        return _on_remote
+
+    async def _subscribe_nolock(self, stream_id: Any) -> None:
+        if stream_id in self._subs:
+            return
+        handler = self._make_handler(stream_id)
+        self._subs[stream_id] = handler
+        try:
+            await self.backplane.subscribe(channel_for(stream_id), handler)
+        except Exception as e:
+            self._subs.pop(stream_id, None)
+            log.warning("backplane subscribe failed for %s: %s", stream_id, e)
+
+    async def _unsubscribe_nolock(self, stream_id: Any) -> None:
+        handler = self._subs.pop(stream_id, None)
+        if handler is not None:
+            try:
+                await self.backplane.unsubscribe(channel_for(stream_id), handler)
+            except Exception as e:
+                log.warning("backplane unsubscribe failed for %s: %s", stream_id, e)
+        if stream_id != _ALL_CHANNEL_KEY and not self._active:
+            await self._unsubscribe_nolock(_ALL_CHANNEL_KEY)
+
+    async def _publish(self, key: Any, encoded: str, ckey: Optional[str] = None) -> None:
+        try:
+            frame = f"{self._node}\n{ckey or ''}\n{encoded}"
+            await self.backplane.publish(channel_for(key), frame.encode("utf-8"))
+        except Exception as e:
+            log.warning("backplane publish failed for %s: %s", key, e)
 
     # --------------------------
     # Public API
@@ -58,6 +194,10 @@ class WebSocketManager:
         await ws.accept()
         async with self._lock:
             self._get_set_nolock(stream_id).add(ws)
+            if self._outbox_size and ws not in self._outboxes:
+                self._outboxes[ws] = Outbox(ws, maxsize=self._outbox_size, on_evict=self._on_evict).start()
+            await self._subscribe_nolock(stream_id)
+            await self._subscribe_nolock(_ALL_CHANNEL_KEY)
 
     async def disconnect(self, stream_id: int, ws: WebSocket) -> None:
         """Remove socket from a stream."""
@@ -66,8 +206,11 @@ class WebSocketManager:
             if not s:
                 return
             s.discard(ws)
+            if not any(ws in v for v in self._active.values()):
+                self._close_outbox_nolock(ws)
             if not s:
                 self._active.pop(stream_id, None)
+                await self._unsubscribe_nolock(stream_id)
 
     async def send_personal(self, ws: WebSocket, message: Any) -> None:
         """Send to one socket (no registration needed)."""
@@ -75,27 +218,16 @@ class WebSocketManager:
 
     async def broadcast(self, stream_id: int, message: Any) -> int:
         """
-        Send to all sockets in a stream.
-        Returns the number of successful deliveries.
+        Send to all sockets in a stream, on every worker.
+        Returns the number of successful deliveries on THIS worker; other
+        workers receive the message through the backplane. The payload is
+        serialized once and reused for every socket and the backplane frame;
+        the full delivered/dropped/slow report is kept on `last_report`.
         """
-        async with self._lock:
-            sockets = set(self._active.get(stream_id, set()))
-        if not sockets:
-            return 0
-
-        delivered = 0
-        dead: Set[WebSocket] = set()
-        for ws in sockets:
-            ok = await self._safe_send_json(ws, message)
-            if ok:
-                delivered += 1
-            else:
-                dead.add(ws)
-
-        if dead:
-            async with self._lock:
-                await self._remove_dead_nolock(stream_id, dead)
-        return delivered
+        encoded, key = encode_message(message), coalesce_key(message)
+        report = await self._deliver_local(stream_id, None, encoded=encoded, key=key)
+        await self._publish(stream_id, encoded, key)
+        return report.delivered
 
     async def broadcast_many(self, stream_ids: Iterable[int], message: Any) -> int:
         """Broadcast the same message to multiple streams; returns total deliveries."""
@@ -105,12 +237,14 @@ class WebSocketManager:
         return total
 
     async def broadcast_all(self, message: Any) -> int:
-        """Broadcast to every connected socket across all streams."""
+        """Broadcast to every connected socket across all streams (cluster-wide)."""
         async with self._lock:
             stream_ids = list(self._active.keys())
+        encoded, key = encode_message(message), coalesce_key(message)
         total = 0
         for sid in stream_ids:
-            total += await self.broadcast(sid, message)
+            total += (await self._deliver_local(sid, None, encoded=encoded, key=key)).delivered
+        await self._publish(_ALL_CHANNEL_KEY, encoded, key)
         return total
 
     # --------------------------
@@ -123,10 +257,20 @@ class WebSocketManager:
                 return sum(len(s) for s in self._active.values())
             return len(self._active.get(stream_id, set()))
 
+    def queue_metrics(self) -> Dict[str, Any]:
+        """Outbound queue depth / drop / eviction counters for this hub."""
+        out = outbox_metrics(self._outboxes.values())
+        out["capacity"] = self._outbox_size
+        out["evicted"] = self.evicted
+        return out
+
     async def close_stream(self, stream_id: int, code: int = 1000, reason: str = "") -> int:
         """Close all sockets in a stream and remove the group."""
         async with self._lock:
             sockets = self._active.pop(stream_id, set())
+            for ws in sockets:
+                self._close_outbox_nolock(ws)
+            await self._unsubscribe_nolock(stream_id)
         closed = 0
         for ws in sockets:
             try:
@@ -139,8 +283,14 @@ class WebSocketManager:
     async def ping(self, stream_id: Optional[int] = None, payload: Any = {"type": "ping"}) -> int:
         """
         Optional heartbeat; sends a small ping and prunes dead sockets.
-        Returns deliveries.
+        Returns deliveries. Local only: every worker pings its own sockets.
         """
         if stream_id is None:
-            return await self.broadcast_all(payload)
-        return await self.broadcast(stream_id, payload)
+            async with self._lock:
+                stream_ids = list(self._active.keys())
+            encoded = encode_message(payload)
+            total = 0
+            for sid in stream_ids:
+                total += (await self._deliver_local(sid, None, encoded=encoded)).delivered
+            return total
+        return (await self._deliver_local(stream_id, payload)).delivered
@@ -1,6 +1,10 @@
-import httpx
+import logging
 import os
 
+from backend.utils.http_client import apost, post
+
+log = logging.getLogger(__name__)
+
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN")
 WHATSAPP_PHONE_ID = os.getenv("WHATSAPP_PHONE_ID")
 
@@ -10,9 +14,28 @@ def send_whatsapp_message(phone: str, message: str):
     """
     if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_ID:
         # MOCK fallback
-        print(f"[MOCK] Sending WhatsApp to {phone}: {message}")
+        log.debug("[MOCK] WhatsApp to %s (%d chars)", phone, len(message or ""))
+        return {"status": "mock", "to": phone, "message": message}
+
+    url, headers, payload = _request(phone, message)
+    res = post(url, headers=headers, json=payload)
+    return res.json()
+
+
+async def send_whatsapp_message_async(phone: str, message: str):
+    """
+    Async version (event loop, hakuna thread); hutumia connection pool ya pamoja.
+    """
+    if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_ID:
+        log.debug("[MOCK] WhatsApp to %s (%d chars)", phone, len(message or ""))
         return {"status": "mock", "to": phone, "message": message}
 
+    url, headers, payload = _request(phone, message)
+    res = await apost(url, headers=headers, json=payload)
+    return res.json()
+
+
+def _request(phone: str, message: str):
     url = f"https://graph.facebook.com/v17.0/{WHATSAPP_PHONE_ID}/messages"
     headers = {
         "Authorization": f"Bearer {WHATSAPP_TOKEN}",
@@ -27,5 +50,4 @@ def send_whatsapp_message(phone: str, message: str):
         }
     }
 
-    res = httpx.post(url, headers=headers, json=payload)
-    return res.json()
+    return url, headers, payload
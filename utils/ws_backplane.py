@@ -0,0 +1,211 @@
+# backend/utils/ws_backplane.py
+# -*- coding: utf-8 -*-
+"""
+Pub/sub backplane kwa websocket hubs (cluster-wide fan-out).
+
+Kila uvicorn worker ana sockets zake tu; backplane hupeleka broadcast ya
+worker mmoja kwa workers wote wenye viewers wa stream hiyo.
+
+Backends:
+  - InProcessBackplane : dict ya handlers ndani ya process (default / dev / tests)
+  - RedisBackplane     : Redis PUBLISH/SUBSCRIBE; client yoyote yenye
+                         `publish()` na `pubsub()` (redis.asyncio au stand-in ya tests)
+
+ENV:
+  WS_BACKPLANE=memory|redis        (default: memory)
+  WS_BACKPLANE_REDIS_URL           (fallback: REDIS_URL)
+  WS_BACKPLANE_PREFIX=smartbiz:ws  (namespace ya channels)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol
+
+log = logging.getLogger("smartbiz.ws_backplane")
+
+Handler = Callable[[bytes], Awaitable[None]]
+
+CHANNEL_PREFIX = os.getenv("WS_BACKPLANE_PREFIX", "smartbiz:ws").strip() or "smartbiz:ws"
+
+
+def channel_for(key: Any) -> str:
+    """Jina la channel kwa stream/room (int na str za id moja hupata channel moja)."""
+    return f"{CHANNEL_PREFIX}:{key}"
+
+
+class Backplane(Protocol):
+    async def publish(self, channel: str, data: bytes) -> None: ...
+    async def subscribe(self, channel: str, handler: Handler) -> None: ...
+    async def unsubscribe(self, channel: str, handler: Handler) -> None: ...
+    async def close(self) -> None: ...
+
+
+# ───────────────────────────── In-process ─────────────────────────────
+class InProcessBackplane:
+    """
+    Handlers wote wako kwenye process moja. Inatosha kwa worker mmoja, na
+    huunganisha pia hub nyingi (WebSocketManager instances) za process moja.
+    """
+
+    def __init__(self) -> None:
+        self._subs: Dict[str, List[Handler]] = {}
+
+    async def publish(self, channel: str, data: bytes) -> None:
+        for handler in list(self._subs.get(channel, ())):
+            try:
+                await handler(data)
+            except Exception as e:
+                log.warning("backplane handler failed on %s: %s", channel, e)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._subs.setdefault(channel, []).append(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self._subs.get(channel)
+        if not handlers:
+            return
+        with suppress(ValueError):
+            handlers.remove(handler)
+        if not handlers:
+            self._subs.pop(channel, None)
+
+    def channels(self) -> List[str]:
+        return sorted(self._subs)
+
+    async def close(self) -> None:
+        self._subs.clear()
+
+
+# ───────────────────────────── Redis protocol ─────────────────────────────
+class RedisBackplane:
+    """
+    Redis PUBLISH/SUBSCRIBE. PubSub connection moja kwa process; reader task
+    moja husambaza ujumbe kwa handlers wa ndani wa kila channel.
+
+    `client` ni redis.asyncio.Redis (au stand-in ya tests yenye API ileile:
+    `await client.publish(ch, data)`, `client.pubsub()` yenye
+    subscribe/unsubscribe/get_message/aclose).
+    """
+
+    def __init__(self, client: Any, *, poll_timeout: float = 1.0) -> None:
+        self._client = client
+        self._pubsub: Any = None
+        self._subs: Dict[str, List[Handler]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._poll_timeout = poll_timeout
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackplane":
+        import redis.asyncio as aioredis  # optional dependency
+        return cls(aioredis.Redis.from_url(url))
+
+    async def publish(self, channel: str, data: bytes) -> None:
+        await self._client.publish(channel, data)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        async with self._lock:
+            handlers = self._subs.setdefault(channel, [])
+            handlers.append(handler)
+            if len(handlers) > 1:
+                return
+            if self._pubsub is None:
+                self._pubsub = self._client.pubsub()
+            await self._pubsub.subscribe(channel)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        async with self._lock:
+            handlers = self._subs.get(channel)
+            if not handlers:
+                return
+            with suppress(ValueError):
+                handlers.remove(handler)
+            if handlers:
+                return
+            self._subs.pop(channel, None)
+            if self._pubsub is not None:
+                with suppress(Exception):
+                    await self._pubsub.unsubscribe(channel)
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                msg = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self._poll_timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("redis backplane read failed: %s", e)
+                await asyncio.sleep(1.0)
+                continue
+            if not msg or msg.get("type") != "message":
+                continue
+            ch = msg.get("channel")
+            if isinstance(ch, bytes):
+                ch = ch.decode("utf-8", "replace")
+            data = msg.get("data")
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            for handler in list(self._subs.get(ch, ())):
+                try:
+                    await handler(data)
+                except Exception as e:
+                    log.warning("backplane handler failed on %s: %s", ch, e)
+
+    def channels(self) -> List[str]:
+        return sorted(self._subs)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            with suppress(BaseException):
+                await self._reader
+            self._reader = None
+        if self._pubsub is not None:
+            with suppress(Exception):
+                await self._pubsub.aclose()
+            self._pubsub = None
+        self._subs.clear()
+
+
+# ───────────────────────────── Factory ─────────────────────────────
+_default: Optional[Backplane] = None
+
+
+def get_backplane() -> Backplane:
+    """Backplane ya pamoja ya process (huchaguliwa kwa WS_BACKPLANE)."""
+    global _default
+    if _default is not None:
+        return _default
+    kind = (os.getenv("WS_BACKPLANE", "memory") or "memory").strip().lower()
+    if kind == "redis":
+        url = os.getenv("WS_BACKPLANE_REDIS_URL") or os.getenv("REDIS_URL") or ""
+        try:
+            _default = RedisBackplane.from_url(url or "redis://localhost:6379/0")
+            log.info("WS backplane: redis")
+        except Exception as e:
+            log.warning("Redis backplane unavailable (%s); using in-process", e)
+            _default = InProcessBackplane()
+    else:
+        _default = InProcessBackplane()
+    return _default
+
+
+def set_backplane(backplane: Optional[Backplane]) -> None:
+    """Badilisha backplane ya default (tests / custom wiring)."""
+    global _default
+    _default = backplane
+
+
+async def close_backplane() -> None:
+    global _default
+    bp, _default = _default, None
+    if bp is not None:
+        with suppress(Exception):
+            await bp.close()
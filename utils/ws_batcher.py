@@ -0,0 +1,173 @@
+# backend/utils/ws_batcher.py
+# -*- coding: utf-8 -*-
+"""
+Batching ya events za live kwa tick fupi (opt-in kwa kila connection).
+
+Badala ya frame moja kwa kila gift/like/join, hub hukusanya events za chumba
+kwa `tick` (default 80ms), huunganisha zisizo za lazima, kisha hutuma frame
+MOJA ya JSON array kwa tick:
+
+  - counts (viewer_count, count, ...)  → ya mwisho hushinda
+  - likes (like, likes)                → `count` hujumlishwa
+  - presence (user_joined/left)        → ya mwisho kwa kila user_id hushinda
+  - nyingine zote (chat, gift, ...)    → hubaki kwa mpangilio wake
+
+Client huomba kwa query param `?batch=1`; clients wa zamani hawaguswi na
+huendelea kupata frame moja kwa event.
+
+ENV:
+  WS_BATCH_TICK_MS=80   (kikomo 20..1000)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.utils.ws_broadcast import encode_message
+
+log = logging.getLogger("smartbiz.ws_batcher")
+
+
+def _tick_default() -> float:
+    try:
+        ms = int(os.getenv("WS_BATCH_TICK_MS", "80"))
+    except Exception:
+        ms = 80
+    return max(20, min(1000, ms)) / 1000.0
+
+
+DEFAULT_TICK = _tick_default()
+
+_COUNT_TYPES = {"viewer_count", "viewers", "count", "like_count", "likes_total"}
+_LIKE_TYPES = {"like", "likes"}
+_PRESENCE_TYPES = {"user_joined", "user_left", "viewer_joined", "viewer_left"}
+
+# (event, exclude) — exclude = socket isiyopaswa kupata event hii (echo=false)
+Item = Tuple[Dict[str, Any], Optional[Any]]
+FlushFn = Callable[[Any, List[Item]], Awaitable[None]]
+
+
+def _kind(event: Dict[str, Any]) -> Optional[str]:
+    return event.get("type") or event.get("event")
+
+
+def _collapse_key(event: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """(key, mode) — mode ni 'replace' au 'sum'; None = usiunganishe."""
+    kind = _kind(event)
+    if kind in _COUNT_TYPES:
+        return f"count:{kind}", "replace"
+    if kind in _LIKE_TYPES:
+        return f"like:{kind}", "sum"
+    if kind in _PRESENCE_TYPES:
+        return f"presence:{event.get('user_id')}", "replace"
+    return None
+
+
+class _RoomBuffer:
+    __slots__ = ("items", "index", "received")
+
+    def __init__(self) -> None:
+        self.items: List[Item] = []
+        self.index: Dict[str, int] = {}
+        self.received = 0
+
+    def add(self, event: Dict[str, Any], exclude: Optional[Any]) -> None:
+        self.received += 1
+        ck = _collapse_key(event) if exclude is None else None
+        if ck is None:
+            self.items.append((event, exclude))
+            return
+        key, mode = ck
+        pos = self.index.get(key)
+        if pos is None:
+            self.index[key] = len(self.items)
+            self.items.append((dict(event) if mode == "sum" else event, None))
+            return
+        prev, _ = self.items[pos]
+        if mode == "sum":
+            total = int(prev.get("count") or 1) + int(event.get("count") or 1)
+            prev.update(event)
+            prev["count"] = total
+        else:
+            self.items[pos] = (event, None)
+
+
+class EventBatcher:
+    """
+    Hukusanya events kwa chumba; flush task ya chumba huanzishwa tu kukiwa
+    na events, na hujifunga chumba kikiwa kimya (hakuna tasks za bure).
+    """
+
+    def __init__(self, flush: FlushFn, *, tick: float = DEFAULT_TICK) -> None:
+        self._flush = flush
+        self.tick = tick
+        self._buffers: Dict[Any, _RoomBuffer] = {}
+        self._tasks: Dict[Any, asyncio.Task] = {}
+        self.events_in = 0
+        self.events_out = 0
+        self.frames = 0
+
+    def add(self, room: Any, event: Dict[str, Any], exclude: Optional[Any] = None) -> None:
+        buf = self._buffers.get(room)
+        if buf is None:
+            buf = self._buffers[room] = _RoomBuffer()
+        buf.add(event, exclude)
+        self.events_in += 1
+        if room not in self._tasks:
+            self._tasks[room] = asyncio.get_running_loop().create_task(self._run(room))
+
+    async def _run(self, room: Any) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.tick)
+                buf = self._buffers.pop(room, None)
+                if buf is None or not buf.items:
+                    return
+                self.events_out += len(buf.items)
+                self.frames += 1
+                try:
+                    await self._flush(room, buf.items)
+                except Exception as e:
+                    log.warning("batch flush failed room=%s: %s", room, e)
+        finally:
+            self._tasks.pop(room, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rooms_pending": len(self._buffers),
+            "events_in": self.events_in,
+            "events_out": self.events_out,
+            "ticks": self.frames,
+            "tick_ms": int(self.tick * 1000),
+        }
+
+    async def close(self) -> None:
+        for t in list(self._tasks.values()):
+            t.cancel()
+            with suppress(BaseException):
+                await t
+        self._tasks.clear()
+        self._buffers.clear()
+
+
+def build_frames(items: List[Item], sockets: List[Any]) -> Dict[Any, str]:
+    """
+    JSON array frame kwa kila socket. Sockets zisizo na exclusion hushiriki
+    frame moja (encode mara moja); zilizo na exclusion hupata nakala yao.
+    """
+    excluded = {ex for _, ex in items if ex is not None}
+    shared: Optional[str] = None
+    out: Dict[Any, str] = {}
+    for ws in sockets:
+        if ws in excluded:
+            events = [ev for ev, ex in items if ex is not ws]
+            if events:
+                out[ws] = encode_message(events)
+            continue
+        if shared is None:
+            shared = encode_message([ev for ev, _ in items])
+        out[ws] = shared
+    return out
@@ -0,0 +1,143 @@
+# backend/utils/ws_broadcast.py
+# -*- coding: utf-8 -*-
+"""
+Broadcast engine ya pamoja kwa websocket hubs.
+
+- Payload hu-serialize MARA MOJA (orjson ikiwepo) kisha frame ileile ya
+  text hutumwa kwa sockets zote — si json.dumps kwa kila socket.
+- Fan-out ni concurrent kwa kikomo (workers `max_parallel`), na kila send
+  ina timeout yake; simu moja iliyo polepole haizuii chumba kizima.
+- Hurudisha BroadcastReport (delivered / dropped / slow) pamoja na sockets
+  zilizokufa ili hub ziziondoe.
+
+ENV:
+  WS_BROADCAST_PARALLEL=256     (sends zinazoenda kwa wakati mmoja kwa broadcast)
+  WS_SEND_TIMEOUT_SEC=2.0       (send ikizidi hapa → slow, socket huondolewa)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+from starlette.websockets import WebSocket, WebSocketState
+
+try:  # orjson ni ya haraka zaidi (requirements.txt), json ni fallback
+    import orjson as _orjson  # type: ignore
+except Exception:  # pragma: no cover
+    _orjson = None
+
+
+def _env_float(k: str, default: float) -> float:
+    try:
+        return float(os.getenv(k, "").strip() or default)
+    except Exception:
+        return default
+
+
+DEFAULT_PARALLEL = max(1, int(_env_float("WS_BROADCAST_PARALLEL", 256)))
+DEFAULT_SEND_TIMEOUT = max(0.05, _env_float("WS_SEND_TIMEOUT_SEC", 2.0))
+
+
+def encode_message(message: Any) -> str:
+    """Serialize mara moja kuwa text frame (UTF-8 JSON)."""
+    if isinstance(message, str):
+        return message
+    if isinstance(message, (bytes, bytearray)):
+        return bytes(message).decode("utf-8")
+    if _orjson is not None:
+        return _orjson.dumps(message, default=str).decode("utf-8")
+    return json.dumps(message, ensure_ascii=False, default=str)
+
+
+@dataclass
+class BroadcastReport:
+    recipients: int = 0
+    delivered: int = 0
+    dropped: int = 0      # socket imefungwa / send imeshindwa
+    slow: int = 0         # send imezidi timeout
+    elapsed_ms: float = 0.0
+    dead: Set[Any] = field(default_factory=set, repr=False)
+
+    def merge(self, other: "BroadcastReport") -> "BroadcastReport":
+        self.recipients += other.recipients
+        self.delivered += other.delivered
+        self.dropped += other.dropped
+        self.slow += other.slow
+        self.elapsed_ms = max(self.elapsed_ms, other.elapsed_ms)
+        self.dead |= other.dead
+        return self
+
+    def as_dict(self) -> dict:
+        return {
+            "recipients": self.recipients,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "slow": self.slow,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+
+def _is_connected(ws: Any) -> bool:
+    state = getattr(ws, "application_state", WebSocketState.CONNECTED)
+    return state == WebSocketState.CONNECTED
+
+
+async def fan_out(
+    sockets: Iterable[WebSocket],
+    message: Any,
+    *,
+    exclude: Optional[WebSocket] = None,
+    max_parallel: Optional[int] = None,
+    send_timeout: Optional[float] = None,
+    encoded: Optional[str] = None,
+    send: Optional[Callable[[Any, str], Any]] = None,
+) -> BroadcastReport:
+    """
+    Tuma `message` kwa `sockets` zote kwa concurrency yenye kikomo.
+
+    `encoded` — frame iliyokwisha serialize (ikiwa caller ameshaitengeneza).
+    `send`    — coroutine mbadala `send(ws, text)` (mf. kuweka kwenye queue).
+    """
+    t0 = time.perf_counter()
+    targets: List[Any] = [ws for ws in sockets if ws is not exclude]
+    report = BroadcastReport(recipients=len(targets))
+    if not targets:
+        return report
+
+    text = encoded if encoded is not None else encode_message(message)
+    limit = max(1, min(max_parallel or DEFAULT_PARALLEL, len(targets)))
+    timeout = send_timeout or DEFAULT_SEND_TIMEOUT
+    it = iter(targets)
+
+    async def _send_one(ws: Any) -> None:
+        if send is not None:
+            await send(ws, text)
+        else:
+            await ws.send_text(text)
+
+    async def _worker() -> None:
+        for ws in it:
+            if not _is_connected(ws):
+                report.dropped += 1
+                report.dead.add(ws)
+                continue
+            try:
+                await asyncio.wait_for(_send_one(ws), timeout)
+                report.delivered += 1
+            except asyncio.TimeoutError:
+                report.slow += 1
+                report.dead.add(ws)
+            except Exception:
+                report.dropped += 1
+                report.dead.add(ws)
+
+    if limit == 1:
+        await _worker()
+    else:
+        await asyncio.gather(*(_worker() for _ in range(limit)))
+    report.elapsed_ms = (time.perf_counter() - t0) * 1000.0
+    return report
@@ -0,0 +1,217 @@
+# backend/utils/ws_outbox.py
+# -*- coding: utf-8 -*-
+"""
+Foleni ya nje (outbox) yenye kikomo kwa kila websocket.
+
+Broadcast huweka frame kwenye foleni ya kila socket (O(1)), na writer task
+ya socket husika ndiyo hutuma. Mtazamaji aliye kwenye mtandao dhaifu hajazi
+chumba kizima; foleni yake ikijaa, sera ya overflow huamua:
+
+  drop_oldest  → tupa frame ya zamani zaidi, weka mpya
+  coalesce     → presence/count events za aina moja hubadilishana (ya mwisho
+                 hushinda); ikiwa bado imejaa → drop_oldest
+  disconnect   → funga socket (1013 try again later) na iondoe kwenye hub
+
+ENV:
+  WS_OUTBOX_SIZE=256            (0 = zima outbox; hubs hurudi kwenye fan_out ya moja kwa moja)
+  WS_OUTBOX_POLICY=coalesce     (drop_oldest|coalesce|disconnect)
+"""
+from __future__ import annotations
+
+import asyncio
+import enum
+import logging
+import os
+from collections import deque
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from backend.utils.ws_broadcast import DEFAULT_SEND_TIMEOUT
+
+log = logging.getLogger("smartbiz.ws_outbox")
+
+
+class OverflowPolicy(str, enum.Enum):
+    drop_oldest = "drop_oldest"
+    coalesce = "coalesce"
+    disconnect = "disconnect"
+
+
+def _env_policy() -> OverflowPolicy:
+    raw = (os.getenv("WS_OUTBOX_POLICY", "coalesce") or "coalesce").strip().lower()
+    try:
+        return OverflowPolicy(raw)
+    except ValueError:
+        return OverflowPolicy.coalesce
+
+
+try:
+    OUTBOX_SIZE = max(0, int(os.getenv("WS_OUTBOX_SIZE", "256")))
+except Exception:
+    OUTBOX_SIZE = 256
+OUTBOX_POLICY = _env_policy()
+
+# Events ambazo thamani ya mwisho tu ndiyo ina maana (counts / presence)
+_COUNT_TYPES = {"viewer_count", "viewers", "count", "presence", "like_count", "likes_total"}
+_PRESENCE_TYPES = {"user_joined", "user_left", "viewer_joined", "viewer_left"}
+
+
+def coalesce_key(message: Any) -> Optional[str]:
+    """Ufunguo wa coalescing kwa event (None = isiunganishwe)."""
+    if not isinstance(message, dict):
+        return None
+    kind = message.get("type") or message.get("event")
+    if kind in _COUNT_TYPES:
+        return f"count:{kind}"
+    if kind in _PRESENCE_TYPES:
+        return f"presence:{message.get('user_id')}"
+    return None
+
+
+class Outbox:
+    """Foleni yenye kikomo + writer task ya socket moja."""
+
+    __slots__ = (
+        "ws", "maxsize", "policy", "send_timeout", "_on_evict", "_q", "_keyed",
+        "_wake", "_task", "closed", "sent", "dropped", "coalesced", "max_depth",
+    )
+
+    def __init__(
+        self,
+        ws: Any,
+        *,
+        maxsize: int = OUTBOX_SIZE or 256,
+        policy: OverflowPolicy = OUTBOX_POLICY,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+        on_evict: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> None:
+        self.ws = ws
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self._on_evict = on_evict
+        self._q: Deque[List[Any]] = deque()          # [key, text]
+        self._keyed: Dict[str, List[Any]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    # ----- lifecycle -----
+    def start(self) -> "Outbox":
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._writer())
+        return self
+
+    def close(self) -> None:
+        """Simamisha writer (sync-safe; frames zilizobaki zinatupwa)."""
+        self.closed = True
+        self._q.clear()
+        self._keyed.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        self._task = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._q)
+
+    # ----- producer side -----
+    def offer(self, text: str, key: Optional[str] = None) -> bool:
+        """Weka frame kwenye foleni. False ikiwa imekataliwa/socket imeondolewa."""
+        if self.closed:
+            return False
+
+        if key is not None and self.policy is OverflowPolicy.coalesce:
+            pending = self._keyed.get(key)
+            if pending is not None:
+                pending[1] = text
+                self.coalesced += 1
+                return True
+
+        if len(self._q) >= self.maxsize:
+            if self.policy is OverflowPolicy.disconnect:
+                self._evict("outbox_overflow")
+                return False
+            old = self._q.popleft()
+            if old[0] is not None and self._keyed.get(old[0]) is old:
+                self._keyed.pop(old[0], None)
+            self.dropped += 1
+
+        entry = [key, text]
+        self._q.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+        if len(self._q) > self.max_depth:
+            self.max_depth = len(self._q)
+        self._wake.set()
+        return True
+
+    # ----- consumer side -----
+    async def _writer(self) -> None:
+        try:
+            while not self.closed:
+                if not self._q:
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+                key, text = self._q.popleft()
+                if key is not None:
+                    self._keyed.pop(key, None)
+                try:
+                    await asyncio.wait_for(self.ws.send_text(text), self.send_timeout)
+                    self.sent += 1
+                except asyncio.TimeoutError:
+                    self._evict("send_timeout")
+                    return
+                except Exception:
+                    self._evict("send_failed")
+                    return
+        except asyncio.CancelledError:
+            pass
+
+    def _evict(self, reason: str) -> None:
+        if self.closed:
+            return
+        log.info("ws outbox evict (%s) depth=%s dropped=%s", reason, len(self._q), self.dropped)
+        self.close()
+
+        async def _finish() -> None:
+            with suppress(Exception):
+                await self.ws.close(code=1013)
+            if self._on_evict is not None:
+                with suppress(Exception):
+                    await self._on_evict(self.ws)
+
+        with suppress(RuntimeError):
+            asyncio.get_running_loop().create_task(_finish())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._q),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "policy": self.policy.value,
+        }
+
+
+def outbox_metrics(outboxes: Iterable[Outbox]) -> Dict[str, Any]:
+    """Muhtasari wa foleni zote za hub (kwa /metrics au logs)."""
+    boxes = list(outboxes)
+    depths = [b.depth for b in boxes]
+    return {
+        "sockets": len(boxes),
+        "queued_total": sum(depths),
+        "depth_max": max(depths, default=0),
+        "depth_hwm": max((b.max_depth for b in boxes), default=0),
+        "dropped": sum(b.dropped for b in boxes),
+        "coalesced": sum(b.coalesced for b in boxes),
+        "sent": sum(b.sent for b in boxes),
+        "policy": OUTBOX_POLICY.value,
+        "capacity": OUTBOX_SIZE,
+    }
@@ -1,11 +1,16 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter, Query
 from backend.websocket.live_ws_manager import live_room_manager
 
 router = APIRouter()
 
 @router.websocket("/ws/live/{stream_id}/{user_id}")
-async def live_websocket(websocket: WebSocket, stream_id: int, user_id: int):
-    await live_room_manager.connect(stream_id, websocket)
+async def live_websocket(
+    websocket: WebSocket,
+    stream_id: int,
+    user_id: int,
+    batch: bool = Query(False, description="One JSON array frame per tick instead of one frame per event"),
+):
+    await live_room_manager.connect(stream_id, websocket, batch=batch)
     
     # Notify others user joined
     await live_room_manager.broadcast(stream_id, {
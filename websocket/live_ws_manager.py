@@ -1,25 +1,49 @@
-from typing import Dict, List
+from typing import Dict, List, Set
 from fastapi import WebSocket
 
+from backend.utils.ws_broadcast import BroadcastReport, fan_out
+from backend.utils.ws_batcher import EventBatcher, build_frames
+
 class LiveRoomManager:
     def __init__(self):
         self.active_connections: Dict[int, List[WebSocket]] = {}
+        self.batched: Set[WebSocket] = set()  # sockets that asked for ?batch=1
+        self.batcher = EventBatcher(self._flush_batch)
 
-    async def connect(self, stream_id: int, websocket: WebSocket):
+    async def connect(self, stream_id: int, websocket: WebSocket, batch: bool = False):
         await websocket.accept()
         if stream_id not in self.active_connections:
             self.active_connections[stream_id] = []
         self.active_connections[stream_id].append(websocket)
+        if batch:
+            self.batched.add(websocket)
 
     def disconnect(self, stream_id: int, websocket: WebSocket):
         if stream_id in self.active_connections:
-            self.active_connections[stream_id].remove(websocket)
+            if websocket in self.active_connections[stream_id]:  # may already be evicted by broadcast
+                self.active_connections[stream_id].remove(websocket)
+            self.batched.discard(websocket)
             if not self.active_connections[stream_id]:
                 del self.active_connections[stream_id]
 
-    async def broadcast(self, stream_id: int, message: dict):
-        if stream_id in self.active_connections:
-            for connection in self.active_connections[stream_id]:
-                await connection.send_json(message)
+    async def _flush_batch(self, stream_id: int, items: list) -> None:
+        connections = [ws for ws in self.active_connections.get(stream_id, []) if ws in self.batched]
+        frames = build_frames(items, connections)
+        if not frames:
+            return
+        # every batched socket shares the same array frame here (no exclusions)
+        report = await fan_out(list(frames), None, encoded=next(iter(frames.values())))
+        for connection in report.dead:
+            self.disconnect(stream_id, connection)
+
+    async def broadcast(self, stream_id: int, message: dict) -> BroadcastReport:
+        connections = list(self.active_connections.get(stream_id, []))
+        if self.batched and any(ws in self.batched for ws in connections):
+            self.batcher.add(stream_id, message)
+            connections = [ws for ws in connections if ws not in self.batched]
+        report = await fan_out(connections, message)
+        for connection in report.dead:
+            self.disconnect(stream_id, connection)
+        return report
 
 live_room_manager = LiveRoomManager()